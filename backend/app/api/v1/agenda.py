@@ -18,6 +18,7 @@ from app.schemas.agenda import (
     EventoListResponse
 )
 from app.services.agenda_service import AgendaService
+from app.services.pagination_service import TOTAL_MODE_PATTERN, InvalidCursorError
 from app.services.google_calendar_service import google_calendar_service
 
 router = APIRouter()
@@ -67,20 +68,27 @@ async def list_eventos(
     concluido: Optional[bool] = Query(None, description="Filter by status"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor (next_cursor of the previous page)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact, cached or none"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_operador)
 ):
-    """List events with pagination."""
+    """List events with pagination (page/offset or keyset cursor)."""
     service = AgendaService(db)
-    return await service.list(
-        inicio=inicio,
-        fim=fim,
-        cliente_id=cliente_id,
-        concluido=concluido,
-        user_id=current_user.id,
-        page=page,
-        page_size=page_size
-    )
+    try:
+        return await service.list(
+            inicio=inicio,
+            fim=fim,
+            cliente_id=cliente_id,
+            concluido=concluido,
+            user_id=current_user.id,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            total_mode=total_mode,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 
 @router.get("/hoje", response_model=EventoListResponse)
@@ -1,19 +1,23 @@
 """Clientes routes."""
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db, require_admin, require_operador
 from app.models.user import User
 from app.schemas.cliente import (
+    ClienteCandidato,
     ClienteCreate,
     ClienteListResponse,
     ClienteResponse,
+    ClienteSugestao,
     ClienteUpdate,
 )
+from app.services.cliente_maintenance_service import cliente_maintenance_service
 from app.services.cliente_service import ClienteService
+from app.services.pagination_service import TOTAL_MODE_PATTERN, InvalidCursorError
 
 router = APIRouter()
 
@@ -40,14 +44,51 @@ async def create_cliente(
 @router.get("", response_model=ClienteListResponse)
 async def list_clientes(
     search: Optional[str] = Query(None, description="Search by name or documento"),
+    modo: str = Query("contains", pattern="^(contains|prefix)$", description="contains (trigram) or prefix"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor (next_cursor of the previous page)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact, cached or none"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_operador),
 ):
-    """List clients with pagination."""
+    """List clients with pagination (page/offset or keyset cursor)."""
     service = ClienteService(db)
-    return await service.list(search=search, page=page, page_size=page_size)
+    try:
+        return await service.list(
+            search=search,
+            page=page,
+            page_size=page_size,
+            mode=modo,
+            cursor=cursor,
+            total_mode=total_mode,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@router.get("/sugestoes", response_model=List[ClienteSugestao])
+async def sugerir_clientes(
+    q: str = Query(..., min_length=1, description="Prefixo de nome, email ou documento"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_operador),
+):
+    """Typeahead de clientes (busca por prefixo, ordenada por relevancia)."""
+    service = ClienteService(db)
+    return await service.suggest(q, limit=limit)
+
+
+@router.get("/resolver", response_model=List[ClienteCandidato])
+async def resolver_cliente(
+    nome: str = Query(..., min_length=1, description="Nome aproximado (tolera acento e erro de digitacao)"),
+    k: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_operador),
+):
+    """Top-k clientes para um nome aproximado, com score de similaridade."""
+    service = ClienteService(db)
+    return await service.resolve(nome, limit=k)
 
 
 @router.post("/sincronizar-contratos", response_model=Dict[str, int])
@@ -70,6 +111,41 @@ async def deduplicar_clientes_documento(
     return await service.deduplicate_documentos()
 
 
+@router.post("/manutencao/{tipo}")
+async def iniciar_manutencao_clientes(
+    tipo: str = Path(..., pattern="^(sincronizar_contratos|deduplicar_documentos)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_admin),
+):
+    """Schedule a background sync/dedup job (returns the job for polling)."""
+    return await cliente_maintenance_service.start_job(db, tipo, user_id=current_user.id)
+
+
+@router.get("/manutencao/jobs/{job_id}")
+async def status_manutencao_clientes(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_admin),
+):
+    """Progress of a client maintenance job."""
+    job = await cliente_maintenance_service.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job de manutencao nao encontrado")
+    return job
+
+
+@router.post("/recalcular-metricas", response_model=Dict[str, int])
+async def recalcular_metricas_clientes(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_admin),
+):
+    """Repair stored contract metrics for every client."""
+    service = ClienteService(db)
+    recalculados = await service.rebuild_metrics()
+    await db.commit()
+    return {"clientes_recalculados": recalculados}
+
+
 @router.get("/documento/{documento}", response_model=ClienteResponse)
 async def get_cliente_by_documento(
     documento: str,
@@ -11,6 +11,8 @@ from app.services.cofre_manifest_service import cofre_manifest_service
 from app.services.cofre_schema_service import cofre_schema_service
 from app.services.viva_brain_paths_service import viva_brain_paths_service
 from app.services.viva_memory_service import viva_memory_service
+from app.services.viva_memory_reindex_service import viva_memory_reindex_service
+from app.services.viva_memory_index_service import viva_memory_index_service
 from sqlalchemy import text
 
 router = APIRouter()
@@ -38,6 +40,77 @@ async def cofre_memory_status(
         raise HTTPException(status_code=500, detail=f"Erro ao consultar COFRE: {str(exc)}")
 
 
+@router.post("/memories/reindex")
+async def cofre_memory_reindex_start(
+    session_id: Optional[UUID] = None,
+    max_messages: Optional[int] = Query(default=None, ge=1, le=1_000_000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """Agenda reindex da memoria longa em background (retorna o job para polling)."""
+    try:
+        return await viva_memory_reindex_service.start_job(
+            db=db,
+            user_id=current_user.id,
+            session_id=session_id,
+            max_messages=max_messages,
+        )
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao agendar reindex: {str(exc)}")
+
+
+@router.get("/memories/reindex/{job_id}")
+async def cofre_memory_reindex_status(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    job = await viva_memory_reindex_service.get_job(db=db, job_id=job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de reindex nao encontrado")
+    return job
+
+
+@router.post("/memories/reindex/{job_id}/cancel")
+async def cofre_memory_reindex_cancel(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    job = await viva_memory_reindex_service.cancel_job(db=db, job_id=job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de reindex nao encontrado")
+    return job
+
+
+@router.get("/memories/index")
+async def cofre_memory_index_health(
+    recall_sample: int = Query(default=0, ge=0, le=50),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """Saude do indice ANN; `recall_sample` > 0 mede recall@10 contra busca exata."""
+    _ = current_user
+    try:
+        return await viva_memory_index_service.health(db=db, recall_sample=recall_sample)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar indice da memoria: {str(exc)}")
+
+
+@router.post("/memories/index/rebuild")
+async def cofre_memory_index_rebuild(
+    method: Optional[str] = Query(default=None, pattern="^(hnsw|ivfflat)$"),
+    force: bool = False,
+    current_user: User = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """Agenda rebuild concorrente do indice ANN quando o plano (ou `force`) pedir."""
+    _ = current_user
+    try:
+        return await viva_memory_index_service.maintain(force=force, method=method)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao agendar rebuild do indice: {str(exc)}")
+
+
 @router.get("/memories/tables")
 async def cofre_memory_tables(
     current_user: User = Depends(get_current_user),
@@ -1,14 +1,16 @@
 """Contratos routes."""
+from datetime import date, datetime
 from typing import List, Optional
 from uuid import UUID
 from io import BytesIO
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select, desc, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db, get_current_user, require_operador, require_admin
+from app.config import settings
 from app.models.user import User
 from app.models.contrato import Contrato, ContratoStatus
 from app.models.cliente import Cliente
@@ -17,9 +19,18 @@ from app.schemas.contrato import (
     ContratoUpdate,
     ContratoResponse,
     ContratoListResponse,
-    ContratoTemplateResponse
+    ContratoTemplateResponse,
+    ContratoPreviewRequest,
+    ContratoPreviewResponse,
+    ContratoBulkCreateRequest,
+    ContratoBulkCreateResponse,
 )
+from app.services.contrato_bulk_export_service import contrato_bulk_export_service
+from app.services.contrato_preview_service import contrato_preview_service
 from app.services.contrato_service import ContratoService
+from app.services.pagination_service import TOTAL_MODE_PATTERN, InvalidCursorError
+from app.services.pdf_browser_pool_service import PdfPoolBusyError, pdf_browser_pool_service
+from app.services.weasy_render_pool_service import weasy_render_pool_service
 
 router = APIRouter()
 
@@ -64,22 +75,104 @@ async def create_contrato(
     return await service.create(data, current_user.id)
 
 
+@router.post("/bulk", response_model=ContratoBulkCreateResponse)
+async def bulk_create_contratos(
+    data: ContratoBulkCreateRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_operador)
+):
+    """Create many contracts in one transaction, reporting per-row results."""
+    if len(data.items) > settings.CONTRATO_BULK_CREATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Lote acima do limite de {settings.CONTRATO_BULK_CREATE_MAX_ITEMS} contratos"
+        )
+    service = ContratoService(db)
+    return await service.bulk_create(data.items, current_user.id)
+
+
+@router.post("/preview", response_model=ContratoPreviewResponse)
+async def preview_contrato(
+    data: ContratoPreviewRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_operador)
+):
+    """Preview HTML do rascunho (sem gerar PDF); so re-renderiza blocos alterados."""
+    service = ContratoService(db)
+    if not await service.get_template(data.template_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template não encontrado"
+        )
+    return contrato_preview_service.render(data.template_id, data.dados)
+
+
 @router.get("", response_model=ContratoListResponse)
 async def list_contratos(
     status: Optional[ContratoStatus] = Query(None, description="Filter by status"),
     search: Optional[str] = Query(None, description="Search by cliente name or numero"),
+    modo: str = Query("contains", pattern="^(contains|prefix)$", description="contains (trigram) or prefix"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor (next_cursor of the previous page)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact, cached or none"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_operador)
 ):
-    """List contracts with pagination."""
+    """List contracts with pagination (page/offset or keyset cursor)."""
     service = ContratoService(db)
-    return await service.list(
-        status=status,
-        search=search,
-        page=page,
-        page_size=page_size
+    try:
+        return await service.list(
+            status=status,
+            search=search,
+            page=page,
+            page_size=page_size,
+            mode=modo,
+            cursor=cursor,
+            total_mode=total_mode,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/export/pdf-zip")
+async def export_pdfs_zip(
+    status_filter: Optional[ContratoStatus] = Query(None, alias="status", description="Filter by status"),
+    cliente_id: Optional[UUID] = None,
+    template_id: Optional[str] = None,
+    data_inicio: Optional[date] = Query(None, description="Criados a partir de (YYYY-MM-DD)"),
+    data_fim: Optional[date] = Query(None, description="Criados ate (YYYY-MM-DD)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_operador)
+):
+    """Exporta PDFs dos contratos filtrados num ZIP transmitido em streaming."""
+    items = await contrato_bulk_export_service.list_items(
+        db,
+        status=status_filter,
+        cliente_id=cliente_id,
+        template_id=template_id,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+    )
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum contrato encontrado para exportar"
+        )
+    if len(items) > contrato_bulk_export_service.max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Lote acima do limite de {contrato_bulk_export_service.max_items} contratos; refine o filtro"
+        )
+
+    filename = f"contratos-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    return StreamingResponse(
+        contrato_bulk_export_service.stream_zip(items),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Export-Count": str(len(items)),
+        },
     )
 
 
@@ -139,35 +232,60 @@ async def delete_contrato(
         )
 
 
+@router.get("/pdf/pool-status")
+async def pdf_pool_status(
+    current_user: User = Depends(require_admin)
+):
+    """Metricas dos pools de renderizacao de PDF (Chromium e WeasyPrint) e do preview."""
+    return {
+        **pdf_browser_pool_service.get_stats(),
+        "weasyprint": weasy_render_pool_service.get_stats(),
+        "preview": contrato_preview_service.get_stats(),
+    }
+
+
 @router.get("/{contrato_id}/pdf")
 async def generate_pdf(
     contrato_id: UUID,
+    if_none_match: Optional[str] = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_operador)
 ):
-    """Generate PDF for contract."""
-    from fastapi.responses import Response
+    """Generate PDF for contract (cache por conteudo + ETag)."""
+    from fastapi.responses import FileResponse, Response
     
     service = ContratoService(db)
-    pdf_bytes = await service.generate_pdf_bytes(contrato_id)
+    try:
+        artifact = await service.get_pdf_artifact(contrato_id, if_none_match=if_none_match)
+    except PdfPoolBusyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": "5"},
+        )
     
-    if not pdf_bytes:
+    if not artifact:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erro ao gerar PDF"
         )
     
     # Return PDF with CORS headers
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=contrato-{contrato_id}.pdf",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, OPTIONS",
-            "Access-Control-Allow-Headers": "*"
-        }
-    )
+    headers = {
+        "ETag": f'"{artifact.etag}"',
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename=contrato-{contrato_id}.pdf",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Methods": "GET, OPTIONS",
+        "Access-Control-Allow-Headers": "*",
+        "Access-Control-Expose-Headers": "ETag",
+    }
+    if artifact.not_modified:
+        headers.pop("Content-Disposition")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if artifact.path:
+        return FileResponse(artifact.path, media_type="application/pdf", headers=headers)
+    return Response(content=artifact.content, media_type="application/pdf", headers=headers)
 
 
 @router.post("/{contrato_id}/enviar")
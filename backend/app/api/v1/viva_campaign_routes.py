@@ -1,7 +1,7 @@
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user, get_db
@@ -15,6 +15,7 @@ from app.api.v1.viva_schemas import (
 )
 from app.models.user import User
 from app.services.cofre_memory_service import cofre_memory_service
+from app.services.pagination_service import TOTAL_MODE_PATTERN, InvalidCursorError
 from app.services.viva_campaign_repository_service import viva_campaign_repository_service
 from app.services.viva_shared_service import (
     _clear_campaign_history,
@@ -72,21 +73,27 @@ async def list_campanhas(
     modo: Optional[str] = None,
     limit: int = 30,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     normalized_mode = _normalize_mode(modo) if modo else None
 
     try:
-        rows, total = await viva_campaign_repository_service.list_campaign_rows(
+        rows, total, next_cursor = await viva_campaign_repository_service.list_campaign_page(
             db=db,
             user_id=current_user.id,
             modo=normalized_mode,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            total_mode=total_mode,
         )
         items = [_campaign_row_to_item(row) for row in rows]
-        return CampanhaListResponse(items=items, total=total)
+        return CampanhaListResponse(items=items, total=total, next_cursor=next_cursor)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Erro ao listar campanhas: {str(exc)}")
 
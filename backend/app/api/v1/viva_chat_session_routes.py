@@ -1,7 +1,7 @@
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user, get_db
@@ -11,6 +11,7 @@ from app.api.v1.viva_schemas import (
     ChatSnapshotResponse,
 )
 from app.models.user import User
+from app.services.pagination_service import TOTAL_MODE_PATTERN, InvalidCursorError
 from app.services.viva_chat_repository_service import viva_chat_repository_service
 from app.services.viva_chat_session_service import (
     chat_session_from_row,
@@ -55,19 +56,31 @@ async def get_chat_snapshot(
 async def list_chat_sessions(
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     try:
         await ensure_chat_tables(db)
-        total, rows, safe_page, safe_size = await viva_chat_repository_service.list_sessions_rows(
+        total, rows, safe_page, safe_size, next_cursor = await viva_chat_repository_service.list_sessions_page(
             db=db,
             user_id=current_user.id,
             page=page,
             page_size=page_size,
+            cursor=cursor,
+            total_mode=total_mode,
         )
         items = [chat_session_from_row(row) for row in rows]
-        return ChatSessionListResponse(items=items, total=total, page=safe_page, page_size=safe_size)
+        return ChatSessionListResponse(
+            items=items,
+            total=total,
+            page=safe_page,
+            page_size=safe_size,
+            next_cursor=next_cursor,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Erro ao listar sessoes: {str(exc)}")
 
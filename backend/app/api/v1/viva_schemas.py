@@ -55,9 +55,10 @@ class ChatSessionItem(BaseModel):
 
 class ChatSessionListResponse(BaseModel):
     items: List[ChatSessionItem]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 
 class ChatSessionStartRequest(BaseModel):
@@ -88,7 +89,8 @@ class CampanhaItem(BaseModel):
 
 class CampanhaListResponse(BaseModel):
     items: List[CampanhaItem]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class CampanhaResetResponse(BaseModel):
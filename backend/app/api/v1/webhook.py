@@ -2,15 +2,48 @@
 Endpoints de Webhook para Evolution API.
 Recebe eventos do WhatsApp.
 """
+import logging
+from typing import Any, Dict
+
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.deps import require_operador
+from app.config import settings
 from app.db.session import get_db
+from app.models.user import User
+from app.services.evolution_webhook_queue_service import webhook_queue_service
 from app.services.evolution_webhook_service import webhook_service
 
 router = APIRouter()
 
 
+async def _receber_evento(data: Any, db: AsyncSession) -> Dict[str, Any]:
+    """Enfileira mensagens inbound (ack rapido); demais eventos seguem inline."""
+    if (
+        settings.WEBHOOK_QUEUE_ENABLED
+        and webhook_queue_service.is_running
+        and isinstance(data, dict)
+    ):
+        keys = webhook_service.extract_intake_keys(data)
+        if webhook_queue_service.should_enqueue(keys):
+            try:
+                intake = await webhook_queue_service.enqueue(db, data, keys)
+                return {
+                    "status": "received",
+                    "processed": False,
+                    "queued": intake["queued"],
+                    "duplicate": intake["duplicate"],
+                }
+            except Exception:
+                # Fila indisponivel nao pode perder mensagem: cai no processamento inline.
+                logging.exception("Falha ao enfileirar webhook; processando inline.")
+                await db.rollback()
+
+    processado = await webhook_service.processar_webhook(data, db)
+    return {"status": "received", "processed": processado}
+
+
 @router.post("/evolution")
 async def evolution_webhook(
     request: Request,
@@ -25,12 +58,20 @@ async def evolution_webhook(
     """
     try:
         data = await request.json()
-        processado = await webhook_service.processar_webhook(data, db)
-        return {"status": "received", "processed": processado}
+        return await _receber_evento(data, db)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/evolution/queue/status")
+async def evolution_webhook_queue_status(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_operador),
+):
+    """Profundidade, atraso e tempos por etapa da fila de ingestao do webhook."""
+    return await webhook_queue_service.get_status(db)
+
+
 @router.post("/evolution/{path:path}")
 async def evolution_webhook_catchall(
     path: str,
@@ -50,8 +91,7 @@ async def evolution_webhook_catchall(
             event_hint = str((path or "").strip("/").split("/")[-1] or "").strip()
             if event_hint:
                 data["event"] = event_hint.replace("-", ".").replace("_", ".")
-        processado = await webhook_service.processar_webhook(data, db)
-        return {"status": "received", "processed": processado}
+        return await _receber_evento(data, db)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
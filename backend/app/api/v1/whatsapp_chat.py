@@ -25,6 +25,8 @@ from app.schemas.whatsapp_chat import (
     MensagemResponse,
 )
 from app.services.evolution_webhook_service import webhook_service
+from app.services.whatsapp_lid_binding_service import whatsapp_lid_binding_service
+from app.services.whatsapp_outbound_queue_service import whatsapp_outbound_queue_service
 
 router = APIRouter()
 
@@ -143,6 +145,14 @@ async def bind_numero_real(
     conversa.contexto_ia = contexto
     await db.commit()
     await db.refresh(conversa)
+    lid_jid = contexto.get("lid_jid")
+    if whatsapp_lid_binding_service.is_lid(lid_jid):
+        await whatsapp_lid_binding_service.bind(
+            conversa.instance_name,
+            lid_jid,
+            digits,
+            source="manual_bind",
+        )
 
     sent = await webhook_service._flush_pending_outbound_for_conversation(  # noqa: SLF001
         db=db,
@@ -181,8 +191,11 @@ async def status_whatsapp(
     result = await db.execute(stmt_hoje)
     mensagens_hoje = result.scalar() or 0
 
+    fila_saida = await whatsapp_outbound_queue_service.get_status(db)
+
     return {
         "conversas_ativas": ativas,
         "mensagens_hoje": mensagens_hoje,
+        "fila_saida": fila_saida,
         "status": "online",
     }
@@ -76,7 +76,34 @@ class Settings(BaseSettings):
     WEBHOOK_URL: Optional[str] = None
     WA_INSTANCE_NAME: str = "fc-solucoes"
     WA_QR_TIMEOUT: int = 60000
-    
+
+    # Diretorio em cache (instancias/contatos/chats do Evolution)
+    WA_DIRECTORY_TTL_SECONDS: int = 300
+    WA_DIRECTORY_INSTANCES_TTL_SECONDS: int = 60
+    WA_DIRECTORY_MAX_INSTANCES: int = 8
+    WA_DIRECTORY_REDIS_ENABLED: bool = False
+
+    # Vinculos @lid -> numero (cache negativo com TTL exponencial por falha)
+    WA_LID_NEGATIVE_TTL_SECONDS: int = 600
+    WA_LID_NEGATIVE_MAX_TTL_SECONDS: int = 21600
+    WA_LID_NUMBER_NEGATIVE_TTL_SECONDS: int = 3600
+    WA_LID_MIN_WEBHOOK_CONFIDENCE: float = 0.9
+
+    # Fila de saida para reenvio (backoff exponencial + SKIP LOCKED)
+    WA_OUTBOUND_MAX_ATTEMPTS: int = 6
+    WA_OUTBOUND_BACKOFF_SECONDS: int = 60
+    WA_OUTBOUND_BACKOFF_MAX_SECONDS: int = 3600
+    WA_OUTBOUND_CONCURRENCY: int = 4
+    WA_OUTBOUND_STALE_SECONDS: int = 300
+
+    # Fila de ingestao do webhook (ack rapido + consumidores em background)
+    WEBHOOK_QUEUE_ENABLED: bool = True
+    WEBHOOK_QUEUE_CONCURRENCY: int = 4
+    WEBHOOK_QUEUE_POLL_SECONDS: float = 1.0
+    WEBHOOK_QUEUE_MAX_ATTEMPTS: int = 3
+    WEBHOOK_QUEUE_STALE_SECONDS: int = 300
+    WEBHOOK_QUEUE_RETENTION_HOURS: int = 72
+
     # ==================================================================
     # Storage
     # ==================================================================
@@ -108,8 +135,21 @@ class Settings(BaseSettings):
     OPENAI_VISION_MODEL: str = "gpt-4o-mini"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
     OPENAI_EMBEDDING_FALLBACK_LOCAL: bool = True
+    OPENAI_EMBEDDING_BATCH_SIZE: int = 64
+    OPENAI_EMBEDDING_CONCURRENCY: int = 4
+    # Cache de embeddings por hash de conteudo (LRU em processo + Redis opcional)
+    EMBEDDING_CACHE_MAX_ITEMS: int = 4096
+    EMBEDDING_CACHE_REDIS_ENABLED: bool = False
+    EMBEDDING_CACHE_REDIS_TTL_SECONDS: int = 604800
     OPENAI_TIMEOUT_SECONDS: int = 60
 
+    # Pool HTTP compartilhado (OpenAI/MiniMax/Google) - HTTP/2 exige pacote "h2"
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_POOL_DEFAULT_TIMEOUT: float = 60.0
+    HTTP_POOL_HTTP2: bool = False
+
     # VIVA provider strategy (institucional): openai
     VIVA_PROVIDER: str = "openai"
 
@@ -119,8 +159,43 @@ class Settings(BaseSettings):
     VIVA_MEMORY_ENABLED: bool = False
     VIVA_BRAIN_ROOT: str = "COFRE"
     VIVA_MEMORY_FILE_LOG_ENABLED: bool = True
+    VIVA_MEMORY_REINDEX_PAGE_SIZE: int = 256
+    VIVA_MEMORY_VECTOR_TRANSFER: str = "array"  # array (real[] binario via asyncpg) | text
+    # Indice ANN de viva_memory_vectors (manutencao em background)
+    VIVA_MEMORY_ANN_METHOD: str = "ivfflat"  # ivfflat | hnsw
+    VIVA_MEMORY_ANN_HNSW_M: int = 16
+    VIVA_MEMORY_ANN_HNSW_EF_CONSTRUCTION: int = 64
+    VIVA_MEMORY_ANN_HNSW_EF_SEARCH: int = 40
+    VIVA_MEMORY_ANN_IVFFLAT_PROBES: int = 0  # 0 = automatico (sqrt(lists))
+    VIVA_MEMORY_ANN_IVFFLAT_MIN_ROWS: int = 1000
+    VIVA_MEMORY_ANN_LISTS_DRIFT: float = 2.0
+    VIVA_MEMORY_ANN_MAINTENANCE_INTERVAL_SECONDS: int = 3600
     VIVA_AGENT_STRICT: bool = True
 
+    # ==================================================================
+    # PDF (Playwright) - pool de navegadores aquecidos
+    # ==================================================================
+    PDF_BROWSER_POOL_SIZE: int = 1
+    PDF_BROWSER_CONTEXTS_PER_BROWSER: int = 2
+    PDF_BROWSER_MAX_QUEUE: int = 16
+    PDF_BROWSER_ACQUIRE_TIMEOUT_SECONDS: float = 20.0
+    PDF_BROWSER_RENDER_TIMEOUT_SECONDS: float = 30.0
+    PDF_BROWSER_PAGE_MAX_USES: int = 50
+    PDF_BROWSER_WARM_ON_STARTUP: bool = True
+    PDF_ASSETS_RELOAD_SECONDS: float = 5.0
+    # WeasyPrint (fallback) em processos separados; 0 = thread
+    WEASY_POOL_WORKERS: int = 1
+    WEASY_POOL_START_METHOD: str = "spawn"
+    WEASY_RENDER_TIMEOUT_SECONDS: float = 60.0
+    CONTRATO_PDF_CACHE_ENABLED: bool = True
+    CONTRATO_BULK_EXPORT_CONCURRENCY: int = 4
+    CONTRATO_BULK_EXPORT_MAX_ITEMS: int = 500
+    CONTRATO_BULK_CREATE_MAX_ITEMS: int = 1000
+    CONTRATO_PREVIEW_CACHE_BLOCKS: int = 512
+    EXTENSO_CACHE_SIZE: int = 4096
+    PAGINATION_COUNT_CACHE_SECONDS: float = 30.0
+    CLIENTE_MAINTENANCE_BATCH_SIZE: int = 1000
+
     # ==================================================================
     # Google Calendar (agenda bridge)
     # ==================================================================
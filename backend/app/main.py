@@ -11,11 +11,22 @@ from app.config import settings
 from app.api.router import api_router
 from app.core.logging import setup_logging
 from app.db.session import AsyncSessionLocal
+from app.services.http_client_service import http_client_service
+from app.services.pdf_asset_registry_service import pdf_asset_registry
+from app.services.search_index_service import search_index_service
+from app.services.contrato_preview_service import contrato_preview_service
+from app.services.pdf_browser_pool_service import pdf_browser_pool_service
+from app.services.weasy_render_pool_service import weasy_render_pool_service
 from app.services.viva_handoff_service import viva_handoff_service
 from app.services.viva_brain_paths_service import viva_brain_paths_service
 from app.services.viva_memory_service import viva_memory_service
+from app.services.viva_memory_reindex_service import viva_memory_reindex_service
+from app.services.cliente_maintenance_service import cliente_maintenance_service
+from app.services.viva_memory_index_service import viva_memory_index_service
 from app.services.cofre_schema_service import cofre_schema_service
+from app.services.contrato_template_loader import contract_template_registry
 from app.services.evolution_webhook_service import webhook_service
+from app.services.evolution_webhook_queue_service import webhook_queue_service
 
 
 @asynccontextmanager
@@ -27,6 +38,11 @@ async def lifespan(app: FastAPI):
     # Create storage directory if not exists
     os.makedirs(settings.STORAGE_LOCAL_PATH, exist_ok=True)
     viva_brain_paths_service.ensure_runtime_dirs()
+    contract_template_registry.warm()
+    pdf_asset_registry.warm()
+    with contextlib.suppress(Exception):
+        contrato_preview_service.warm()
+    await http_client_service.startup()
 
     is_vercel = os.getenv("VERCEL") == "1"
 
@@ -58,15 +74,49 @@ async def lifespan(app: FastAPI):
                     continue
 
         worker_task = asyncio.create_task(handoff_worker())
+
+        if settings.WEBHOOK_QUEUE_ENABLED:
+            await webhook_queue_service.start()
+
+        await viva_memory_reindex_service.resume_pending()
+        await cliente_maintenance_service.resume_pending()
+        if settings.VIVA_MEMORY_ENABLED:
+            await viva_memory_index_service.start()
+
+        await search_index_service.start()
+
+        if settings.PDF_BROWSER_WARM_ON_STARTUP:
+            try:
+                await pdf_browser_pool_service.start()
+            except Exception:
+                # Sem Playwright/Chromium o download de PDF segue pelo fallback WeasyPrint.
+                pass
+        with contextlib.suppress(Exception):
+            await weasy_render_pool_service.start()
     
     yield
     
     # Shutdown
+    with contextlib.suppress(Exception):
+        await webhook_queue_service.stop()
+    with contextlib.suppress(Exception):
+        await viva_memory_reindex_service.stop()
+    with contextlib.suppress(Exception):
+        await cliente_maintenance_service.stop()
+    with contextlib.suppress(Exception):
+        await viva_memory_index_service.stop()
+    with contextlib.suppress(Exception):
+        await search_index_service.stop()
+    with contextlib.suppress(Exception):
+        await pdf_browser_pool_service.stop()
+    with contextlib.suppress(Exception):
+        await weasy_render_pool_service.stop()
     stop_event.set()
     if worker_task is not None:
         worker_task.cancel()
         with contextlib.suppress(Exception):
             await worker_task
+    await http_client_service.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -57,6 +57,7 @@ class EventoResponse(EventoInDB):
 class EventoListResponse(BaseModel):
     """Evento list response."""
     items: List[EventoResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
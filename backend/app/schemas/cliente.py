@@ -83,6 +83,27 @@ class ClienteListResponse(BaseModel):
     """Cliente list response."""
 
     items: List[ClienteResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+
+
+class ClienteCandidato(BaseModel):
+    """Fuzzy name resolution candidate."""
+
+    id: UUID
+    nome: str
+    documento: str
+    email: Optional[str] = None
+    total_contratos: int = 0
+    score: float
+
+
+class ClienteSugestao(BaseModel):
+    """Typeahead suggestion."""
+
+    id: UUID
+    nome: str
+    documento: str
+    email: Optional[str] = None
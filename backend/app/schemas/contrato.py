@@ -47,6 +47,27 @@ class ContratoCreate(ContratoBase):
     dados_extras: Optional[Dict[str, Any]] = None
 
 
+class ContratoBulkCreateRequest(BaseModel):
+    """Bulk contrato creation (each item follows ContratoCreate)."""
+    items: List[Dict[str, Any]] = Field(..., min_length=1)
+
+
+class ContratoBulkItemResult(BaseModel):
+    """Per-row result of a bulk creation."""
+    index: int
+    ok: bool
+    id: Optional[UUID] = None
+    numero: Optional[str] = None
+    erro: Optional[str] = None
+
+
+class ContratoBulkCreateResponse(BaseModel):
+    """Bulk contrato creation response."""
+    criados: int
+    falhas: int
+    resultados: List[ContratoBulkItemResult]
+
+
 class ContratoUpdate(BaseModel):
     """Contrato update schema."""
     status: Optional[ContratoStatus] = None
@@ -92,9 +113,10 @@ class ContratoResponse(ContratoInDB):
 class ContratoListResponse(BaseModel):
     """Contrato list response."""
     items: List[ContratoResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 
 # Template schemas
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.agenda import Agenda, EventoTipo
 from app.schemas.agenda import EventoCreate, EventoUpdate
+from app.services.pagination_service import keyset_condition, next_cursor, page_request, resolve_total
 
 
 class AgendaService:
@@ -53,10 +54,13 @@ class AgendaService:
         concluido: Optional[bool] = None,
         user_id: Optional[UUID] = None,
         page: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        cursor: Optional[str] = None,
+        total_mode: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """List events with pagination."""
-        query = select(Agenda).order_by(desc(Agenda.data_inicio))
+        """List events with pagination (`cursor`: keyset on data_inicio, id)."""
+        page_req = page_request(page, page_size, cursor, total_mode)
+        query = select(Agenda).order_by(desc(Agenda.data_inicio), desc(Agenda.id))
         
         if inicio:
             query = query.where(Agenda.data_inicio >= inicio)
@@ -70,21 +74,27 @@ class AgendaService:
             query = query.where(Agenda.created_by == user_id)
         
         # Count total
-        count_result = await self.db.execute(
-            select(func.count(Agenda.id)).select_from(query.subquery())
-        )
-        total = count_result.scalar()
+        async def count() -> int:
+            count_result = await self.db.execute(
+                select(func.count()).select_from(query.order_by(None).subquery())
+            )
+            return count_result.scalar() or 0
+
+        total = await resolve_total(page_req, ("agenda", inicio, fim, cliente_id, concluido, user_id), count)
         
         # Paginate
-        query = query.offset((page - 1) * page_size).limit(page_size)
+        if page_req.cursor:
+            query = query.where(keyset_condition(Agenda.data_inicio, Agenda.id, page_req.cursor))
+        query = query.offset(page_req.offset).limit(page_req.page_size + 1)
         result = await self.db.execute(query)
-        items = result.scalars().all()
+        items = list(result.scalars().all())
         
         return {
-            "items": list(items),
+            "items": items[:page_req.page_size],
             "total": total,
             "page": page,
-            "page_size": page_size
+            "page_size": page_size,
+            "next_cursor": next_cursor(items, page_req.page_size, lambda item: (item.data_inicio, item.id)),
         }
     
     async def get_by_id(self, evento_id: UUID, user_id: Optional[UUID] = None) -> Optional[Agenda]:
@@ -0,0 +1,522 @@
+"""
+Manutencao de clientes em lote: vincular contratos orfaos e mesclar documentos
+duplicados.
+
+Cada lote e um punhado de statements set-based (CTEs com INSERT/UPDATE/DELETE),
+entao o custo cresce com o volume de dados e nao com idas ao banco. O lote e
+confirmado junto com o avanco do cursor (keyset no id do contrato ou no
+documento normalizado), o que deixa a transacao curta e o trabalho retomavel:
+- `run_inline` roda todos os lotes na requisicao (endpoints sincronos);
+- `start_job` agenda em background com estado/progresso em
+  `cliente_maintenance_jobs`, e `resume_pending()` retoma apos restart.
+
+Os documentos duplicados sao materializados uma vez em
+`cliente_dedup_staging` (por execucao); os lotes so leem dessa lista.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Text
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.cliente_metrics_service import cliente_metrics_service
+
+
+SYNC_CONTRACTS = "sincronizar_contratos"
+DEDUPE_DOCUMENTOS = "deduplicar_documentos"
+JOB_KINDS = (SYNC_CONTRACTS, DEDUPE_DOCUMENTOS)
+
+COUNTER_KEYS: Dict[str, Tuple[str, ...]] = {
+    SYNC_CONTRACTS: (
+        "contratos_orfaos",
+        "clientes_criados",
+        "contratos_vinculados",
+        "ignorados",
+        "clientes_recalculados",
+    ),
+    DEDUPE_DOCUMENTOS: (
+        "grupos_duplicados",
+        "clientes_removidos",
+        "contratos_relinkados",
+        "agenda_relinkada",
+    ),
+}
+
+# Mesma expressao do indice funcional idx_clientes_documento_digits.
+_CLIENTE_DIGITS = "regexp_replace(documento, '[^0-9]', '', 'g')"
+
+_ORPHAN_PAGE_SQL = text(
+    """
+    SELECT id FROM contratos
+    WHERE cliente_id IS NULL
+      AND (CAST(:after AS UUID) IS NULL OR id > CAST(:after AS UUID))
+    ORDER BY id
+    LIMIT :limit
+    """
+)
+
+# Clientes novos (um por documento, dados do contrato mais recente) e vinculo
+# no mesmo statement. O SELECT de clientes existentes usa o snapshot anterior
+# ao INSERT, entao cada documento cai em exatamente um dos dois ramos.
+_SYNC_BATCH_SQL = text(
+    f"""
+    WITH batch AS (
+        SELECT id, created_at, contratante_nome, contratante_email, contratante_telefone,
+               contratante_endereco,
+               regexp_replace(COALESCE(contratante_documento, ''), '[^0-9]', '', 'g') AS doc
+        FROM contratos
+        WHERE id = ANY(:ids) AND cliente_id IS NULL
+    ),
+    existentes AS (
+        SELECT DISTINCT ON ({_CLIENTE_DIGITS}) {_CLIENTE_DIGITS} AS doc, id
+        FROM clientes
+        WHERE {_CLIENTE_DIGITS} IN (SELECT doc FROM batch WHERE doc <> '')
+        ORDER BY {_CLIENTE_DIGITS}, total_contratos DESC, created_at, id
+    ),
+    novos AS (
+        INSERT INTO clientes (id, nome, tipo_pessoa, documento, email, telefone, endereco, total_contratos, created_at)
+        SELECT DISTINCT ON (b.doc)
+            gen_random_uuid(),
+            b.contratante_nome,
+            CASE WHEN length(b.doc) = 11 THEN 'fisica' ELSE 'juridica' END,
+            b.doc,
+            COALESCE(b.contratante_email, ''),
+            b.contratante_telefone,
+            b.contratante_endereco,
+            0,
+            NOW()
+        FROM batch b
+        WHERE b.doc <> '' AND NOT EXISTS (SELECT 1 FROM existentes e WHERE e.doc = b.doc)
+        ORDER BY b.doc, b.created_at DESC
+        ON CONFLICT (documento) DO NOTHING
+        RETURNING id, documento AS doc
+    ),
+    alvo AS (
+        SELECT doc, id, FALSE AS novo FROM existentes
+        UNION ALL
+        SELECT doc, id, TRUE AS novo FROM novos
+    )
+    UPDATE contratos ct
+    SET cliente_id = a.id
+    FROM batch b
+    JOIN alvo a ON a.doc = b.doc
+    WHERE ct.id = b.id
+    RETURNING ct.cliente_id, ct.created_at, a.novo
+    """
+).bindparams(bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+_STAGE_DUPLICATES_SQL = text(
+    f"""
+    INSERT INTO cliente_dedup_staging (run_id, documento)
+    SELECT :run_id, {_CLIENTE_DIGITS}
+    FROM clientes
+    GROUP BY {_CLIENTE_DIGITS}
+    HAVING COUNT(*) > 1
+    ON CONFLICT DO NOTHING
+    """
+)
+
+_STAGED_PAGE_SQL = text(
+    """
+    SELECT documento FROM cliente_dedup_staging
+    WHERE run_id = :run_id AND (CAST(:after AS TEXT) IS NULL OR documento > CAST(:after AS TEXT))
+    ORDER BY documento
+    LIMIT :limit
+    """
+)
+
+# Canonico = mais contratos, depois o mais antigo (mesmo criterio de antes).
+# Contato vazio do canonico recebe o primeiro valor preenchido dos duplicados.
+# As FKs de contratos/agenda sao checadas no fim do statement, ja relinkadas.
+_MERGE_FIELDS = ("telefone", "endereco", "cidade", "estado", "cep", "observacoes")
+_MERGE_SELECT = ",\n               ".join(
+    f"(array_agg(d.{field} ORDER BY m.rn) FILTER (WHERE COALESCE(d.{field}, '') <> ''))[1] AS {field}"
+    for field in _MERGE_FIELDS
+)
+_MERGE_SET = ",\n            ".join(
+    f"{field} = COALESCE(NULLIF(c.{field}, ''), f.{field}, c.{field})" for field in _MERGE_FIELDS
+)
+_DEDUPE_BATCH_SQL = text(
+    f"""
+    WITH ranked AS (
+        SELECT id,
+               first_value(id) OVER w AS canonical_id,
+               row_number() OVER w AS rn
+        FROM clientes
+        WHERE {_CLIENTE_DIGITS} = ANY(:docs)
+        WINDOW w AS (PARTITION BY {_CLIENTE_DIGITS} ORDER BY total_contratos DESC, created_at, id)
+    ),
+    mapa AS (
+        SELECT id AS duplicate_id, canonical_id, rn FROM ranked WHERE rn > 1
+    ),
+    contato AS (
+        SELECT m.canonical_id,
+               {_MERGE_SELECT}
+        FROM mapa m JOIN clientes d ON d.id = m.duplicate_id
+        GROUP BY m.canonical_id
+    ),
+    mesclados AS (
+        UPDATE clientes c
+        SET {_MERGE_SET}
+        FROM contato f
+        WHERE c.id = f.canonical_id
+        RETURNING c.id
+    ),
+    contratos_movidos AS (
+        UPDATE contratos SET cliente_id = m.canonical_id
+        FROM mapa m WHERE contratos.cliente_id = m.duplicate_id
+        RETURNING contratos.id
+    ),
+    agenda_movida AS (
+        UPDATE agenda SET cliente_id = m.canonical_id
+        FROM mapa m WHERE agenda.cliente_id = m.duplicate_id
+        RETURNING agenda.id
+    ),
+    removidos AS (
+        DELETE FROM clientes USING mapa m WHERE clientes.id = m.duplicate_id
+        RETURNING clientes.id
+    )
+    SELECT
+        (SELECT COUNT(DISTINCT canonical_id) FROM mapa) AS grupos_duplicados,
+        (SELECT COUNT(*) FROM removidos) AS clientes_removidos,
+        (SELECT COUNT(*) FROM contratos_movidos) AS contratos_relinkados,
+        (SELECT COUNT(*) FROM agenda_movida) AS agenda_relinkada,
+        (SELECT COUNT(*) FROM mesclados) AS contatos_mesclados,
+        (SELECT array_agg(DISTINCT canonical_id) FROM mapa) AS canonicos
+    """
+).bindparams(bindparam("docs", type_=ARRAY(Text())))
+
+
+Page = Tuple[Dict[str, int], int, Optional[str]]
+
+
+class ClienteMaintenanceService:
+    """Lotes set-based de manutencao de clientes + jobs retomaveis."""
+
+    ACTIVE_STATUSES = ("pending", "running")
+
+    def __init__(self) -> None:
+        self.batch_size = max(1, int(settings.CLIENTE_MAINTENANCE_BATCH_SIZE))
+        self._table_checked = False
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_table(self, db: AsyncSession) -> None:
+        if self._table_checked:
+            return
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS cliente_maintenance_jobs (
+                    id UUID PRIMARY KEY,
+                    kind VARCHAR(40) NOT NULL,
+                    user_id UUID,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    total INTEGER NOT NULL DEFAULT 0,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    counters_json JSONB,
+                    cursor_json JSONB,
+                    error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    started_at TIMESTAMPTZ,
+                    finished_at TIMESTAMPTZ,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_cliente_maintenance_jobs_kind_status
+                ON cliente_maintenance_jobs(kind, status)
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS cliente_dedup_staging (
+                    run_id UUID NOT NULL,
+                    documento TEXT NOT NULL,
+                    PRIMARY KEY (run_id, documento)
+                )
+                """
+            )
+        )
+        self._table_checked = True
+
+    # ------------------------------------------------------------------
+    # Lotes
+    # ------------------------------------------------------------------
+    async def sync_contracts_batch(self, db: AsyncSession, after: Optional[str], limit: int) -> Page:
+        """Vincula (criando clientes quando preciso) uma pagina de contratos orfaos."""
+        result = await db.execute(_ORPHAN_PAGE_SQL, {"after": after, "limit": limit})
+        ids = [row[0] for row in result.all()]
+        if not ids:
+            return {}, 0, None
+
+        linked = (await db.execute(_SYNC_BATCH_SQL, {"ids": ids})).all()
+        touched = await cliente_metrics_service.contracts_added(
+            db, [(cliente_id, created_at) for cliente_id, created_at, _ in linked]
+        )
+        counters = {
+            "contratos_orfaos": len(ids),
+            "clientes_criados": len({cliente_id for cliente_id, _, novo in linked if novo}),
+            "contratos_vinculados": len(linked),
+            "ignorados": len(ids) - len(linked),
+            "clientes_recalculados": touched,
+        }
+        cursor = str(ids[-1]) if len(ids) >= limit else None
+        return counters, len(ids), cursor
+
+    async def stage_duplicates(self, db: AsyncSession, run_id: UUID) -> int:
+        """Materializa os documentos com mais de um cliente; retorna quantos grupos."""
+        await self.ensure_table(db)
+        result = await db.execute(_STAGE_DUPLICATES_SQL, {"run_id": run_id})
+        return int(result.rowcount or 0)
+
+    async def clear_staging(self, db: AsyncSession, run_id: UUID) -> None:
+        await db.execute(text("DELETE FROM cliente_dedup_staging WHERE run_id = :run_id"), {"run_id": run_id})
+
+    async def dedupe_batch(self, db: AsyncSession, run_id: UUID, after: Optional[str], limit: int) -> Page:
+        """Mescla uma pagina de grupos duplicados (ordem do documento normalizado)."""
+        result = await db.execute(_STAGED_PAGE_SQL, {"run_id": run_id, "after": after, "limit": limit})
+        docs = [row[0] for row in result.all()]
+        if not docs:
+            return {}, 0, None
+
+        row = (await db.execute(_DEDUPE_BATCH_SQL, {"docs": docs})).mappings().one()
+        await cliente_metrics_service.rebuild(db, list(row["canonicos"] or []))
+        counters = {key: int(row[key] or 0) for key in COUNTER_KEYS[DEDUPE_DOCUMENTOS]}
+        cursor = docs[-1] if len(docs) >= limit else None
+        return counters, len(docs), cursor
+
+    async def _batch(self, db: AsyncSession, kind: str, run_id: UUID, after: Optional[str]) -> Page:
+        if kind == SYNC_CONTRACTS:
+            return await self.sync_contracts_batch(db, after, self.batch_size)
+        return await self.dedupe_batch(db, run_id, after, self.batch_size)
+
+    @staticmethod
+    def _accumulate(totals: Dict[str, int], counters: Dict[str, int]) -> None:
+        for key, value in counters.items():
+            totals[key] = int(totals.get(key, 0)) + int(value)
+
+    async def run_inline(
+        self,
+        db: AsyncSession,
+        kind: str,
+        progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> Dict[str, int]:
+        """Executa todos os lotes nesta sessao, com commit por lote."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de manutencao invalido: {kind}")
+        await db.flush()
+        totals = {key: 0 for key in COUNTER_KEYS[kind]}
+        run_id = uuid4()
+        if kind == DEDUPE_DOCUMENTOS:
+            await self.stage_duplicates(db, run_id)
+            await db.commit()
+        try:
+            cursor: Optional[str] = None
+            while True:
+                counters, processed, cursor = await self._batch(db, kind, run_id, cursor)
+                self._accumulate(totals, counters)
+                await db.commit()
+                if processed:
+                    logging.info("Manutencao de clientes %s: lote de %s (%s)", kind, processed, totals)
+                    if progress is not None:
+                        progress(dict(totals))
+                if cursor is None:
+                    break
+        finally:
+            if kind == DEDUPE_DOCUMENTOS:
+                await db.rollback()
+                await self.clear_staging(db, run_id)
+                await db.commit()
+        return totals
+
+    # ------------------------------------------------------------------
+    # Jobs em background
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _serialize(row: Any) -> Dict[str, Any]:
+        data = dict(row)
+        total = int(data.get("total") or 0)
+        processed = int(data.get("processed") or 0)
+        for key in ("id", "user_id"):
+            if data.get(key) is not None:
+                data[key] = str(data[key])
+        for key in ("created_at", "started_at", "finished_at", "updated_at"):
+            if data.get(key) is not None:
+                data[key] = data[key].isoformat()
+        counters = data.pop("counters_json", None)
+        if isinstance(counters, str):
+            counters = json.loads(counters)
+        data["counters"] = counters or {}
+        data.pop("cursor_json", None)
+        data["progress"] = round(min(1.0, processed / total), 4) if total else (1.0 if data["status"] == "done" else 0.0)
+        return data
+
+    async def _load(self, db: AsyncSession, job_id: Any) -> Optional[Dict[str, Any]]:
+        result = await db.execute(text("SELECT * FROM cliente_maintenance_jobs WHERE id = :id"), {"id": str(job_id)})
+        row = result.mappings().first()
+        return dict(row) if row else None
+
+    async def start_job(self, db: AsyncSession, kind: str, user_id: Optional[UUID] = None) -> Dict[str, Any]:
+        """Cria (ou reaproveita o job ativo do mesmo tipo) e agenda a execucao."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de manutencao invalido: {kind}")
+        await self.ensure_table(db)
+        existing = await db.execute(
+            text(
+                """
+                SELECT * FROM cliente_maintenance_jobs
+                WHERE kind = :kind AND status IN ('pending', 'running')
+                ORDER BY created_at DESC
+                LIMIT 1
+                """
+            ),
+            {"kind": kind},
+        )
+        row = existing.mappings().first()
+        if row:
+            self._schedule(str(row["id"]))
+            return self._serialize(row)
+
+        job_id = uuid4()
+        if kind == DEDUPE_DOCUMENTOS:
+            total = await self.stage_duplicates(db, job_id)
+        else:
+            count = await db.execute(text("SELECT COUNT(*) FROM contratos WHERE cliente_id IS NULL"))
+            total = int(count.scalar() or 0)
+        await db.execute(
+            text(
+                """
+                INSERT INTO cliente_maintenance_jobs (id, kind, user_id, status, total, created_at, updated_at)
+                VALUES (:id, :kind, :user_id, 'pending', :total, NOW(), NOW())
+                """
+            ),
+            {"id": str(job_id), "kind": kind, "user_id": str(user_id) if user_id else None, "total": total},
+        )
+        await db.commit()
+        job = await self._load(db, job_id)
+        self._schedule(str(job_id))
+        return self._serialize(job or {"id": job_id, "kind": kind, "status": "pending"})
+
+    async def get_job(self, db: AsyncSession, job_id: UUID) -> Optional[Dict[str, Any]]:
+        await self.ensure_table(db)
+        job = await self._load(db, job_id)
+        return self._serialize(job) if job else None
+
+    def _schedule(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str) -> None:
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    job = await self._load(db, job_id)
+                    if not job or job["status"] not in self.ACTIVE_STATUSES:
+                        return
+                    cursor = job.get("cursor_json")
+                    if isinstance(cursor, str):
+                        cursor = json.loads(cursor)
+                    totals = job.get("counters_json") or {}
+                    if isinstance(totals, str):
+                        totals = json.loads(totals)
+
+                    counters, processed, next_after = await self._batch(
+                        db, job["kind"], UUID(job_id), (cursor or {}).get("after")
+                    )
+                    self._accumulate(totals, counters)
+                    # Lote e avanco do cursor no mesmo commit: retomada sem reprocessar.
+                    await db.execute(
+                        text(
+                            """
+                            UPDATE cliente_maintenance_jobs
+                            SET status = 'running',
+                                started_at = COALESCE(started_at, NOW()),
+                                processed = processed + :processed,
+                                counters_json = CAST(:counters_json AS JSONB),
+                                cursor_json = CAST(:cursor_json AS JSONB),
+                                updated_at = NOW()
+                            WHERE id = :id AND status IN ('pending', 'running')
+                            """
+                        ),
+                        {
+                            "id": job_id,
+                            "processed": processed,
+                            "counters_json": json.dumps(totals),
+                            "cursor_json": json.dumps({"after": next_after}) if next_after else None,
+                        },
+                    )
+                    await db.commit()
+                    if next_after is None:
+                        await self._finish(db, job_id, "done")
+                        return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logging.exception("Falha no job de manutencao de clientes: %s", job_id)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self._finish(db, job_id, "failed", error=str(exc))
+            except Exception:
+                return
+
+    async def _finish(self, db: AsyncSession, job_id: str, status: str, error: Optional[str] = None) -> None:
+        await self.clear_staging(db, UUID(job_id))
+        await db.execute(
+            text(
+                """
+                UPDATE cliente_maintenance_jobs
+                SET status = :status, error = :error, finished_at = NOW(), updated_at = NOW()
+                WHERE id = :id AND status IN ('pending', 'running')
+                """
+            ),
+            {"id": job_id, "status": status, "error": (error or None) and error[:2000]},
+        )
+        await db.commit()
+
+    async def resume_pending(self) -> int:
+        """Reagenda jobs interrompidos (chamado no startup)."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.ensure_table(db)
+                result = await db.execute(
+                    text("SELECT id FROM cliente_maintenance_jobs WHERE status IN ('pending', 'running')")
+                )
+                job_ids: List[str] = [str(row.id) for row in result.fetchall()]
+                await db.commit()
+        except Exception:
+            return 0
+        for job_id in job_ids:
+            self._schedule(job_id)
+        return len(job_ids)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except BaseException:
+                continue
+
+
+cliente_maintenance_service = ClienteMaintenanceService()
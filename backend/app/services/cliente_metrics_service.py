@@ -0,0 +1,144 @@
+"""
+Metricas de contratos por cliente (total, primeiro/ultimo contrato) mantidas
+incrementalmente.
+
+Criar, excluir ou re-vincular contrato aplica um delta na linha do cliente
+(`total + n`, `LEAST/GREATEST` das datas) dentro da mesma transacao; o lock
+da linha no UPDATE serializa escritas concorrentes. Remover o contrato mais
+antigo/mais recente e o unico caso que consulta os contratos daquele cliente
+(indice `idx_contratos_cliente_created`). `rebuild` recalcula tudo (ou um
+conjunto de clientes) num unico UPDATE ... FROM, para jobs de reparo.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# (cliente_id, created_at); created_at None = NOW() da transacao (server_default).
+ContractRef = Tuple[Optional[UUID], Optional[datetime]]
+
+_ADD_SQL = text(
+    """
+    UPDATE clientes
+    SET total_contratos = COALESCE(total_contratos, 0) + :count,
+        primeiro_contrato_em = LEAST(primeiro_contrato_em, COALESCE(CAST(:primeiro AS TIMESTAMPTZ), NOW())),
+        ultimo_contrato_em = GREATEST(ultimo_contrato_em, COALESCE(CAST(:ultimo AS TIMESTAMPTZ), NOW()))
+    WHERE id = :cliente_id
+    """
+)
+
+# Roda depois do DELETE/UPDATE do contrato (flush): a subconsulta ja nao o ve.
+_REMOVE_SQL = text(
+    """
+    UPDATE clientes c
+    SET total_contratos = GREATEST(COALESCE(c.total_contratos, 0) - :count, 0),
+        primeiro_contrato_em = CASE
+            WHEN c.primeiro_contrato_em IS NOT NULL
+                 AND c.primeiro_contrato_em < COALESCE(CAST(:primeiro AS TIMESTAMPTZ), NOW())
+            THEN c.primeiro_contrato_em
+            ELSE (SELECT MIN(ct.created_at) FROM contratos ct WHERE ct.cliente_id = c.id)
+        END,
+        ultimo_contrato_em = CASE
+            WHEN c.ultimo_contrato_em IS NOT NULL
+                 AND c.ultimo_contrato_em > COALESCE(CAST(:ultimo AS TIMESTAMPTZ), NOW())
+            THEN c.ultimo_contrato_em
+            ELSE (SELECT MAX(ct.created_at) FROM contratos ct WHERE ct.cliente_id = c.id)
+        END
+    WHERE c.id = :cliente_id
+    """
+)
+
+_REBUILD_SQL = """
+    UPDATE clientes c
+    SET total_contratos = COALESCE(m.total, 0),
+        primeiro_contrato_em = m.primeiro,
+        ultimo_contrato_em = m.ultimo
+    FROM clientes base
+    LEFT JOIN (
+        SELECT cliente_id, COUNT(*) AS total, MIN(created_at) AS primeiro, MAX(created_at) AS ultimo
+        FROM contratos
+        WHERE cliente_id IS NOT NULL {contratos_filter}
+        GROUP BY cliente_id
+    ) m ON m.cliente_id = base.id
+    WHERE c.id = base.id {clientes_filter}
+      AND (
+        c.total_contratos IS DISTINCT FROM COALESCE(m.total, 0)
+        OR c.primeiro_contrato_em IS DISTINCT FROM m.primeiro
+        OR c.ultimo_contrato_em IS DISTINCT FROM m.ultimo
+      )
+"""
+
+
+def _group(refs: Iterable[ContractRef]) -> List[Dict[str, Any]]:
+    """Agrupa por cliente: uma linha de parametros (count, min, max) por cliente."""
+    grouped: Dict[UUID, List[Optional[datetime]]] = defaultdict(list)
+    for cliente_id, created_at in refs:
+        if cliente_id is not None:
+            grouped[cliente_id].append(created_at)
+    params = []
+    for cliente_id, dates in grouped.items():
+        known = [value for value in dates if value is not None]
+        # Data desconhecida = NOW(), que e sempre >= qualquer data gravada.
+        unknown = len(known) < len(dates)
+        params.append({
+            "cliente_id": cliente_id,
+            "count": len(dates),
+            "primeiro": min(known) if known else None,
+            "ultimo": None if unknown else max(known),
+        })
+    return params
+
+
+class ClienteMetricsService:
+    async def contracts_added(self, db: AsyncSession, refs: Iterable[ContractRef]) -> int:
+        """Aplica delta de contratos inseridos; retorna quantos clientes foram tocados."""
+        params = _group(refs)
+        if params:
+            await db.execute(_ADD_SQL, params)
+        return len(params)
+
+    async def contracts_removed(self, db: AsyncSession, refs: Iterable[ContractRef]) -> int:
+        """Aplica delta de contratos excluidos/desvinculados (chamar apos o flush)."""
+        params = _group(refs)
+        if params:
+            await db.execute(_REMOVE_SQL, params)
+        return len(params)
+
+    async def contract_relinked(
+        self,
+        db: AsyncSession,
+        old_cliente_id: Optional[UUID],
+        new_cliente_id: Optional[UUID],
+        created_at: Optional[datetime],
+    ) -> None:
+        if old_cliente_id == new_cliente_id:
+            return
+        await self.contracts_removed(db, [(old_cliente_id, created_at)])
+        await self.contracts_added(db, [(new_cliente_id, created_at)])
+
+    async def rebuild(self, db: AsyncSession, cliente_ids: Optional[Sequence[UUID]] = None) -> int:
+        """Recalcula as metricas num unico UPDATE; retorna linhas que mudaram."""
+        if cliente_ids is not None:
+            ids = list(dict.fromkeys(cliente_ids))
+            if not ids:
+                return 0
+            statement = text(
+                _REBUILD_SQL.format(
+                    contratos_filter="AND cliente_id = ANY(:ids)",
+                    clientes_filter="AND base.id = ANY(:ids)",
+                )
+            ).bindparams(bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+            result = await db.execute(statement, {"ids": ids})
+        else:
+            result = await db.execute(text(_REBUILD_SQL.format(contratos_filter="", clientes_filter="")))
+        return int(result.rowcount or 0)
+
+
+cliente_metrics_service = ClienteMetricsService()
@@ -1,15 +1,22 @@
 """Cliente service - Business logic for clients."""
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence
 from uuid import UUID
 import logging
 
-from sqlalchemy import select, desc, func, or_, update
+from sqlalchemy import select, desc, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.cliente import Cliente
 from app.models.contrato import Contrato
-from app.models.agenda import Agenda
 from app.schemas.cliente import ClienteCreate, ClienteUpdate
+from app.services.cliente_maintenance_service import (
+    DEDUPE_DOCUMENTOS,
+    SYNC_CONTRACTS,
+    cliente_maintenance_service,
+)
+from app.services.cliente_metrics_service import cliente_metrics_service
+from app.services.pagination_service import keyset_condition, next_cursor, page_request, resolve_total
+from app.services.search_index_service import document_digits, search_index_service
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +29,8 @@ class ClienteService:
 
     @staticmethod
     def _document_expression():
-        return func.regexp_replace(Cliente.documento, r"[^0-9]", "", "g")
+        # Constantes literais: a expressao casa com o indice funcional idx_clientes_documento_digits.
+        return document_digits(Cliente.documento)
 
     @staticmethod
     def _serialize_cliente(
@@ -89,77 +97,95 @@ class ClienteService:
         self,
         search: Optional[str] = None,
         page: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        mode: str = "contains",
+        cursor: Optional[str] = None,
+        total_mode: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """List clients with pagination."""
-        metrics_subquery = (
-            select(
-                Contrato.cliente_id.label("cliente_id"),
-                func.count(Contrato.id).label("total_contratos_calculado"),
-                func.min(Contrato.created_at).label("primeiro_contrato_em_calculado"),
-                func.max(Contrato.created_at).label("ultimo_contrato_em_calculado"),
-            )
-            .where(Contrato.cliente_id.is_not(None))
-            .group_by(Contrato.cliente_id)
-            .subquery()
-        )
+        """List clients with pagination (ranked by relevance when searching).
 
-        query = (
-            select(
-                Cliente,
-                func.coalesce(metrics_subquery.c.total_contratos_calculado, 0).label(
-                    "total_contratos_calculado"
-                ),
-                metrics_subquery.c.primeiro_contrato_em_calculado,
-                metrics_subquery.c.ultimo_contrato_em_calculado,
-            )
-            .outerjoin(metrics_subquery, metrics_subquery.c.cliente_id == Cliente.id)
-        )
-        
-        if search:
-            query = query.where(
-                or_(
-                    Cliente.nome.ilike(f"%{search}%"),
-                    Cliente.documento.ilike(f"%{search}%"),
-                    Cliente.email.ilike(f"%{search}%")
-                )
-            )
+        `cursor` switches to keyset pagination on (created_at, id); relevance
+        ordering only applies to page/offset requests.
+        """
+        page_req = page_request(page, page_size, cursor, total_mode)
+        # Metricas ja gravadas em clientes (cliente_metrics_service mantem por delta).
+        query = select(Cliente)
         
-        count_query = query.subquery()
-        count_result = await self.db.execute(
-            select(func.count()).select_from(count_query)
-        )
-        total = count_result.scalar()
-
+        search_filter, search_rank = search_index_service.build_search("clientes", search, mode)
+        if search_filter is not None:
+            query = query.where(search_filter)
+
+        async def count() -> int:
+            count_query = select(func.count(Cliente.id))
+            if search_filter is not None:
+                count_query = count_query.where(search_filter)
+            return (await self.db.execute(count_query)).scalar() or 0
+
+        total = await resolve_total(page_req, ("clientes", search, mode), count)
+
+        if page_req.cursor:
+            search_rank = None
+            query = query.where(keyset_condition(Cliente.created_at, Cliente.id, page_req.cursor))
+        order_by = [desc(Cliente.created_at), desc(Cliente.id)]
+        if search_rank is not None:
+            order_by.insert(0, desc(search_rank))
         query = (
-            query.order_by(desc(Cliente.created_at))
-            .offset((page - 1) * page_size)
-            .limit(page_size)
+            query.order_by(*order_by)
+            .offset(page_req.offset)
+            .limit(page_req.page_size + 1)
         )
         result = await self.db.execute(query)
-        rows = result.all()
-        items = [
-            self._serialize_cliente(
-                cliente=cliente,
-                total_contratos=total_contratos_calculado,
-                primeiro_contrato_em=primeiro_contrato_em_calculado,
-                ultimo_contrato_em=ultimo_contrato_em_calculado,
-            )
-            for (
-                cliente,
-                total_contratos_calculado,
-                primeiro_contrato_em_calculado,
-                ultimo_contrato_em_calculado,
-            ) in rows
-        ]
+        rows = list(result.scalars().all())
+        cursor_next = None
+        if search_rank is None:
+            cursor_next = next_cursor(rows, page_req.page_size, lambda cliente: (cliente.created_at, cliente.id))
+        items = [self._serialize_cliente(cliente=cliente) for cliente in rows[:page_req.page_size]]
         
         return {
             "items": items,
             "total": total,
             "page": page,
-            "page_size": page_size
+            "page_size": page_size,
+            "next_cursor": cursor_next,
         }
     
+    async def suggest(self, term: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Typeahead: clientes cujo nome/email/documento comeca com o termo, por relevancia."""
+        search_filter, search_rank = search_index_service.build_search("clientes", term, "prefix")
+        if search_filter is None:
+            return []
+        order_by = [desc(Cliente.total_contratos), Cliente.nome]
+        if search_rank is not None:
+            order_by.insert(0, desc(search_rank))
+        result = await self.db.execute(
+            select(Cliente.id, Cliente.nome, Cliente.documento, Cliente.email)
+            .where(search_filter)
+            .order_by(*order_by)
+            .limit(limit)
+        )
+        return [dict(row._mapping) for row in result.all()]
+    
+    async def resolve(
+        self,
+        name: Optional[str],
+        tokens: Sequence[str] = (),
+        limit: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """Top-k clientes para um nome aproximado, com score, numa unica query."""
+        match_filter, score = search_index_service.build_name_match("clientes", name, tokens)
+        if match_filter is None:
+            return []
+        result = await self.db.execute(
+            select(Cliente, score.label("score"))
+            .where(match_filter)
+            .order_by(desc("score"), desc(Cliente.total_contratos), Cliente.nome)
+            .limit(limit)
+        )
+        return [
+            {**self._serialize_cliente(cliente=cliente), "score": round(float(row_score or 0), 4)}
+            for cliente, row_score in result.all()
+        ]
+
     async def get_by_id(self, cliente_id: UUID) -> Optional[Cliente]:
         """Get client by ID."""
         result = await self.db.execute(
@@ -248,176 +274,21 @@ class ClienteService:
     async def sync_from_contracts(self) -> Dict[str, int]:
         """
         Backfill clients from contracts that were created without proper linkage.
-        """
-        result = await self.db.execute(
-            select(Contrato)
-            .where(Contrato.cliente_id.is_(None))
-            .order_by(desc(Contrato.created_at))
-        )
-        contratos_orfaos = list(result.scalars().all())
-
-        created = 0
-        linked = 0
-        skipped = 0
-
-        for contrato in contratos_orfaos:
-            documento = self._normalize_document(contrato.contratante_documento or "")
-            if not documento:
-                skipped += 1
-                continue
-
-            cliente = await self.get_by_documento(documento)
-
-            if not cliente:
-                cliente = Cliente(
-                    nome=contrato.contratante_nome,
-                    tipo_pessoa="fisica" if len(documento) == 11 else "juridica",
-                    documento=documento,
-                    email=contrato.contratante_email,
-                    telefone=contrato.contratante_telefone,
-                    endereco=contrato.contratante_endereco,
-                    primeiro_contrato_em=contrato.created_at,
-                    ultimo_contrato_em=contrato.created_at,
-                    total_contratos=0,
-                )
-                self.db.add(cliente)
-                await self.db.flush()
-                created += 1
-
-            contrato.cliente_id = cliente.id
-            linked += 1
 
-        recalculados = await self._rebuild_all_metrics()
-
-        await self.db.commit()
-
-        return {
-            "contratos_orfaos": len(contratos_orfaos),
-            "clientes_criados": created,
-            "contratos_vinculados": linked,
-            "ignorados": skipped,
-            "clientes_recalculados": recalculados,
-        }
+        Runs in set-based batches committed one at a time (see cliente_maintenance_service).
+        """
+        return await cliente_maintenance_service.run_inline(self.db, SYNC_CONTRACTS)
 
     async def deduplicate_documentos(self) -> Dict[str, int]:
         """
         Merge clients with the same normalized document and relink references.
         """
-        doc_expr = self._document_expression()
-        duplicates_result = await self.db.execute(
-            select(
-                doc_expr.label("documento_normalizado"),
-                func.count(Cliente.id).label("total"),
-            )
-            .group_by(doc_expr)
-            .having(func.count(Cliente.id) > 1)
-        )
-        duplicates = duplicates_result.all()
-
-        grupos = 0
-        removidos = 0
-        contratos_relinkados = 0
-        agenda_relinkada = 0
-
-        for row in duplicates:
-            documento_normalizado = row.documento_normalizado
-            clientes_result = await self.db.execute(
-                select(Cliente)
-                .where(doc_expr == documento_normalizado)
-                .order_by(
-                    desc(Cliente.total_contratos),
-                    Cliente.created_at.asc(),
-                    Cliente.id.asc(),
-                )
-            )
-            clientes = list(clientes_result.scalars().all())
-            if len(clientes) <= 1:
-                continue
-
-            grupos += 1
-            canonical = clientes[0]
-            duplicates_to_remove = clientes[1:]
-
-            for duplicate in duplicates_to_remove:
-                # Preserve the richest available contact data on canonical record.
-                if not canonical.telefone and duplicate.telefone:
-                    canonical.telefone = duplicate.telefone
-                if not canonical.endereco and duplicate.endereco:
-                    canonical.endereco = duplicate.endereco
-                if not canonical.cidade and duplicate.cidade:
-                    canonical.cidade = duplicate.cidade
-                if not canonical.estado and duplicate.estado:
-                    canonical.estado = duplicate.estado
-                if not canonical.cep and duplicate.cep:
-                    canonical.cep = duplicate.cep
-                if not canonical.observacoes and duplicate.observacoes:
-                    canonical.observacoes = duplicate.observacoes
-
-                contratos_update = await self.db.execute(
-                    update(Contrato)
-                    .where(Contrato.cliente_id == duplicate.id)
-                    .values(cliente_id=canonical.id)
-                )
-                contratos_relinkados += int(contratos_update.rowcount or 0)
-
-                agenda_update = await self.db.execute(
-                    update(Agenda)
-                    .where(Agenda.cliente_id == duplicate.id)
-                    .values(cliente_id=canonical.id)
-                )
-                agenda_relinkada += int(agenda_update.rowcount or 0)
-
-                await self.db.delete(duplicate)
-                removidos += 1
-
-            metrics_result = await self.db.execute(
-                select(
-                    func.count(Contrato.id),
-                    func.min(Contrato.created_at),
-                    func.max(Contrato.created_at),
-                ).where(Contrato.cliente_id == canonical.id)
-            )
-            total, primeiro, ultimo = metrics_result.one()
-            canonical.total_contratos = int(total or 0)
-            canonical.primeiro_contrato_em = primeiro
-            canonical.ultimo_contrato_em = ultimo
-
-        await self.db.commit()
-
-        return {
-            "grupos_duplicados": grupos,
-            "clientes_removidos": removidos,
-            "contratos_relinkados": contratos_relinkados,
-            "agenda_relinkada": agenda_relinkada,
-        }
-
-    async def _rebuild_all_metrics(self) -> int:
-        """Recalculate contract metrics for every client."""
-        result = await self.db.execute(select(Cliente.id))
-        client_ids = [row[0] for row in result.all()]
-
-        for client_id in client_ids:
-            count_result = await self.db.execute(
-                select(
-                    func.count(Contrato.id),
-                    func.min(Contrato.created_at),
-                    func.max(Contrato.created_at),
-                ).where(Contrato.cliente_id == client_id)
-            )
-            total, primeiro, ultimo = count_result.one()
-
-            cliente_result = await self.db.execute(
-                select(Cliente).where(Cliente.id == client_id)
-            )
-            cliente = cliente_result.scalar_one_or_none()
-            if not cliente:
-                continue
-
-            cliente.total_contratos = int(total or 0)
-            cliente.primeiro_contrato_em = primeiro
-            cliente.ultimo_contrato_em = ultimo
+        return await cliente_maintenance_service.run_inline(self.db, DEDUPE_DOCUMENTOS)
 
-        return len(client_ids)
+    async def rebuild_metrics(self, cliente_ids: Optional[List[UUID]] = None) -> int:
+        """Recalculate contract metrics in one set-based UPDATE; returns changed clients."""
+        await self.db.flush()
+        return await cliente_metrics_service.rebuild(self.db, cliente_ids)
     
     async def get_historico(self, cliente_id: UUID) -> Dict[str, Any]:
         """Get complete client timeline."""
@@ -5,6 +5,8 @@ import os
 from pathlib import Path
 from typing import Any, Dict, List
 
+from app.services.pdf_asset_registry_service import pdf_asset_registry
+
 
 RATING_TEMPLATE_IDS = {
     "aumento_score",
@@ -42,16 +44,25 @@ def _candidate_annex_dirs() -> List[Path]:
     return unique_candidates
 
 
+def _register_annex_file(filename: str) -> str:
+    asset_id = f"annex/{filename}"
+    pdf_asset_registry.register_file(
+        asset_id,
+        [annex_dir / filename for annex_dir in _candidate_annex_dirs()],
+        mime="text/markdown",
+    )
+    return asset_id
+
+
 def _read_annex_file(filename: str) -> str:
-    for annex_dir in _candidate_annex_dirs():
-        annex_path = annex_dir / filename
-        if not annex_path.exists():
-            continue
-        try:
-            return annex_path.read_text(encoding="utf-8")
-        except OSError:
-            continue
-    return ""
+    # Lido/decodificado uma vez e recarregado so quando o arquivo muda.
+    asset = pdf_asset_registry.get(_register_annex_file(filename))
+    if asset is None:
+        return ""
+    try:
+        return asset.text()
+    except UnicodeDecodeError:
+        return ""
 
 
 def list_fixed_annexes_for_template(template_id: str) -> List[Dict[str, Any]]:
@@ -89,3 +100,7 @@ def list_fixed_annexes_for_template(template_id: str) -> List[Dict[str, Any]]:
             )
 
     return annexes
+
+
+for _annex_filename in ("TERMODECIENCIAGERAL.md", "TERMODECIENCIARATING.md"):
+    _register_annex_file(_annex_filename)
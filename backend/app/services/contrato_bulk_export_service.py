@@ -0,0 +1,172 @@
+"""
+Exportacao em lote de PDFs de contrato como ZIP transmitido em streaming.
+
+Os PDFs sao renderizados (ou lidos do cache por conteudo) por um pool limitado
+de workers, cada um com sessao propria; o ZIP e escrito entrada a entrada num
+buffer nao-pesquisavel que e esvaziado a cada pedaco, entao a memoria fica
+limitada a ~`CONTRATO_BULK_EXPORT_CONCURRENCY` PDFs independentemente do lote.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+import logging
+import re
+from typing import AsyncIterator, List, Optional, Tuple
+from uuid import UUID
+import zipfile
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.contrato import Contrato, ContratoStatus
+from app.services.contrato_pdf_cache_service import PdfArtifact
+from app.services.contrato_service import ContratoService
+
+
+_FILE_CHUNK_SIZE = 64 * 1024
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+@dataclass
+class ExportItem:
+    contrato_id: UUID
+    numero: str
+
+
+class _ZipStreamBuffer:
+    """Destino do ZipFile sem seek: acumula bytes ate o proximo `drain()`."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        return None
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ContratoBulkExportService:
+    def __init__(self) -> None:
+        self.concurrency = max(1, int(settings.CONTRATO_BULK_EXPORT_CONCURRENCY))
+        self.max_items = max(1, int(settings.CONTRATO_BULK_EXPORT_MAX_ITEMS))
+
+    async def list_items(
+        self,
+        db: AsyncSession,
+        status: Optional[ContratoStatus] = None,
+        cliente_id: Optional[UUID] = None,
+        template_id: Optional[str] = None,
+        data_inicio: Optional[date] = None,
+        data_fim: Optional[date] = None,
+    ) -> List[ExportItem]:
+        filters = []
+        if status:
+            filters.append(Contrato.status == status)
+        if cliente_id:
+            filters.append(Contrato.cliente_id == cliente_id)
+        if template_id:
+            filters.append(Contrato.template_id == str(template_id).strip().lower())
+        if data_inicio:
+            filters.append(Contrato.created_at >= datetime.combine(data_inicio, time.min, tzinfo=timezone.utc))
+        if data_fim:
+            filters.append(Contrato.created_at <= datetime.combine(data_fim, time.max, tzinfo=timezone.utc))
+
+        query = select(Contrato.id, Contrato.numero).order_by(Contrato.created_at, Contrato.id).limit(self.max_items + 1)
+        if filters:
+            query = query.where(and_(*filters))
+        result = await db.execute(query)
+        return [ExportItem(contrato_id=row.id, numero=str(row.numero or row.id)) for row in result.all()]
+
+    async def _render_one(self, contrato_id: UUID) -> Optional[PdfArtifact]:
+        # Sessao propria por worker: AsyncSession nao aceita uso concorrente.
+        async with AsyncSessionLocal() as db:
+            return await ContratoService(db).get_pdf_artifact(contrato_id)
+
+    @staticmethod
+    def _entry_name(item: ExportItem, used: set) -> str:
+        base = _UNSAFE_NAME_RE.sub("_", f"contrato-{item.numero}").strip("_") or f"contrato-{item.contrato_id}"
+        name = f"{base}.pdf"
+        suffix = 2
+        while name in used:
+            name = f"{base}-{suffix}.pdf"
+            suffix += 1
+        used.add(name)
+        return name
+
+    async def stream_zip(self, items: List[ExportItem]) -> AsyncIterator[bytes]:
+        """Gera o ZIP incrementalmente; falhas viram linhas em `erros.txt`."""
+        pending: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            pending.put_nowait(item)
+        # Fila de resultados limitada: workers esperam o consumidor (backpressure).
+        done: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+
+        async def worker() -> None:
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    artifact = await self._render_one(item.contrato_id)
+                    error = None if artifact else "PDF nao gerado"
+                except Exception as exc:
+                    logging.exception("Falha ao exportar PDF do contrato %s", item.contrato_id)
+                    artifact, error = None, str(exc) or exc.__class__.__name__
+                await done.put((item, artifact, error))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(items)) or 1)]
+        buffer = _ZipStreamBuffer()
+        used_names: set = set()
+        errors: List[Tuple[ExportItem, str]] = []
+        try:
+            with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for _ in range(len(items)):
+                    item, artifact, error = await done.get()
+                    if error or artifact is None:
+                        errors.append((item, error or "PDF nao gerado"))
+                        continue
+                    entry_name = self._entry_name(item, used_names)
+                    if artifact.path:
+                        with archive.open(entry_name, mode="w", force_zip64=True) as entry:
+                            with open(artifact.path, "rb") as source:
+                                while True:
+                                    chunk = source.read(_FILE_CHUNK_SIZE)
+                                    if not chunk:
+                                        break
+                                    entry.write(chunk)
+                                    data = buffer.drain()
+                                    if data:
+                                        yield data
+                    else:
+                        archive.writestr(entry_name, artifact.content or b"")
+                    data = buffer.drain()
+                    if data:
+                        yield data
+                if errors:
+                    lines = [f"{item.numero}\t{item.contrato_id}\t{message}" for item, message in errors]
+                    archive.writestr("erros.txt", "\n".join(lines) + "\n")
+            yield buffer.drain()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+contrato_bulk_export_service = ContratoBulkExportService()
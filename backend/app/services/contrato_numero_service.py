@@ -0,0 +1,91 @@
+"""
+Numeracao de contratos (CNT-AAAA-NNNN) por contador anual com lock de linha.
+
+Cada ano tem uma linha em `contrato_numero_counters`; reservar N numeros e um
+`UPDATE ... RETURNING` na mesma transacao do INSERT do contrato. O lock da
+linha serializa criacoes concorrentes (sem numero duplicado) e, como o
+incremento so e confirmado junto com o contrato, rollback devolve o numero
+(sem buracos, ao contrario de uma SEQUENCE). A tabela de contratos so e
+varrida uma vez por ano, para semear o contador a partir do maior numero.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+NUMERO_PREFIX = "CNT"
+
+
+def format_numero(ano: int, sequencial: int) -> str:
+    return f"{NUMERO_PREFIX}-{ano}-{sequencial:04d}"
+
+
+class ContratoNumeroService:
+    async def ensure_table(self, db: AsyncSession) -> None:
+        # Sem flag em memoria: o DDL roda na transacao do chamador e um rollback
+        # desfaz a tabela. IF NOT EXISTS com a tabela criada so consulta o catalogo.
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS contrato_numero_counters (
+                    ano INTEGER PRIMARY KEY,
+                    ultimo INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        )
+
+    async def _increment(self, db: AsyncSession, ano: int, count: int) -> Optional[int]:
+        result = await db.execute(
+            text(
+                """
+                UPDATE contrato_numero_counters
+                SET ultimo = ultimo + :count, updated_at = NOW()
+                WHERE ano = :ano
+                RETURNING ultimo
+                """
+            ),
+            {"ano": ano, "count": count},
+        )
+        return result.scalar_one_or_none()
+
+    async def _seed(self, db: AsyncSession, ano: int, count: int) -> int:
+        # Primeiro numero do ano: parte do maior CNT-AAAA-NNNN ja gravado.
+        # ON CONFLICT cobre dois processos semeando o mesmo ano ao mesmo tempo.
+        result = await db.execute(
+            text(
+                """
+                INSERT INTO contrato_numero_counters (ano, ultimo)
+                SELECT :ano, COALESCE(MAX(CAST(split_part(numero, '-', 3) AS INTEGER)), 0) + :count
+                FROM contratos
+                WHERE numero LIKE :prefix AND split_part(numero, '-', 3) ~ '^[0-9]+$'
+                ON CONFLICT (ano) DO UPDATE
+                SET ultimo = contrato_numero_counters.ultimo + :count, updated_at = NOW()
+                RETURNING ultimo
+                """
+            ),
+            {"ano": ano, "count": count, "prefix": f"{NUMERO_PREFIX}-{ano}-%"},
+        )
+        return int(result.scalar_one())
+
+    async def reserve(self, db: AsyncSession, count: int = 1, ano: Optional[int] = None) -> List[str]:
+        """Reserva `count` numeros consecutivos na transacao atual de `db`."""
+        if count < 1:
+            return []
+        ano = int(ano or datetime.now().year)
+        await self.ensure_table(db)
+        ultimo = await self._increment(db, ano, count)
+        if ultimo is None:
+            ultimo = await self._seed(db, ano, count)
+        return [format_numero(ano, sequencial) for sequencial in range(int(ultimo) - count + 1, int(ultimo) + 1)]
+
+    async def next_numero(self, db: AsyncSession, ano: Optional[int] = None) -> str:
+        return (await self.reserve(db, 1, ano))[0]
+
+
+contrato_numero_service = ContratoNumeroService()
@@ -0,0 +1,221 @@
+"""
+Cache de PDFs de contrato enderecado por conteudo.
+
+A chave (tambem usada como ETag) e o sha256 dos campos do contrato que entram
+no documento + JSON do template + anexos fixos + assets (logo/CSS) + versao e
+renderer (Playwright ou WeasyPrint, layouts diferentes).
+Se nada disso mudou, o download e servido direto do artefato em disco
+(`STORAGE_LOCAL_PATH/pdf_cache/<contrato_id>/<chave>.pdf`) ou do S3
+(`STORAGE_MODE=s3`, boto3 opcional), sem abrir Chromium/WeasyPrint.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+from typing import Any, Optional
+from uuid import UUID, uuid4
+
+from app.config import settings
+from app.models.contrato import Contrato
+from app.services.contrato_annex_loader import list_fixed_annexes_for_template
+from app.services.contrato_template_loader import load_contract_template
+from app.services.pdf_asset_registry_service import pdf_asset_registry
+from app.services.pdf_service_playwright import CSS_ASSET_ID, LOGO_ASSET_ID
+
+
+# Incrementar quando o layout/HTML do PDF mudar: invalida todos os artefatos.
+PDF_RENDER_VERSION = "contrato-pdf-v2"
+
+RENDERER_PLAYWRIGHT = "playwright"
+RENDERER_WEASYPRINT = "weasyprint"
+
+# Campos que nao aparecem no documento (mudar status/URL nao exige novo PDF).
+_IGNORED_FIELDS = {"status", "pdf_url", "updated_at", "created_by", "cliente_id"}
+
+
+@dataclass
+class PdfArtifact:
+    etag: str
+    path: Optional[str] = None
+    content: Optional[bytes] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.path is None and self.content is None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o header If-None-Match (lista, fraco/forte ou *) com a ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        value = candidate.strip()
+        if value == "*":
+            return True
+        if value.startswith("W/"):
+            value = value[2:]
+        if value.strip('"') == etag:
+            return True
+    return False
+
+
+@lru_cache(maxsize=1)
+def preferred_renderer() -> str:
+    """Renderer esperado neste runtime (sem Playwright instalado, o WeasyPrint e o normal)."""
+    return RENDERER_PLAYWRIGHT if importlib.util.find_spec("playwright") is not None else RENDERER_WEASYPRINT
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if hasattr(value, "value"):
+        return value.value
+    return str(value)
+
+
+class ContratoPdfCacheService:
+    def __init__(self) -> None:
+        self.enabled = bool(settings.CONTRATO_PDF_CACHE_ENABLED)
+        self.mode = "s3" if str(settings.STORAGE_MODE or "").lower() == "s3" and settings.AWS_S3_BUCKET else "local"
+        self.root = Path(settings.STORAGE_LOCAL_PATH) / "pdf_cache"
+        self.s3_prefix = "pdf_cache"
+        self._s3_client: Any = None
+
+    def fingerprint(self, contrato: Contrato, renderer: str = RENDERER_PLAYWRIGHT) -> str:
+        fields = {
+            column.name: getattr(contrato, column.name, None)
+            for column in contrato.__table__.columns
+            if column.name not in _IGNORED_FIELDS
+        }
+        template_id = str(contrato.template_id or "").lower()
+        annexes = [
+            {"id": item.get("id"), "ordem": item.get("ordem"), "conteudo": item.get("conteudo_markdown")}
+            for item in list_fixed_annexes_for_template(template_id)
+        ]
+        payload = {
+            "version": PDF_RENDER_VERSION,
+            "renderer": renderer,
+            "contrato": fields,
+            "template": load_contract_template(template_id),
+            "anexos": annexes,
+            "assets": {
+                asset_id: asset.digest if asset else None
+                for asset_id, asset in ((item, pdf_asset_registry.get(item)) for item in (LOGO_ASSET_ID, CSS_ASSET_ID))
+            },
+        }
+        raw = json.dumps(payload, sort_keys=True, default=_json_default, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Backend local
+    # ------------------------------------------------------------------
+    def _local_path(self, contrato_id: UUID, key: str) -> Path:
+        return self.root / str(contrato_id) / f"{key}.pdf"
+
+    def _local_put(self, contrato_id: UUID, key: str, content: bytes) -> str:
+        target = self._local_path(contrato_id, key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Escrita atomica + remocao das versoes antigas do mesmo contrato.
+        tmp_path = target.with_suffix(f".{uuid4().hex}.tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, target)
+        for sibling in target.parent.iterdir():
+            if sibling != target:
+                sibling.unlink(missing_ok=True)
+        return str(target)
+
+    # ------------------------------------------------------------------
+    # Backend S3 (boto3 opcional)
+    # ------------------------------------------------------------------
+    def _get_s3(self) -> Any:
+        if self._s3_client is None:
+            import boto3
+
+            self._s3_client = boto3.client(
+                "s3",
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.AWS_S3_ENDPOINT or None,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            )
+        return self._s3_client
+
+    def _s3_key(self, contrato_id: UUID, key: str) -> str:
+        return f"{self.s3_prefix}/{contrato_id}/{key}.pdf"
+
+    def _s3_get(self, contrato_id: UUID, key: str) -> Optional[bytes]:
+        client = self._get_s3()
+        try:
+            response = client.get_object(Bucket=settings.AWS_S3_BUCKET, Key=self._s3_key(contrato_id, key))
+        except client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def _s3_put(self, contrato_id: UUID, key: str, content: bytes) -> None:
+        self._s3_delete_prefix(contrato_id)
+        self._get_s3().put_object(
+            Bucket=settings.AWS_S3_BUCKET,
+            Key=self._s3_key(contrato_id, key),
+            Body=content,
+            ContentType="application/pdf",
+        )
+
+    def _s3_delete_prefix(self, contrato_id: UUID) -> None:
+        client = self._get_s3()
+        listing = client.list_objects_v2(Bucket=settings.AWS_S3_BUCKET, Prefix=f"{self.s3_prefix}/{contrato_id}/")
+        keys = [{"Key": item["Key"]} for item in listing.get("Contents") or []]
+        if keys:
+            client.delete_objects(Bucket=settings.AWS_S3_BUCKET, Delete={"Objects": keys})
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    async def get(self, contrato_id: UUID, key: str) -> Optional[PdfArtifact]:
+        if not self.enabled:
+            return None
+        try:
+            if self.mode == "s3":
+                content = await asyncio.to_thread(self._s3_get, contrato_id, key)
+                return PdfArtifact(etag=key, content=content) if content else None
+            path = self._local_path(contrato_id, key)
+            return PdfArtifact(etag=key, path=str(path)) if path.is_file() else None
+        except Exception:
+            logging.exception("Falha ao ler cache de PDF do contrato %s", contrato_id)
+            return None
+
+    async def put(self, contrato_id: UUID, key: str, content: bytes) -> PdfArtifact:
+        artifact = PdfArtifact(etag=key, content=content)
+        if not self.enabled or not content:
+            return artifact
+        try:
+            if self.mode == "s3":
+                await asyncio.to_thread(self._s3_put, contrato_id, key, content)
+            else:
+                artifact.path = await asyncio.to_thread(self._local_put, contrato_id, key, content)
+        except Exception:
+            logging.exception("Falha ao gravar cache de PDF do contrato %s", contrato_id)
+        return artifact
+
+    async def invalidate(self, contrato_id: UUID) -> None:
+        try:
+            if self.mode == "s3":
+                await asyncio.to_thread(self._s3_delete_prefix, contrato_id)
+            else:
+                await asyncio.to_thread(shutil.rmtree, self.root / str(contrato_id), True)
+        except Exception:
+            logging.exception("Falha ao invalidar cache de PDF do contrato %s", contrato_id)
+
+
+contrato_pdf_cache_service = ContratoPdfCacheService()
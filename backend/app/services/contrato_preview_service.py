@@ -0,0 +1,182 @@
+"""
+Preview HTML de contrato para o editor, sem Chromium/WeasyPrint.
+
+Reusa o HTML do PDF (`PDFService._generate_html`, assets inline) sobre um
+`Contrato` transitorio montado a partir do rascunho. Clausulas sem token ja
+vem pre-renderizadas do template compilado; clausulas e anexos com token sao
+guardados num LRU por template, com chave = conteudo + valores dos tokens que
+aparecem no bloco. Editar um campo so re-renderiza os blocos que o usam.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+import logging
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, MutableMapping, Optional
+
+from app.config import settings
+from app.models.contrato import Contrato, ContratoStatus
+from app.services.contrato_service import ContratoService
+from app.services.contrato_template_loader import (
+    CompiledTemplate,
+    get_compiled_template,
+    list_contract_templates_from_files,
+)
+from app.services.extenso_service import ExtensoService
+from app.services.pdf_service_playwright import PDFService
+
+
+PREVIEW_NUMERO = "PREVIA"
+
+_TEXT_FIELDS = (
+    "contratante_nome",
+    "contratante_documento",
+    "contratante_email",
+    "contratante_endereco",
+    "valor_total_extenso",
+    "valor_entrada_extenso",
+    "qtd_parcelas_extenso",
+    "valor_parcela_extenso",
+    "prazo_1_extenso",
+    "prazo_2_extenso",
+)
+
+
+class _BlockCache(MutableMapping[Any, str]):
+    """LRU limitado de blocos HTML de um template compilado."""
+
+    def __init__(self, compiled: Optional[CompiledTemplate], max_blocks: int) -> None:
+        self.compiled = compiled
+        self.max_blocks = max_blocks
+        self._blocks: "OrderedDict[Any, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key: Any) -> str:
+        try:
+            value = self._blocks[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self._blocks.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key: Any, value: str) -> None:
+        self._blocks[key] = value
+        self._blocks.move_to_end(key)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def __delitem__(self, key: Any) -> None:
+        del self._blocks[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._blocks)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+
+def _to_decimal(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value if value not in (None, "") else 0).replace(",", "."))
+    except (InvalidOperation, ValueError):
+        return Decimal("0")
+
+
+def _to_int(value: Any, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class ContratoPreviewService:
+    def __init__(self) -> None:
+        self.max_blocks = max(1, int(settings.CONTRATO_PREVIEW_CACHE_BLOCKS))
+        self._renderer = PDFService()
+        self._extenso = ExtensoService()
+        self._caches: Dict[str, _BlockCache] = {}
+        self.renders = 0
+
+    def _block_cache(self, template_id: str) -> _BlockCache:
+        compiled = get_compiled_template(template_id)
+        cache = self._caches.get(template_id)
+        # Template recompilado (arquivo mudou): blocos antigos nao valem mais.
+        if cache is None or cache.compiled is not compiled:
+            cache = _BlockCache(compiled, self.max_blocks)
+            self._caches[template_id] = cache
+        return cache
+
+    def build_draft(self, template_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+        """Completa o rascunho (prazos, parcela e extensos) como `ContratoService.create`."""
+        draft = SimpleNamespace(
+            **{field: str(dados.get(field) or "") for field in _TEXT_FIELDS},
+            contratante_telefone=dados.get("contratante_telefone") or None,
+            valor_total=_to_decimal(dados.get("valor_total")),
+            valor_entrada=_to_decimal(dados.get("valor_entrada")),
+            qtd_parcelas=max(1, _to_int(dados.get("qtd_parcelas"), 1)),
+            valor_parcela=Decimal("0"),
+            prazo_1=0,
+            prazo_2=0,
+            local_assinatura=str(dados.get("local_assinatura") or "Ribeirão Preto/SP"),
+            data_assinatura=str(dados.get("data_assinatura") or datetime.now().strftime("%d/%m/%Y")),
+        )
+        schedule = ContratoService._apply_derived_fields(draft, self._extenso)
+
+        dados_extras = dict(dados.get("dados_extras")) if isinstance(dados.get("dados_extras"), dict) else {}
+        dados_extras["prazos_dias"] = schedule
+        dados_extras["parcelamento"] = "à vista" if draft.qtd_parcelas == 1 else f"{draft.qtd_parcelas}x"
+        return {
+            **vars(draft),
+            "template_id": str(template_id or "").strip().lower(),
+            "numero": str(dados.get("numero") or PREVIEW_NUMERO),
+            "dados_extras": dados_extras,
+        }
+
+    def render(self, template_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+        """HTML autocontido (CSS/logo inline) do rascunho + dados completos."""
+        dados_completos = self.build_draft(template_id, dados)
+        contrato = Contrato(
+            **dados_completos,
+            status=ContratoStatus.RASCUNHO,
+            template_nome=dados_completos["template_id"],
+        )
+        contrato.created_at = datetime.now(timezone.utc)
+        html_content = self._renderer._generate_html(
+            contrato,
+            inline_assets=True,
+            block_cache=self._block_cache(dados_completos["template_id"]),
+        )
+        self.renders += 1
+        return {"html": html_content, "dados_completos": dados_completos}
+
+    def warm(self) -> int:
+        """Renderiza um rascunho vazio por template (fragmentos estaticos + anexos)."""
+        warmed = 0
+        for template in list_contract_templates_from_files():
+            try:
+                self.render(str(template.get("id") or ""), {})
+                warmed += 1
+            except Exception:
+                logging.exception("Falha ao aquecer preview do template %s", template.get("id"))
+        return warmed
+
+    def clear(self) -> None:
+        self._caches.clear()
+        self.renders = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "renders": self.renders,
+            "templates": len(self._caches),
+            "blocks": sum(len(cache) for cache in self._caches.values()),
+            "block_hits": sum(cache.hits for cache in self._caches.values()),
+            "block_misses": sum(cache.misses for cache in self._caches.values()),
+        }
+
+
+contrato_preview_service = ContratoPreviewService()
@@ -1,18 +1,22 @@
 """Contrato service - Business logic for contracts."""
+import asyncio
 import os
 import logging
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
-from uuid import UUID
+from typing import List, Optional, Dict, Any, Tuple
+from uuid import UUID, uuid4
 
-from sqlalchemy import select, desc, func, and_, or_
+from pydantic import ValidationError
+from sqlalchemy import insert, select, desc, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models.contrato import Contrato, ContratoStatus
 from app.models.cliente import Cliente
 from app.models.contrato_template import ContratoTemplate
 from app.schemas.contrato import ContratoCreate, ContratoUpdate
+from app.services.cliente_metrics_service import cliente_metrics_service
 from app.services.cliente_service import ClienteService
 from app.services.contrato_template_loader import (
     list_contract_templates_from_files,
@@ -20,7 +24,20 @@ from app.services.contrato_template_loader import (
     normalize_template_payload,
 )
 from app.services.contrato_annex_loader import list_fixed_annexes_for_template
+from app.services.contrato_numero_service import contrato_numero_service
 from app.services.extenso_service import ExtensoService
+from app.services.contrato_pdf_cache_service import (
+    RENDERER_PLAYWRIGHT,
+    RENDERER_WEASYPRINT,
+    PdfArtifact,
+    contrato_pdf_cache_service,
+    etag_matches,
+    preferred_renderer,
+)
+from app.services.pagination_service import keyset_condition, next_cursor, page_request, resolve_total
+from app.services.pdf_browser_pool_service import PdfPoolBusyError
+from app.services.search_index_service import search_index_service
+from app.services.weasy_render_pool_service import weasy_render_pool_service
 from app.services.viva_shared_service import _normalize_mojibake_text
 
 
@@ -308,27 +325,51 @@ class ContratoService:
             return schedule[0], schedule[0]
         return schedule[0], schedule[1]
 
-    async def _recalculate_cliente_metrics(self, cliente_id: UUID) -> None:
-        result = await self.db.execute(
-            select(
-                func.count(Contrato.id),
-                func.min(Contrato.created_at),
-                func.max(Contrato.created_at),
-            ).where(Contrato.cliente_id == cliente_id)
-        )
-        total, primeiro, ultimo = result.one()
-
-        cliente_result = await self.db.execute(
-            select(Cliente).where(Cliente.id == cliente_id)
-        )
-        cliente = cliente_result.scalar_one_or_none()
-        if not cliente:
-            return
+    @classmethod
+    def _apply_derived_fields(cls, data: Any, extenso: ExtensoService) -> List[int]:
+        """Preenche prazos, parcela e valores por extenso; retorna o cronograma em dias."""
+        return cls._apply_derived_fields_batch([data], extenso)[0]
+
+    @classmethod
+    def _apply_derived_fields_batch(cls, rows: List[Any], extenso: ExtensoService) -> List[List[int]]:
+        """Versao em lote: extensos faltantes sao convertidos numa chamada por tipo."""
+        schedules: List[List[int]] = []
+        valores: List[tuple] = []
+        numeros: List[tuple] = []
+        for data in rows:
+            valor_total = Decimal(str(data.valor_total))
+            valor_entrada = Decimal(str(data.valor_entrada))
+            schedule = cls._build_installment_schedule(data.qtd_parcelas)
+            data.prazo_1, data.prazo_2 = cls._extract_primary_prazos(schedule)
+            data.valor_parcela = extenso.calcular_valor_parcela(
+                valor_total, valor_entrada, data.qtd_parcelas
+            )
+            schedules.append(schedule)
+
+            for field, value in (
+                ("valor_total_extenso", valor_total),
+                ("valor_entrada_extenso", valor_entrada),
+                ("valor_parcela_extenso", data.valor_parcela),
+            ):
+                if not getattr(data, field):
+                    valores.append((data, field, value))
+            if not data.qtd_parcelas_extenso:
+                numeros.append((data, "qtd_parcelas_extenso", data.qtd_parcelas))
+            if data.qtd_parcelas == 1:
+                data.prazo_1_extenso = "à vista"
+                data.prazo_2_extenso = "à vista"
+            else:
+                if not data.prazo_1_extenso:
+                    numeros.append((data, "prazo_1_extenso", data.prazo_1))
+                if not data.prazo_2_extenso:
+                    numeros.append((data, "prazo_2_extenso", data.prazo_2))
+
+        for (data, field, _), text_value in zip(valores, extenso.valores_por_extenso(item[2] for item in valores)):
+            setattr(data, field, text_value)
+        for (data, field, _), text_value in zip(numeros, extenso.numeros_por_extenso(item[2] for item in numeros)):
+            setattr(data, field, text_value)
+        return schedules
 
-        cliente.total_contratos = int(total or 0)
-        cliente.primeiro_contrato_em = primeiro
-        cliente.ultimo_contrato_em = ultimo
-    
     async def create(self, data: ContratoCreate, user_id: UUID) -> Contrato:
         """Create a new contract."""
         template = await self.get_template(data.template_id)
@@ -336,35 +377,7 @@ class ContratoService:
             raise ValueError(f"Template {data.template_id} nÃ£o encontrado")
 
         documento_limpo = self._normalize_document(data.contratante_documento)
-
-        valor_total = Decimal(str(data.valor_total))
-        valor_entrada = Decimal(str(data.valor_entrada))
-        schedule = self._build_installment_schedule(data.qtd_parcelas)
-        prazo_1, prazo_2 = self._extract_primary_prazos(schedule)
-
-        data.prazo_1 = prazo_1
-        data.prazo_2 = prazo_2
-
-        if not data.valor_total_extenso:
-            data.valor_total_extenso = self.extenso.valor_por_extenso(valor_total)
-        if not data.valor_entrada_extenso:
-            data.valor_entrada_extenso = self.extenso.valor_por_extenso(valor_entrada)
-        if not data.qtd_parcelas_extenso:
-            data.qtd_parcelas_extenso = self.extenso.numero_por_extenso(data.qtd_parcelas)
-
-        data.valor_parcela = self.extenso.calcular_valor_parcela(
-            valor_total, valor_entrada, data.qtd_parcelas
-        )
-        if not data.valor_parcela_extenso:
-            data.valor_parcela_extenso = self.extenso.valor_por_extenso(data.valor_parcela)
-        if data.qtd_parcelas == 1:
-            data.prazo_1_extenso = "à vista"
-            data.prazo_2_extenso = "à vista"
-        else:
-            if not data.prazo_1_extenso:
-                data.prazo_1_extenso = self.extenso.numero_por_extenso(data.prazo_1)
-            if not data.prazo_2_extenso:
-                data.prazo_2_extenso = self.extenso.numero_por_extenso(data.prazo_2)
+        schedule = self._apply_derived_fields(data, self.extenso)
 
         dados_extras = dict(data.dados_extras) if isinstance(data.dados_extras, dict) else {}
         dados_extras["prazos_dias"] = schedule
@@ -424,75 +437,224 @@ class ContratoService:
 
         self.db.add(contrato)
         await self.db.flush()
-        await self._recalculate_cliente_metrics(cliente.id)
+        # created_at vem do server_default (NOW() desta transacao).
+        await cliente_metrics_service.contracts_added(self.db, [(cliente.id, None)])
         await self.db.commit()
         await self.db.refresh(contrato)
 
         return contrato
     
-    async def _generate_numero(self) -> str:
-        """Generate contract number: CNT-YYYY-XXXX"""
-        year = datetime.now().year
-        prefix = f"CNT-{year}-"
-
-        # Use current max sequence to avoid duplicate numbers when there are gaps.
+    async def _resolve_template_names(self, template_ids: List[str]) -> Dict[str, str]:
+        """Nome de cada template existente (arquivo, banco em uma query, fallback)."""
+        names: Dict[str, str] = {}
+        pending: List[str] = []
+        for template_key in template_ids:
+            file_template = load_contract_template(template_key)
+            if file_template:
+                names[template_key] = str(file_template.get("nome") or template_key)
+            else:
+                pending.append(template_key)
+        if pending:
+            result = await self.db.execute(
+                select(ContratoTemplate.tipo, ContratoTemplate.nome).where(ContratoTemplate.tipo.in_(pending))
+            )
+            for tipo, nome in result.all():
+                names.setdefault(str(tipo).strip().lower(), nome or str(tipo))
+        for template_key in pending:
+            fallback = FALLBACK_TEMPLATES.get(template_key)
+            if template_key not in names and fallback:
+                names[template_key] = str(fallback.get("nome") or template_key)
+        return names
+
+    async def _resolve_clientes(self, rows: List[ContratoCreate]) -> Dict[str, Cliente]:
+        """Um SELECT para todos os documentos; clientes novos entram num unico flush."""
+        documentos = {self._normalize_document(data.contratante_documento) for data in rows}
         result = await self.db.execute(
-            select(Contrato.numero)
-            .where(Contrato.numero.like(f"{prefix}%"))
-            .order_by(desc(Contrato.numero))
-            .limit(1)
+            select(Cliente)
+            .where(ClienteService._document_expression().in_(documentos))
+            .order_by(
+                desc(Cliente.total_contratos),
+                Cliente.created_at.asc(),
+                Cliente.id.asc(),
+            )
         )
-        ultimo_numero = result.scalar_one_or_none()
-
-        if not ultimo_numero:
-            sequencial = 1
-        else:
+        clientes: Dict[str, Cliente] = {}
+        for cliente in result.scalars().all():
+            # Mesma escolha de ClienteService.get_by_documento em caso de duplicidade.
+            clientes.setdefault(self._normalize_document(cliente.documento), cliente)
+
+        novos: List[Cliente] = []
+        for data in rows:
+            documento_limpo = self._normalize_document(data.contratante_documento)
+            cliente = clientes.get(documento_limpo)
+            if cliente is None:
+                cliente = Cliente(
+                    nome=data.contratante_nome,
+                    tipo_pessoa="fisica" if len(documento_limpo) == 11 else "juridica",
+                    documento=documento_limpo,
+                    email=data.contratante_email,
+                    telefone=data.contratante_telefone,
+                    endereco=data.contratante_endereco,
+                )
+                clientes[documento_limpo] = cliente
+                novos.append(cliente)
+            else:
+                cliente.nome = data.contratante_nome
+                cliente.email = data.contratante_email
+                cliente.telefone = data.contratante_telefone
+                cliente.endereco = data.contratante_endereco
+        if novos:
+            self.db.add_all(novos)
+        await self.db.flush()
+        return clientes
+
+    async def bulk_create(self, items: List[Dict[str, Any]], user_id: UUID) -> Dict[str, Any]:
+        """Cria contratos em lote numa transacao; retorna resultado por linha.
+
+        Linhas invalidas (schema ou template inexistente) sao reportadas e
+        puladas; as validas sao inseridas com INSERT multi-linha, com numeros
+        reservados em bloco e um delta de metricas por cliente.
+        """
+        results: List[Dict[str, Any]] = [{"index": index, "ok": False} for index in range(len(items))]
+        valid: List[tuple] = []
+        for index, item in enumerate(items):
             try:
-                sequencial = int(str(ultimo_numero).split("-")[-1]) + 1
-            except (TypeError, ValueError):
-                sequencial = 1
+                data = ContratoCreate.model_validate(item)
+            except ValidationError as exc:
+                results[index]["erro"] = "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+                )
+                continue
+            data.template_id = str(data.template_id or "").strip().lower()
+            valid.append((index, data))
+
+        template_names = await self._resolve_template_names(sorted({data.template_id for _, data in valid}))
+        rows: List[tuple] = []
+        for index, data in valid:
+            if data.template_id not in template_names:
+                results[index]["erro"] = f"Template {data.template_id} não encontrado"
+                continue
+            rows.append((index, data))
+        if not rows:
+            return {"criados": 0, "falhas": len(items), "resultados": results}
+
+        datas = [data for _, data in rows]
+        schedules = self._apply_derived_fields_batch(datas, self.extenso)
+        clientes = await self._resolve_clientes(datas)
+        numeros = await self.reserve_numeros(len(rows))
+
+        values: List[Dict[str, Any]] = []
+        for (index, data), schedule, numero in zip(rows, schedules, numeros):
+            documento_limpo = self._normalize_document(data.contratante_documento)
+            dados_extras = dict(data.dados_extras) if isinstance(data.dados_extras, dict) else {}
+            dados_extras["prazos_dias"] = schedule
+            dados_extras["parcelamento"] = "à vista" if data.qtd_parcelas == 1 else f"{data.qtd_parcelas}x"
+            contrato_id = uuid4()
+            values.append({
+                "id": contrato_id,
+                "numero": numero,
+                "status": ContratoStatus.RASCUNHO,
+                "template_id": data.template_id,
+                "template_nome": template_names[data.template_id],
+                "cliente_id": clientes[documento_limpo].id,
+                "contratante_nome": data.contratante_nome,
+                "contratante_documento": documento_limpo,
+                "contratante_email": data.contratante_email,
+                "contratante_telefone": data.contratante_telefone,
+                "contratante_endereco": data.contratante_endereco,
+                "valor_total": data.valor_total,
+                "valor_total_extenso": data.valor_total_extenso,
+                "valor_entrada": data.valor_entrada,
+                "valor_entrada_extenso": data.valor_entrada_extenso,
+                "qtd_parcelas": data.qtd_parcelas,
+                "qtd_parcelas_extenso": data.qtd_parcelas_extenso,
+                "valor_parcela": data.valor_parcela,
+                "valor_parcela_extenso": data.valor_parcela_extenso,
+                "prazo_1": data.prazo_1,
+                "prazo_1_extenso": data.prazo_1_extenso,
+                "prazo_2": data.prazo_2,
+                "prazo_2_extenso": data.prazo_2_extenso,
+                "local_assinatura": data.local_assinatura,
+                "data_assinatura": data.data_assinatura,
+                "dados_extras": dados_extras,
+                "created_by": user_id,
+            })
+            results[index].update({"ok": True, "id": contrato_id, "numero": numero})
+
+        # executemany: SQLAlchemy agrupa em INSERTs multi-linha (insertmanyvalues).
+        await self.db.execute(insert(Contrato), values)
+        await cliente_metrics_service.contracts_added(self.db, [(row["cliente_id"], None) for row in values])
+        await self.db.commit()
 
-        return f"CNT-{year}-{sequencial:04d}"
+        return {"criados": len(values), "falhas": len(items) - len(values), "resultados": results}
+
+    async def _generate_numero(self) -> str:
+        """Generate contract number: CNT-YYYY-XXXX"""
+        return await contrato_numero_service.next_numero(self.db)
+
+    async def reserve_numeros(self, count: int) -> List[str]:
+        """Reserve `count` consecutive contract numbers in the current transaction."""
+        return await contrato_numero_service.reserve(self.db, count)
     
     async def list(
         self,
         status: Optional[ContratoStatus] = None,
         search: Optional[str] = None,
         page: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        mode: str = "contains",
+        cursor: Optional[str] = None,
+        total_mode: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """List contracts with pagination."""
-        query = select(Contrato).order_by(desc(Contrato.created_at))
-        
+        """List contracts with pagination (ranked by relevance when searching).
+
+        `cursor` switches to keyset pagination on (created_at, id); relevance
+        ordering only applies to page/offset requests.
+        """
+        page_req = page_request(page, page_size, cursor, total_mode)
+        filters = []
         if status:
-            query = query.where(Contrato.status == status)
-        
-        if search:
-            search_filter = or_(
-                Contrato.contratante_nome.ilike(f"%{search}%"),
-                Contrato.numero.ilike(f"%{search}%"),
-                Contrato.contratante_documento.ilike(f"%{search}%")
-            )
-            query = query.where(search_filter)
+            filters.append(Contrato.status == status)
+
+        search_filter, search_rank = search_index_service.build_search("contratos", search, mode)
+        if search_filter is not None:
+            filters.append(search_filter)
         
         # Count total
-        count_result = await self.db.execute(
-            select(func.count(Contrato.id)).where(
-                and_(True, search_filter) if search else True
+        async def count() -> int:
+            count_result = await self.db.execute(
+                select(func.count(Contrato.id)).where(and_(True, *filters))
             )
-        )
-        total = count_result.scalar()
+            return count_result.scalar() or 0
+
+        total = await resolve_total(page_req, ("contratos", status, search, mode), count)
         
         # Paginate
-        query = query.offset((page - 1) * page_size).limit(page_size)
+        if page_req.cursor:
+            search_rank = None
+            filters.append(keyset_condition(Contrato.created_at, Contrato.id, page_req.cursor))
+        order_by = [desc(Contrato.created_at), desc(Contrato.id)]
+        if search_rank is not None:
+            order_by.insert(0, desc(search_rank))
+        query = (
+            select(Contrato)
+            .where(and_(True, *filters))
+            .order_by(*order_by)
+            .offset(page_req.offset)
+            .limit(page_req.page_size + 1)
+        )
         result = await self.db.execute(query)
-        items = result.scalars().all()
+        items = list(result.scalars().all())
+        cursor_next = None
+        if search_rank is None:
+            cursor_next = next_cursor(items, page_req.page_size, lambda item: (item.created_at, item.id))
         
         return {
-            "items": list(items),
+            "items": items[:page_req.page_size],
             "total": total,
             "page": page,
-            "page_size": page_size
+            "page_size": page_size,
+            "next_cursor": cursor_next,
         }
     
     async def get_by_id(self, contrato_id: UUID) -> Optional[Contrato]:
@@ -514,11 +676,21 @@ class ContratoService:
         
         # Update fields
         update_data = data.model_dump(exclude_unset=True)
+        old_cliente_id = contrato.cliente_id
         for field, value in update_data.items():
             setattr(contrato, field, value)
+
+        if "cliente_id" in update_data and contrato.cliente_id != old_cliente_id:
+            await self.db.flush()
+            await cliente_metrics_service.contract_relinked(
+                self.db, old_cliente_id, contrato.cliente_id, contrato.created_at
+            )
         
         await self.db.commit()
         await self.db.refresh(contrato)
+
+        if set(update_data) - {"status", "pdf_url"}:
+            await contrato_pdf_cache_service.invalidate(contrato_id)
         
         return contrato
     
@@ -532,12 +704,12 @@ class ContratoService:
         if not contrato:
             return False
 
-        cliente_id = contrato.cliente_id
+        ref = (contrato.cliente_id, contrato.created_at)
         await self.db.delete(contrato)
         await self.db.flush()
-        if cliente_id:
-            await self._recalculate_cliente_metrics(cliente_id)
+        await cliente_metrics_service.contracts_removed(self.db, [ref])
         await self.db.commit()
+        await contrato_pdf_cache_service.invalidate(contrato_id)
         
         return True
     
@@ -547,8 +719,15 @@ class ContratoService:
         if not contrato:
             return None
 
-        pdf_path = self._generate_pdf_via_weasy(contrato)
-        if not pdf_path:
+        pdf_bytes = await self._render_pdf_via_weasy(contrato)
+        if not pdf_bytes:
+            return None
+
+        pdf_path = os.path.join(settings.STORAGE_LOCAL_PATH, f"contrato_{contrato.numero or contrato.id}.pdf")
+        try:
+            await asyncio.to_thread(self._write_file, pdf_path, pdf_bytes)
+        except OSError:
+            logger.exception("Nao foi possivel gravar PDF do contrato %s", contrato_id)
             return None
 
         # Update contract with PDF URL
@@ -557,12 +736,47 @@ class ContratoService:
 
         return relative_path
 
+    async def get_pdf_artifact(
+        self,
+        contrato_id: UUID,
+        if_none_match: Optional[str] = None,
+    ) -> Optional[PdfArtifact]:
+        """PDF do cache enderecado por conteudo; renderiza e grava apenas em miss.
+
+        Se `if_none_match` bate com a chave atual, retorna artefato vazio
+        (`not_modified`) sem ler nem renderizar o PDF. PDF do fallback WeasyPrint
+        por falha transitoria do Playwright nao e gravado e sai com ETag propria.
+        """
+        contrato = await self.get_by_id(contrato_id)
+        if not contrato:
+            return None
+
+        renderer = preferred_renderer()
+        key = contrato_pdf_cache_service.fingerprint(contrato, renderer)
+        if etag_matches(if_none_match, key):
+            return PdfArtifact(etag=key)
+        cached = await contrato_pdf_cache_service.get(contrato_id, key)
+        if cached:
+            return cached
+
+        pdf_bytes, used = await self._render_contrato_pdf(contrato)
+        if not pdf_bytes:
+            return None
+        if used != renderer:
+            return PdfArtifact(etag=contrato_pdf_cache_service.fingerprint(contrato, used), content=pdf_bytes)
+        return await contrato_pdf_cache_service.put(contrato_id, key, pdf_bytes)
+
     async def generate_pdf_bytes(self, contrato_id: UUID) -> Optional[bytes]:
         """Generate PDF bytes for contract (Playwright first, WeasyPrint fallback)."""
         contrato = await self.get_by_id(contrato_id)
         if not contrato:
             return None
+        pdf_bytes, _ = await self._render_contrato_pdf(contrato)
+        return pdf_bytes
 
+    async def _render_contrato_pdf(self, contrato: Contrato) -> Tuple[Optional[bytes], Optional[str]]:
+        """(bytes, renderer usado)."""
+        contrato_id = contrato.id
         # Primary path: Playwright renderer.
         try:
             from app.services.pdf_service_playwright import PDFService as PlaywrightPDFService
@@ -571,7 +785,9 @@ class ContratoService:
             pdf_bytes = await pdf_service.generate_contrato_pdf(contrato_id)
             if pdf_bytes:
                 logger.info("PDF gerado via Playwright para contrato %s", contrato_id)
-                return pdf_bytes
+                return pdf_bytes, RENDERER_PLAYWRIGHT
+        except PdfPoolBusyError:
+            raise
         except ModuleNotFoundError:
             # Playwright dependency may be absent in some containers.
             logger.info("Playwright indisponivel no runtime. Usando fallback WeasyPrint.")
@@ -579,19 +795,13 @@ class ContratoService:
             # Any Playwright runtime issue should not block contract download.
             logger.exception("Falha no Playwright para contrato %s. Tentando WeasyPrint.", contrato_id)
 
-        # Fallback path: WeasyPrint renderer.
-        pdf_path = self._generate_pdf_via_weasy(contrato)
-        if not pdf_path:
+        # Fallback path: WeasyPrint renderer (process pool, bytes em memoria).
+        pdf_bytes = await self._render_pdf_via_weasy(contrato)
+        if not pdf_bytes:
             logger.error("Falha no fallback WeasyPrint para contrato %s", contrato_id)
-            return None
-
-        try:
-            with open(pdf_path, "rb") as pdf_file:
-                logger.info("PDF gerado via WeasyPrint para contrato %s em %s", contrato_id, pdf_path)
-                return pdf_file.read()
-        except OSError:
-            logger.exception("Nao foi possivel ler arquivo PDF gerado para contrato %s", contrato_id)
-            return None
+            return None, None
+        logger.info("PDF gerado via WeasyPrint para contrato %s", contrato_id)
+        return pdf_bytes, RENDERER_WEASYPRINT
 
     @staticmethod
     def _format_brl(value: Any) -> str:
@@ -620,16 +830,25 @@ class ContratoService:
             "prazo_2": contrato.prazo_2,
             "prazo_2_extenso": contrato.prazo_2_extenso,
             "local_assinatura": contrato.local_assinatura,
-            "data_assinatura": contrato.data_assinatura,
+            # Sem data de assinatura usa a criacao do contrato (como o Playwright),
+            # nao a data do render: o PDF fica estavel no cache.
+            "data_assinatura": contrato.data_assinatura or (
+                contrato.created_at.strftime("%d/%m/%Y") if contrato.created_at else None
+            ),
         }
 
-    def _generate_pdf_via_weasy(self, contrato: Contrato) -> Optional[str]:
+    async def _render_pdf_via_weasy(self, contrato: Contrato) -> Optional[bytes]:
         try:
-            from app.services.pdf_service import PDFService as WeasyPDFService
-
-            pdf_service = WeasyPDFService()
             dados = self._build_pdf_data(contrato)
-            return pdf_service.generate_contrato_bacen(contrato.id, dados)
+            return await weasy_render_pool_service.render(dados)
+        except asyncio.CancelledError:
+            raise
         except Exception:
             logger.exception("WeasyPrint falhou na geracao do contrato %s", contrato.id)
             return None
+
+    @staticmethod
+    def _write_file(path: str, content: bytes) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as pdf_file:
+            pdf_file.write(content)
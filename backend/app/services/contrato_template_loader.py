@@ -1,8 +1,10 @@
 """Shared contract template loader."""
+from dataclasses import dataclass, field
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 
 def _candidate_template_dirs() -> List[Path]:
@@ -121,54 +123,140 @@ def normalize_template_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
     return normalized
 
 
-def load_contract_template(template_id: str) -> Optional[Dict[str, Any]]:
-    template_key = str(template_id or "").strip().lower()
-    if not template_key:
-        return None
+@dataclass
+class CompiledTemplate:
+    """Template ja lido e normalizado; `fragments` guarda HTML estatico pre-renderizado."""
 
-    for templates_dir in _candidate_template_dirs():
-        template_path = templates_dir / f"{template_key}.json"
-        if not template_path.exists():
-            continue
-        try:
-            with open(template_path, "r", encoding="utf-8") as file:
-                payload = json.load(file)
-            if isinstance(payload, dict):
-                return normalize_template_payload(payload)
-        except Exception:
-            continue
+    template_id: str
+    payload: Dict[str, Any]
+    fragments: Dict[Any, str] = field(default_factory=dict)
 
-    return None
 
+def _summarize_template(template_id: str, normalized: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": template_id,
+        "nome": str(normalized.get("nome") or template_id).strip(),
+        "tipo": str(normalized.get("tipo") or template_id).strip() or template_id,
+        "descricao": str(normalized.get("descricao") or "").strip(),
+        "versao": str(normalized.get("versao") or "1.0.0").strip(),
+        "ativo": bool(normalized.get("ativo", True)),
+        "campos": normalized.get("campos", []),
+        "secoes": normalized.get("secoes", []),
+    }
 
-def list_contract_templates_from_files() -> List[Dict[str, Any]]:
-    templates: Dict[str, Dict[str, Any]] = {}
-    for templates_dir in _candidate_template_dirs():
-        if not templates_dir.exists() or not templates_dir.is_dir():
-            continue
-        for template_path in templates_dir.glob("*.json"):
+
+class ContractTemplateRegistry:
+    """Registro em memoria dos templates JSON (leitura + normalizacao uma vez).
+
+    A cada `CONTRATOS_TEMPLATES_RELOAD_SECONDS` (no maximo) a assinatura dos
+    diretorios (mtime/tamanho dos .json) e conferida; se mudou, recompila tudo.
+    Entre as conferencias, lookup e O(1) sem acesso a disco.
+    """
+
+    def __init__(self) -> None:
+        try:
+            self.reload_seconds = max(0.0, float(os.getenv("CONTRATOS_TEMPLATES_RELOAD_SECONDS", "5")))
+        except ValueError:
+            self.reload_seconds = 5.0
+        self._by_stem: Dict[str, CompiledTemplate] = {}
+        self._listing: List[Dict[str, Any]] = []
+        self._signature: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+        self.loads = 0
+
+    @staticmethod
+    def _template_files() -> List[Path]:
+        files: List[Path] = []
+        for templates_dir in _candidate_template_dirs():
+            if not templates_dir.exists() or not templates_dir.is_dir():
+                continue
+            files.extend(sorted(templates_dir.glob("*.json")))
+        return files
+
+    @staticmethod
+    def _compute_signature(files: List[Path]) -> Tuple[Any, ...]:
+        items = []
+        for template_path in files:
+            try:
+                stat = template_path.stat()
+            except OSError:
+                continue
+            items.append((str(template_path), stat.st_mtime_ns, stat.st_size))
+        return tuple(items)
+
+    def _build(self, files: List[Path], signature: Tuple[Any, ...]) -> None:
+        by_stem: Dict[str, CompiledTemplate] = {}
+        listing: Dict[str, Dict[str, Any]] = {}
+        canonical: Dict[str, bool] = {}
+        for template_path in files:
+            stem = template_path.stem.lower()
             try:
                 with open(template_path, "r", encoding="utf-8") as file:
                     payload = json.load(file)
                 if not isinstance(payload, dict):
                     continue
                 normalized = normalize_template_payload(payload)
-                template_id = str(normalized.get("id") or template_path.stem).strip().lower()
-                if not template_id:
-                    continue
-                if template_id in templates:
-                    continue
-                templates[template_id] = {
-                    "id": template_id,
-                    "nome": str(normalized.get("nome") or template_id).strip(),
-                    "tipo": str(normalized.get("tipo") or template_id).strip() or template_id,
-                    "descricao": str(normalized.get("descricao") or "").strip(),
-                    "versao": str(normalized.get("versao") or "1.0.0").strip(),
-                    "ativo": bool(normalized.get("ativo", True)),
-                    "campos": normalized.get("campos", []),
-                    "secoes": normalized.get("secoes", []),
-                }
             except Exception:
                 continue
+            # Primeiro diretorio candidato vence (mesma precedencia do loader original).
+            by_stem.setdefault(stem, CompiledTemplate(template_id=stem, payload=normalized))
+            template_id = str(normalized.get("id") or template_path.stem).strip().lower()
+            if not template_id:
+                continue
+            # Arquivo cujo nome coincide com o id (ex.: bacen.json) prevalece sobre variantes (bacen-v2.json).
+            is_canonical = stem == template_id
+            if template_id not in listing or (is_canonical and not canonical[template_id]):
+                listing[template_id] = _summarize_template(template_id, normalized)
+                canonical[template_id] = is_canonical
+
+        self._by_stem = by_stem
+        self._listing = [tpl for tpl in listing.values() if bool(tpl.get("ativo", True))]
+        self._signature = signature
+        self.loads += 1
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < self.reload_seconds:
+            return
+        self._checked_at = now
+        files = self._template_files()
+        signature = self._compute_signature(files)
+        if signature != self._signature:
+            self._build(files, signature)
+
+    def warm(self) -> int:
+        self._ensure_fresh()
+        return len(self._by_stem)
+
+    def invalidate(self) -> None:
+        self._signature = None
+
+    def get(self, template_id: str) -> Optional[CompiledTemplate]:
+        template_key = str(template_id or "").strip().lower()
+        if not template_key:
+            return None
+        self._ensure_fresh()
+        return self._by_stem.get(template_key)
+
+    def list_templates(self) -> List[Dict[str, Any]]:
+        self._ensure_fresh()
+        return [dict(item) for item in self._listing]
+
+
+contract_template_registry = ContractTemplateRegistry()
 
-    return [tpl for tpl in templates.values() if bool(tpl.get("ativo", True))]
+
+def get_compiled_template(template_id: str) -> Optional[CompiledTemplate]:
+    return contract_template_registry.get(template_id)
+
+
+def load_contract_template(template_id: str) -> Optional[Dict[str, Any]]:
+    compiled = contract_template_registry.get(template_id)
+    if not compiled:
+        return None
+    # Copia rasa: callers adicionam chaves (ex.: anexos_fixos) no retorno.
+    return dict(compiled.payload)
+
+
+def list_contract_templates_from_files() -> List[Dict[str, Any]]:
+    return contract_template_registry.list_templates()
@@ -0,0 +1,141 @@
+"""
+Cache de embeddings enderecado por conteudo (sha256 de modelo + texto normalizado).
+
+Nivel 1: LRU em processo com vetores compactados em float32 (`array('f')`).
+Nivel 2 (opcional): Redis compartilhado entre workers, com TTL.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from redis import asyncio as redis_asyncio
+
+from app.config import settings
+
+
+def normalize_embedding_text(value: str) -> str:
+    return " ".join(str(value or "").split())
+
+
+def embedding_cache_key(model: str, value: str) -> str:
+    payload = f"{model}\x00{normalize_embedding_text(value)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCacheService:
+    def __init__(self) -> None:
+        self.max_items = max(0, int(settings.EMBEDDING_CACHE_MAX_ITEMS))
+        self.redis_enabled = bool(settings.EMBEDDING_CACHE_REDIS_ENABLED)
+        self.redis_ttl_seconds = max(60, int(settings.EMBEDDING_CACHE_REDIS_TTL_SECONDS))
+        self.redis_url = settings.REDIS_URL
+        self._redis: Optional[redis_asyncio.Redis] = None
+        self._items: "OrderedDict[str, array]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._counters = {"hits": 0, "misses": 0, "redis_hits": 0, "stores": 0, "evictions": 0}
+
+    async def _get_redis(self) -> Optional[redis_asyncio.Redis]:
+        if not self.redis_enabled:
+            return None
+        if self._redis is not None:
+            return self._redis
+        try:
+            client = redis_asyncio.from_url(self.redis_url, decode_responses=False)
+            await client.ping()
+            self._redis = client
+            return client
+        except Exception:
+            return None
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        return f"viva:embedding:{key}"
+
+    def _remember(self, key: str, packed: array) -> None:
+        if self.max_items <= 0:
+            return
+        self._items[key] = packed
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    async def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Retorna {texto: vetor} para os textos presentes no cache."""
+        found: Dict[str, List[float]] = {}
+        missing: List[Tuple[str, str]] = []
+        for value in texts:
+            key = embedding_cache_key(model, value)
+            packed = self._items.get(key)
+            if packed is None:
+                missing.append((value, key))
+                continue
+            self._items.move_to_end(key)
+            found[value] = packed.tolist()
+            self._counters["hits"] += 1
+
+        if missing:
+            redis_client = await self._get_redis()
+            if redis_client is not None:
+                try:
+                    raw_values = await redis_client.mget([self._redis_key(key) for _, key in missing])
+                except Exception:
+                    raw_values = [None] * len(missing)
+                still_missing: List[Tuple[str, str]] = []
+                for (value, key), raw in zip(missing, raw_values):
+                    if not raw:
+                        still_missing.append((value, key))
+                        continue
+                    packed = array("f")
+                    packed.frombytes(raw)
+                    self._remember(key, packed)
+                    found[value] = packed.tolist()
+                    self._counters["hits"] += 1
+                    self._counters["redis_hits"] += 1
+                missing = still_missing
+        self._counters["misses"] += len(missing)
+        return found
+
+    async def put_many(self, model: str, items: Iterable[Tuple[str, Optional[List[float]]]]) -> None:
+        to_redis: Dict[str, bytes] = {}
+        for value, vector in items:
+            if not vector:
+                continue
+            key = embedding_cache_key(model, value)
+            packed = array("f", vector)
+            self._remember(key, packed)
+            self._counters["stores"] += 1
+            if self.redis_enabled:
+                to_redis[self._redis_key(key)] = packed.tobytes()
+        if not to_redis:
+            return
+        redis_client = await self._get_redis()
+        if redis_client is None:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for redis_key, payload in to_redis.items():
+                pipe.set(redis_key, payload, ex=self.redis_ttl_seconds)
+            await pipe.execute()
+        except Exception:
+            return
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self._counters["hits"]
+        total = hits + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "items": len(self._items),
+            "max_items": self.max_items,
+            "redis_enabled": self.redis_enabled,
+        }
+
+
+embedding_cache_service = EmbeddingCacheService()
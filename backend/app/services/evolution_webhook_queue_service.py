@@ -0,0 +1,479 @@
+"""
+Fila duravel de ingestao para webhooks do Evolution API.
+
+O endpoint grava o evento bruto em `whatsapp_webhook_intake` e responde em
+milissegundos; consumidores em background executam o pipeline pesado
+(midia, VIVA, envio) com concorrencia configuravel e ordem por conversa.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+import json
+import logging
+import time
+from typing import Any, Deque, Dict, List, Optional, Set
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.evolution_webhook_service import (
+    collect_webhook_stages,
+    webhook_service,
+)
+
+
+class EvolutionWebhookQueueService:
+    """Persistencia + consumo assincrono dos eventos `messages.upsert`."""
+
+    STAGE_WINDOW = 500
+
+    def __init__(self) -> None:
+        self.concurrency = max(1, int(settings.WEBHOOK_QUEUE_CONCURRENCY))
+        self.poll_seconds = max(0.1, float(settings.WEBHOOK_QUEUE_POLL_SECONDS))
+        self.max_attempts = max(1, int(settings.WEBHOOK_QUEUE_MAX_ATTEMPTS))
+        self.stale_seconds = max(30, int(settings.WEBHOOK_QUEUE_STALE_SECONDS))
+        self.retention_hours = max(1, int(settings.WEBHOOK_QUEUE_RETENTION_HOURS))
+        self._table_checked = False
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._stage_samples: Dict[str, Deque[float]] = {}
+        self._counters: Dict[str, int] = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "processed": 0,
+            "failed": 0,
+            "retried": 0,
+        }
+        self._last_purge_at = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._dispatcher is not None and not self._dispatcher.done()
+
+    async def ensure_table(self, db: AsyncSession) -> None:
+        if self._table_checked:
+            return
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS whatsapp_webhook_intake (
+                    id UUID PRIMARY KEY,
+                    event VARCHAR(60) NOT NULL,
+                    instance_name VARCHAR(100),
+                    conversation_key VARCHAR(200) NOT NULL,
+                    message_id VARCHAR(100),
+                    payload JSONB NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    stage_timings JSONB NOT NULL DEFAULT '{}'::jsonb,
+                    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    started_at TIMESTAMPTZ,
+                    finished_at TIMESTAMPTZ,
+                    updated_at TIMESTAMPTZ
+                )
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_webhook_intake_status_received
+                ON whatsapp_webhook_intake(status, received_at ASC)
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_webhook_intake_conversation_status
+                ON whatsapp_webhook_intake(conversation_key, status)
+                """
+            )
+        )
+        # Evolution reenvia o mesmo evento sob carga: dedupe na propria insercao.
+        await db.execute(
+            text(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_webhook_intake_message
+                ON whatsapp_webhook_intake(instance_name, message_id)
+                WHERE message_id IS NOT NULL
+                """
+            )
+        )
+        self._table_checked = True
+
+    @staticmethod
+    def _conversation_key(keys: Dict[str, Any]) -> str:
+        instance_name = str(keys.get("instance_name") or "").strip()
+        remote_jid = str(keys.get("remote_jid") or "").strip().lower()
+        if remote_jid:
+            return f"{instance_name}:{remote_jid}"[:200]
+        # Sem remoteJid nao ha ordem a preservar; cada evento vira sua propria chave.
+        return f"{instance_name}:orphan:{uuid4()}"[:200]
+
+    def should_enqueue(self, keys: Dict[str, Any]) -> bool:
+        """Apenas mensagens inbound vao para a fila; o resto e barato e segue inline."""
+        return keys.get("event") == "messages.upsert" and not keys.get("from_me")
+
+    async def enqueue(self, db: AsyncSession, data: Dict[str, Any], keys: Dict[str, Any]) -> Dict[str, Any]:
+        """Grava o evento bruto e acorda o despachante. Nao executa o pipeline."""
+        await self.ensure_table(db)
+        intake_id = uuid4()
+        result = await db.execute(
+            text(
+                """
+                INSERT INTO whatsapp_webhook_intake (
+                    id, event, instance_name, conversation_key, message_id,
+                    payload, status, attempts, received_at, available_at, updated_at
+                ) VALUES (
+                    :id, :event, :instance_name, :conversation_key, :message_id,
+                    CAST(:payload AS JSONB), 'pending', 0, NOW(), NOW(), NOW()
+                )
+                ON CONFLICT (instance_name, message_id) WHERE message_id IS NOT NULL
+                DO NOTHING
+                RETURNING id
+                """
+            ),
+            {
+                "id": str(intake_id),
+                "event": str(keys.get("event") or "")[:60],
+                "instance_name": keys.get("instance_name"),
+                "conversation_key": self._conversation_key(keys),
+                "message_id": keys.get("message_id"),
+                "payload": json.dumps(data, ensure_ascii=False, default=str),
+            },
+        )
+        inserted = result.scalar_one_or_none() is not None
+        await db.commit()
+        if inserted:
+            self._counters["enqueued"] += 1
+            self._wake.set()
+        else:
+            self._counters["duplicates"] += 1
+        return {"queued": inserted, "duplicate": not inserted, "id": str(intake_id) if inserted else None}
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop.clear()
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.ensure_table(db)
+                await self._requeue_stale(db)
+                await db.commit()
+        except Exception:
+            logging.exception("Falha ao preparar fila de webhook; consumidores seguem em modo retry.")
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._dispatcher = None
+        if self._in_flight:
+            # Itens interrompidos ficam em "processing" e voltam via _requeue_stale.
+            await asyncio.wait(set(self._in_flight), timeout=drain_timeout)
+
+    async def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            idle_seconds = self.poll_seconds
+            try:
+                free_slots = self.concurrency - len(self._in_flight)
+                if free_slots > 0:
+                    claimed = await self._claim_batch(free_slots)
+                    for row in claimed:
+                        task = asyncio.create_task(self._run_item(row))
+                        self._in_flight.add(task)
+                        task.add_done_callback(self._on_item_done)
+                await self._maybe_housekeeping()
+            except Exception:
+                logging.exception("Erro no despachante da fila de webhook.")
+                # Banco indisponivel: recua para nao inundar o log a cada poll.
+                idle_seconds = max(self.poll_seconds, 15.0)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=idle_seconds)
+            except asyncio.TimeoutError:
+                continue
+
+    def _on_item_done(self, task: asyncio.Task) -> None:
+        self._in_flight.discard(task)
+        self._wake.set()
+
+    async def _claim_batch(self, limit: int) -> List[Dict[str, Any]]:
+        """Reserva o evento mais antigo de cada conversa sem outro em andamento."""
+        async with AsyncSessionLocal() as db:
+            await self.ensure_table(db)
+            result = await db.execute(
+                text(
+                    """
+                    WITH heads AS (
+                        SELECT DISTINCT ON (conversation_key)
+                               id, conversation_key, received_at, available_at
+                        FROM whatsapp_webhook_intake
+                        WHERE status = 'pending'
+                        ORDER BY conversation_key, received_at ASC
+                    ),
+                    ready AS (
+                        SELECT h.id
+                        FROM heads h
+                        WHERE h.available_at <= NOW()
+                          AND NOT EXISTS (
+                              SELECT 1
+                              FROM whatsapp_webhook_intake p
+                              WHERE p.conversation_key = h.conversation_key
+                                AND p.status = 'processing'
+                          )
+                        ORDER BY h.received_at ASC
+                        LIMIT :limit
+                    )
+                    UPDATE whatsapp_webhook_intake w
+                    SET status = 'processing',
+                        attempts = w.attempts + 1,
+                        started_at = NOW(),
+                        updated_at = NOW()
+                    FROM ready
+                    WHERE w.id = ready.id AND w.status = 'pending'
+                    RETURNING w.id, w.conversation_key, w.payload, w.attempts, w.received_at
+                    """
+                ),
+                {"limit": max(1, int(limit))},
+            )
+            rows = [dict(row._mapping) for row in result.fetchall()]
+            await db.commit()
+        return rows
+
+    @staticmethod
+    def _decode_payload(raw: Any) -> Dict[str, Any]:
+        if isinstance(raw, dict):
+            return raw
+        if isinstance(raw, str):
+            try:
+                parsed = json.loads(raw)
+            except Exception:
+                return {}
+            return parsed if isinstance(parsed, dict) else {}
+        return {}
+
+    async def _run_item(self, row: Dict[str, Any]) -> None:
+        intake_id = str(row.get("id"))
+        attempts = int(row.get("attempts") or 1)
+        received_at = row.get("received_at")
+        if isinstance(received_at, datetime):
+            dt = received_at if received_at.tzinfo else received_at.replace(tzinfo=timezone.utc)
+            wait_ms = max(0.0, (datetime.now(timezone.utc) - dt).total_seconds() * 1000.0)
+            self._record_stage("queue_wait", wait_ms)
+
+        payload = self._decode_payload(row.get("payload"))
+        ok = False
+        error: Optional[str] = None
+        started = time.perf_counter()
+        with collect_webhook_stages() as timings:
+            try:
+                async with AsyncSessionLocal() as db:
+                    ok = await webhook_service.processar_webhook(payload, db)
+            except Exception as exc:
+                ok = False
+                error = str(exc)[:1000]
+                logging.exception("Erro ao consumir evento da fila de webhook. id=%s", intake_id)
+        timings["total"] = (time.perf_counter() - started) * 1000.0
+        for stage, elapsed_ms in timings.items():
+            self._record_stage(stage, elapsed_ms)
+
+        try:
+            await self._finish_item(
+                intake_id=intake_id,
+                ok=ok,
+                attempts=attempts,
+                error=error or (None if ok else "processar_webhook retornou False"),
+                timings=timings,
+            )
+        except Exception:
+            logging.exception("Falha ao finalizar item da fila de webhook. id=%s", intake_id)
+
+    async def _finish_item(
+        self,
+        intake_id: str,
+        ok: bool,
+        attempts: int,
+        error: Optional[str],
+        timings: Dict[str, float],
+    ) -> None:
+        timings_json = json.dumps({key: round(value, 2) for key, value in timings.items()})
+        async with AsyncSessionLocal() as db:
+            if ok:
+                self._counters["processed"] += 1
+                await db.execute(
+                    text(
+                        """
+                        UPDATE whatsapp_webhook_intake
+                        SET status = 'done',
+                            finished_at = NOW(),
+                            updated_at = NOW(),
+                            last_error = NULL,
+                            stage_timings = CAST(:timings AS JSONB)
+                        WHERE id = :id
+                        """
+                    ),
+                    {"id": intake_id, "timings": timings_json},
+                )
+            elif attempts < self.max_attempts:
+                self._counters["retried"] += 1
+                backoff_seconds = min(300, 5 * (2 ** (attempts - 1)))
+                await db.execute(
+                    text(
+                        """
+                        UPDATE whatsapp_webhook_intake
+                        SET status = 'pending',
+                            available_at = NOW() + make_interval(secs => :backoff),
+                            updated_at = NOW(),
+                            last_error = :last_error,
+                            stage_timings = CAST(:timings AS JSONB)
+                        WHERE id = :id
+                        """
+                    ),
+                    {
+                        "id": intake_id,
+                        "backoff": backoff_seconds,
+                        "last_error": error,
+                        "timings": timings_json,
+                    },
+                )
+            else:
+                self._counters["failed"] += 1
+                await db.execute(
+                    text(
+                        """
+                        UPDATE whatsapp_webhook_intake
+                        SET status = 'failed',
+                            finished_at = NOW(),
+                            updated_at = NOW(),
+                            last_error = :last_error,
+                            stage_timings = CAST(:timings AS JSONB)
+                        WHERE id = :id
+                        """
+                    ),
+                    {"id": intake_id, "last_error": error, "timings": timings_json},
+                )
+            await db.commit()
+
+    async def _requeue_stale(self, db: AsyncSession) -> int:
+        """Devolve para a fila itens presos em processing (worker reiniciado/caido)."""
+        result = await db.execute(
+            text(
+                """
+                UPDATE whatsapp_webhook_intake
+                SET status = 'pending',
+                    available_at = NOW(),
+                    updated_at = NOW(),
+                    last_error = COALESCE(last_error, 'stale_processing_requeued')
+                WHERE status = 'processing'
+                  AND started_at < NOW() - make_interval(secs => :stale)
+                """
+            ),
+            {"stale": self.stale_seconds},
+        )
+        return int(result.rowcount or 0)
+
+    async def _maybe_housekeeping(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge_at < 600:
+            return
+        self._last_purge_at = now
+        async with AsyncSessionLocal() as db:
+            await self._requeue_stale(db)
+            await db.execute(
+                text(
+                    """
+                    DELETE FROM whatsapp_webhook_intake
+                    WHERE status = 'done'
+                      AND finished_at < NOW() - make_interval(hours => :hours)
+                    """
+                ),
+                {"hours": self.retention_hours},
+            )
+            await db.commit()
+
+    def _record_stage(self, stage: str, elapsed_ms: float) -> None:
+        samples = self._stage_samples.get(stage)
+        if samples is None:
+            samples = deque(maxlen=self.STAGE_WINDOW)
+            self._stage_samples[stage] = samples
+        samples.append(float(elapsed_ms))
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], pct: float) -> float:
+        if not sorted_values:
+            return 0.0
+        index = min(len(sorted_values) - 1, max(0, int(round(pct * (len(sorted_values) - 1)))))
+        return sorted_values[index]
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        stats: Dict[str, Dict[str, float]] = {}
+        for stage, samples in self._stage_samples.items():
+            values = sorted(samples)
+            if not values:
+                continue
+            stats[stage] = {
+                "count": len(values),
+                "avg_ms": round(sum(values) / len(values), 2),
+                "p50_ms": round(self._percentile(values, 0.50), 2),
+                "p95_ms": round(self._percentile(values, 0.95), 2),
+                "max_ms": round(values[-1], 2),
+            }
+        return stats
+
+    async def get_status(self, db: AsyncSession) -> Dict[str, Any]:
+        await self.ensure_table(db)
+        result = await db.execute(
+            text(
+                """
+                SELECT status, COUNT(*) AS total
+                FROM whatsapp_webhook_intake
+                GROUP BY status
+                """
+            )
+        )
+        depth = {str(row.status): int(row.total or 0) for row in result.fetchall()}
+        lag_row = await db.execute(
+            text(
+                """
+                SELECT EXTRACT(EPOCH FROM (NOW() - MIN(received_at))) AS lag_seconds
+                FROM whatsapp_webhook_intake
+                WHERE status IN ('pending', 'processing')
+                """
+            )
+        )
+        lag_seconds = lag_row.scalar()
+        return {
+            "enabled": bool(settings.WEBHOOK_QUEUE_ENABLED),
+            "running": self.is_running,
+            "concurrency": self.concurrency,
+            "in_flight": len(self._in_flight),
+            "depth": {
+                "pending": depth.get("pending", 0),
+                "processing": depth.get("processing", 0),
+                "failed": depth.get("failed", 0),
+                "done": depth.get("done", 0),
+            },
+            "lag_seconds": round(float(lag_seconds), 3) if lag_seconds is not None else 0.0,
+            "counters": dict(self._counters),
+            "stages": self.stage_stats(),
+        }
+
+
+webhook_queue_service = EvolutionWebhookQueueService()
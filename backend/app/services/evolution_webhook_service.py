@@ -2,14 +2,17 @@
 Servico de Webhook para Evolution API.
 Recebe mensagens do WhatsApp e integra com IA VIVA.
 """
+import asyncio
 import base64
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 import logging
 import re
-from uuid import uuid4
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from sqlalchemy import and_, select
+from sqlalchemy import and_, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.cliente import Cliente
@@ -22,12 +25,58 @@ from app.models.whatsapp_conversa import (
 from app.services.openai_service import openai_service
 from app.services.viva_ia_service import viva_service
 from app.services.viva_model_service import viva_model_service
+from app.services.whatsapp_directory_service import whatsapp_directory_service
+from app.services.whatsapp_lid_binding_service import whatsapp_lid_binding_service
+from app.services.whatsapp_outbound_queue_service import whatsapp_outbound_queue_service
 from app.services.whatsapp_service import WhatsAppService
 
 
+_webhook_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "webhook_stage_timings",
+    default=None,
+)
+
+
+@contextmanager
+def track_webhook_stage(stage: str) -> Iterator[None]:
+    """Acumula a duracao (ms) da etapa quando ha uma coleta ativa no contexto."""
+    timings = _webhook_stage_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        timings[stage] = timings.get(stage, 0.0) + elapsed_ms
+
+
+@contextmanager
+def collect_webhook_stages() -> Iterator[Dict[str, float]]:
+    """Abre uma coleta de tempos por etapa para o evento em processamento."""
+    timings: Dict[str, float] = {}
+    token = _webhook_stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _webhook_stage_timings.reset(token)
+
+
+# Modelo declara JSON e a migration JSONB: o CAST faz json_typeof valer para os dois.
+LEGACY_PENDING_OUTBOUND_FILTER = (
+    "json_typeof(CAST(whatsapp_conversas.contexto_ia AS json) -> 'pending_outbound') = 'array'"
+)
+# Migracao legada que falhou e tentada de novo depois desse intervalo (sem travar a fila).
+LEGACY_OUTBOUND_RETRY_SECONDS = 600.0
+
+
 class EvolutionWebhookService:
     """Processa webhooks recebidos do Evolution Manager."""
 
+    _legacy_outbound_migrated = False
+    _legacy_outbound_retry_at = 0.0
+
     @staticmethod
     def _normalizar_evento(event_type: Any) -> str:
         """Normaliza evento para formato canônico (ex.: messages.upsert)."""
@@ -52,6 +101,7 @@ class EvolutionWebhookService:
         """Processa evento recebido do Evolution API."""
         event_type = data.get("event")
         evento_normalizado = self._normalizar_evento(event_type)
+        self._atualizar_diretorio(evento_normalizado, data)
 
         if evento_normalizado == "messages.upsert":
             return await self._processar_mensagem(data, db)
@@ -61,12 +111,57 @@ class EvolutionWebhookService:
         logging.info("Webhook ignorado: evento=%s", event_type)
         return True
 
+    def _atualizar_diretorio(self, evento: str, data: Dict[str, Any]) -> None:
+        """Propaga o evento para o diretorio em cache de contatos/chats."""
+        if not isinstance(data, dict):
+            return
+        payload_data = data.get("data", {})
+        instance_name = self._extrair_instance_name(
+            instance_data=data.get("instance"),
+            payload_data=payload_data if isinstance(payload_data, dict) else {},
+        )
+        if evento == "messages.upsert" and isinstance(payload_data, dict):
+            message_wrapper = self._extrair_message_wrapper(payload_data)
+            if not message_wrapper:
+                return
+            data = {"data": message_wrapper}
+        whatsapp_directory_service.apply_event(evento, instance_name, data)
+
+    def extract_intake_keys(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extrai chaves baratas do evento para a fila de ingestao (sem I/O)."""
+        event = self._normalizar_evento(data.get("event") if isinstance(data, dict) else None)
+        payload_data = data.get("data", {}) if isinstance(data, dict) else {}
+        if not isinstance(payload_data, dict):
+            payload_data = {}
+        instance_name = self._extrair_instance_name(
+            instance_data=data.get("instance") if isinstance(data, dict) else None,
+            payload_data=payload_data,
+        )
+        keys: Dict[str, Any] = {
+            "event": event,
+            "instance_name": instance_name,
+            "remote_jid": None,
+            "message_id": None,
+            "from_me": False,
+        }
+        if event != "messages.upsert":
+            return keys
+        message_wrapper = self._extrair_message_wrapper(payload_data)
+        if not message_wrapper:
+            return keys
+        key_data = message_wrapper.get("key") if isinstance(message_wrapper.get("key"), dict) else {}
+        keys["remote_jid"] = self._extrair_remote_jid(message_wrapper, payload_data) or None
+        keys["message_id"] = str(key_data.get("id") or "").strip() or None
+        keys["from_me"] = self._is_from_me_message(message_wrapper)
+        return keys
+
     async def _processar_mensagem(
         self,
         data: Dict[str, Any],
         db: AsyncSession,
     ) -> bool:
         """Processa nova mensagem recebida."""
+        resposta_enviada = False
         try:
             payload_data = data.get("data", {})
             instance_name = self._extrair_instance_name(
@@ -102,11 +197,12 @@ class EvolutionWebhookService:
             if self._eh_imagem_mensagem(message_content):
                 tipo_midia = "imagem"
                 legenda = self._extrair_legenda_imagem(message_content)
-                descricao = await self._descrever_imagem_mensagem(
-                    instance_name=instance_name,
-                    message_wrapper=message_wrapper,
-                    message_content=message_content,
-                )
+                with track_webhook_stage("media"):
+                    descricao = await self._descrever_imagem_mensagem(
+                        instance_name=instance_name,
+                        message_wrapper=message_wrapper,
+                        message_content=message_content,
+                    )
                 if not descricao:
                     falha_leitura_imagem = True
                 texto = self._build_image_user_text(
@@ -115,11 +211,12 @@ class EvolutionWebhookService:
                 )
             elif not texto and self._eh_audio_mensagem(message_content):
                 tipo_midia = "audio"
-                texto = await self._transcrever_audio_mensagem(
-                    instance_name=instance_name,
-                    message_wrapper=message_wrapper,
-                    message_content=message_content,
-                )
+                with track_webhook_stage("media"):
+                    texto = await self._transcrever_audio_mensagem(
+                        instance_name=instance_name,
+                        message_wrapper=message_wrapper,
+                        message_content=message_content,
+                    )
                 if not texto:
                     texto = "[audio nao transcrito]"
                     falha_transcricao_audio = True
@@ -133,26 +230,29 @@ class EvolutionWebhookService:
                 nome_contato=push_name,
                 db=db,
             )
+            # A resposta da IA grava o message_id da mensagem que respondeu: so e
+            # duplicata quando ja houve resposta. Mensagem do usuario gravada sem
+            # resposta = tentativa anterior falhou antes do envio; segue sem regravar.
+            mensagem_ja_gravada = False
             if message_id:
                 duplicate_stmt = (
-                    select(WhatsappMensagem.id)
+                    select(WhatsappMensagem.tipo_origem)
                     .where(
                         and_(
                             WhatsappMensagem.conversa_id == conversa.id,
                             WhatsappMensagem.message_id == message_id,
-                            WhatsappMensagem.tipo_origem == TipoOrigem.USUARIO,
                         )
                     )
-                    .limit(1)
                 )
-                duplicate_row = await db.execute(duplicate_stmt)
-                if duplicate_row.scalar_one_or_none() is not None:
+                origens = set((await db.execute(duplicate_stmt)).scalars().all())
+                if TipoOrigem.IA in origens:
                     logging.info(
                         "Webhook ignorado: mensagem inbound duplicada. conversa_id=%s message_id=%s",
                         str(conversa.id),
                         message_id,
                     )
                     return True
+                mensagem_ja_gravada = TipoOrigem.USUARIO in origens
 
             contexto_atual = conversa.contexto_ia if isinstance(conversa.contexto_ia, dict) else {}
             contexto_atual = await self._refresh_lid_resolution_context(
@@ -189,17 +289,18 @@ class EvolutionWebhookService:
                     )
                     return True
 
-            msg_usuario = WhatsappMensagem(
-                conversa_id=conversa.id,
-                tipo_origem=TipoOrigem.USUARIO,
-                conteudo=texto,
-                message_id=message_id,
-                tipo_midia=tipo_midia,
-            )
-            db.add(msg_usuario)
+            if not mensagem_ja_gravada:
+                msg_usuario = WhatsappMensagem(
+                    conversa_id=conversa.id,
+                    tipo_origem=TipoOrigem.USUARIO,
+                    conteudo=texto,
+                    message_id=message_id,
+                    tipo_midia=tipo_midia,
+                )
+                db.add(msg_usuario)
 
-            conversa.ultima_mensagem_em = datetime.utcnow()
-            await db.commit()
+                conversa.ultima_mensagem_em = datetime.utcnow()
+                await db.commit()
 
             if falha_transcricao_audio:
                 resposta_ia = (
@@ -212,12 +313,13 @@ class EvolutionWebhookService:
                     "Me descreve em uma frase o que voce quer resolver com ela que eu te ajudo em seguida."
                 )
             else:
-                resposta_ia = await viva_service.processar_mensagem(
-                    numero=numero,
-                    mensagem=texto,
-                    conversa=conversa,
-                    db=db,
-                )
+                with track_webhook_stage("llm"):
+                    resposta_ia = await viva_service.processar_mensagem(
+                        numero=numero,
+                        mensagem=texto,
+                        conversa=conversa,
+                        db=db,
+                    )
 
             if not isinstance(resposta_ia, str) or not resposta_ia.strip():
                 logging.warning(
@@ -240,13 +342,15 @@ class EvolutionWebhookService:
                 and preferred_number
             ):
                 destino_envio = preferred_number
-            envio_result = await wa_service.send_text(
-                numero=destino_envio,
-                mensagem=resposta_ia,
-                context_push_name=push_name,
-                context_preferred_number=preferred_number,
-            )
+            with track_webhook_stage("send"):
+                envio_result = await wa_service.send_text(
+                    numero=destino_envio,
+                    mensagem=resposta_ia,
+                    context_push_name=push_name,
+                    context_preferred_number=preferred_number,
+                )
             enviado = bool(envio_result.get("sucesso"))
+            resposta_enviada = enviado
             erro_envio = None if enviado else envio_result.get("erro")
             erro_codigo = str(envio_result.get("erro_codigo") or "").strip().lower()
             if enviado:
@@ -262,6 +366,7 @@ class EvolutionWebhookService:
                 conversa_id=conversa.id,
                 tipo_origem=TipoOrigem.IA,
                 conteudo=resposta_ia,
+                message_id=message_id,
                 enviada=enviado,
                 erro=erro_envio,
             )
@@ -273,6 +378,8 @@ class EvolutionWebhookService:
                 and "\"exists\":false" in str(erro_envio).replace(" ", "").lower()
                 and "@lid" not in destino_utilizado.lower()
             ):
+                if whatsapp_lid_binding_service.is_lid(remote_jid):
+                    await whatsapp_lid_binding_service.invalidate(conversa.instance_name, remote_jid)
                 contexto = dict(conversa.contexto_ia or {})
                 contexto["non_deliverable_number"] = True
                 contexto["non_deliverable_reason"] = "exists_false"
@@ -313,6 +420,14 @@ class EvolutionWebhookService:
 
             return True
         except Exception as e:
+            if resposta_enviada:
+                # Cliente ja recebeu a resposta: reprocessar repetiria LLM e envio.
+                logging.exception(
+                    "Falha apos enviar resposta do webhook; evento nao sera reprocessado: %s",
+                    str(e),
+                )
+                await db.rollback()
+                return True
             logging.exception("Erro ao processar mensagem webhook: %s", str(e))
             return False
 
@@ -617,6 +732,10 @@ class EvolutionWebhookService:
 
         contexto = dict(contexto_atual or {})
         changed = False
+        if contexto.get("lid_jid") != remote_jid:
+            # Guarda o JID @lid original para o bind manual gravar o vinculo persistente.
+            contexto["lid_jid"] = remote_jid
+            changed = True
         existing_resolved = self._normalize_digits(str(contexto.get("resolved_whatsapp_number") or ""))
         existing_source = str(contexto.get("resolved_whatsapp_source") or "").strip().lower()
 
@@ -661,6 +780,22 @@ class EvolutionWebhookService:
             contexto["resolved_whatsapp_source"] = "event_sender"
             changed = True
 
+        resolved_source = str(contexto.get("resolved_whatsapp_source") or "")
+        if changed and resolved_source in {"lid_meta", "event_sender"}:
+            # Evidencia vinda do proprio WhatsApp: persiste o vinculo para o caminho de envio.
+            await whatsapp_lid_binding_service.bind(
+                conversa.instance_name,
+                remote_jid,
+                str(contexto.get("resolved_whatsapp_number") or ""),
+                source=resolved_source,
+            )
+        if not contexto.get("resolved_whatsapp_number"):
+            binding = await whatsapp_lid_binding_service.get_binding(conversa.instance_name, remote_jid)
+            if binding and binding["confidence"] >= whatsapp_lid_binding_service.min_webhook_confidence:
+                contexto["resolved_whatsapp_number"] = binding["numero"]
+                contexto["resolved_whatsapp_source"] = "lid_binding"
+                changed = True
+
         # Para @lid, evitar inferir telefone por lead interno/cadastro de cliente.
         # Esse atalho pode enviar para numero antigo/incorreto e perder o lead real.
         # Mantemos apenas fontes explicitas: texto do proprio cliente e metadados do evento.
@@ -973,97 +1108,190 @@ class EvolutionWebhookService:
         push_name: Optional[str],
         erro: Optional[str],
     ) -> None:
-        contexto = dict(conversa.contexto_ia or {})
-        queue = list(contexto.get("pending_outbound") or [])
-        queue.append(
-            {
-                "id": str(uuid4()),
-                "conteudo": str(conteudo or "").strip(),
-                "remote_jid": str(remote_jid or "").strip(),
-                "push_name": str(push_name or "").strip() or None,
-                "created_at": datetime.utcnow().isoformat(),
-                "attempts": 0,
-                "last_error": str(erro or "").strip() or None,
-                "last_attempt_at": None,
-            }
+        await whatsapp_outbound_queue_service.enqueue(
+            db,
+            conversa_id=conversa.id,
+            conteudo=conteudo,
+            remote_jid=remote_jid,
+            push_name=push_name,
+            instance_name=getattr(conversa, "instance_name", None),
+            erro=erro,
         )
-        contexto["pending_outbound"] = queue[-20:]
+        await db.commit()
+
+    async def _migrate_legacy_pending_outbound(self, db: AsyncSession, conversa: WhatsappConversa) -> int:
+        """Move itens antigos de `contexto_ia.pending_outbound` para a fila persistente."""
+        contexto = dict(conversa.contexto_ia or {})
+        legacy = contexto.pop("pending_outbound", None)
+        if legacy is None:
+            return 0
+        moved = 0
+        for item in list(legacy or []):
+            if not isinstance(item, dict):
+                continue
+            attempts = int(item.get("attempts") or 0)
+            if attempts >= whatsapp_outbound_queue_service.max_attempts:
+                continue
+            created_at = None
+            if isinstance(item.get("created_at"), str):
+                try:
+                    created_at = datetime.fromisoformat(item["created_at"])
+                except ValueError:
+                    created_at = None
+            item_id = await whatsapp_outbound_queue_service.enqueue(
+                db,
+                conversa_id=conversa.id,
+                conteudo=str(item.get("conteudo") or ""),
+                remote_jid=item.get("remote_jid"),
+                push_name=item.get("push_name"),
+                instance_name=getattr(conversa, "instance_name", None),
+                erro=item.get("last_error"),
+                attempts=attempts,
+                created_at=created_at,
+            )
+            if item_id:
+                moved += 1
         conversa.contexto_ia = contexto
         await db.commit()
+        return moved
+
+    async def migrate_legacy_pending_outbound(self, db: AsyncSession, batch_size: int = 200) -> int:
+        """Migracao unica das filas legadas em JSON (conversas ativas ou nao)."""
+        moved = 0
+        while True:
+            stmt = (
+                select(WhatsappConversa)
+                .where(text(LEGACY_PENDING_OUTBOUND_FILTER))
+                .limit(max(1, batch_size))
+            )
+            rows = (await db.execute(stmt)).scalars().all()
+            if not rows:
+                return moved
+            for conversa in rows:
+                moved += await self._migrate_legacy_pending_outbound(db, conversa)
 
-    async def _flush_pending_outbound_for_conversation(
+    async def _deliver_outbound_rows(
         self,
         db: AsyncSession,
-        conversa: WhatsappConversa,
-        push_name: Optional[str],
-        remote_jid: Optional[str],
+        rows: List[Dict[str, Any]],
+        conversas: Dict[Any, WhatsappConversa],
+        push_name: Optional[str] = None,
+        remote_jid: Optional[str] = None,
     ) -> int:
-        contexto = dict(conversa.contexto_ia or {})
-        queue = list(contexto.get("pending_outbound") or [])
-        if not queue:
-            return 0
-
+        """Envia itens reservados: sequencial por conversa, conversas em paralelo (limitado)."""
         wa_service = WhatsAppService()
-        preferred = self._pick_preferred_number_from_context(contexto)
-        kept = []
+        semaphore = asyncio.Semaphore(whatsapp_outbound_queue_service.concurrency)
+        by_conversa: Dict[Any, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_conversa.setdefault(row["conversa_id"], []).append(row)
+
+        async def _send_group(conversa_id: Any, items: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+            conversa = conversas.get(conversa_id)
+            contexto = dict(getattr(conversa, "contexto_ia", None) or {})
+            preferred = self._pick_preferred_number_from_context(contexto)
+            results: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+            async with semaphore:
+                for item in items:
+                    destino = (
+                        str(item.get("remote_jid") or "").strip()
+                        or str(remote_jid or "").strip()
+                        or str(getattr(conversa, "numero_telefone", "") or "").strip()
+                    )
+                    nome = str(item.get("push_name") or "").strip() or push_name or getattr(conversa, "nome_contato", None)
+                    if destino.lower().endswith("@lid") and preferred:
+                        destino = preferred
+                    try:
+                        result = await wa_service.send_text(
+                            numero=destino,
+                            mensagem=str(item.get("conteudo") or ""),
+                            context_push_name=nome,
+                            context_preferred_number=preferred,
+                        )
+                    except Exception as exc:
+                        result = {"sucesso": False, "erro": str(exc)}
+                    results.append((item, result))
+            return results
+
+        grouped = await asyncio.gather(*[_send_group(key, items) for key, items in by_conversa.items()])
+
         sent_count = 0
-        for item in queue:
-            attempts = int(item.get("attempts") or 0)
-            if attempts >= 6:
+        delivered_conversas = set()
+        for results in grouped:
+            for item, result in results:
+                if bool(result.get("sucesso")):
+                    await whatsapp_outbound_queue_service.mark_sent(db, item["id"])
+                    sent_count += 1
+                    delivered_conversas.add(item["conversa_id"])
+                    continue
+                await whatsapp_outbound_queue_service.mark_failed(
+                    db,
+                    item["id"],
+                    attempts=int(item.get("attempts") or 0),
+                    erro=str(result.get("erro") or "falha envio"),
+                )
+        await db.commit()
+
+        for conversa_id in delivered_conversas:
+            conversa = conversas.get(conversa_id)
+            if conversa is None:
                 continue
-            conteudo = str(item.get("conteudo") or "").strip()
-            if not conteudo:
+            contexto = dict(conversa.contexto_ia or {})
+            if not contexto.get("needs_manual_bind"):
                 continue
-            destino = str(item.get("remote_jid") or "").strip() or str(remote_jid or "").strip()
-            nome = str(item.get("push_name") or "").strip() or push_name
-            if isinstance(destino, str) and destino.lower().endswith("@lid") and preferred:
-                destino = preferred
-            result = await wa_service.send_text(
-                numero=destino,
-                mensagem=conteudo,
-                context_push_name=nome,
-                context_preferred_number=preferred,
-            )
-            if bool(result.get("sucesso")):
-                sent_count += 1
+            if await whatsapp_outbound_queue_service.count_pending(db, conversa_id) > 0:
                 continue
-            item["attempts"] = attempts + 1
-            item["last_error"] = str(result.get("erro") or "falha envio")
-            item["last_attempt_at"] = datetime.utcnow().isoformat()
-            kept.append(item)
-
-        contexto["pending_outbound"] = kept
-        if sent_count > 0 and contexto.get("needs_manual_bind") and not kept:
             contexto["needs_manual_bind"] = False
             contexto.pop("manual_bind_reason", None)
             contexto.pop("manual_bind_last_error", None)
             contexto["manual_bind_cleared_at"] = datetime.utcnow().isoformat()
-        conversa.contexto_ia = contexto
-        await db.commit()
+            conversa.contexto_ia = contexto
+        if delivered_conversas:
+            await db.commit()
         return sent_count
 
-    async def process_pending_outbound(self, db: AsyncSession, limit: int = 30) -> Dict[str, int]:
-        stmt = (
-            select(WhatsappConversa)
-            .where(WhatsappConversa.status == StatusConversa.ATIVA)
-            .order_by(WhatsappConversa.updated_at.desc())
-            .limit(max(1, min(limit, 200)))
+    async def _flush_pending_outbound_for_conversation(
+        self,
+        db: AsyncSession,
+        conversa: WhatsappConversa,
+        push_name: Optional[str],
+        remote_jid: Optional[str],
+    ) -> int:
+        await self._migrate_legacy_pending_outbound(db, conversa)
+        # Nova entrada/bind manual e evidencia nova: tenta ja, sem esperar o backoff.
+        rows = await whatsapp_outbound_queue_service.claim(
+            db,
+            limit=20,
+            conversa_id=conversa.id,
+            due_only=False,
         )
-        rows = (await db.execute(stmt)).scalars().all()
-        processed = 0
-        sent = 0
-        for conversa in rows:
-            contexto = dict(conversa.contexto_ia or {})
-            if not list(contexto.get("pending_outbound") or []):
-                continue
-            processed += 1
-            sent += await self._flush_pending_outbound_for_conversation(
-                db=db,
-                conversa=conversa,
-                push_name=conversa.nome_contato,
-                remote_jid=conversa.numero_telefone,
-            )
-        return {"processed": processed, "sent": sent}
+        if not rows:
+            return 0
+        return await self._deliver_outbound_rows(
+            db,
+            rows,
+            conversas={conversa.id: conversa},
+            push_name=push_name,
+            remote_jid=remote_jid,
+        )
+
+    async def process_pending_outbound(self, db: AsyncSession, limit: int = 30) -> Dict[str, int]:
+        if not self._legacy_outbound_migrated and time.monotonic() >= self._legacy_outbound_retry_at:
+            try:
+                await self.migrate_legacy_pending_outbound(db)
+                self._legacy_outbound_migrated = True
+            except Exception:
+                logging.exception("Falha na migracao da fila outbound legada; seguindo com a fila duravel.")
+                self._legacy_outbound_retry_at = time.monotonic() + LEGACY_OUTBOUND_RETRY_SECONDS
+                await db.rollback()
+        await whatsapp_outbound_queue_service.release_stale(db)
+        rows = await whatsapp_outbound_queue_service.claim(db, limit=max(1, min(limit, 200)))
+        if not rows:
+            return {"processed": 0, "sent": 0}
+        conversa_ids = list({row["conversa_id"] for row in rows})
+        stmt = select(WhatsappConversa).where(WhatsappConversa.id.in_(conversa_ids))
+        conversas = {item.id: item for item in (await db.execute(stmt)).scalars().all()}
+        sent = await self._deliver_outbound_rows(db, rows, conversas=conversas)
+        return {"processed": len(rows), "sent": sent}
 
 
 webhook_service = EvolutionWebhookService()
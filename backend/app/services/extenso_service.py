@@ -1,7 +1,71 @@
-"""Extenso service - Converte valores para extenso em português."""
+"""Extenso service - Converte valores para extenso em português.
+
+As conversoes sao memoizadas (LRU de `EXTENSO_CACHE_SIZE` entradas): valores
+e quantidades de parcelas se repetem muito entre contratos, importacoes e
+backfills. As APIs em lote deduplicam a entrada e convertem cada valor unico
+uma vez. Benchmark: `python backend/scripts/bench_extenso.py`.
+"""
 from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
 from num2words import num2words
 
+from app.config import settings
+
+
+_CACHE_SIZE = max(0, int(settings.EXTENSO_CACHE_SIZE))
+
+
+def _split_valor(valor: Decimal | float | str) -> Tuple[int, int]:
+    if isinstance(valor, str):
+        valor = Decimal(valor.replace(',', '.'))
+    elif not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+
+    # Separate reais and centavos
+    reais = int(valor)
+    centavos = int((valor - reais) * 100)
+    return reais, centavos
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _numero_words(numero: int) -> str:
+    return num2words(numero, lang='pt_BR')
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _valor_words(reais: int, centavos: int) -> str:
+    parts = []
+
+    # Convert reais
+    if reais > 0:
+        reais_text = _numero_words(reais)
+        reais_text = reais_text.replace(' e ', ' ')
+
+        # Plural/singular
+        if reais == 1:
+            parts.append(f"{reais_text} real")
+        else:
+            parts.append(f"{reais_text} reais")
+
+    # Convert centavos
+    if centavos > 0:
+        centavos_text = _numero_words(centavos)
+
+        if centavos == 1:
+            parts.append(f"{centavos_text} centavo")
+        else:
+            parts.append(f"{centavos_text} centavos")
+
+    # Join with " e "
+    if len(parts) == 2:
+        return f"{parts[0]} e {parts[1]}"
+    elif len(parts) == 1:
+        return parts[0]
+    else:
+        return "zero reais"
+
 
 class ExtensoService:
     """Service for converting numbers to words in Portuguese."""
@@ -25,44 +89,7 @@ class ExtensoService:
             >>> ExtensoService.valor_por_extenso(Decimal("0.50"))
             'cinquenta centavos'
         """
-        if isinstance(valor, str):
-            valor = Decimal(valor.replace(',', '.'))
-        elif not isinstance(valor, Decimal):
-            valor = Decimal(str(valor))
-        
-        # Separate reais and centavos
-        reais = int(valor)
-        centavos = int((valor - reais) * 100)
-        
-        parts = []
-        
-        # Convert reais
-        if reais > 0:
-            reais_text = num2words(reais, lang='pt_BR')
-            reais_text = reais_text.replace(' e ', ' ')
-            
-            # Plural/singular
-            if reais == 1:
-                parts.append(f"{reais_text} real")
-            else:
-                parts.append(f"{reais_text} reais")
-        
-        # Convert centavos
-        if centavos > 0:
-            centavos_text = num2words(centavos, lang='pt_BR')
-            
-            if centavos == 1:
-                parts.append(f"{centavos_text} centavo")
-            else:
-                parts.append(f"{centavos_text} centavos")
-        
-        # Join with " e "
-        if len(parts) == 2:
-            return f"{parts[0]} e {parts[1]}"
-        elif len(parts) == 1:
-            return parts[0]
-        else:
-            return "zero reais"
+        return _valor_words(*_split_valor(valor))
     
     @staticmethod
     def numero_por_extenso(numero: int) -> str:
@@ -79,8 +106,42 @@ class ExtensoService:
             >>> ExtensoService.numero_por_extenso(45)
             'quarenta e cinco'
         """
+        if isinstance(numero, int):
+            return _numero_words(numero)
         return num2words(numero, lang='pt_BR')
     
+    @staticmethod
+    def valores_por_extenso(valores: Iterable[Decimal | float | str]) -> List[str]:
+        """
+        Convert many monetary values at once (same output as `valor_por_extenso`).
+        
+        Values are normalized to (reais, centavos) and each distinct pair is
+        converted only once per call.
+        """
+        keys = [_split_valor(valor) for valor in valores]
+        unique: Dict[Tuple[int, int], str] = {key: _valor_words(*key) for key in set(keys)}
+        return [unique[key] for key in keys]
+    
+    @staticmethod
+    def numeros_por_extenso(numeros: Iterable[int]) -> List[str]:
+        """Convert many integers at once (same output as `numero_por_extenso`)."""
+        keys = list(numeros)
+        unique: Dict[int, str] = {key: ExtensoService.numero_por_extenso(key) for key in set(keys)}
+        return [unique[key] for key in keys]
+    
+    @staticmethod
+    def cache_info() -> Dict[str, Dict[str, int]]:
+        """LRU statistics for the memoized conversions."""
+        return {
+            name: cached.cache_info()._asdict()
+            for name, cached in (("valor", _valor_words), ("numero", _numero_words))
+        }
+    
+    @staticmethod
+    def cache_clear() -> None:
+        _valor_words.cache_clear()
+        _numero_words.cache_clear()
+    
     @staticmethod
     def calcular_valor_parcela(valor_total: Decimal, valor_entrada: Decimal, qtd_parcelas: int) -> Decimal:
         """
@@ -12,11 +12,11 @@ from typing import Any, Dict, Optional
 from urllib.parse import urlencode, quote
 from uuid import UUID
 
-import httpx
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.services.http_client_service import http_client_service
 
 
 class GoogleCalendarService:
@@ -140,34 +140,36 @@ class GoogleCalendarService:
         return f"{self._auth_base_url}?{urlencode(params)}"
 
     async def _exchange_code(self, code: str) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self._token_url,
-                data={
-                    "code": code,
-                    "client_id": self._calendar_client_id(),
-                    "client_secret": self._calendar_client_secret(),
-                    "redirect_uri": settings.GOOGLE_REDIRECT_URI,
-                    "grant_type": "authorization_code",
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
+        client = http_client_service.get_client("google")
+        response = await client.post(
+            self._token_url,
+            data={
+                "code": code,
+                "client_id": self._calendar_client_id(),
+                "client_secret": self._calendar_client_secret(),
+                "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+                "grant_type": "authorization_code",
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=30.0,
+        )
         if response.status_code != 200:
             raise ValueError(f"Falha token Google ({response.status_code}): {response.text[:250]}")
         return response.json()
 
     async def _refresh_token(self, refresh_token: str) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self._token_url,
-                data={
-                    "refresh_token": refresh_token,
-                    "client_id": self._calendar_client_id(),
-                    "client_secret": self._calendar_client_secret(),
-                    "grant_type": "refresh_token",
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
+        client = http_client_service.get_client("google")
+        response = await client.post(
+            self._token_url,
+            data={
+                "refresh_token": refresh_token,
+                "client_id": self._calendar_client_id(),
+                "client_secret": self._calendar_client_secret(),
+                "grant_type": "refresh_token",
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=30.0,
+        )
         if response.status_code != 200:
             raise ValueError(f"Falha refresh Google ({response.status_code}): {response.text[:250]}")
         return response.json()
@@ -330,8 +332,14 @@ class GoogleCalendarService:
     ) -> Dict[str, Any]:
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         url = f"{self._api_base}{path}"
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.request(method=method, url=url, headers=headers, json=json_payload)
+        client = http_client_service.get_client("google")
+        response = await client.request(
+            method=method,
+            url=url,
+            headers=headers,
+            json=json_payload,
+            timeout=30.0,
+        )
         if response.status_code in (200, 201):
             if response.text.strip():
                 return response.json()
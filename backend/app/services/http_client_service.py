@@ -0,0 +1,142 @@
+"""
+Pool compartilhado de clientes HTTP (httpx) por processo.
+
+Cada integracao externa (OpenAI, MiniMax, Google) usa um cliente nomeado de
+vida longa, com keep-alive e limites de conexao configuraveis, em vez de abrir
+um `httpx.AsyncClient` novo (TCP+TLS) a cada chamada.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+class _TracedTransport(httpx.AsyncHTTPTransport):
+    """Transport que conta requisicoes e conexoes novas via trace do httpcore."""
+
+    def __init__(self, stats: Dict[str, int], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["connections_opened"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self._stats["tls_handshakes"] += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats["requests"] += 1
+        request.extensions = {**request.extensions, "trace": self._trace}
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+
+
+class HttpClientService:
+    """Registro de clientes httpx nomeados, abertos/fechados pelo lifespan."""
+
+    def __init__(self) -> None:
+        self.max_connections = max(1, int(settings.HTTP_POOL_MAX_CONNECTIONS))
+        self.max_keepalive = max(0, int(settings.HTTP_POOL_MAX_KEEPALIVE))
+        self.keepalive_expiry = float(settings.HTTP_POOL_KEEPALIVE_EXPIRY)
+        self.default_timeout = float(settings.HTTP_POOL_DEFAULT_TIMEOUT)
+        self.http2_requested = bool(settings.HTTP_POOL_HTTP2)
+        self.http2 = self.http2_requested and _http2_available()
+        if self.http2_requested and not self.http2:
+            logging.warning("HTTP_POOL_HTTP2 ativo mas pacote 'h2' ausente; usando HTTP/1.1.")
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._client_loops: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _new_stats(self) -> Dict[str, int]:
+        return {"requests": 0, "connections_opened": 0, "tls_handshakes": 0, "errors": 0}
+
+    def get_client(self, name: str = "default") -> httpx.AsyncClient:
+        """Retorna (criando sob demanda) o cliente compartilhado para `name`."""
+        loop_id = self._current_loop_id()
+        client = self._clients.get(name)
+        if client is not None and not client.is_closed and self._client_loops.get(name) == loop_id:
+            return client
+
+        stats = self._stats.setdefault(name, self._new_stats())
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        transport = _TracedTransport(stats, limits=limits, http2=self.http2)
+        client = httpx.AsyncClient(
+            transport=transport,
+            timeout=self.default_timeout,
+            http2=self.http2,
+        )
+        self._clients[name] = client
+        self._client_loops[name] = loop_id
+        return client
+
+    @staticmethod
+    def _current_loop_id() -> int:
+        # Conexoes ficam presas ao event loop que as abriu (scripts/testes usam varios loops).
+        try:
+            return id(asyncio.get_running_loop())
+        except RuntimeError:
+            return 0
+
+    async def startup(self) -> None:
+        for name in ("openai", "minimax", "google"):
+            self.get_client(name)
+
+    async def shutdown(self) -> None:
+        clients = list(self._clients.values())
+        self._clients = {}
+        self._client_loops = {}
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception:
+                continue
+
+    def get_stats(self, name: Optional[str] = None) -> Dict[str, Any]:
+        names = [name] if name else sorted(self._stats)
+        pools: Dict[str, Any] = {}
+        for item in names:
+            stats = dict(self._stats.get(item) or self._new_stats())
+            requests = stats["requests"]
+            opened = stats["connections_opened"]
+            reused = max(0, requests - opened)
+            client = self._clients.get(item)
+            pools[item] = {
+                **stats,
+                "reused_requests": reused,
+                "reuse_ratio": round(reused / requests, 4) if requests else 0.0,
+                "open": bool(client is not None and not client.is_closed),
+            }
+        payload: Dict[str, Any] = {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive,
+            "keepalive_expiry": self.keepalive_expiry,
+        }
+        if name:
+            payload.update(pools.get(name) or {})
+            return payload
+        payload["pools"] = pools
+        return payload
+
+
+http_client_service = HttpClientService()
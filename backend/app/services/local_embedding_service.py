@@ -0,0 +1,128 @@
+"""
+Embedder local deterministico (hash de tokens) usado quando a OpenAI nao esta disponivel.
+
+Mesmo algoritmo do fallback original (indice/sinal/peso por sha256 do token +
+ancora do texto inteiro), com saida float32 e modo em lote. Usa NumPy (esta no
+requirements.txt); em ambiente sem NumPy acumula de forma esparsa e monta um
+`array('f')`, evitando laco sobre as 1536 posicoes.
+"""
+from __future__ import annotations
+
+from array import array
+from functools import lru_cache
+import hashlib
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - depende do ambiente
+    np = None
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ANCHOR_WEIGHT = 0.35
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+@lru_cache(maxsize=65536)
+def _token_slot(token: str, dim: int) -> Tuple[int, float]:
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    idx = int.from_bytes(digest[:4], "big") % dim
+    sign = -1.0 if (digest[4] & 1) else 1.0
+    weight = 1.0 + (float(digest[5]) / 255.0) * 0.5
+    return idx, sign * weight
+
+
+def _anchor_slots(clean: str, dim: int) -> List[Tuple[int, float]]:
+    full_digest = hashlib.sha256(clean.encode("utf-8")).digest()
+    slots = []
+    for offset in range(0, 16, 4):
+        idx = int.from_bytes(full_digest[offset:offset + 4], "big") % dim
+        sign = -1.0 if (full_digest[(offset + 4) % len(full_digest)] & 1) else 1.0
+        slots.append((idx, sign * _ANCHOR_WEIGHT))
+    return slots
+
+
+def _sparse_slots(text: str, dim: int) -> Optional[Dict[int, float]]:
+    clean = str(text or "").strip().lower()
+    if not clean:
+        return None
+    tokens = _TOKEN_RE.findall(clean) or [clean]
+    slots: Dict[int, float] = {}
+    for token in tokens:
+        idx, value = _token_slot(token, dim)
+        slots[idx] = slots.get(idx, 0.0) + value
+    # Ancora do texto inteiro reduz colisao em frases curtas.
+    for idx, value in _anchor_slots(clean, dim):
+        slots[idx] = slots.get(idx, 0.0) + value
+    return slots
+
+
+class LocalEmbeddingService:
+    def __init__(self, dim: int = 1536) -> None:
+        self.dim = int(dim)
+
+    @property
+    def backend(self) -> str:
+        return "numpy" if np is not None else "python"
+
+    def embed(self, text: str) -> Optional[Sequence[float]]:
+        """Vetor float32 normalizado (ndarray com NumPy, `array('f')` sem)."""
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: Sequence[str]) -> List[Optional[Sequence[float]]]:
+        sparse = [_sparse_slots(text, self.dim) for text in texts]
+        if np is not None:
+            return self._dense_numpy(sparse)
+        return [self._dense_python(slots) for slots in sparse]
+
+    def _dense_numpy(self, sparse: List[Optional[Dict[int, float]]]) -> List[Optional[Any]]:
+        rows = [idx for idx, slots in enumerate(sparse) if slots]
+        results: List[Optional[Any]] = [None] * len(sparse)
+        if not rows:
+            return results
+        matrix = np.zeros((len(rows), self.dim), dtype=np.float32)
+        row_index: List[int] = []
+        col_index: List[int] = []
+        values: List[float] = []
+        for position, source in enumerate(rows):
+            for idx, value in sparse[source].items():
+                row_index.append(position)
+                col_index.append(idx)
+                values.append(value)
+        np.add.at(matrix, (np.asarray(row_index), np.asarray(col_index)), np.asarray(values, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1)
+        for position, source in enumerate(rows):
+            if norms[position] <= 1e-12:
+                continue
+            results[source] = matrix[position] / norms[position]
+        return results
+
+    def _dense_python(self, slots: Optional[Dict[int, float]]) -> Optional[array]:
+        if not slots:
+            return None
+        norm = math.sqrt(sum(value * value for value in slots.values()))
+        if norm <= 1e-12:
+            return None
+        vector = array("f", bytes(4 * self.dim))
+        for idx, value in slots.items():
+            vector[idx] = value / norm
+        return vector
+
+
+def to_float_list(vector: Optional[Sequence[float]]) -> Optional[List[float]]:
+    """Converte ndarray/array('f') para lista (formato dos callers e do driver)."""
+    if vector is None:
+        return None
+    tolist = getattr(vector, "tolist", None)
+    if callable(tolist):
+        return tolist()
+    return [float(item) for item in vector]
+
+
+local_embedding_service = LocalEmbeddingService()
@@ -11,6 +11,7 @@ from typing import Any, Dict, Optional, Tuple
 import httpx
 
 from app.config import settings
+from app.services.http_client_service import http_client_service
 
 
 class MinimaxTTSService:
@@ -118,12 +119,13 @@ class MinimaxTTSService:
 
         for attempt in range(max_retries + 1):
             try:
-                async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-                    response = await client.post(
-                        endpoint,
-                        headers=self._headers(),
-                        json=payload,
-                    )
+                client = http_client_service.get_client("minimax")
+                response = await client.post(
+                    endpoint,
+                    headers=self._headers(),
+                    json=payload,
+                    timeout=timeout_seconds,
+                )
 
                 if response.status_code != 200:
                     message = f"MiniMax erro ({response.status_code}): {response.text[:280]}"
@@ -151,8 +153,7 @@ class MinimaxTTSService:
 
                     audio_url = str(payload_data.get("audio_url") or "").strip()
                     if not audio_blob and audio_url:
-                        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-                            get_resp = await client.get(audio_url)
+                        get_resp = await client.get(audio_url, timeout=timeout_seconds)
                         if get_resp.status_code == 200:
                             audio_blob = get_resp.content
 
@@ -194,6 +195,7 @@ class MinimaxTTSService:
             "voice_id": self.voice_id,
             "format": self.format,
             "missing_env": missing_env,
+            "http_pool": http_client_service.get_stats("minimax"),
         }
 
 
@@ -1,14 +1,13 @@
 """
 OpenAI service for VIVA chat and audio transcription.
 """
-import hashlib
-import math
-import re
-from typing import Any, Dict, List, Optional
-
-import httpx
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.config import settings
+from app.services.embedding_cache_service import embedding_cache_service
+from app.services.http_client_service import http_client_service
+from app.services.local_embedding_service import LocalEmbeddingService, to_float_list
 
 
 class OpenAIService:
@@ -26,6 +25,9 @@ class OpenAIService:
         self.model_embedding = settings.OPENAI_EMBEDDING_MODEL
         self.embedding_fallback_local = bool(settings.OPENAI_EMBEDDING_FALLBACK_LOCAL)
         self.embedding_fallback_dim = 1536
+        self._local_embedder = LocalEmbeddingService(dim=self.embedding_fallback_dim)
+        self.embedding_batch_size = max(1, int(settings.OPENAI_EMBEDDING_BATCH_SIZE))
+        self.embedding_concurrency = max(1, int(settings.OPENAI_EMBEDDING_CONCURRENCY))
         self.timeout = float(settings.OPENAI_TIMEOUT_SECONDS)
         self._last_embedding_provider = "none"
 
@@ -124,12 +126,13 @@ class OpenAIService:
             payload["temperature"] = temperature
             payload["max_completion_tokens"] = max_tokens
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=self._headers(),
-                json=payload,
-            )
+        client = http_client_service.get_client("openai")
+        response = await client.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            json=payload,
+            timeout=self.timeout,
+        )
 
         if response.status_code == 200:
             content = self._extract_chat_completion_content(response.json())
@@ -159,12 +162,13 @@ class OpenAIService:
             "max_output_tokens": max_tokens,
         }
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/responses",
-                headers=self._headers(),
-                json=payload,
-            )
+        client = http_client_service.get_client("openai")
+        response = await client.post(
+            f"{self.base_url}/responses",
+            headers=self._headers(),
+            json=payload,
+            timeout=self.timeout,
+        )
 
         if response.status_code == 200:
             content = self._extract_responses_content(response.json())
@@ -246,65 +250,66 @@ class OpenAIService:
                 if self._supports_optional_chat_params()
                 else [False]
             )
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                for with_optional_params in attempt_optional_params:
-                    payload: Dict[str, Any] = {
-                        "model": self.model_chat,
-                        "messages": normalized,
-                        "stream": True,
-                    }
-                    if with_optional_params:
-                        payload["temperature"] = temperature
-                        payload["max_completion_tokens"] = max_tokens
-
-                    async with client.stream(
-                        "POST",
-                        f"{self.base_url}/chat/completions",
-                        headers=self._headers(),
-                        json=payload,
-                    ) as response:
-                        if response.status_code != 200:
-                            error_text = (await response.aread()).decode(errors="ignore")[:400]
-                            stream_last_error = error_text
-                            lower_error = error_text.lower()
-                            should_retry_without_optional = (
-                                with_optional_params
-                                and response.status_code in {400, 422}
-                                and (
-                                    "temperature" in lower_error
-                                    or "max_completion_tokens" in lower_error
-                                    or "unsupported_value" in lower_error
-                                )
+            client = http_client_service.get_client("openai")
+            for with_optional_params in attempt_optional_params:
+                payload: Dict[str, Any] = {
+                    "model": self.model_chat,
+                    "messages": normalized,
+                    "stream": True,
+                }
+                if with_optional_params:
+                    payload["temperature"] = temperature
+                    payload["max_completion_tokens"] = max_tokens
+
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    headers=self._headers(),
+                    json=payload,
+                    timeout=self.timeout,
+                ) as response:
+                    if response.status_code != 200:
+                        error_text = (await response.aread()).decode(errors="ignore")[:400]
+                        stream_last_error = error_text
+                        lower_error = error_text.lower()
+                        should_retry_without_optional = (
+                            with_optional_params
+                            and response.status_code in {400, 422}
+                            and (
+                                "temperature" in lower_error
+                                or "max_completion_tokens" in lower_error
+                                or "unsupported_value" in lower_error
                             )
-                            if should_retry_without_optional:
-                                continue
+                        )
+                        if should_retry_without_optional:
+                            continue
 
-                            break
+                        break
 
-                        async for line in response.aiter_lines():
-                            if not line.strip():
-                                continue
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
 
-                            if line.startswith("data: "):
-                                data_str = line[6:]  # Remove "data: " prefix
+                        if line.startswith("data: "):
+                            data_str = line[6:]  # Remove "data: " prefix
 
-                                if data_str == "[DONE]":
-                                    break
+                            if data_str == "[DONE]":
+                                break
 
-                                try:
-                                    import json
-                                    chunk_data = json.loads(data_str)
-                                    choices = chunk_data.get("choices", [])
+                            try:
+                                import json
+                                chunk_data = json.loads(data_str)
+                                choices = chunk_data.get("choices", [])
 
-                                    if choices:
-                                        delta = choices[0].get("delta", {})
-                                        content = delta.get("content")
+                                if choices:
+                                    delta = choices[0].get("delta", {})
+                                    content = delta.get("content")
 
-                                        if content:
-                                            yield content
-                                except json.JSONDecodeError:
-                                    continue
-                        return
+                                    if content:
+                                        yield content
+                            except json.JSONDecodeError:
+                                continue
+                    return
 
             # Fallback resiliente: usa resposta nao-streaming quando streaming falhar.
             fallback = await self.chat(
@@ -337,13 +342,14 @@ class OpenAIService:
         files = {"file": (filename, audio_bytes, content_type)}
         data: Dict[str, Any] = {"model": self.model_audio}
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/audio/transcriptions",
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                data=data,
-                files=files,
-            )
+        client = http_client_service.get_client("openai")
+        response = await client.post(
+            f"{self.base_url}/audio/transcriptions",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            data=data,
+            files=files,
+            timeout=self.timeout,
+        )
 
         if response.status_code == 200:
             payload = response.json()
@@ -383,12 +389,13 @@ class OpenAIService:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/audio/speech",
-                headers=headers,
-                json=payload,
-            )
+        client = http_client_service.get_client("openai")
+        response = await client.post(
+            f"{self.base_url}/audio/speech",
+            headers=headers,
+            json=payload,
+            timeout=self.timeout,
+        )
 
         if response.status_code != 200:
             raise ValueError(f"Erro OpenAI TTS ({response.status_code}): {response.text[:300]}")
@@ -417,12 +424,13 @@ class OpenAIService:
         if quality:
             payload["quality"] = quality
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/images/generations",
-                headers=self._headers(),
-                json=payload,
-            )
+        client = http_client_service.get_client("openai")
+        response = await client.post(
+            f"{self.base_url}/images/generations",
+            headers=self._headers(),
+            json=payload,
+            timeout=self.timeout,
+        )
 
         if response.status_code == 200:
             data = response.json()
@@ -455,12 +463,13 @@ class OpenAIService:
             "max_completion_tokens": max_tokens,
         }
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=self._headers(),
-                json=payload,
-            )
+        client = http_client_service.get_client("openai")
+        response = await client.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            json=payload,
+            timeout=self.timeout,
+        )
 
         if response.status_code == 200:
             content = self._extract_chat_completion_content(response.json())
@@ -474,109 +483,129 @@ class OpenAIService:
         clean = str(text or "").strip()
         if not clean:
             return None
+        return (await self.embed_texts([clean]))[0]
+
+    async def embed_texts(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> List[Optional[List[float]]]:
+        """Embeddings em lote: ate `batch_size` inputs por chamada a /embeddings.
+
+        Retorna uma lista alinhada a `texts` (None para texto vazio/falha sem fallback).
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        pending = [(idx, str(item or "").strip()) for idx, item in enumerate(texts)]
+        pending = [(idx, clean) for idx, clean in pending if clean]
+        if not pending:
+            return results
+
+        model_key = self.model_embedding if self.api_key else self._fallback_cache_model
+        cached = await embedding_cache_service.get_many(model_key, {clean for _, clean in pending})
+        if cached:
+            for idx, clean in pending:
+                if clean in cached:
+                    results[idx] = cached[clean]
+            pending = [(idx, clean) for idx, clean in pending if clean not in cached]
+            if not pending:
+                return results
 
         if not self.api_key:
             if self.embedding_fallback_local:
                 self._last_embedding_provider = "local_fallback"
-                return self._fallback_embed_text(clean)
-            self._last_embedding_provider = "disabled"
-            return None
+                unique = list(dict.fromkeys(clean for _, clean in pending))
+                vectors = self._local_embedder.embed_batch(unique)
+                fresh = {clean: to_float_list(vector) for clean, vector in zip(unique, vectors)}
+                for idx, clean in pending:
+                    results[idx] = fresh[clean]
+                await embedding_cache_service.put_many(model_key, fresh.items())
+            else:
+                self._last_embedding_provider = "disabled"
+            return results
+
+        size = max(1, int(batch_size or self.embedding_batch_size))
+        batches = [pending[start:start + size] for start in range(0, len(pending), size)]
+        semaphore = asyncio.Semaphore(max(1, int(concurrency or self.embedding_concurrency)))
+
+        async def _run(batch: List[Tuple[int, str]]) -> None:
+            async with semaphore:
+                vectors = await self._embed_batch([clean for _, clean in batch])
+            # So vetores da OpenAI entram no cache do modelo; fallback local nao "envenena" a chave.
+            await embedding_cache_service.put_many(
+                model_key,
+                [(clean, vector) for (_, clean), vector in zip(batch, vectors) if vector is not None],
+            )
+            for (idx, clean), vector in zip(batch, vectors):
+                if vector is None and self.embedding_fallback_local:
+                    vector = self._fallback_embed_text(clean)
+                results[idx] = vector
+
+        await asyncio.gather(*[_run(batch) for batch in batches])
+        return results
 
+    async def _embed_batch(self, inputs: List[str]) -> List[Optional[List[float]]]:
+        """Uma chamada /embeddings; respostas sao reordenadas pelo campo `index`."""
+        empty: List[Optional[List[float]]] = [None] * len(inputs)
         payload: Dict[str, Any] = {
             "model": self.model_embedding,
-            "input": clean,
+            "input": inputs,
         }
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/embeddings",
-                    headers=self._headers(),
-                    json=payload,
-                )
+            client = http_client_service.get_client("openai")
+            response = await client.post(
+                f"{self.base_url}/embeddings",
+                headers=self._headers(),
+                json=payload,
+                timeout=self.timeout,
+            )
         except Exception:
-            if self.embedding_fallback_local:
-                self._last_embedding_provider = "local_fallback"
-                return self._fallback_embed_text(clean)
-            self._last_embedding_provider = "error"
-            return None
+            self._last_embedding_provider = "local_fallback" if self.embedding_fallback_local else "error"
+            return empty
 
         if response.status_code != 200:
-            if self.embedding_fallback_local:
-                self._last_embedding_provider = "local_fallback"
-                return self._fallback_embed_text(clean)
-            self._last_embedding_provider = f"error_{response.status_code}"
-            return None
+            self._last_embedding_provider = (
+                "local_fallback" if self.embedding_fallback_local else f"error_{response.status_code}"
+            )
+            return empty
 
         try:
             data = response.json()
         except Exception:
-            if self.embedding_fallback_local:
-                self._last_embedding_provider = "local_fallback"
-                return self._fallback_embed_text(clean)
-            self._last_embedding_provider = "error_json"
-            return None
-        items = data.get("data")
+            self._last_embedding_provider = "local_fallback" if self.embedding_fallback_local else "error_json"
+            return empty
+        items = data.get("data") if isinstance(data, dict) else None
         if not isinstance(items, list) or not items:
-            if self.embedding_fallback_local:
-                self._last_embedding_provider = "local_fallback"
-                return self._fallback_embed_text(clean)
-            self._last_embedding_provider = "error_payload"
-            return None
-
-        first = items[0] if isinstance(items[0], dict) else {}
-        embedding = first.get("embedding")
-        if not isinstance(embedding, list):
-            if self.embedding_fallback_local:
-                self._last_embedding_provider = "local_fallback"
-                return self._fallback_embed_text(clean)
-            self._last_embedding_provider = "error_embedding_shape"
-            return None
-
-        vector: List[float] = []
-        for item in embedding:
+            self._last_embedding_provider = "local_fallback" if self.embedding_fallback_local else "error_payload"
+            return empty
+
+        vectors = list(empty)
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index", position)
+            embedding = item.get("embedding")
+            if not isinstance(index, int) or not 0 <= index < len(inputs) or not isinstance(embedding, list):
+                continue
             try:
-                vector.append(float(item))
+                vectors[index] = [float(value) for value in embedding]
             except Exception:
-                if self.embedding_fallback_local:
-                    self._last_embedding_provider = "local_fallback"
-                    return self._fallback_embed_text(clean)
-                self._last_embedding_provider = "error_embedding_value"
-                return None
-        self._last_embedding_provider = "openai"
-        return vector
+                continue
+        if any(vector is None for vector in vectors):
+            self._last_embedding_provider = (
+                "local_fallback" if self.embedding_fallback_local else "error_embedding_shape"
+            )
+        else:
+            self._last_embedding_provider = "openai"
+        return vectors
+
+    @property
+    def _fallback_cache_model(self) -> str:
+        return f"local-hash-{self.embedding_fallback_dim}"
 
     def _fallback_embed_text(self, text: str) -> Optional[List[float]]:
         """Deterministic local hash embedding to keep RAG functional without API quota."""
-        clean = str(text or "").strip().lower()
-        if not clean:
-            return None
-
-        dim = self.embedding_fallback_dim
-        vector = [0.0] * dim
-
-        tokens = re.findall(r"[a-z0-9]+", clean)
-        if not tokens:
-            tokens = [clean]
-
-        for token in tokens:
-            digest = hashlib.sha256(token.encode("utf-8")).digest()
-            idx = int.from_bytes(digest[:4], "big") % dim
-            sign = -1.0 if (digest[4] & 1) else 1.0
-            weight = 1.0 + (float(digest[5]) / 255.0) * 0.5
-            vector[idx] += sign * weight
-
-        # Add a small whole-text anchor to reduce collisions for short phrases.
-        full_digest = hashlib.sha256(clean.encode("utf-8")).digest()
-        for offset in range(0, 16, 4):
-            idx = int.from_bytes(full_digest[offset:offset + 4], "big") % dim
-            sign = -1.0 if (full_digest[(offset + 4) % len(full_digest)] & 1) else 1.0
-            vector[idx] += sign * 0.35
-
-        norm = math.sqrt(sum(value * value for value in vector))
-        if norm <= 1e-12:
-            return None
-
-        return [value / norm for value in vector]
+        return to_float_list(self._local_embedder.embed(text))
 
     def get_status(self) -> Dict[str, Any]:
         return {
@@ -588,6 +617,7 @@ class OpenAIService:
                 "vision": self.model_vision,
                 "embedding": self.model_embedding,
             },
+            "http_pool": http_client_service.get_stats("openai"),
         }
 
     def get_embedding_runtime_status(self) -> Dict[str, Any]:
@@ -597,9 +627,11 @@ class OpenAIService:
             "configured": bool(self.api_key),
             "model": self.model_embedding,
             "fallback_enabled": self.embedding_fallback_local,
+            "fallback_backend": self._local_embedder.backend,
             "provider_last": provider,
             "semantic_tier": "premium_openai" if premium_active else "fallback_local",
             "premium_active": premium_active,
+            "cache": embedding_cache_service.get_stats(),
         }
 
 
@@ -0,0 +1,123 @@
+"""
+Paginacao por cursor (keyset) e total opcional para as listagens.
+
+O cursor e opaco (base64 de `{"v": <valor da coluna de ordenacao>, "id": ...}`)
+e a pagina seguinte filtra `(ordem, id) < (v, id)`, usando o indice em vez de
+`OFFSET` (custo constante em qualquer profundidade). O total pode ser exato
+(padrao, compativel com page/offset), em cache por alguns segundos ou omitido.
+"""
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import settings
+
+
+TOTAL_MODES = ("exact", "cached", "none")
+TOTAL_MODE_PATTERN = "^(exact|cached|none)$"
+
+
+class InvalidCursorError(ValueError):
+    """Cursor malformado ou de outra listagem."""
+
+
+@dataclass
+class PageRequest:
+    page: int
+    page_size: int
+    cursor: Optional[Tuple[datetime, UUID]] = None
+    total_mode: str = "exact"
+
+    @property
+    def offset(self) -> int:
+        # Com cursor a posicao vem do filtro keyset, nao do OFFSET.
+        return 0 if self.cursor else (self.page - 1) * self.page_size
+
+
+def encode_cursor(sort_value: datetime, row_id: Any) -> str:
+    payload = json.dumps({"v": sort_value.isoformat(), "id": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["v"]), UUID(str(payload["id"]))
+    except Exception as exc:
+        raise InvalidCursorError("Cursor de paginacao invalido") from exc
+
+
+def page_request(
+    page: int = 1,
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    total_mode: Optional[str] = None,
+) -> PageRequest:
+    """Normaliza parametros; sem `total_mode`, cursor implica total em cache."""
+    decoded = decode_cursor(cursor) if cursor else None
+    mode = total_mode or ("cached" if decoded else "exact")
+    if mode not in TOTAL_MODES:
+        raise ValueError(f"total_mode invalido: {mode}")
+    return PageRequest(page=max(1, int(page)), page_size=max(1, int(page_size)), cursor=decoded, total_mode=mode)
+
+
+def keyset_condition(sort_column: Any, id_column: Any, cursor: Tuple[datetime, UUID]) -> ColumnElement:
+    """Linhas depois do cursor na ordem `(sort DESC, id DESC)`."""
+    return tuple_(sort_column, id_column) < tuple_(*cursor)
+
+
+def next_cursor(rows: list, page_size: int, key: Callable[[Any], Tuple[datetime, Any]]) -> Optional[str]:
+    """Cursor da proxima pagina; `rows` deve vir com `page_size + 1` itens se houver mais."""
+    if len(rows) <= page_size:
+        return None
+    return encode_cursor(*key(rows[page_size - 1]))
+
+
+class CountCache:
+    """Totais recentes por (listagem, filtros), para nao contar a cada pagina."""
+
+    def __init__(self) -> None:
+        self.ttl = max(0.0, float(settings.PAGINATION_COUNT_CACHE_SECONDS))
+        self._entries: Dict[Hashable, Tuple[float, int]] = {}
+        self.max_entries = 2048
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[int]]) -> int:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = int(await compute())
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+async def resolve_total(
+    request: PageRequest,
+    key: Hashable,
+    compute: Callable[[], Awaitable[int]],
+) -> Optional[int]:
+    if request.total_mode == "none":
+        return None
+    if request.total_mode == "cached":
+        return await count_cache.get(key, compute)
+    return int(await compute())
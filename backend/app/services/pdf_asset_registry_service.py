@@ -0,0 +1,140 @@
+"""
+Registro de assets estaticos usados na renderizacao de PDFs (logo, anexos, CSS).
+
+Cada asset e resolvido (primeiro caminho candidato existente), lido e, quando
+preciso, codificado uma unica vez; a cada `PDF_ASSETS_RELOAD_SECONDS` (no
+maximo) o mtime/tamanho do arquivo e conferido e o asset recarregado se mudou.
+Templates HTML referenciam assets por id via `url(asset_id)`; o pool do
+Playwright atende essas URLs direto da memoria (`page.route`), entao o HTML
+nao carrega o logo em base64 e o render nao toca o disco.
+"""
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass, field
+import hashlib
+import mimetypes
+from pathlib import Path
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+
+ASSET_BASE_URL = "https://pdf-assets.local"
+
+
+@dataclass
+class PdfAsset:
+    asset_id: str
+    content: bytes
+    mime: str
+    digest: str
+    path: Optional[str] = None
+    signature: Optional[Tuple[int, int]] = None
+    _data_uri: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def data_uri(self) -> str:
+        if self._data_uri is None:
+            encoded = base64.b64encode(self.content).decode("ascii")
+            self._data_uri = f"data:{self.mime};base64,{encoded}"
+        return self._data_uri
+
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+
+@dataclass
+class _FileSource:
+    candidates: List[Path]
+    mime: Optional[str]
+    checked_at: float = 0.0
+
+
+class PdfAssetRegistry:
+    def __init__(self) -> None:
+        self.reload_seconds = max(0.0, float(settings.PDF_ASSETS_RELOAD_SECONDS))
+        self._sources: Dict[str, _FileSource] = {}
+        self._assets: Dict[str, PdfAsset] = {}
+        self.disk_reads = 0
+
+    @staticmethod
+    def _make_asset(asset_id: str, content: bytes, mime: str, path: Optional[Path] = None,
+                    signature: Optional[Tuple[int, int]] = None) -> PdfAsset:
+        return PdfAsset(
+            asset_id=asset_id,
+            content=content,
+            mime=mime,
+            digest=hashlib.sha256(content).hexdigest(),
+            path=str(path) if path else None,
+            signature=signature,
+        )
+
+    def register_static(self, asset_id: str, content: bytes, mime: str) -> PdfAsset:
+        """Asset em memoria (ex.: CSS embutido no codigo)."""
+        self._sources.pop(asset_id, None)
+        asset = self._make_asset(asset_id, content, mime)
+        self._assets[asset_id] = asset
+        return asset
+
+    def register_file(self, asset_id: str, candidates: Sequence[Path], mime: Optional[str] = None) -> None:
+        if asset_id in self._sources:
+            return
+        self._sources[asset_id] = _FileSource(candidates=[Path(item) for item in candidates], mime=mime)
+
+    def _refresh(self, asset_id: str, source: _FileSource) -> None:
+        now = time.monotonic()
+        current = self._assets.get(asset_id)
+        if current is not None and now - source.checked_at < self.reload_seconds:
+            return
+        source.checked_at = now
+        for candidate in source.candidates:
+            try:
+                stat = candidate.stat()
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if current is not None and current.path == str(candidate) and current.signature == signature:
+                return
+            try:
+                content = candidate.read_bytes()
+            except OSError:
+                continue
+            self.disk_reads += 1
+            mime = source.mime or mimetypes.guess_type(candidate.name)[0] or "application/octet-stream"
+            self._assets[asset_id] = self._make_asset(asset_id, content, mime, candidate, signature)
+            return
+        self._assets.pop(asset_id, None)
+
+    def get(self, asset_id: str) -> Optional[PdfAsset]:
+        source = self._sources.get(asset_id)
+        if source is not None:
+            self._refresh(asset_id, source)
+        return self._assets.get(asset_id)
+
+    def get_file(self, asset_id: str, candidates: Sequence[Path], mime: Optional[str] = None) -> Optional[PdfAsset]:
+        """Registra (na primeira chamada) e retorna o asset de arquivo."""
+        self.register_file(asset_id, candidates, mime)
+        return self.get(asset_id)
+
+    @staticmethod
+    def url(asset_id: str) -> str:
+        return f"{ASSET_BASE_URL}/{asset_id}"
+
+    def resolve_url(self, url: str) -> Optional[PdfAsset]:
+        prefix = f"{ASSET_BASE_URL}/"
+        if not url.startswith(prefix):
+            return None
+        return self.get(url[len(prefix):].split("?", 1)[0])
+
+    def warm(self) -> int:
+        return sum(1 for asset_id in list(self._sources) if self.get(asset_id) is not None)
+
+    def clear(self) -> None:
+        self._sources.clear()
+        self._assets.clear()
+        self.disk_reads = 0
+
+
+pdf_asset_registry = PdfAssetRegistry()
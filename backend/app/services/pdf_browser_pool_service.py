@@ -0,0 +1,247 @@
+"""
+Pool de navegadores Chromium (Playwright) aquecidos para renderizar PDFs.
+
+Em vez de `chromium.launch()` por download, o processo mantem N navegadores
+com M contextos/paginas cada ("slots"). Cada render pega um slot livre da
+fila (com limite de espera e de fila), reusa a pagina e a recicla apos
+`PDF_BROWSER_PAGE_MAX_USES` renders ou em caso de erro. Navegador que cair
+e relancado sob demanda. Assets (logo/CSS) sao servidos da memoria via
+`page.route`. Playwright e importado de forma preguicosa: sem o pacote,
+`render_pdf` levanta ModuleNotFoundError e o caller usa o fallback.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import logging
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.services.pdf_asset_registry_service import ASSET_BASE_URL, pdf_asset_registry
+
+
+class PdfPoolBusyError(RuntimeError):
+    """Fila de renderizacao cheia ou tempo de espera por slot esgotado."""
+
+
+@dataclass
+class _Slot:
+    browser_index: int
+    generation: int = -1
+    context: Any = None
+    page: Any = None
+    uses: int = 0
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return round(ordered[position], 2)
+
+
+class PdfBrowserPoolService:
+    def __init__(self) -> None:
+        self.browsers = max(1, int(settings.PDF_BROWSER_POOL_SIZE))
+        self.contexts_per_browser = max(1, int(settings.PDF_BROWSER_CONTEXTS_PER_BROWSER))
+        self.max_queue = max(0, int(settings.PDF_BROWSER_MAX_QUEUE))
+        self.acquire_timeout = float(settings.PDF_BROWSER_ACQUIRE_TIMEOUT_SECONDS)
+        self.render_timeout = float(settings.PDF_BROWSER_RENDER_TIMEOUT_SECONDS)
+        self.page_max_uses = max(1, int(settings.PDF_BROWSER_PAGE_MAX_USES))
+        self._playwright: Any = None
+        self._browser_handles: List[Any] = []
+        self._browser_generations: List[int] = []
+        self._free: Optional[asyncio.Queue] = None
+        self._slots: List[_Slot] = []
+        self._start_lock = asyncio.Lock()
+        self._browser_locks: List[asyncio.Lock] = []
+        self._waiting = 0
+        self._in_use = 0
+        self._durations: Deque[float] = deque(maxlen=512)
+        self._counters: Dict[str, int] = {}
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self._counters = {
+            "renders": 0,
+            "failures": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "browser_launches": 0,
+            "page_recycles": 0,
+        }
+
+    @property
+    def started(self) -> bool:
+        return self._free is not None
+
+    @property
+    def capacity(self) -> int:
+        return self.browsers * self.contexts_per_browser
+
+    async def start(self) -> None:
+        """Lanca os navegadores e aquece um contexto/pagina por slot."""
+        async with self._start_lock:
+            if self.started:
+                return
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            self._browser_handles = [None] * self.browsers
+            self._browser_generations = [0] * self.browsers
+            self._browser_locks = [asyncio.Lock() for _ in range(self.browsers)]
+            free: asyncio.Queue = asyncio.Queue()
+            self._slots = []
+            for browser_index in range(self.browsers):
+                for _ in range(self.contexts_per_browser):
+                    slot = _Slot(browser_index=browser_index)
+                    try:
+                        await self._prepare_slot(slot)
+                    except Exception:
+                        # Slot fica frio e e preparado no primeiro uso.
+                        logging.exception("Falha ao aquecer slot do pool de PDF")
+                    self._slots.append(slot)
+                    free.put_nowait(slot)
+            self._free = free
+            logging.info("Pool de PDF iniciado: %s navegador(es) x %s contexto(s)", self.browsers, self.contexts_per_browser)
+
+    async def stop(self) -> None:
+        async with self._start_lock:
+            for slot in self._slots:
+                await self._close_slot(slot)
+            for browser in self._browser_handles:
+                if browser is None:
+                    continue
+                try:
+                    await browser.close()
+                except Exception:
+                    continue
+            if self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                except Exception:
+                    pass
+            self._playwright = None
+            self._browser_handles = []
+            self._browser_generations = []
+            self._slots = []
+            self._free = None
+
+    async def _get_browser(self, browser_index: int) -> Any:
+        async with self._browser_locks[browser_index]:
+            browser = self._browser_handles[browser_index]
+            if browser is not None and browser.is_connected():
+                return browser
+            browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=["--disable-dev-shm-usage"],
+            )
+            self._browser_handles[browser_index] = browser
+            self._browser_generations[browser_index] += 1
+            self._counters["browser_launches"] += 1
+            return browser
+
+    async def _close_slot(self, slot: _Slot) -> None:
+        context, slot.context, slot.page, slot.uses = slot.context, None, None, 0
+        if context is None:
+            return
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _prepare_slot(self, slot: _Slot) -> None:
+        browser = await self._get_browser(slot.browser_index)
+        generation = self._browser_generations[slot.browser_index]
+        if slot.page is not None and slot.generation == generation and not slot.page.is_closed():
+            return
+        await self._close_slot(slot)
+        slot.context = await browser.new_context()
+        slot.page = await slot.context.new_page()
+        await slot.page.route(f"{ASSET_BASE_URL}/**", self._serve_asset)
+        slot.generation = generation
+
+    @staticmethod
+    async def _serve_asset(route: Any) -> None:
+        """Atende assets referenciados por id no HTML (logo/CSS) direto da memoria."""
+        asset = pdf_asset_registry.resolve_url(route.request.url)
+        if asset is None:
+            await route.abort()
+            return
+        await route.fulfill(status=200, body=asset.content, content_type=asset.mime)
+
+    async def _acquire(self) -> _Slot:
+        if not self.started:
+            await self.start()
+        # Fila = pedidos aguardando alem dos slots ja livres.
+        if self._waiting - self._free.qsize() >= self.max_queue:
+            self._counters["rejected"] += 1
+            raise PdfPoolBusyError("Fila de geracao de PDF cheia")
+        self._waiting += 1
+        try:
+            slot = await asyncio.wait_for(self._free.get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError as exc:
+            self._counters["timeouts"] += 1
+            raise PdfPoolBusyError("Tempo de espera por renderizador de PDF esgotado") from exc
+        finally:
+            self._waiting -= 1
+        self._in_use += 1
+        return slot
+
+    def _release(self, slot: _Slot) -> None:
+        self._in_use -= 1
+        if self._free is not None:
+            self._free.put_nowait(slot)
+
+    async def render_pdf(self, html_content: str, **pdf_options: Any) -> bytes:
+        """Renderiza HTML em PDF num slot aquecido (page.set_content + page.pdf)."""
+        slot = await self._acquire()
+        started = time.perf_counter()
+        try:
+            await self._prepare_slot(slot)
+            pdf_bytes = await asyncio.wait_for(self._render(slot, html_content, pdf_options), timeout=self.render_timeout)
+            slot.uses += 1
+            self._counters["renders"] += 1
+            self._durations.append((time.perf_counter() - started) * 1000)
+            if slot.uses >= self.page_max_uses:
+                # Recicla contexto para liberar memoria acumulada pelo Chromium.
+                self._counters["page_recycles"] += 1
+                await self._close_slot(slot)
+            return pdf_bytes
+        except asyncio.CancelledError:
+            # Cliente desconectou no meio do render: a pagina pode estar em
+            # set_content/pdf e nao pode voltar para a fila livre assim.
+            # `_close_slot` solta o contexto antes do primeiro await.
+            await self._close_slot(slot)
+            raise
+        except Exception:
+            self._counters["failures"] += 1
+            await self._close_slot(slot)
+            raise
+        finally:
+            self._release(slot)
+
+    @staticmethod
+    async def _render(slot: _Slot, html_content: str, pdf_options: Dict[str, Any]) -> bytes:
+        await slot.page.set_content(html_content, wait_until="load")
+        return await slot.page.pdf(**pdf_options)
+
+    def get_stats(self) -> Dict[str, Any]:
+        durations = list(self._durations)
+        return {
+            **self._counters,
+            "started": self.started,
+            "browsers": self.browsers,
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "queued": max(0, self._waiting - (self._free.qsize() if self._free is not None else 0)),
+            "max_queue": self.max_queue,
+            "render_p50_ms": _percentile(durations, 0.5),
+            "render_p95_ms": _percentile(durations, 0.95),
+        }
+
+
+pdf_browser_pool_service = PdfBrowserPoolService()
@@ -9,6 +9,10 @@ from uuid import UUID
 
 from jinja2 import Template
 from weasyprint import HTML, CSS
+try:
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:  # WeasyPrint < 53
+    from weasyprint.fonts import FontConfiguration
 
 from app.config import settings
 from app.services.extenso_service import ExtensoService
@@ -150,6 +154,9 @@ class PDFService:
     }
     """
     
+    _css_cache: Optional[CSS] = None
+    _font_config: Optional[FontConfiguration] = None
+
     def __init__(self):
         self.storage_path = settings.STORAGE_LOCAL_PATH
         os.makedirs(self.storage_path, exist_ok=True)
@@ -309,18 +316,32 @@ class PDFService:
         Returns:
             Path to generated PDF file
         """
-        html_content = self._render_template_bacen(dados)
-        
         # Generate filename
         filename = f"contrato_{dados.get('numero', str(contrato_id))}.pdf"
         filepath = os.path.join(self.storage_path, filename)
         
         # Generate PDF
-        html = HTML(string=html_content)
-        css = CSS(string=self.CSS_INSTITUCIONAL)
-        html.write_pdf(filepath, stylesheets=[css])
+        with open(filepath, "wb") as pdf_file:
+            pdf_file.write(self.render_contrato_bacen_bytes(dados))
         
         return filepath
+
+    @classmethod
+    def _stylesheet(cls) -> CSS:
+        """CSS institucional parseado uma vez por processo (fontes resolvidas juntas)."""
+        if cls._css_cache is None:
+            cls._font_config = FontConfiguration()
+            cls._css_cache = CSS(string=cls.CSS_INSTITUCIONAL, font_config=cls._font_config)
+        return cls._css_cache
+
+    def render_contrato_bacen_bytes(self, dados: Dict[str, Any]) -> bytes:
+        """Render Bacen contract PDF in memory (sem arquivo temporario)."""
+        html_content = self._render_template_bacen(dados)
+        stylesheet = self._stylesheet()
+        return HTML(string=html_content).write_pdf(
+            stylesheets=[stylesheet],
+            font_config=self._font_config,
+        )
     
     def _render_template_bacen(self, dados: Dict[str, Any]) -> str:
         """Render Bacen contract HTML template."""
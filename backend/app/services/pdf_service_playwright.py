@@ -1,47 +1,228 @@
 ﻿"""PDF Service using Playwright."""
-import base64
 import html
 import re
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple
 from uuid import UUID
 
-from playwright.async_api import async_playwright
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.contrato import Contrato
 from app.services.contrato_annex_loader import list_fixed_annexes_for_template
-from app.services.contrato_template_loader import load_contract_template
+from app.services.contrato_template_loader import get_compiled_template, load_contract_template
+from app.services.pdf_asset_registry_service import pdf_asset_registry
+from app.services.pdf_browser_pool_service import PdfPoolBusyError, pdf_browser_pool_service
+
+
+LOGO_ASSET_ID = "logo"
+CSS_ASSET_ID = "contrato.css"
+
+_SERVICE_FILE = Path(__file__).resolve()
+pdf_asset_registry.register_file(
+    LOGO_ASSET_ID,
+    [
+        Path("C:/projetos/fabio2/contratos/logo2-tight.png"),
+        Path("C:/projetos/fabio2/contratos/logo2.png"),
+        _SERVICE_FILE.parents[3] / "contratos" / "logo2-tight.png",
+        _SERVICE_FILE.parents[3] / "contratos" / "logo2.png",
+        _SERVICE_FILE.parents[2] / "contratos" / "logo2-tight.png",
+        _SERVICE_FILE.parents[2] / "contratos" / "logo2.png",
+        Path("C:/projetos/fabio2/contratos/logo2.jpeg"),
+    ],
+)
+
+CONTRATO_CSS = """
+@page {
+    size: A4;
+    margin: 20mm 15mm;
+}
+body {
+    font-family: 'Times New Roman', Times, serif;
+    font-size: 12pt;
+    line-height: 1.4;
+    color: #000;
+    max-width: 210mm;
+    margin: 0 auto;
+}
+.header-band {
+    background: #1e3a5f;
+    color: #fff;
+    display: flex;
+    align-items: center;
+    gap: 14px;
+    padding: 10px 14px;
+    margin-bottom: 18px;
+}
+.header-band .logo {
+    width: 88px;
+    height: 88px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    flex-shrink: 0;
+}
+.header-band .logo img {
+    width: 100%;
+    height: 100%;
+    object-fit: contain;
+    display: block;
+}
+.header-band h1 {
+    margin: 0;
+    font-size: 22pt;
+    letter-spacing: 0.2px;
+    font-weight: 700;
+    color: #fff;
+}
+.title-section {
+    text-align: center;
+    margin-bottom: 20px;
+}
+.title-section h2 {
+    font-size: 16pt;
+    border-bottom: 2px solid #000;
+    display: inline-block;
+    padding-bottom: 5px;
+    margin: 0;
+}
+.subtitle {
+    font-size: 11pt;
+    color: #333;
+    margin-top: 8px;
+}
+.contract-info {
+    text-align: center;
+    margin-bottom: 20px;
+    font-size: 11pt;
+}
+.contract-info span {
+    margin: 0 15px;
+}
+.parties {
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 15px;
+    margin-bottom: 15px;
+}
+.party-box {
+    border: 2px solid #000;
+    padding: 10px;
+}
+.party-box h3 {
+    font-size: 11pt;
+    margin: 0 0 8px 0;
+    border-bottom: 1px solid #999;
+    padding-bottom: 3px;
+}
+.party-box p {
+    margin: 2px 0;
+    font-size: 10pt;
+}
+.intro {
+    text-align: justify;
+    margin-bottom: 15px;
+    font-size: 11pt;
+}
+.clauses {
+    text-align: justify;
+}
+.clauses p {
+    margin: 8px 0;
+    text-align: justify;
+}
+.clauses ul {
+    margin: 5px 0;
+    padding-left: 25px;
+}
+.clauses li {
+    margin: 3px 0;
+}
+.clause-block {
+    margin-bottom: 10px;
+}
+.signatures {
+    margin-top: 30px;
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 50px;
+}
+.signature {
+    text-align: center;
+}
+.signature-line {
+    border-top: 1px solid #000;
+    margin-top: 50px;
+    padding-top: 5px;
+}
+.witnesses {
+    margin-top: 20px;
+    font-size: 9pt;
+}
+.witness-grid {
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 30px;
+    margin-top: 10px;
+}
+.footer {
+    margin-top: 20px;
+    padding-top: 10px;
+    border-top: 1px solid #ccc;
+    text-align: center;
+    font-size: 8pt;
+    color: #666;
+}
+.annex-page {
+    page-break-before: always;
+    break-before: page;
+    margin-top: 10px;
+    font-size: 11pt;
+    text-align: justify;
+}
+.annex-page h2,
+.annex-page h3,
+.annex-page h4 {
+    margin: 0 0 8px 0;
+    font-weight: 700;
+    text-transform: uppercase;
+}
+.annex-page p {
+    margin: 8px 0;
+}
+.annex-page ul {
+    margin: 6px 0;
+    padding-left: 24px;
+}
+.annex-page li {
+    margin: 3px 0;
+}
+.annex-page blockquote {
+    margin: 8px 0;
+    padding-left: 10px;
+    border-left: 3px solid #888;
+    color: #333;
+}
+.annex-page hr {
+    border: 0;
+    border-top: 1px solid #bbb;
+    margin: 10px 0;
+}
+"""
+pdf_asset_registry.register_static(CSS_ASSET_ID, CONTRATO_CSS.encode("utf-8"), "text/css")
 
 
 class PDFService:
     """PDF generation service using Playwright."""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: Optional[AsyncSession] = None):
         self.db = db
 
     @staticmethod
     def _load_logo_data_uri() -> Optional[str]:
-        possible_paths = [
-            Path("C:/projetos/fabio2/contratos/logo2-tight.png"),
-            Path("C:/projetos/fabio2/contratos/logo2.png"),
-            Path(__file__).resolve().parents[3] / "contratos" / "logo2-tight.png",
-            Path(__file__).resolve().parents[3] / "contratos" / "logo2.png",
-            Path(__file__).resolve().parents[2] / "contratos" / "logo2-tight.png",
-            Path(__file__).resolve().parents[2] / "contratos" / "logo2.png",
-            Path("C:/projetos/fabio2/contratos/logo2.jpeg"),
-        ]
-        for logo_path in possible_paths:
-            try:
-                if logo_path.exists():
-                    encoded = base64.b64encode(logo_path.read_bytes()).decode("ascii")
-                    mime = "image/png" if logo_path.suffix.lower() == ".png" else "image/jpeg"
-                    return f"data:{mime};base64,{encoded}"
-            except OSError:
-                continue
-        return None
+        asset = pdf_asset_registry.get(LOGO_ASSET_ID)
+        return asset.data_uri if asset else None
 
     @staticmethod
     def _normalize_mojibake_text(value: Optional[str], fallback: str = "") -> str:
@@ -150,14 +331,11 @@ class PDFService:
         except Exception:
             return contract_date
 
-    def _replace_annex_header_tokens(self, markdown: str, contrato: Contrato) -> str:
-        if not markdown:
-            return ""
-
+    def _annex_token_map(self, contrato: Contrato) -> Dict[str, str]:
         contract_date = self._format_contract_date(contrato.data_assinatura, contrato.created_at)
         plus_seven_days = self._date_plus_days(contrato.data_assinatura, contrato.created_at, 7)
 
-        mapped = {
+        return {
             "[NOME COMPLETO DO CLIENTE]": str(contrato.contratante_nome or ""),
             "[NÚMERO DO DOCUMENTO]": self._format_document(contrato.contratante_documento),
             "[NUMERO DO DOCUMENTO]": self._format_document(contrato.contratante_documento),
@@ -167,6 +345,16 @@ class PDFService:
             "[DATA]": contract_date,
         }
 
+    def _replace_annex_header_tokens(
+        self,
+        markdown: str,
+        contrato: Contrato,
+        mapped: Optional[Dict[str, str]] = None,
+    ) -> str:
+        if not markdown:
+            return ""
+
+        mapped = mapped if mapped is not None else self._annex_token_map(contrato)
         lines = markdown.splitlines()
         output_lines: List[str] = []
         header_open = True
@@ -190,9 +378,14 @@ class PDFService:
         escaped = re.sub(r"`(.+?)`", r"<code>\1</code>", escaped)
         return escaped
 
-    def _render_markdown_document_html(self, contrato: Contrato, markdown: str) -> str:
+    def _render_markdown_document_html(
+        self,
+        contrato: Contrato,
+        markdown: str,
+        mapped: Optional[Dict[str, str]] = None,
+    ) -> str:
         normalized_source = self._normalize_mojibake_text(self._extract_markdown_payload(markdown))
-        content = self._replace_annex_header_tokens(normalized_source, contrato)
+        content = self._replace_annex_header_tokens(normalized_source, contrato, mapped)
         if not content:
             return ""
 
@@ -245,24 +438,43 @@ class PDFService:
         flush_list()
         return "".join(nodes)
 
-    def _render_annexes_html(self, contrato: Contrato, annexes: List[Dict[str, Any]]) -> str:
+    def _render_annexes_html(
+        self,
+        contrato: Contrato,
+        annexes: List[Dict[str, Any]],
+        block_cache: Optional[MutableMapping[Any, str]] = None,
+    ) -> str:
         if not annexes:
             return ""
 
+        mapped = self._annex_token_map(contrato)
         blocks: List[str] = []
         for annex in sorted(annexes, key=lambda item: int(item.get("ordem") or 0)):
             markdown = str(annex.get("conteudo_markdown") or "")
-            annex_html = self._render_markdown_document_html(contrato, markdown)
+            if block_cache is not None:
+                # Chave = conteudo + valores dos tokens presentes: so re-renderiza o que mudou.
+                block_key = ("annex", markdown, self._token_values(markdown, mapped))
+                annex_html = block_cache.get(block_key)
+                if annex_html is None:
+                    annex_html = self._render_markdown_document_html(contrato, markdown, mapped)
+                    block_cache[block_key] = annex_html
+            else:
+                annex_html = self._render_markdown_document_html(contrato, markdown, mapped)
             if not annex_html:
                 continue
             blocks.append(f'<section class="annex-page">{annex_html}</section>')
         return "".join(blocks)
 
-    def _replace_tokens(self, value: str, contrato: Contrato) -> str:
+    @staticmethod
+    def _token_values(value: str, mapped: Dict[str, str]) -> Tuple[str, ...]:
+        """Valores dos tokens que aparecem em `value` (chave de cache do bloco)."""
+        return tuple(replacement for token, replacement in mapped.items() if token in value)
+
+    def _token_map(self, contrato: Contrato) -> Dict[str, str]:
         dados_extras = contrato.dados_extras if isinstance(contrato.dados_extras, dict) else {}
         cnh_numero = str(dados_extras.get("cnh_numero") or "-")
 
-        mapped = {
+        return {
             "[NOME COMPLETO DO CLIENTE]": str(contrato.contratante_nome or ""),
             "[NÚMERO DO DOCUMENTO]": self._format_document(contrato.contratante_documento),
             "[NUMERO DO DOCUMENTO]": self._format_document(contrato.contratante_documento),
@@ -290,6 +502,8 @@ class PDFService:
             "[PRAZO 2 EXTENSO]": self._format_prazo_extenso(contrato.prazo_2, contrato.prazo_2_extenso),
         }
 
+    def _replace_tokens(self, value: str, contrato: Contrato, mapped: Optional[Dict[str, str]] = None) -> str:
+        mapped = mapped if mapped is not None else self._token_map(contrato)
         out = value
         for token, replacement in mapped.items():
             out = out.replace(token, replacement)
@@ -299,7 +513,13 @@ class PDFService:
     def _load_template_json(template_id: str) -> Optional[Dict[str, Any]]:
         return load_contract_template(template_id)
 
-    def _render_clauses_html(self, contrato: Contrato, clauses: List[Dict[str, Any]]) -> str:
+    def _render_clauses_html(
+        self,
+        contrato: Contrato,
+        clauses: List[Dict[str, Any]],
+        fragments: Optional[Dict[Any, str]] = None,
+        block_cache: Optional[MutableMapping[Any, str]] = None,
+    ) -> str:
         if not clauses:
             return (
                 "<p><strong>CLÁUSULAS</strong><br>"
@@ -307,8 +527,14 @@ class PDFService:
             )
 
         blocks: List[str] = []
+        mapped = self._token_map(contrato)
+
+        for index, clause in enumerate(clauses):
+            fragment_key = ("clause", index)
+            if fragments is not None and fragment_key in fragments:
+                blocks.append(fragments[fragment_key])
+                continue
 
-        for clause in clauses:
             numero = self._normalize_mojibake_text(str(clause.get("numero") or ""))
             titulo = self._normalize_mojibake_text(str(clause.get("titulo") or ""))
             heading = " - ".join(part for part in [numero, titulo] if part)
@@ -322,7 +548,16 @@ class PDFService:
                 )
 
             raw_content = self._normalize_mojibake_text(content)
-            raw_content = self._replace_tokens(raw_content, contrato)
+            # Clausula sem token e igual para todo contrato: HTML vai para o template compilado.
+            is_static = "[" not in raw_content
+            block_key = None
+            if block_cache is not None and not is_static:
+                block_key = ("clause", index, raw_content, self._token_values(raw_content, mapped))
+                cached_block = block_cache.get(block_key)
+                if cached_block is not None:
+                    blocks.append(cached_block)
+                    continue
+            raw_content = self._replace_tokens(raw_content, contrato, mapped)
 
             lines = raw_content.splitlines()
             content_html: List[str] = []
@@ -351,12 +586,17 @@ class PDFService:
 
             flush_list()
 
-            blocks.append(
+            block = (
                 "<div class=\"clause-block\">"
                 + (f"<p><strong>{html.escape(heading)}</strong></p>" if heading else "")
                 + "".join(content_html)
                 + "</div>"
             )
+            if fragments is not None and is_static:
+                fragments[fragment_key] = block
+            elif block_key is not None:
+                block_cache[block_key] = block
+            blocks.append(block)
 
         return "".join(blocks)
 
@@ -372,32 +612,34 @@ class PDFService:
 
             html_content = self._generate_html(contrato)
 
-            async with async_playwright() as playwright:
-                browser = await playwright.chromium.launch(headless=True)
-                page = await browser.new_page()
-                await page.set_content(html_content)
-
-                pdf_bytes = await page.pdf(
-                    format="A4",
-                    print_background=True,
-                    margin={
-                        "top": "20mm",
-                        "right": "15mm",
-                        "bottom": "20mm",
-                        "left": "15mm",
-                    },
-                )
-
-                await browser.close()
-                return pdf_bytes
+            return await pdf_browser_pool_service.render_pdf(
+                html_content,
+                format="A4",
+                print_background=True,
+                margin={
+                    "top": "20mm",
+                    "right": "15mm",
+                    "bottom": "20mm",
+                    "left": "15mm",
+                },
+            )
 
+        except PdfPoolBusyError:
+            # Sobrecarga: propaga para o endpoint responder 503 em vez de cair no fallback.
+            raise
         except Exception as error:
             print(f"ERRO ao gerar PDF: {error}")
             return None
 
-    def _generate_html(self, contrato: Contrato) -> str:
+    def _generate_html(
+        self,
+        contrato: Contrato,
+        inline_assets: bool = False,
+        block_cache: Optional[MutableMapping[Any, str]] = None,
+    ) -> str:
         template_id = str(contrato.template_id or "").lower()
-        template_data = self._load_template_json(template_id) or {}
+        compiled = get_compiled_template(template_id)
+        template_data = compiled.payload if compiled else {}
 
         subtitle = self._normalize_mojibake_text(
             str(template_data.get("subtitulo") or ""),
@@ -405,11 +647,16 @@ class PDFService:
         )
 
         clauses = template_data.get("clausulas") if isinstance(template_data.get("clausulas"), list) else []
-        clauses_html = self._render_clauses_html(contrato, clauses)
+        clauses_html = self._render_clauses_html(
+            contrato,
+            clauses,
+            fragments=compiled.fragments if compiled else None,
+            block_cache=block_cache,
+        )
         annexes = template_data.get("anexos_fixos") if isinstance(template_data.get("anexos_fixos"), list) else []
         if not annexes:
             annexes = list_fixed_annexes_for_template(template_id)
-        annexes_html = self._render_annexes_html(contrato, annexes)
+        annexes_html = self._render_annexes_html(contrato, annexes, block_cache)
         dados_extras = contrato.dados_extras if isinstance(contrato.dados_extras, dict) else {}
         extras_html = "".join(
             f"<p><strong>{html.escape(str(key).replace('_', ' ').title())}:</strong> {html.escape(str(value))}</p>"
@@ -417,10 +664,18 @@ class PDFService:
             if key != "forma_pagamento" and value is not None and str(value).strip()
         )
 
-        logo_data_uri = self._load_logo_data_uri()
+        logo_asset = pdf_asset_registry.get(LOGO_ASSET_ID)
+        css_asset = pdf_asset_registry.get(CSS_ASSET_ID)
+        if inline_assets:
+            logo_src = logo_asset.data_uri if logo_asset else None
+            styles_html = f"<style>{css_asset.text()}</style>"
+        else:
+            # Assets por referencia: o pool do Playwright serve as URLs da memoria.
+            logo_src = pdf_asset_registry.url(LOGO_ASSET_ID) if logo_asset else None
+            styles_html = f'<link rel="stylesheet" href="{pdf_asset_registry.url(CSS_ASSET_ID)}">'
         logo_html = (
-            f'<img src="{logo_data_uri}" alt="FC Soluções Financeiras" />'
-            if logo_data_uri
+            f'<img src="{logo_src}" alt="FC Soluções Financeiras" />'
+            if logo_src
             else '<span style="font-size:20px;font-weight:700">FC</span>'
         )
 
@@ -433,183 +688,7 @@ class PDFService:
         <head>
             <meta charset="UTF-8">
             <title>Contrato {html.escape(str(contrato.numero))}</title>
-            <style>
-                @page {{
-                    size: A4;
-                    margin: 20mm 15mm;
-                }}
-                body {{
-                    font-family: 'Times New Roman', Times, serif;
-                    font-size: 12pt;
-                    line-height: 1.4;
-                    color: #000;
-                    max-width: 210mm;
-                    margin: 0 auto;
-                }}
-                .header-band {{
-                    background: #1e3a5f;
-                    color: #fff;
-                    display: flex;
-                    align-items: center;
-                    gap: 14px;
-                    padding: 10px 14px;
-                    margin-bottom: 18px;
-                }}
-                .header-band .logo {{
-                    width: 88px;
-                    height: 88px;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                    flex-shrink: 0;
-                }}
-                .header-band .logo img {{
-                    width: 100%;
-                    height: 100%;
-                    object-fit: contain;
-                    display: block;
-                }}
-                .header-band h1 {{
-                    margin: 0;
-                    font-size: 22pt;
-                    letter-spacing: 0.2px;
-                    font-weight: 700;
-                    color: #fff;
-                }}
-                .title-section {{
-                    text-align: center;
-                    margin-bottom: 20px;
-                }}
-                .title-section h2 {{
-                    font-size: 16pt;
-                    border-bottom: 2px solid #000;
-                    display: inline-block;
-                    padding-bottom: 5px;
-                    margin: 0;
-                }}
-                .subtitle {{
-                    font-size: 11pt;
-                    color: #333;
-                    margin-top: 8px;
-                }}
-                .contract-info {{
-                    text-align: center;
-                    margin-bottom: 20px;
-                    font-size: 11pt;
-                }}
-                .contract-info span {{
-                    margin: 0 15px;
-                }}
-                .parties {{
-                    display: grid;
-                    grid-template-columns: 1fr 1fr;
-                    gap: 15px;
-                    margin-bottom: 15px;
-                }}
-                .party-box {{
-                    border: 2px solid #000;
-                    padding: 10px;
-                }}
-                .party-box h3 {{
-                    font-size: 11pt;
-                    margin: 0 0 8px 0;
-                    border-bottom: 1px solid #999;
-                    padding-bottom: 3px;
-                }}
-                .party-box p {{
-                    margin: 2px 0;
-                    font-size: 10pt;
-                }}
-                .intro {{
-                    text-align: justify;
-                    margin-bottom: 15px;
-                    font-size: 11pt;
-                }}
-                .clauses {{
-                    text-align: justify;
-                }}
-                .clauses p {{
-                    margin: 8px 0;
-                    text-align: justify;
-                }}
-                .clauses ul {{
-                    margin: 5px 0;
-                    padding-left: 25px;
-                }}
-                .clauses li {{
-                    margin: 3px 0;
-                }}
-                .clause-block {{
-                    margin-bottom: 10px;
-                }}
-                .signatures {{
-                    margin-top: 30px;
-                    display: grid;
-                    grid-template-columns: 1fr 1fr;
-                    gap: 50px;
-                }}
-                .signature {{
-                    text-align: center;
-                }}
-                .signature-line {{
-                    border-top: 1px solid #000;
-                    margin-top: 50px;
-                    padding-top: 5px;
-                }}
-                .witnesses {{
-                    margin-top: 20px;
-                    font-size: 9pt;
-                }}
-                .witness-grid {{
-                    display: grid;
-                    grid-template-columns: 1fr 1fr;
-                    gap: 30px;
-                    margin-top: 10px;
-                }}
-                .footer {{
-                    margin-top: 20px;
-                    padding-top: 10px;
-                    border-top: 1px solid #ccc;
-                    text-align: center;
-                    font-size: 8pt;
-                    color: #666;
-                }}
-                .annex-page {{
-                    page-break-before: always;
-                    break-before: page;
-                    margin-top: 10px;
-                    font-size: 11pt;
-                    text-align: justify;
-                }}
-                .annex-page h2,
-                .annex-page h3,
-                .annex-page h4 {{
-                    margin: 0 0 8px 0;
-                    font-weight: 700;
-                    text-transform: uppercase;
-                }}
-                .annex-page p {{
-                    margin: 8px 0;
-                }}
-                .annex-page ul {{
-                    margin: 6px 0;
-                    padding-left: 24px;
-                }}
-                .annex-page li {{
-                    margin: 3px 0;
-                }}
-                .annex-page blockquote {{
-                    margin: 8px 0;
-                    padding-left: 10px;
-                    border-left: 3px solid #888;
-                    color: #333;
-                }}
-                .annex-page hr {{
-                    border: 0;
-                    border-top: 1px solid #bbb;
-                    margin: 10px 0;
-                }}
-            </style>
+            {styles_html}
         </head>
         <body>
             <div class="header-band">
@@ -695,7 +774,7 @@ class PDFService:
 
             <div class="footer">
                 FC Soluções Financeiras - CNPJ: 57.815.628/0001-62<br>
-                Documento gerado em {datetime.now().strftime('%d/%m/%Y')}
+                Documento emitido em {self._format_contract_date(None, contrato.created_at or datetime.now())}
             </div>
         </body>
         </html>
@@ -0,0 +1,408 @@
+"""
+Busca de clientes e contratos apoiada em indices (pg_trgm + full-text sem acento).
+
+No startup (fora da Vercel) cria, uma vez e sem bloquear escrita (so
+`CREATE INDEX CONCURRENTLY`, nenhum ALTER TABLE que reescreva tabela):
+- `f_unaccent(text)`: wrapper IMMUTABLE do `unaccent` (ou `translate` dos
+  acentos do portugues quando a extensao nao esta disponivel);
+- indice GIN de expressao `to_tsvector('simple', f_unaccent(lower(...)))` em
+  clientes e contratos (full-text sem acento);
+- indices GIN trigram sobre nome/email/numero normalizados (busca "contem" e
+  tolerante a erro de digitacao) e btree funcional nos digitos do documento
+  (`get_by_documento` e prefixo de CPF/CNPJ);
+- btree `(created_at DESC, id DESC)` / `(data_inicio DESC, id DESC)` que
+  sustentam a paginacao por cursor de contratos, clientes e agenda.
+
+Um unico worker/replica roda o bootstrap por vez (`pg_try_advisory_lock`); os
+demais so leem o catalogo e tentam de novo. Indice INVALID so e descartado
+quando nenhum backend esta construindo (`pg_stat_progress_create_index`).
+
+`build_search` devolve filtro + score de relevancia usando exatamente as
+expressoes indexadas. Enquanto os indices nao existem (ou sem Postgres com as
+extensoes) cai no `ILIKE '%termo%'` original. `build_name_match` faz o mesmo
+para resolver um nome aproximado (VIVA), pontuando por palavra.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import re
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, literal, literal_column, or_, text
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.db.session import engine
+from app.models.cliente import Cliente
+from app.models.contrato import Contrato
+
+
+SEARCH_MODES = ("contains", "prefix")
+
+_ACCENTED = "áàâãäåéèêëíìîïóòôõöúùûüçñý"
+_PLAIN = "aaaaaaeeeeiiiiooooouuuucny"
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MIN_DIGITS = 3
+_MAX_NAME_TOKENS = 8
+# pg_try_advisory_lock: um unico worker/replica roda o bootstrap por vez.
+_BOOTSTRAP_LOCK_KEY = 7_310_452_118
+# Worker que encontrou o lock ocupado tenta de novo depois desse intervalo.
+_BOOTSTRAP_RETRY_SECONDS = 30.0
+
+
+def document_digits(column: Any) -> ColumnElement:
+    """`regexp_replace(col, '[^0-9]', '', 'g')` com constantes literais (casa com o indice funcional)."""
+    return func.regexp_replace(column, literal_column("'[^0-9]'"), literal_column("''"), literal_column("'g'"))
+
+
+def normalize_term(value: str) -> str:
+    """Mesmo resultado de `f_unaccent(lower(...))` no banco, em Python."""
+    decomposed = unicodedata.normalize("NFKD", str(value or "").lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.split())
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _unaccent_lower(column: Any) -> ColumnElement:
+    return func.f_unaccent(func.lower(column))
+
+
+@dataclass(frozen=True)
+class _Target:
+    table: str
+    nome: Any
+    documento_digits: Any
+    extras: Tuple[Any, ...]
+    legacy: Tuple[Any, ...]
+    tsv_source: str
+
+
+_TARGETS: Dict[str, _Target] = {
+    "clientes": _Target(
+        table="clientes",
+        nome=Cliente.nome,
+        documento_digits=document_digits(Cliente.documento),
+        extras=(func.lower(Cliente.email),),
+        legacy=(Cliente.nome, Cliente.documento, Cliente.email),
+        tsv_source="coalesce({t}nome, '') || ' ' || coalesce({t}email, '') || ' ' || coalesce({t}documento, '')",
+    ),
+    "contratos": _Target(
+        table="contratos",
+        nome=Contrato.contratante_nome,
+        # Documento ja e gravado so com digitos (ContratoService._normalize_document).
+        documento_digits=Contrato.contratante_documento,
+        extras=(func.lower(Contrato.numero),),
+        legacy=(Contrato.contratante_nome, Contrato.numero, Contrato.contratante_documento),
+        tsv_source=(
+            "coalesce({t}contratante_nome, '') || ' ' || coalesce({t}numero, '') || ' ' "
+            "|| coalesce({t}contratante_documento, '')"
+        ),
+    ),
+}
+
+# (nome, tabela, expressao) - expressoes identicas as usadas em build_search.
+_TRGM_INDEXES = (
+    ("idx_clientes_nome_trgm", "clientes", "f_unaccent(lower(nome)) gin_trgm_ops"),
+    ("idx_clientes_email_trgm", "clientes", "lower(email) gin_trgm_ops"),
+    ("idx_clientes_documento_digits_trgm", "clientes", "regexp_replace(documento, '[^0-9]', '', 'g') gin_trgm_ops"),
+    ("idx_contratos_nome_trgm", "contratos", "f_unaccent(lower(contratante_nome)) gin_trgm_ops"),
+    ("idx_contratos_numero_trgm", "contratos", "lower(numero) gin_trgm_ops"),
+    ("idx_contratos_documento_trgm", "contratos", "contratante_documento gin_trgm_ops"),
+)
+_BTREE_INDEXES = (
+    ("idx_clientes_documento_digits", "clientes", "regexp_replace(documento, '[^0-9]', '', 'g') text_pattern_ops"),
+    ("idx_contratos_documento_prefix", "contratos", "contratante_documento text_pattern_ops"),
+    # Nao e de busca: MIN/MAX por cliente nos deltas de cliente_metrics_service.
+    ("idx_contratos_cliente_created", "contratos", "cliente_id, created_at"),
+    # Keyset de pagination_service: mesma ordem do ORDER BY das listagens.
+    ("idx_contratos_created_id", "contratos", "created_at DESC, id DESC"),
+    ("idx_clientes_created_id", "clientes", "created_at DESC, id DESC"),
+    ("idx_agenda_data_inicio_id", "agenda", "data_inicio DESC, id DESC"),
+)
+
+
+def _tsv_sql(target: _Target, qualifier: str = "") -> str:
+    """Expressao do tsvector; no DDL sem qualificar, na consulta com `tabela.`."""
+    return f"to_tsvector('simple'::regconfig, f_unaccent(lower({target.tsv_source.format(t=qualifier)})))"
+
+
+# Indice de expressao (nao coluna gerada): ADD COLUMN ... STORED reescreveria a
+# tabela sob ACCESS EXCLUSIVE. A consulta usa a mesma expressao para casar.
+_TSV_INDEXES = tuple(
+    (f"idx_{target.table}_search_tsv_expr", target.table, f"({_tsv_sql(target)})")
+    for target in _TARGETS.values()
+)
+
+
+class SearchIndexService:
+    def __init__(self) -> None:
+        self.trgm_ready = False
+        self.tsv_ready = False
+        # f_unaccent existe no banco (com ou sem a extensao unaccent).
+        self.unaccent_ready = False
+        self.unaccent_extension = False
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # DDL
+    # ------------------------------------------------------------------
+    @staticmethod
+    async def _try(conn: Any, sql: str) -> bool:
+        try:
+            await conn.execute(text(sql))
+            return True
+        except Exception as exc:
+            logging.warning("Busca: DDL ignorado (%s): %s", exc.__class__.__name__, sql.split("(")[0].strip())
+            return False
+
+    @staticmethod
+    async def _index_state(conn: Any, name: str) -> Tuple[Optional[bool], bool]:
+        """(indisvalid ou None se nao existe, build em andamento em outro backend)."""
+        result = await conn.execute(
+            text(
+                """
+                SELECT i.indisvalid,
+                       EXISTS (
+                           SELECT 1 FROM pg_stat_progress_create_index p
+                           WHERE p.index_relid = i.indexrelid
+                       ) AS building
+                FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = :name
+                """
+            ),
+            {"name": name},
+        )
+        row = result.first()
+        if row is None:
+            return None, False
+        return bool(row[0]), bool(row[1])
+
+    async def _create_index(self, conn: Any, name: str, table: str, expression: str, method: str) -> bool:
+        valid, building = await self._index_state(conn, name)
+        if valid:
+            return True
+        if building:
+            # INVALID porque ainda esta sendo construido (migration manual, outro processo).
+            return False
+        if valid is False:
+            # CONCURRENTLY que falhou deixa indice INVALID: remove antes de tentar de novo.
+            await self._try(conn, f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        return await self._try(
+            conn,
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING {method} ({expression})",
+        )
+
+    async def ensure_indexes(self) -> Dict[str, Any]:
+        """Cria funcao e indices (idempotente). Roda em autocommit.
+
+        Serializado entre workers por advisory lock; quem nao pega o lock so le o
+        estado atual (`skipped`) e deve tentar de novo mais tarde.
+        """
+        started = time.monotonic()
+        async with engine.connect() as raw_conn:
+            conn = await raw_conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _BOOTSTRAP_LOCK_KEY})
+            if not locked.scalar():
+                await self._refresh_state(conn)
+                self._last_run = {
+                    "skipped": True,
+                    "trgm": self.trgm_ready,
+                    "tsv": self.tsv_ready,
+                    "unaccent_ready": self.unaccent_ready,
+                    "duration_seconds": round(time.monotonic() - started, 2),
+                }
+                return dict(self._last_run)
+            try:
+                await self._bootstrap(conn)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _BOOTSTRAP_LOCK_KEY})
+
+        self._last_run = {
+            "skipped": False,
+            "trgm": self.trgm_ready,
+            "tsv": self.tsv_ready,
+            "unaccent_ready": self.unaccent_ready,
+            "unaccent_extension": self.unaccent_extension,
+            "duration_seconds": round(time.monotonic() - started, 2),
+        }
+        return dict(self._last_run)
+
+    async def _refresh_state(self, conn: Any) -> None:
+        """Flags a partir do catalogo, sem DDL (outro worker esta no bootstrap)."""
+        result = await conn.execute(text("SELECT 1 FROM pg_proc WHERE proname = 'f_unaccent'"))
+        self.unaccent_ready = result.scalar_one_or_none() is not None
+        valid = {}
+        for name, _, _ in _TSV_INDEXES + _TRGM_INDEXES:
+            valid[name] = (await self._index_state(conn, name))[0] is True
+        self.tsv_ready = all(valid[name] for name, _, _ in _TSV_INDEXES)
+        self.trgm_ready = all(valid[name] for name, _, _ in _TRGM_INDEXES)
+
+    async def _bootstrap(self, conn: Any) -> None:
+        trgm = await self._try(conn, "CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        self.unaccent_extension = await self._try(conn, "CREATE EXTENSION IF NOT EXISTS unaccent")
+
+        result = await conn.execute(text("SELECT 1 FROM pg_proc WHERE proname = 'f_unaccent'"))
+        if result.scalar_one_or_none() is None:
+            # Definida uma unica vez: trocar o corpo exigiria recriar os indices.
+            body = (
+                "SELECT public.unaccent('public.unaccent'::regdictionary, $1)"
+                if self.unaccent_extension
+                else f"SELECT translate($1, '{_ACCENTED}', '{_PLAIN}')"
+            )
+            await conn.execute(
+                text(
+                    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+                    f"LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $func$ {body} $func$"
+                )
+            )
+        self.unaccent_ready = True
+
+        tsv = True
+        for name, table, expression in _TSV_INDEXES:
+            tsv = await self._create_index(conn, name, table, expression, "gin") and tsv
+        for name, table, expression in _BTREE_INDEXES:
+            await self._create_index(conn, name, table, expression, "btree")
+        if trgm:
+            for name, table, expression in _TRGM_INDEXES:
+                trgm = await self._create_index(conn, name, table, expression, "gin") and trgm
+        for target in _TARGETS.values():
+            await self._try(conn, f"ANALYZE {target.table}")
+
+        self.trgm_ready, self.tsv_ready = trgm, tsv
+
+    async def start(self) -> None:
+        """Agenda `ensure_indexes` em background (build CONCURRENTLY pode demorar)."""
+        if self._task is not None and not self._task.done():
+            return
+
+        async def runner() -> None:
+            while True:
+                try:
+                    result = await self.ensure_indexes()
+                except Exception:
+                    logging.exception("Falha ao preparar indices de busca")
+                    return
+                if not result.get("skipped"):
+                    return
+                # Outro worker esta construindo: rele o estado depois que ele terminar.
+                await asyncio.sleep(_BOOTSTRAP_RETRY_SECONDS)
+
+        self._task = asyncio.create_task(runner())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+
+    def status(self) -> Dict[str, Any]:
+        return {"trgm_ready": self.trgm_ready, "tsv_ready": self.tsv_ready, "last_run": dict(self._last_run)}
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _legacy(target: _Target, term: str) -> ColumnElement:
+        return or_(*(column.ilike(f"%{term}%") for column in target.legacy))
+
+    def build_search(
+        self,
+        target_name: str,
+        term: str,
+        mode: str = "contains",
+    ) -> Tuple[Optional[ColumnElement], Optional[ColumnElement]]:
+        """(filtro, score) para `term`; score None = sem ranking (fallback)."""
+        target = _TARGETS[target_name]
+        raw = str(term or "").strip()
+        if not raw:
+            return None, None
+        normalized = normalize_term(raw)
+        digits = re.sub(r"\D", "", raw)
+        has_digits = len(digits) >= _MIN_DIGITS
+        tokens = _TOKEN_RE.findall(normalized)
+
+        if mode == "prefix" and self.tsv_ready and tokens:
+            tsv = literal_column(_tsv_sql(target, f"{target.table}."))
+            query = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{token}:*" for token in tokens))
+            conditions: List[ColumnElement] = [tsv.op("@@")(query)]
+            rank: ColumnElement = func.ts_rank_cd(tsv, query)
+            if has_digits:
+                doc_prefix = target.documento_digits.like(f"{digits}%")
+                conditions.append(doc_prefix)
+                # Documento com o prefixo digitado sobe para o topo.
+                rank = rank + case((doc_prefix, 1.0), else_=0.0)
+            return or_(*conditions), rank
+
+        if mode == "contains" and self.trgm_ready:
+            name_expr = _unaccent_lower(target.nome)
+            pattern = f"%{_escape_like(normalized)}%"
+            conditions = [name_expr.like(pattern), name_expr.op("%")(normalized)]
+            conditions.extend(extra.like(pattern) for extra in target.extras)
+            if has_digits:
+                conditions.append(target.documento_digits.like(f"%{digits}%"))
+            rank = func.greatest(
+                func.similarity(name_expr, normalized),
+                *(func.similarity(extra, normalized) for extra in target.extras),
+            )
+            return or_(*conditions), rank
+
+        return self._legacy(target, raw), None
+
+    def build_name_match(
+        self,
+        target_name: str,
+        name: Optional[str],
+        tokens: Sequence[str] = (),
+    ) -> Tuple[Optional[ColumnElement], Optional[ColumnElement]]:
+        """(filtro, score) para resolver um nome aproximado.
+
+        Nome igual vale 100, nome contendo o termo 80, e cada palavra soma ate
+        20 (`word_similarity` com pg_trgm, senao 20 quando aparece no nome).
+        `tokens` sao palavras extras (ex.: da mensagem) que entram no mesmo score.
+        """
+        target = _TARGETS[target_name]
+        if self.unaccent_ready or self.trgm_ready:
+            # Sem acento mesmo sem pg_trgm: "Fabio" acha "Fábio".
+            fold, name_expr = normalize_term, _unaccent_lower(target.nome)
+        else:
+            # Sem f_unaccent no banco: compara so em minusculas, com acento.
+            fold, name_expr = (lambda value: " ".join(str(value or "").lower().split())), func.lower(target.nome)
+        normalized = fold(name or "")
+        words = list(dict.fromkeys(
+            token
+            for token in re.findall(r"\w+", normalized) + [fold(item) for item in tokens]
+            if len(token) >= 2
+        ))[:_MAX_NAME_TOKENS]
+        if not normalized and not words:
+            return None, None
+
+        conditions: List[ColumnElement] = []
+        score: ColumnElement = literal(0.0)
+        if normalized:
+            contains = name_expr.like(f"%{_escape_like(normalized)}%")
+            conditions.append(contains)
+            score = score + case((name_expr == normalized, 100.0), (contains, 80.0), else_=0.0)
+        for word in words:
+            word_like = name_expr.like(f"%{_escape_like(word)}%")
+            if self.trgm_ready:
+                # `<%` usa o indice trigram; tolera erro de digitacao na palavra.
+                conditions.extend([word_like, literal(word).op("<%")(name_expr)])
+                score = score + func.word_similarity(word, name_expr) * 20.0
+            else:
+                conditions.append(word_like)
+                score = score + case((word_like, 20.0), else_=0.0)
+        return or_(*conditions), score
+
+
+search_index_service = SearchIndexService()
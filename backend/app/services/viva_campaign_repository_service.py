@@ -11,6 +11,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.cofre_memory_service import cofre_memory_service
+from app.services.pagination_service import next_cursor, page_request, resolve_total
 
 
 class VivaCampaignRepositoryService:
@@ -52,6 +53,14 @@ class VivaCampaignRepositoryService:
                 """
             )
         )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_viva_campanhas_user_created_id
+                ON viva_campanhas(user_id, created_at DESC, id DESC)
+                """
+            )
+        )
 
     async def save_campaign(
         self,
@@ -150,17 +159,39 @@ class VivaCampaignRepositoryService:
         limit: int,
         offset: int,
     ) -> Tuple[List[Any], int]:
+        rows, total, _ = await self.list_campaign_page(db, user_id, modo, limit, offset)
+        return rows, int(total or 0)
+
+    async def list_campaign_page(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        modo: Optional[str],
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        total_mode: Optional[str] = None,
+    ) -> Tuple[List[Any], Optional[int], Optional[str]]:
+        """(linhas, total, proximo cursor); com `cursor` usa keyset em (created_at, id)."""
         await self.ensure_table(db)
-        params: Dict[str, Any] = {
-            "user_id": str(user_id),
-            "limit": min(max(limit, 1), 200),
-            "offset": max(offset, 0),
-        }
+        safe_limit = min(max(limit, 1), 200)
+        page_req = page_request(1, safe_limit, cursor, total_mode)
+        params: Dict[str, Any] = {"user_id": str(user_id)}
 
         where_clause = "WHERE user_id = :user_id"
         if modo in ("FC", "REZETA", "NEUTRO"):
             where_clause += " AND modo = :modo"
             params["modo"] = modo
+        filter_params = dict(params)
+
+        page_clause = "OFFSET :offset"
+        if page_req.cursor:
+            where_clause += " AND (created_at, id) < (:cursor_value, :cursor_id)"
+            params["cursor_value"], params["cursor_id"] = page_req.cursor
+            page_clause = ""
+        else:
+            params["offset"] = max(offset, 0)
+        params["limit"] = safe_limit + 1
 
         rows_result = await db.execute(
             text(
@@ -168,26 +199,30 @@ class VivaCampaignRepositoryService:
                 SELECT id, modo, titulo, briefing, mensagem_original, image_url, overlay_json, meta_json, created_at
                 FROM viva_campanhas
                 {where_clause}
-                ORDER BY created_at DESC
-                LIMIT :limit OFFSET :offset
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit {page_clause}
                 """
             ),
             params,
         )
         rows = list(rows_result.fetchall())
 
-        count_result = await db.execute(
-            text(
-                f"""
-                SELECT COUNT(*) AS total
-                FROM viva_campanhas
-                {where_clause}
-                """
-            ),
-            {k: v for k, v in params.items() if k in ("user_id", "modo")},
-        )
-        total = int(count_result.scalar() or 0)
-        return rows, total
+        async def count() -> int:
+            count_result = await db.execute(
+                text(
+                    f"""
+                    SELECT COUNT(*) AS total
+                    FROM viva_campanhas
+                    WHERE user_id = :user_id{" AND modo = :modo" if "modo" in filter_params else ""}
+                    """
+                ),
+                filter_params,
+            )
+            return int(count_result.scalar() or 0)
+
+        total = await resolve_total(page_req, ("viva_campanhas", str(user_id), modo), count)
+        cursor_next = next_cursor(rows, safe_limit, lambda row: (row.created_at, row.id))
+        return rows[:safe_limit], total, cursor_next
 
     async def get_campaign_row_by_id(
         self,
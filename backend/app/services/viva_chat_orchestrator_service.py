@@ -3,8 +3,9 @@
 Extrai a orquestracao pesada do endpoint /chat para reduzir acoplamento em rota.
 """
 
+from dataclasses import dataclass
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from uuid import UUID, uuid4
 from datetime import datetime, timedelta, timezone
 
@@ -197,9 +198,28 @@ def _should_generate_pending_campaign_followup(
     return _is_generation_confirmation(message)
 
 
+@dataclass
+class _StreamingLLMReply:
+    """Fallback LLM adiado: o wrapper SSE transmite os tokens e depois finaliza."""
+
+    messages: List[Dict[str, Any]]
+    complete: Callable[[str], Awaitable[ChatResponse]]
+    local_fallback: Callable[[], Awaitable[str]]
+
+
 class VivaChatOrchestratorService:
-    async def handle_chat_with_viva(self, request: Any, current_user: Any, db: Any):
-        """Chat direto com a VIVA usando OpenAI como provedor institucional."""
+    async def handle_chat_with_viva(
+        self,
+        request: Any,
+        current_user: Any,
+        db: Any,
+        stream_llm: bool = False,
+    ):
+        """Chat direto com a VIVA usando OpenAI como provedor institucional.
+
+        Com `stream_llm=True`, intents deterministicas respondem normalmente e o
+        fallback LLM retorna `_StreamingLLMReply` para streaming token a token.
+        """
         try:
             await ensure_chat_tables(db)
 
@@ -273,7 +293,7 @@ class VivaChatOrchestratorService:
                 db=db,
                 user_id=current_user.id,
                 session_id=session_id,
-                # Menor janela reduz latencia do prompt (streaming ainda pendente).
+                # Menor janela reduz latencia do prompt.
                 limit=90,
             )
             contexto_efetivo = context_from_snapshot(snapshot)
@@ -951,9 +971,43 @@ class VivaChatOrchestratorService:
                     )
                 return await finalize(resposta="A imagem foi solicitada, mas a API nao retornou URL.")
 
+            async def local_fallback() -> str:
+                messages_local = viva_local_service.build_messages(request.mensagem, contexto_efetivo)
+                return await viva_local_service.chat(messages_local, modo)
+
+            async def complete_llm_reply(resposta: str) -> ChatResponse:
+                resposta = _sanitize_fake_asset_delivery_reply(resposta, modo)
+                safe_resposta = _ensure_fabio_greeting(request.mensagem, resposta)
+                normalized_safe = _normalize_key(safe_resposta)
+                agenda_operation_requested = bool(
+                    agenda_query_intent
+                    or agenda_created
+                    or agenda_checked
+                    or agenda_command is not None
+                    or agenda_natural_command is not None
+                )
+                if (
+                    agenda_operation_requested
+                    and not agenda_created
+                    and _mentions_agenda_creation_confirmation(normalized_safe)
+                ):
+                    safe_resposta = (
+                        "Nao consegui confirmar criacao de compromisso na agenda. "
+                        "Informe data e hora exatas (DD/MM/AAAA HH:MM) que eu executo novamente."
+                    )
+                elif agenda_operation_requested and not agenda_checked and any(
+                    token in normalized_safe
+                    for token in ("consultei sua agenda", "calendario checado", "nao ha compromissos")
+                ):
+                    safe_resposta = (
+                        "Nao consegui confirmar a consulta da agenda com seguranca agora. "
+                        "Posso tentar novamente em seguida."
+                    )
+
+                return await finalize(resposta=safe_resposta)
+
             if not settings.OPENAI_API_KEY:
-                messages = viva_local_service.build_messages(request.mensagem, contexto_efetivo)
-                resposta = await viva_local_service.chat(messages, modo)
+                resposta = await local_fallback()
             else:
                 messages = _build_viva_concierge_messages(
                     mensagem=request.mensagem,
@@ -962,6 +1016,12 @@ class VivaChatOrchestratorService:
                     memory_context=memory_context,
                 )
                 await _release_db_before_remote_call(db)
+                if stream_llm:
+                    return _StreamingLLMReply(
+                        messages=messages,
+                        complete=complete_llm_reply,
+                        local_fallback=local_fallback,
+                    )
                 resposta = await viva_model_service.chat(
                     messages=messages,
                     # Alguns modelos aceitam somente comportamento padrao (temperature=1).
@@ -969,38 +1029,9 @@ class VivaChatOrchestratorService:
                     max_tokens=220,
                 )
                 if not resposta or resposta.strip().lower().startswith(("erro", "error")):
-                    messages_local = viva_local_service.build_messages(request.mensagem, contexto_efetivo)
-                    resposta = await viva_local_service.chat(messages_local, modo)
-
-            resposta = _sanitize_fake_asset_delivery_reply(resposta, modo)
-            safe_resposta = _ensure_fabio_greeting(request.mensagem, resposta)
-            normalized_safe = _normalize_key(safe_resposta)
-            agenda_operation_requested = bool(
-                agenda_query_intent
-                or agenda_created
-                or agenda_checked
-                or agenda_command is not None
-                or agenda_natural_command is not None
-            )
-            if (
-                agenda_operation_requested
-                and not agenda_created
-                and _mentions_agenda_creation_confirmation(normalized_safe)
-            ):
-                safe_resposta = (
-                    "Nao consegui confirmar criacao de compromisso na agenda. "
-                    "Informe data e hora exatas (DD/MM/AAAA HH:MM) que eu executo novamente."
-                )
-            elif agenda_operation_requested and not agenda_checked and any(
-                token in normalized_safe
-                for token in ("consultei sua agenda", "calendario checado", "nao ha compromissos")
-            ):
-                safe_resposta = (
-                    "Nao consegui confirmar a consulta da agenda com seguranca agora. "
-                    "Posso tentar novamente em seguida."
-                )
+                    resposta = await local_fallback()
 
-            return await finalize(resposta=safe_resposta)
+            return await complete_llm_reply(resposta)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro: {str(e)}")
 
@@ -1014,16 +1045,41 @@ class VivaChatOrchestratorService:
         - Evita divergencia de comportamento entre `/chat` e `/chat/stream`.
         - Garante que intents operacionais (agenda/handoff/consultas de dominio)
           usem a mesma orquestracao deterministica do endpoint canonico.
+        - Somente o fallback LLM e transmitido token a token; memoria e historico
+          sao gravados uma unica vez, apos o fim do stream.
         """
         try:
             response = await self.handle_chat_with_viva(
                 request=request,
                 current_user=current_user,
                 db=db,
+                stream_llm=True,
             )
-            content = str(getattr(response, "resposta", "") or "")
-            yield {"content": content}
-            yield {"done": True, "session_id": str(getattr(response, "session_id", "") or "")}
+            if isinstance(response, _StreamingLLMReply):
+                streamed: List[str] = []
+                async for delta in viva_model_service.chat_stream(
+                    messages=response.messages,
+                    temperature=1.0,
+                    max_tokens=220,
+                ):
+                    if not streamed and delta.strip().lower().startswith(("erro", "error")):
+                        logger.warning("Streaming VIVA falhou antes do primeiro token: %s", delta[:200])
+                        break
+                    streamed.append(delta)
+                    yield {"content": delta}
+                texto = "".join(streamed)
+                if not texto.strip():
+                    texto = await response.local_fallback()
+                    yield {"content": texto}
+                response = await response.complete(texto)
+            else:
+                yield {"content": str(getattr(response, "resposta", "") or "")}
+            # `resposta` traz o texto final apos sanitizacao (ex.: saudacao ajustada).
+            yield {
+                "done": True,
+                "session_id": str(getattr(response, "session_id", "") or ""),
+                "resposta": str(getattr(response, "resposta", "") or ""),
+            }
         except Exception as e:
             logger.error("Erro no streaming VIVA (canonical wrapper): %s", str(e))
             yield {"error": f"Erro: {str(e)}"}
@@ -11,6 +11,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.cofre_memory_service import cofre_memory_service
+from app.services.pagination_service import next_cursor, page_request, resolve_total
 
 
 class VivaChatRepositoryService:
@@ -277,36 +278,66 @@ class VivaChatRepositoryService:
         page: int,
         page_size: int,
     ) -> Tuple[int, List[Any], int, int]:
+        total, rows, safe_page, safe_size, _ = await self.list_sessions_page(db, user_id, page, page_size)
+        return int(total or 0), rows, safe_page, safe_size
+
+    async def list_sessions_page(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        page: int,
+        page_size: int,
+        cursor: Optional[str] = None,
+        total_mode: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[Any], int, int, Optional[str]]:
+        """(total, linhas, pagina, tamanho, proximo cursor); cursor = keyset em (updated_at, id)."""
         safe_page = max(1, page)
         safe_size = max(1, min(page_size, 100))
-        offset = (safe_page - 1) * safe_size
+        page_req = page_request(safe_page, safe_size, cursor, total_mode)
 
-        total_result = await db.execute(
-            text("SELECT COUNT(*) FROM viva_chat_sessions WHERE user_id = :user_id"),
-            {"user_id": str(user_id)},
-        )
-        total = int(total_result.scalar() or 0)
+        async def count() -> int:
+            total_result = await db.execute(
+                text("SELECT COUNT(*) FROM viva_chat_sessions WHERE user_id = :user_id"),
+                {"user_id": str(user_id)},
+            )
+            return int(total_result.scalar() or 0)
+
+        total = await resolve_total(page_req, ("viva_chat_sessions", str(user_id)), count)
+
+        params: Dict[str, Any] = {"user_id": str(user_id), "offset": page_req.offset, "limit": safe_size + 1}
+        keyset_clause = ""
+        if page_req.cursor:
+            keyset_clause = "AND (updated_at, id) < (:cursor_value, :cursor_id)"
+            params["cursor_value"], params["cursor_id"] = page_req.cursor
 
+        # Contagem de mensagens so das sessoes da pagina (nao de todo o historico).
         rows_result = await db.execute(
             text(
-                """
+                f"""
+                WITH page AS (
+                    SELECT id, modo, created_at, updated_at, last_message_at
+                    FROM viva_chat_sessions
+                    WHERE user_id = :user_id {keyset_clause}
+                    ORDER BY updated_at DESC, id DESC
+                    OFFSET :offset LIMIT :limit
+                )
                 SELECT s.id, s.modo, s.created_at, s.updated_at, s.last_message_at,
                        COALESCE(msg.cnt, 0) AS message_count
-                FROM viva_chat_sessions s
+                FROM page s
                 LEFT JOIN (
                     SELECT session_id, COUNT(*) AS cnt
                     FROM viva_chat_messages
-                    WHERE user_id = :user_id
+                    WHERE user_id = :user_id AND session_id IN (SELECT id FROM page)
                     GROUP BY session_id
                 ) msg ON msg.session_id = s.id
-                WHERE s.user_id = :user_id
-                ORDER BY s.updated_at DESC
-                OFFSET :offset LIMIT :limit
+                ORDER BY s.updated_at DESC, s.id DESC
                 """
             ),
-            {"user_id": str(user_id), "offset": offset, "limit": safe_size},
+            params,
         )
-        return total, list(rows_result.fetchall()), safe_page, safe_size
+        rows = list(rows_result.fetchall())
+        cursor_next = next_cursor(rows, safe_size, lambda row: (row.updated_at, row.id))
+        return total, rows[:safe_size], safe_page, safe_size, cursor_next
 
 
 viva_chat_repository_service = VivaChatRepositoryService()
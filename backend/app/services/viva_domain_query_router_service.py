@@ -79,31 +79,6 @@ def _format_optional(value: Any) -> str:
     return text if text else "nao informado"
 
 
-def _find_best_client_match(items: List[Dict[str, Any]], requested_name: str) -> Optional[Dict[str, Any]]:
-    if not items:
-        return None
-    normalized_requested = _normalize_key(requested_name)
-    if not normalized_requested:
-        return items[0]
-
-    def score(item: Dict[str, Any]) -> int:
-        name = _normalize_key(str(item.get("nome") or ""))
-        if not name:
-            return 0
-        if name == normalized_requested:
-            return 100
-        if normalized_requested in name:
-            return 80
-        if name in normalized_requested:
-            return 60
-        request_tokens = set(normalized_requested.split())
-        name_tokens = set(name.split())
-        return len(request_tokens.intersection(name_tokens)) * 10
-
-    ranked = sorted(items, key=score, reverse=True)
-    return ranked[0] if ranked and score(ranked[0]) > 0 else None
-
-
 def _extract_name_from_pending_reference(contexto: List[Dict[str, Any]]) -> Optional[str]:
     for msg in reversed(contexto[-10:]):
         if str(msg.get("tipo") or "") != "ia":
@@ -191,41 +166,19 @@ def _extract_last_client_name_from_context(contexto: List[Dict[str, Any]]) -> Op
     return None
 
 
-def _find_best_client_match_by_message(items: List[Dict[str, Any]], raw_message: str) -> Optional[Dict[str, Any]]:
-    if not items:
-        return None
-    normalized_message = _normalize_key(raw_message or "")
-    if not normalized_message:
-        return None
+_MESSAGE_STOPWORDS = {
+    "que", "pra", "para", "mim", "o", "a", "os", "as", "de", "do", "da", "dos", "das",
+    "e", "tem", "ele", "ela", "isso", "sim", "contrato", "contratos", "cadastro", "dados",
+}
 
-    stopwords = {
-        "que", "pra", "para", "mim", "o", "a", "os", "as", "de", "do", "da", "dos", "das",
-        "e", "tem", "ele", "ela", "isso", "sim", "contrato", "contratos", "cadastro", "dados",
-    }
-    tokens = {
-        token for token in normalized_message.split()
-        if len(token) > 1 and token not in stopwords
-    }
-    if not tokens:
-        return None
 
-    def score(item: Dict[str, Any]) -> int:
-        name = _normalize_key(str(item.get("nome") or ""))
-        if not name:
-            return 0
-        name_tokens = set(name.split())
-        common = len(tokens.intersection(name_tokens))
-        if common <= 0:
-            return 0
-        # Mais peso para sobreposicao de tokens; bonus quando primeiro token coincide.
-        base = common * 20
-        first_name = next(iter(name_tokens), "")
-        if first_name and first_name in tokens:
-            base += 10
-        return base
-
-    ranked = sorted(items, key=score, reverse=True)
-    return ranked[0] if ranked and score(ranked[0]) > 0 else None
+def _message_name_tokens(raw_message: str) -> List[str]:
+    """Palavras da mensagem que podem ser parte do nome do cliente."""
+    normalized_message = _normalize_key(raw_message or "")
+    return [
+        token for token in normalized_message.split()
+        if len(token) > 1 and token not in _MESSAGE_STOPWORDS
+    ]
 
 
 def _format_client_detail(item: Dict[str, Any]) -> str:
@@ -333,20 +286,14 @@ async def _resolve_client_from_message(
     ):
         requested_name = _extract_last_client_name_from_context(contexto_efetivo)
 
-    items: List[Dict[str, Any]] = []
-    if requested_name:
-        payload = await cliente_service.list(search=requested_name, page=1, page_size=200)
-        items = list(payload.get("items", []))
-    if not items:
-        payload = await cliente_service.list(search=None, page=1, page_size=200)
-        items = list(payload.get("items", []))
-    if not items:
-        return None
-
-    best = _find_best_client_match(items, requested_name or "") if requested_name else None
-    if not best:
-        best = _find_best_client_match_by_message(items, message)
-    return best
+    # Uma query: nome pedido (peso maior) + palavras da mensagem, ranqueados no banco.
+    candidates = await cliente_service.resolve(
+        requested_name,
+        tokens=_message_name_tokens(message),
+        limit=5,
+    )
+    best = candidates[0] if candidates else None
+    return best if best and float(best.get("score") or 0) > 0 else None
 
 
 class VivaDomainQueryRouterService:
@@ -0,0 +1,370 @@
+"""
+Gerenciador do indice ANN (pgvector) de `viva_memory_vectors`.
+
+- Metodo configuravel: HNSW ou IVFFlat (`lists` recalculado pelo volume).
+  Tabela vazia/pequena recebe um HNSW inicial no `ensure_storage`; o IVFFlat
+  so e construido depois de `VIVA_MEMORY_ANN_IVFFLAT_MIN_ROWS` linhas.
+- Rebuild com CREATE INDEX CONCURRENTLY em background (sem travar escrita),
+  trocando o indice antigo so depois do novo ficar valido.
+- Parametros por consulta (`ivfflat.probes` / `hnsw.ef_search`) via SET LOCAL.
+- Saude do indice e recall amostral contra busca exata para o endpoint de manutencao.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal, engine
+
+
+INDEX_NAME = "idx_viva_memory_embedding_ann"
+_BUILD_NAME = f"{INDEX_NAME}_build"
+_SUPPORTED_METHODS = ("hnsw", "ivfflat")
+_LISTS_RE = re.compile(r"lists\s*=\s*'?(\d+)")
+_HNSW_M_RE = re.compile(r"\bm\s*=\s*'?(\d+)")
+
+
+def recommended_lists(rows: int) -> int:
+    """Heuristica do pgvector: rows/1000 ate 1M linhas, sqrt(rows) acima."""
+    rows = max(0, int(rows))
+    if rows <= 1_000_000:
+        value = rows // 1000
+    else:
+        value = int(math.sqrt(rows))
+    return max(1, min(32768, value))
+
+
+def recommended_probes(lists: int) -> int:
+    return max(1, int(round(math.sqrt(max(1, int(lists))))))
+
+
+def parse_index_options(definition: str) -> Dict[str, int]:
+    options: Dict[str, int] = {}
+    clean = str(definition or "")
+    match = _LISTS_RE.search(clean)
+    if match:
+        options["lists"] = int(match.group(1))
+    match = _HNSW_M_RE.search(clean)
+    if match:
+        options["m"] = int(match.group(1))
+    return options
+
+
+class VivaMemoryIndexService:
+    def __init__(self) -> None:
+        method = str(settings.VIVA_MEMORY_ANN_METHOD or "ivfflat").strip().lower()
+        self.method = method if method in _SUPPORTED_METHODS else "ivfflat"
+        self.hnsw_m = max(2, int(settings.VIVA_MEMORY_ANN_HNSW_M))
+        self.hnsw_ef_construction = max(4, int(settings.VIVA_MEMORY_ANN_HNSW_EF_CONSTRUCTION))
+        self.hnsw_ef_search = max(1, int(settings.VIVA_MEMORY_ANN_HNSW_EF_SEARCH))
+        self.ivfflat_probes = max(0, int(settings.VIVA_MEMORY_ANN_IVFFLAT_PROBES))
+        self.ivfflat_min_rows = max(0, int(settings.VIVA_MEMORY_ANN_IVFFLAT_MIN_ROWS))
+        self.lists_drift = max(1.1, float(settings.VIVA_MEMORY_ANN_LISTS_DRIFT))
+        self.maintenance_interval_seconds = max(60, int(settings.VIVA_MEMORY_ANN_MAINTENANCE_INTERVAL_SECONDS))
+        # Estado do indice ativo (atualizado a cada inspecao).
+        self._active_method: Optional[str] = None
+        self._active_lists: Optional[int] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._last_rebuild: Dict[str, Any] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
+    # ------------------------------------------------------------------
+    # Parametros por consulta
+    # ------------------------------------------------------------------
+    def search_settings_sql(self) -> List[str]:
+        """SET LOCAL para a transacao da busca (valores inteiros, sem bind)."""
+        method = self._active_method or self.method
+        if method == "hnsw":
+            return [f"SET LOCAL hnsw.ef_search = {int(self.hnsw_ef_search)}"]
+        probes = self.ivfflat_probes or recommended_probes(self._active_lists or 1)
+        return [f"SET LOCAL ivfflat.probes = {int(probes)}"]
+
+    async def apply_search_settings(self, db: AsyncSession) -> None:
+        for statement in self.search_settings_sql():
+            await db.execute(text(statement))
+
+    # ------------------------------------------------------------------
+    # Inspecao e plano
+    # ------------------------------------------------------------------
+    async def inspect(self, db: AsyncSession) -> Dict[str, Any]:
+        result = await db.execute(
+            text(
+                """
+                SELECT c.relname AS name,
+                       am.amname AS method,
+                       i.indisvalid AS valid,
+                       pg_get_indexdef(i.indexrelid) AS definition,
+                       pg_relation_size(i.indexrelid) AS size_bytes
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE i.indrelid = 'viva_memory_vectors'::regclass
+                  AND am.amname IN ('hnsw', 'ivfflat')
+                ORDER BY c.relname
+                """
+            )
+        )
+        indexes = []
+        for row in result.mappings().all():
+            item = dict(row)
+            item.update(parse_index_options(item.get("definition") or ""))
+            indexes.append(item)
+
+        estimate = await db.execute(
+            text("SELECT reltuples::BIGINT FROM pg_class WHERE oid = 'viva_memory_vectors'::regclass")
+        )
+        rows = int(estimate.scalar() or 0)
+        if rows <= 0:
+            # Tabela nunca analisada (reltuples = -1/0): conta exata.
+            count = await db.execute(text("SELECT COUNT(*) FROM viva_memory_vectors"))
+            rows = int(count.scalar() or 0)
+
+        active = next((item for item in indexes if item.get("valid") and item["name"] != _BUILD_NAME), None)
+        self._active_method = active["method"] if active else None
+        self._active_lists = active.get("lists") if active else None
+        return {"rows": rows, "indexes": indexes, "active": active}
+
+    def plan(self, state: Dict[str, Any], method: Optional[str] = None) -> Dict[str, Any]:
+        """Decide entre none/create/rebuild a partir do estado inspecionado."""
+        target = method or self.method
+        rows = int(state.get("rows") or 0)
+        indexes = [item for item in state.get("indexes") or [] if item["name"] != _BUILD_NAME]
+        lists = recommended_lists(rows) if target == "ivfflat" else None
+        base = {"method": target, "rows": rows, "lists": lists}
+
+        if target == "ivfflat" and rows < self.ivfflat_min_rows:
+            # IVFFlat precisa de dados para treinar os centroides: ate o volume
+            # minimo a tabela fica com um HNSW inicial (barato com poucas linhas).
+            initial = {**base, "method": "hnsw", "lists": None}
+            if not indexes:
+                return {**initial, "action": "create", "reason": "hnsw inicial; ivfflat aguarda volume minimo"}
+            if any(not item.get("valid") for item in indexes):
+                return {**initial, "action": "rebuild", "reason": "indice invalido"}
+            if len(indexes) > 1:
+                return {**initial, "action": "rebuild", "reason": "indices ANN duplicados"}
+            return {**base, "action": "none", "reason": "aguardando volume minimo para ivfflat"}
+        if not indexes:
+            return {**base, "action": "create", "reason": "sem indice ANN"}
+        if any(not item.get("valid") for item in indexes):
+            return {**base, "action": "rebuild", "reason": "indice invalido"}
+        if len(indexes) > 1:
+            return {**base, "action": "rebuild", "reason": "indices ANN duplicados"}
+        current = indexes[0]
+        if current["method"] != target:
+            return {**base, "action": "rebuild", "reason": f"metodo {current['method']} -> {target}"}
+        if target == "ivfflat" and rows >= self.ivfflat_min_rows:
+            current_lists = int(current.get("lists") or 0) or 1
+            ratio = max(current_lists, lists) / min(current_lists, lists)
+            if ratio >= self.lists_drift:
+                return {**base, "action": "rebuild", "reason": f"lists {current_lists} -> {lists}"}
+        if target == "hnsw" and int(current.get("m") or self.hnsw_m) != self.hnsw_m:
+            return {**base, "action": "rebuild", "reason": f"m {current.get('m')} -> {self.hnsw_m}"}
+        return {**base, "action": "none", "reason": "indice adequado"}
+
+    def _index_ddl(self, name: str, plan: Dict[str, Any], concurrently: bool) -> str:
+        mode = "CONCURRENTLY " if concurrently else ""
+        if plan["method"] == "hnsw":
+            options = f"m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction}"
+            return (
+                f"CREATE INDEX {mode}IF NOT EXISTS {name} "
+                f"ON viva_memory_vectors USING hnsw (embedding vector_cosine_ops) WITH ({options})"
+            )
+        return (
+            f"CREATE INDEX {mode}IF NOT EXISTS {name} "
+            f"ON viva_memory_vectors USING ivfflat (embedding vector_cosine_ops) WITH (lists = {int(plan['lists'])})"
+        )
+
+    async def ensure_index(self, db: AsyncSession) -> None:
+        """Chamado no ensure_storage: cria so o indice inicial barato (tabela sem indice ANN).
+
+        IVFFlat precisa de dados para treinar os centroides, entao fica para a manutencao.
+        """
+        state = await self.inspect(db)
+        plan = self.plan(state)
+        if plan["action"] != "create" or plan["method"] != "hnsw":
+            return
+        if state["rows"] > self.ivfflat_min_rows:
+            # Tabela ja volumosa: build bloqueante no startup nao; fica para o rebuild concorrente.
+            return
+        await db.execute(text(self._index_ddl(INDEX_NAME, plan, concurrently=False)))
+        self._active_method, self._active_lists = plan["method"], None
+
+    # ------------------------------------------------------------------
+    # Rebuild concorrente
+    # ------------------------------------------------------------------
+    @property
+    def rebuild_running(self) -> bool:
+        return self._rebuild_task is not None and not self._rebuild_task.done()
+
+    def schedule_rebuild(self, plan: Dict[str, Any]) -> bool:
+        if self.rebuild_running:
+            return False
+        self._rebuild_task = asyncio.create_task(self._rebuild(plan))
+        return True
+
+    async def _rebuild(self, plan: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        self._last_rebuild = {"status": "running", "plan": plan, "started_at": time.time()}
+        try:
+            # CONCURRENTLY nao roda dentro de transacao: conexao dedicada em autocommit.
+            async with engine.connect() as raw_conn:
+                conn = await raw_conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {_BUILD_NAME}"))
+                await conn.execute(text(self._index_ddl(_BUILD_NAME, plan, concurrently=True)))
+                result = await conn.execute(
+                    text(
+                        """
+                        SELECT c.relname
+                        FROM pg_index i
+                        JOIN pg_class c ON c.oid = i.indexrelid
+                        JOIN pg_am am ON am.oid = c.relam
+                        WHERE i.indrelid = 'viva_memory_vectors'::regclass
+                          AND am.amname IN ('hnsw', 'ivfflat')
+                          AND c.relname <> :build_name
+                        """
+                    ),
+                    {"build_name": _BUILD_NAME},
+                )
+                for row in result.fetchall():
+                    await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{row.relname}"'))
+                await conn.execute(text(f"ALTER INDEX {_BUILD_NAME} RENAME TO {INDEX_NAME}"))
+                await conn.execute(text("ANALYZE viva_memory_vectors"))
+            self._active_method = plan["method"]
+            self._active_lists = plan.get("lists")
+            self._last_rebuild.update(
+                {"status": "done", "duration_seconds": round(time.monotonic() - started, 2)}
+            )
+            logging.info("Indice ANN da memoria VIVA reconstruido: %s", plan)
+        except asyncio.CancelledError:
+            self._last_rebuild.update({"status": "cancelled"})
+            raise
+        except Exception as exc:
+            logging.exception("Falha ao reconstruir indice ANN da memoria VIVA")
+            self._last_rebuild.update({"status": "failed", "error": str(exc)[:500]})
+
+    async def maintain(self, force: bool = False, method: Optional[str] = None) -> Dict[str, Any]:
+        """Inspeciona e agenda rebuild quando o plano pedir (ou quando forcado)."""
+        async with AsyncSessionLocal() as db:
+            state = await self.inspect(db)
+            await db.commit()
+        plan = self.plan(state, method=method)
+        scheduled = False
+        if plan["action"] != "none" or force:
+            scheduled = self.schedule_rebuild(plan)
+        return {"plan": plan, "scheduled": scheduled, "rebuild_running": self.rebuild_running}
+
+    # ------------------------------------------------------------------
+    # Saude e recall
+    # ------------------------------------------------------------------
+    async def measure_recall(self, db: AsyncSession, sample_size: int = 10, k: int = 10) -> Dict[str, Any]:
+        """Recall@k do indice contra busca exata, usando vetores da propria tabela como consulta."""
+        sample_size = max(1, min(50, int(sample_size)))
+        k = max(1, min(50, int(k)))
+        sample = await db.execute(
+            text("SELECT id FROM viva_memory_vectors ORDER BY random() LIMIT :limit"),
+            {"limit": sample_size},
+        )
+        probe_ids = [str(row.id) for row in sample.fetchall()]
+        if not probe_ids:
+            return {"sample_size": 0, "k": k, "recall": None}
+
+        knn_sql = text(
+            """
+            SELECT id FROM viva_memory_vectors
+            ORDER BY embedding <=> (SELECT embedding FROM viva_memory_vectors WHERE id = :probe_id)
+            LIMIT :k
+            """
+        )
+        recalls: List[float] = []
+        ann_ms = 0.0
+        exact_ms = 0.0
+        # SET LOCAL sobrevive ao RELEASE do savepoint (so rollback/fim da transacao
+        # desfaz): cada bloco define explicitamente o que precisa.
+        for probe_id in probe_ids:
+            async with db.begin_nested():
+                await db.execute(text("SET LOCAL enable_indexscan = on"))
+                await self.apply_search_settings(db)
+                started = time.perf_counter()
+                ann = await db.execute(knn_sql, {"probe_id": probe_id, "k": k})
+                ann_ids = {str(row.id) for row in ann.fetchall()}
+                ann_ms += (time.perf_counter() - started) * 1000
+            async with db.begin_nested():
+                await db.execute(text("SET LOCAL enable_indexscan = off"))
+                started = time.perf_counter()
+                exact = await db.execute(knn_sql, {"probe_id": probe_id, "k": k})
+                exact_ids = {str(row.id) for row in exact.fetchall()}
+                exact_ms += (time.perf_counter() - started) * 1000
+            if exact_ids:
+                recalls.append(len(ann_ids & exact_ids) / len(exact_ids))
+        await db.execute(text("SET LOCAL enable_indexscan = on"))
+        count = len(probe_ids)
+        return {
+            "sample_size": count,
+            "k": k,
+            "recall": round(sum(recalls) / len(recalls), 4) if recalls else None,
+            "ann_avg_ms": round(ann_ms / count, 2),
+            "exact_avg_ms": round(exact_ms / count, 2),
+        }
+
+    async def health(self, db: AsyncSession, recall_sample: int = 0) -> Dict[str, Any]:
+        state = await self.inspect(db)
+        payload: Dict[str, Any] = {
+            "configured_method": self.method,
+            "rows": state["rows"],
+            "indexes": [
+                {key: value for key, value in item.items() if key != "definition"}
+                for item in state["indexes"]
+            ],
+            "plan": self.plan(state),
+            "search_settings": self.search_settings_sql(),
+            "rebuild_running": self.rebuild_running,
+            "last_rebuild": dict(self._last_rebuild),
+        }
+        if recall_sample > 0 and state["rows"] > 0:
+            payload["recall"] = await self.measure_recall(db, sample_size=recall_sample)
+        return payload
+
+    # ------------------------------------------------------------------
+    # Loop de manutencao
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        if self._maintenance_task is not None and not self._maintenance_task.done():
+            return
+        self._stop.clear()
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def _maintenance_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await self.maintain()
+            except Exception:
+                logging.exception("Falha na manutencao do indice ANN da memoria VIVA")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.maintenance_interval_seconds)
+            except asyncio.TimeoutError:
+                continue
+
+    async def stop(self) -> None:
+        self._stop.set()
+        for task in (self._maintenance_task, self._rebuild_task):
+            if task is None or task.done():
+                continue
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                continue
+        self._maintenance_task = None
+        self._rebuild_task = None
+
+
+viva_memory_index_service = VivaMemoryIndexService()
@@ -0,0 +1,283 @@
+"""
+Job retomavel de reindexacao da memoria longa (viva_chat_messages -> pgvector).
+
+O estado (status, progresso e cursor keyset) fica em `viva_memory_reindex_jobs`;
+cada pagina e indexada e confirmada antes de avancar o cursor, entao um job
+interrompido (deploy/restart) continua de onde parou em `resume_pending()`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.viva_memory_service import viva_memory_service
+
+
+class VivaMemoryReindexService:
+    """Agenda e executa jobs de reindex em background (uma task por job)."""
+
+    ACTIVE_STATUSES = ("pending", "running")
+
+    def __init__(self) -> None:
+        self.page_size = max(1, int(settings.VIVA_MEMORY_REINDEX_PAGE_SIZE))
+        self._table_checked = False
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_table(self, db: AsyncSession) -> None:
+        if self._table_checked:
+            return
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS viva_memory_reindex_jobs (
+                    id UUID PRIMARY KEY,
+                    user_id UUID NOT NULL,
+                    session_id UUID,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    max_messages INTEGER,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    indexed INTEGER NOT NULL DEFAULT 0,
+                    cursor_json JSONB,
+                    error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    started_at TIMESTAMPTZ,
+                    finished_at TIMESTAMPTZ,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_viva_memory_reindex_jobs_user_status
+                ON viva_memory_reindex_jobs(user_id, status)
+                """
+            )
+        )
+        self._table_checked = True
+
+    @staticmethod
+    def _serialize(row: Any) -> Dict[str, Any]:
+        data = dict(row)
+        total = int(data.get("total") or 0)
+        processed = int(data.get("processed") or 0)
+        limit = data.get("max_messages")
+        target = min(total, int(limit)) if limit else total
+        for key in ("id", "user_id", "session_id"):
+            if data.get(key) is not None:
+                data[key] = str(data[key])
+        for key in ("created_at", "started_at", "finished_at", "updated_at"):
+            if data.get(key) is not None:
+                data[key] = data[key].isoformat()
+        data.pop("cursor_json", None)
+        data["progress"] = round(min(1.0, processed / target), 4) if target else (1.0 if data["status"] == "done" else 0.0)
+        return data
+
+    async def _load(self, db: AsyncSession, job_id: Any, user_id: Optional[UUID] = None) -> Optional[Dict[str, Any]]:
+        where = "id = :id"
+        params: Dict[str, Any] = {"id": str(job_id)}
+        if user_id is not None:
+            where += " AND user_id = :user_id"
+            params["user_id"] = str(user_id)
+        result = await db.execute(text(f"SELECT * FROM viva_memory_reindex_jobs WHERE {where}"), params)
+        row = result.mappings().first()
+        return dict(row) if row else None
+
+    async def start_job(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        session_id: Optional[UUID] = None,
+        max_messages: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Cria (ou reaproveita o job ativo do usuario) e agenda a execucao."""
+        await self.ensure_table(db)
+        existing = await db.execute(
+            text(
+                """
+                SELECT * FROM viva_memory_reindex_jobs
+                WHERE user_id = :user_id
+                  AND status IN ('pending', 'running')
+                  AND session_id IS NOT DISTINCT FROM CAST(:session_id AS UUID)
+                ORDER BY created_at DESC
+                LIMIT 1
+                """
+            ),
+            {"user_id": str(user_id), "session_id": str(session_id) if session_id else None},
+        )
+        row = existing.mappings().first()
+        if row:
+            self._schedule(str(row["id"]))
+            return self._serialize(row)
+
+        count_filter = "user_id = :user_id"
+        params: Dict[str, Any] = {"user_id": str(user_id)}
+        if session_id:
+            count_filter += " AND session_id = :session_id"
+            params["session_id"] = str(session_id)
+        total = await db.execute(text(f"SELECT COUNT(*) FROM viva_chat_messages WHERE {count_filter}"), params)
+
+        job_id = uuid4()
+        await db.execute(
+            text(
+                """
+                INSERT INTO viva_memory_reindex_jobs (
+                    id, user_id, session_id, status, max_messages, total, created_at, updated_at
+                ) VALUES (
+                    :id, :user_id, :session_id, 'pending', :max_messages, :total, NOW(), NOW()
+                )
+                """
+            ),
+            {
+                "id": str(job_id),
+                "user_id": str(user_id),
+                "session_id": str(session_id) if session_id else None,
+                "max_messages": int(max_messages) if max_messages else None,
+                "total": int(total.scalar() or 0),
+            },
+        )
+        await db.commit()
+        job = await self._load(db, job_id)
+        self._schedule(str(job_id))
+        return self._serialize(job or {"id": job_id, "status": "pending"})
+
+    async def get_job(self, db: AsyncSession, job_id: UUID, user_id: UUID) -> Optional[Dict[str, Any]]:
+        await self.ensure_table(db)
+        job = await self._load(db, job_id, user_id=user_id)
+        return self._serialize(job) if job else None
+
+    async def cancel_job(self, db: AsyncSession, job_id: UUID, user_id: UUID) -> Optional[Dict[str, Any]]:
+        await self.ensure_table(db)
+        await db.execute(
+            text(
+                """
+                UPDATE viva_memory_reindex_jobs
+                SET status = 'cancelled', finished_at = NOW(), updated_at = NOW()
+                WHERE id = :id AND user_id = :user_id AND status IN ('pending', 'running')
+                """
+            ),
+            {"id": str(job_id), "user_id": str(user_id)},
+        )
+        await db.commit()
+        return await self.get_job(db, job_id, user_id)
+
+    def _schedule(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str) -> None:
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    job = await self._load(db, job_id)
+                    if not job or job["status"] not in self.ACTIVE_STATUSES:
+                        return
+                    cursor = job.get("cursor_json")
+                    if isinstance(cursor, str):
+                        cursor = json.loads(cursor)
+                    processed = int(job.get("processed") or 0)
+                    limit = job.get("max_messages")
+                    page_size = self.page_size
+                    if limit:
+                        page_size = min(page_size, int(limit) - processed)
+                    if page_size <= 0:
+                        await self._finish(db, job_id, "done")
+                        return
+
+                    page = await viva_memory_service.reindex_chat_page(
+                        db=db,
+                        user_id=job["user_id"],
+                        session_id=job.get("session_id"),
+                        cursor=cursor,
+                        page_size=page_size,
+                    )
+                    # Vetores da pagina e avanco do cursor no mesmo commit: retomada sem duplicar.
+                    await db.execute(
+                        text(
+                            """
+                            UPDATE viva_memory_reindex_jobs
+                            SET status = 'running',
+                                started_at = COALESCE(started_at, NOW()),
+                                processed = processed + :processed,
+                                indexed = indexed + :indexed,
+                                cursor_json = CAST(:cursor_json AS JSONB),
+                                updated_at = NOW()
+                            WHERE id = :id AND status IN ('pending', 'running')
+                            """
+                        ),
+                        {
+                            "id": job_id,
+                            "processed": int(page["processed"]),
+                            "indexed": int(page["indexed"]),
+                            "cursor_json": json.dumps(page["cursor"]) if page["cursor"] else None,
+                        },
+                    )
+                    await db.commit()
+                    if not page["cursor"]:
+                        await self._finish(db, job_id, "done")
+                        return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logging.exception("Falha no job de reindex da memoria VIVA: %s", job_id)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self._finish(db, job_id, "failed", error=str(exc))
+            except Exception:
+                return
+
+    async def _finish(self, db: AsyncSession, job_id: str, status: str, error: Optional[str] = None) -> None:
+        await db.execute(
+            text(
+                """
+                UPDATE viva_memory_reindex_jobs
+                SET status = :status, error = :error, finished_at = NOW(), updated_at = NOW()
+                WHERE id = :id AND status IN ('pending', 'running')
+                """
+            ),
+            {"id": job_id, "status": status, "error": (error or None) and error[:2000]},
+        )
+        await db.commit()
+
+    async def resume_pending(self) -> int:
+        """Reagenda jobs interrompidos (chamado no startup)."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.ensure_table(db)
+                result = await db.execute(
+                    text("SELECT id FROM viva_memory_reindex_jobs WHERE status IN ('pending', 'running')")
+                )
+                job_ids = [str(row.id) for row in result.fetchall()]
+                await db.commit()
+        except Exception:
+            return 0
+        for job_id in job_ids:
+            self._schedule(job_id)
+        return len(job_ids)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except BaseException:
+                continue
+
+
+viva_memory_reindex_service = VivaMemoryReindexService()
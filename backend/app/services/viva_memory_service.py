@@ -10,6 +10,7 @@ from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 from uuid import UUID, uuid4
 import json
+import logging
 import re
 
 from redis import asyncio as redis_asyncio
@@ -20,6 +21,10 @@ from app.config import settings
 from app.services.cofre_memory_service import cofre_memory_service
 from app.services.openai_service import openai_service
 from app.services.viva_brain_paths_service import viva_brain_paths_service
+from app.services.viva_memory_index_service import viva_memory_index_service
+
+
+_FLOAT32_FORMAT = "{:.7g}".format
 
 
 class VivaMemoryService:
@@ -27,6 +32,8 @@ class VivaMemoryService:
         self.redis_url = settings.REDIS_URL
         self._redis: Optional[redis_asyncio.Redis] = None
         self.embedding_dim = 1536
+        transfer = str(getattr(settings, "VIVA_MEMORY_VECTOR_TRANSFER", "array") or "array").strip().lower()
+        self.vector_transfer = transfer if transfer in {"array", "text"} else "array"
         self.medium_ttl_seconds = 60 * 60 * 24 * 7
         self.medium_max_items = 40
         self.vector_enabled = False
@@ -110,16 +117,31 @@ class VivaMemoryService:
 
     @staticmethod
     def _vector_literal(embedding: List[float]) -> str:
-        return "[" + ",".join(f"{float(item):.10f}" for item in embedding) + "]"
+        # 7 digitos significativos = precisao float32 do pgvector; zeros viram "0".
+        return "[" + ",".join(map(_FLOAT32_FORMAT, embedding)) + "]"
+
+    def _vector_param(self, embedding: List[float]) -> Any:
+        """Valor do parametro de vetor conforme o modo de transferencia."""
+        if self.vector_transfer == "array":
+            return embedding
+        return self._vector_literal(embedding)
+
+    def _vector_sql(self, param_name: str) -> str:
+        """Expressao SQL do vetor: real[] binario (asyncpg) ou literal texto."""
+        if self.vector_transfer == "array":
+            return f"CAST(CAST(:{param_name} AS REAL[]) AS vector)"
+        return f"CAST(:{param_name} AS vector)"
 
     def _coerce_embedding_dim(self, embedding: Optional[List[float]]) -> Optional[List[float]]:
-        if not embedding:
+        if embedding is None or len(embedding) == 0:
             return None
+        target = int(self.embedding_dim)
+        if isinstance(embedding, list) and len(embedding) == target:
+            return embedding
         vector = [float(item) for item in embedding if item is not None]
         if not vector:
             return None
 
-        target = int(self.embedding_dim)
         if len(vector) > target:
             return vector[:target]
         if len(vector) < target:
@@ -171,9 +193,8 @@ class VivaMemoryService:
                 await db.execute(
                     text(
                         """
-                        CREATE INDEX IF NOT EXISTS idx_viva_memory_embedding_ivfflat
-                        ON viva_memory_vectors USING ivfflat (embedding vector_cosine_ops)
-                        WITH (lists = 100)
+                        CREATE INDEX IF NOT EXISTS idx_viva_memory_message_id
+                        ON viva_memory_vectors((meta_json->>'message_id'))
                         """
                     )
                 )
@@ -181,6 +202,14 @@ class VivaMemoryService:
         except Exception:
             vector_ok = False
 
+        if vector_ok:
+            # Indice ANN (HNSW/IVFFlat) e gerenciado a parte; falha aqui nao desliga a memoria.
+            try:
+                async with db.begin_nested():
+                    await viva_memory_index_service.ensure_index(db)
+            except Exception:
+                logging.exception("Falha ao preparar indice ANN da memoria VIVA")
+
         self.vector_enabled = vector_ok
         self._storage_checked = vector_ok
         redis_ok = bool(await self._get_redis())
@@ -249,59 +278,97 @@ class VivaMemoryService:
         modo: Optional[str],
         meta: Optional[Dict[str, Any]] = None,
     ) -> bool:
+        indexed = await self.append_long_memory_batch(
+            db=db,
+            user_id=user_id,
+            items=[
+                {
+                    "session_id": session_id,
+                    "tipo": tipo,
+                    "conteudo": conteudo,
+                    "modo": modo,
+                    "meta": meta,
+                }
+            ],
+        )
+        return indexed == 1
+
+    async def append_long_memory_batch(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        items: List[Dict[str, Any]],
+    ) -> int:
+        """Indexa varios itens: embeddings em lote + um INSERT multi-linha (executemany)."""
         await self.ensure_storage(db)
         if not self.vector_enabled:
-            return False
-
-        clean = self._clean_text(conteudo)
-        if len(clean) < 12:
-            return False
+            return 0
 
-        embedding = self._coerce_embedding_dim(await openai_service.embed_text(clean))
-        if not embedding:
-            return False
+        prepared: List[Dict[str, Any]] = []
+        for item in items:
+            clean = self._clean_text(item.get("conteudo") or "")
+            if len(clean) < 12:
+                continue
+            prepared.append({**item, "conteudo": clean})
+        if not prepared:
+            return 0
+
+        embeddings = await openai_service.embed_texts([item["conteudo"] for item in prepared])
+        rows: List[Dict[str, Any]] = []
+        sources: List[Dict[str, Any]] = []
+        for item, raw_embedding in zip(prepared, embeddings):
+            embedding = self._coerce_embedding_dim(raw_embedding)
+            if not embedding:
+                continue
+            sources.append(item)
+            rows.append(
+                {
+                    "id": str(uuid4()),
+                    "user_id": str(user_id),
+                    "session_id": str(item["session_id"]),
+                    "tipo": item["tipo"],
+                    "modo": self._normalize_mode(item.get("modo")),
+                    "conteudo": item["conteudo"],
+                    "meta_json": json.dumps(item.get("meta") or {}, ensure_ascii=False),
+                    "embedding": self._vector_param(embedding),
+                }
+            )
+        if not rows:
+            return 0
 
-        normalized_mode = self._normalize_mode(modo)
         try:
             async with db.begin_nested():
                 await db.execute(
                     text(
-                        """
+                        f"""
                         INSERT INTO viva_memory_vectors (
                             id, user_id, session_id, tipo, modo, conteudo, meta_json, embedding, created_at
                         )
                         VALUES (
                             :id, :user_id, :session_id, :tipo, :modo, :conteudo,
-                            CAST(:meta_json AS JSONB), CAST(:embedding AS vector), NOW()
+                            CAST(:meta_json AS JSONB), {self._vector_sql("embedding")}, NOW()
                         )
                         """
                     ),
-                    {
-                        "id": str(uuid4()),
-                        "user_id": str(user_id),
-                        "session_id": str(session_id),
-                        "tipo": tipo,
-                        "modo": normalized_mode,
-                        "conteudo": clean,
-                        "meta_json": json.dumps(meta or {}, ensure_ascii=False),
-                        "embedding": self._vector_literal(embedding),
-                    },
+                    rows,
                 )
+        except Exception:
+            return 0
+
+        for row, item in zip(rows, sources):
             self._append_memory_file_log(
                 table_name="viva_memory_vectors",
                 action="insert",
                 user_id=user_id,
-                session_id=session_id,
-                tipo=tipo,
-                conteudo=clean,
-                modo=normalized_mode,
-                meta=meta or {},
+                session_id=item["session_id"],
+                tipo=row["tipo"],
+                conteudo=row["conteudo"],
+                modo=row["modo"],
+                meta=item.get("meta") or {},
                 medium_ok=False,
                 long_ok=True,
             )
-            return True
-        except Exception:
-            return False
+        return len(rows)
 
     async def append_memory(
         self,
@@ -477,19 +544,21 @@ class VivaMemoryService:
             if embedding:
                 vector_params = {
                     **params,
-                    "query_embedding": self._vector_literal(embedding),
+                    "query_embedding": self._vector_param(embedding),
                     "vector_limit": max(24, min(120, safe_limit * 8)),
                 }
+                query_vector = self._vector_sql("query_embedding")
                 try:
                     async with db.begin_nested():
+                        await viva_memory_index_service.apply_search_settings(db)
                         result = await db.execute(
                             text(
                                 f"""
                                 SELECT id, tipo, modo, conteudo, created_at,
-                                       1 - (embedding <=> CAST(:query_embedding AS vector)) AS score
+                                       1 - (embedding <=> {query_vector}) AS score
                                 FROM viva_memory_vectors
                                 {where}
-                                ORDER BY embedding <=> CAST(:query_embedding AS vector)
+                                ORDER BY embedding <=> {query_vector}
                                 LIMIT :vector_limit
                                 """
                             ),
@@ -643,52 +712,102 @@ class VivaMemoryService:
             return ""
         return "\n".join(unique_lines[:14])
 
-    async def reindex_from_chat_messages(
+    async def reindex_chat_page(
         self,
         db: AsyncSession,
         user_id: UUID,
-        limit: int = 400,
         session_id: Optional[UUID] = None,
-    ) -> Dict[str, int]:
+        cursor: Optional[Dict[str, Any]] = None,
+        page_size: int = 128,
+    ) -> Dict[str, Any]:
+        """Indexa uma pagina de mensagens (keyset created_at/id DESC) ainda nao vetorizadas.
+
+        Retorna `processed`, `indexed` e o `cursor` para a proxima pagina (None no fim).
+        """
         await self.ensure_storage(db)
         if not self.vector_enabled:
-            return {"processed": 0, "indexed": 0}
+            return {"processed": 0, "indexed": 0, "cursor": None}
 
-        safe_limit = max(1, min(limit, 2000))
-        where = "WHERE m.user_id = :user_id"
-        params: Dict[str, Any] = {"user_id": str(user_id), "limit": safe_limit}
+        filters = ["m.user_id = :user_id"]
+        params: Dict[str, Any] = {"user_id": str(user_id), "limit": max(1, min(int(page_size), 1000))}
         if session_id:
-            where += " AND m.session_id = :session_id"
+            filters.append("m.session_id = :session_id")
             params["session_id"] = str(session_id)
+        if cursor and cursor.get("created_at") and cursor.get("id"):
+            filters.append("(m.created_at, m.id) < (CAST(:cursor_created_at AS TIMESTAMPTZ), CAST(:cursor_id AS UUID))")
+            params["cursor_created_at"] = str(cursor["created_at"])
+            params["cursor_id"] = str(cursor["id"])
 
         result = await db.execute(
             text(
                 f"""
-                SELECT m.session_id, m.tipo, m.conteudo, m.modo, m.created_at
+                SELECT m.id, m.session_id, m.tipo, m.conteudo, m.modo, m.created_at,
+                       EXISTS (
+                           SELECT 1 FROM viva_memory_vectors v
+                           WHERE v.meta_json->>'message_id' = CAST(m.id AS TEXT)
+                       ) AS already_indexed
                 FROM viva_chat_messages m
-                {where}
-                ORDER BY m.created_at DESC
+                WHERE {" AND ".join(filters)}
+                ORDER BY m.created_at DESC, m.id DESC
                 LIMIT :limit
                 """
             ),
             params,
         )
+        rows = result.fetchall()
+        if not rows:
+            return {"processed": 0, "indexed": 0, "cursor": None}
 
+        items = [
+            {
+                "session_id": row.session_id,
+                "tipo": row.tipo,
+                "conteudo": row.conteudo,
+                "modo": row.modo,
+                "meta": {
+                    "source": "chat_reindex",
+                    "message_id": str(row.id),
+                    "created_at": str(row.created_at),
+                },
+            }
+            for row in rows
+            if not row.already_indexed
+        ]
+        indexed = await self.append_long_memory_batch(db=db, user_id=user_id, items=items) if items else 0
+        last = rows[-1]
+        next_cursor = {"created_at": last.created_at.isoformat(), "id": str(last.id)}
+        return {
+            "processed": len(rows),
+            "indexed": indexed,
+            "cursor": next_cursor if len(rows) >= params["limit"] else None,
+        }
+
+    async def reindex_from_chat_messages(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        limit: int = 400,
+        session_id: Optional[UUID] = None,
+    ) -> Dict[str, int]:
+        """Reindex sincrono limitado; volumes grandes usam viva_memory_reindex_service."""
+        remaining = max(1, min(limit, 2000))
+        cursor: Optional[Dict[str, Any]] = None
         processed = 0
         indexed = 0
-        for row in result.fetchall():
-            processed += 1
-            ok = await self.append_long_memory(
+        while remaining > 0:
+            page = await self.reindex_chat_page(
                 db=db,
                 user_id=user_id,
-                session_id=row.session_id,
-                tipo=row.tipo,
-                conteudo=row.conteudo,
-                modo=row.modo,
-                meta={"source": "chat_reindex", "created_at": str(row.created_at)},
+                session_id=session_id,
+                cursor=cursor,
+                page_size=min(remaining, openai_service.embedding_batch_size * 2),
             )
-            if ok:
-                indexed += 1
+            processed += page["processed"]
+            indexed += page["indexed"]
+            remaining -= page["processed"]
+            cursor = page["cursor"]
+            if not cursor:
+                break
         return {"processed": processed, "indexed": indexed}
 
     async def memory_status(
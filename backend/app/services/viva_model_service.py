@@ -2,7 +2,7 @@
 VIVA model router service.
 OpenAI-only provider for institutional VIVA operation.
 """
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 from app.config import settings
 from app.services.openai_service import openai_service
@@ -37,6 +37,21 @@ class VivaModelService:
             return result
         return f"Erro: falha no provedor OpenAI. detalhe={result}"
 
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[str]:
+        """Repassa deltas do provedor; erros chegam como texto iniciado por "Erro"."""
+        async for delta in openai_service.chat_stream(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        ):
+            if delta:
+                yield delta
+
     async def audio_transcribe_bytes(
         self,
         audio_bytes: bytes,
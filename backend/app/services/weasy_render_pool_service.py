@@ -0,0 +1,133 @@
+"""
+Renderizacao WeasyPrint fora do event loop, num ProcessPoolExecutor aquecido.
+
+Cada worker importa o WeasyPrint, parseia o CSS institucional e carrega as
+fontes uma unica vez (initializer) e depois so recebe `dados` -> bytes do PDF.
+Timeout ou cancelamento de um render ja em execucao reinicia o pool (processo
+nao pode ser interrompido no meio do layout); renders ainda na fila sao
+simplesmente cancelados. Com `WEASY_POOL_WORKERS=0` usa thread (sem processo).
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor
+import importlib.util
+import logging
+import multiprocessing
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+
+_worker_service: Any = None
+
+
+def _worker_init() -> None:
+    global _worker_service
+    from app.services.pdf_service import PDFService
+
+    _worker_service = PDFService()
+    PDFService._stylesheet()
+
+
+def _worker_ping() -> bool:
+    return _worker_service is not None
+
+
+def _worker_render(dados: Dict[str, Any]) -> bytes:
+    if _worker_service is None:
+        _worker_init()
+    return _worker_service.render_contrato_bacen_bytes(dados)
+
+
+def weasyprint_available() -> bool:
+    return importlib.util.find_spec("weasyprint") is not None
+
+
+class WeasyRenderPoolService:
+    def __init__(self) -> None:
+        self.workers = max(0, int(settings.WEASY_POOL_WORKERS))
+        self.timeout = float(settings.WEASY_RENDER_TIMEOUT_SECONDS)
+        self.start_method = str(settings.WEASY_POOL_START_METHOD or "spawn")
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._counters = {"renders": 0, "failures": 0, "timeouts": 0, "cancelled": 0, "restarts": 0}
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_worker_init,
+            )
+        return self._pool
+
+    async def start(self) -> None:
+        """Sobe e aquece os workers (import + CSS + fontes) antes do primeiro pedido."""
+        if self.workers <= 0 or not weasyprint_available():
+            return
+        pool = self._ensure_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _worker_ping) for _ in range(self.workers)))
+
+    def _restart_pool(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        self._counters["restarts"] += 1
+        # API publica nao mata processo ocupado: encerra os workers diretamente.
+        for process in list(getattr(pool, "_processes", {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                continue
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown, True, cancel_futures=True)
+
+    async def render(self, dados: Dict[str, Any], timeout: Optional[float] = None) -> bytes:
+        """PDF (bytes) do contrato Bacen renderizado fora do event loop."""
+        if not weasyprint_available():
+            raise ModuleNotFoundError("weasyprint")
+        limit = self.timeout if timeout is None else timeout
+
+        if self.workers <= 0:
+            try:
+                result = await asyncio.wait_for(asyncio.to_thread(_worker_render, dados), timeout=limit)
+            except asyncio.TimeoutError:
+                self._counters["timeouts"] += 1
+                raise
+            self._counters["renders"] += 1
+            return result
+
+        future: Future = self._ensure_pool().submit(_worker_render, dados)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=limit)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            key = "timeouts" if isinstance(exc, asyncio.TimeoutError) else "cancelled"
+            self._counters[key] += 1
+            if not future.cancel():
+                # Ja estava executando: unico jeito de liberar o worker e reiniciar o pool.
+                logging.warning("Render WeasyPrint interrompido (%s); reiniciando pool", key)
+                self._restart_pool()
+            raise
+        except Exception:
+            self._counters["failures"] += 1
+            if self._pool is not None and getattr(self._pool, "_broken", False):
+                self._restart_pool()
+            raise
+        self._counters["renders"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "workers": self.workers,
+            "started": self._pool is not None,
+            "available": weasyprint_available(),
+        }
+
+
+weasy_render_pool_service = WeasyRenderPoolService()
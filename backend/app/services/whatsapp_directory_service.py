@@ -0,0 +1,363 @@
+"""
+Diretorio em memoria (TTL + LRU) de instancias, contatos e chats do Evolution.
+
+Evita `fetchInstances`/`findContacts`/`findChats` a cada envio: o
+WhatsAppService consulta o diretorio e so vai ao Evolution em miss/expiracao.
+Eventos de webhook (contacts.*, chats.*, messages.upsert) atualizam as
+entradas incrementalmente. Redis e opcional como segundo nivel entre workers.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime
+import json
+import logging
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from redis import asyncio as redis_asyncio
+
+from app.config import settings
+
+
+Loader = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+def normalize_push_name(nome: Optional[str]) -> str:
+    if not isinstance(nome, str):
+        return ""
+    value = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    return " ".join(value.lower().split())
+
+
+def _parse_iso_datetime(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+class ContactIndex:
+    """Contatos de uma instancia indexados por remoteJid, foto e pushName."""
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        self.by_jid: Dict[str, Dict[str, Any]] = {}
+        self.by_pic: Dict[str, Set[str]] = {}
+        self.by_name: Dict[str, Set[str]] = {}
+        for row in rows:
+            self.upsert(row)
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        jid = str(row.get("remoteJid") or row.get("id") or "").strip().lower()
+        if not jid or "@" not in jid:
+            return
+        previous = self.by_jid.get(jid)
+        merged = {**(previous or {}), **{k: v for k, v in row.items() if v is not None}}
+        merged["remoteJid"] = merged.get("remoteJid") or jid
+        if previous:
+            self._unindex(jid, previous)
+        self.by_jid[jid] = merged
+        pic = str(merged.get("profilePicUrl") or "").strip()
+        if pic:
+            self.by_pic.setdefault(pic, set()).add(jid)
+        name = normalize_push_name(merged.get("pushName"))
+        if name:
+            self.by_name.setdefault(name, set()).add(jid)
+
+    def _unindex(self, jid: str, row: Dict[str, Any]) -> None:
+        pic = str(row.get("profilePicUrl") or "").strip()
+        if pic and pic in self.by_pic:
+            self.by_pic[pic].discard(jid)
+            if not self.by_pic[pic]:
+                self.by_pic.pop(pic, None)
+        name = normalize_push_name(row.get("pushName"))
+        if name and name in self.by_name:
+            self.by_name[name].discard(jid)
+            if not self.by_name[name]:
+                self.by_name.pop(name, None)
+
+    def get(self, jid: str) -> Optional[Dict[str, Any]]:
+        return self.by_jid.get(str(jid or "").strip().lower())
+
+    def jids_with_pic(self, pic: str) -> List[str]:
+        return sorted(self.by_pic.get(str(pic or "").strip(), set()))
+
+    def jids_with_name(self, name: str) -> List[str]:
+        return sorted(self.by_name.get(normalize_push_name(name), set()))
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return list(self.by_jid.values())
+
+
+class ChatIndex:
+    """Chats de uma instancia indexados por remoteJid (nome/data pre-normalizados)."""
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        self.by_jid: Dict[str, Dict[str, Any]] = {}
+        self.meta: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            self.upsert(row)
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        jid = str(row.get("remoteJid") or row.get("id") or "").strip().lower()
+        if not jid or "@" not in jid:
+            return
+        previous = self.by_jid.get(jid) or {}
+        merged = {**previous, **{k: v for k, v in row.items() if v is not None}}
+        merged["remoteJid"] = merged.get("remoteJid") or jid
+        self.by_jid[jid] = merged
+        self.meta[jid] = {
+            "name": normalize_push_name(merged.get("pushName")),
+            "updated_at": _parse_iso_datetime(merged.get("updatedAt")),
+            "is_lid": jid.endswith("@lid"),
+        }
+
+    def get(self, jid: str) -> Optional[Dict[str, Any]]:
+        return self.by_jid.get(str(jid or "").strip().lower())
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return list(self.by_jid.values())
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value: Any, ttl: float) -> None:
+        self.value = value
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class WhatsAppDirectoryService:
+    def __init__(self) -> None:
+        self.instances_ttl = float(settings.WA_DIRECTORY_INSTANCES_TTL_SECONDS)
+        self.ttl = float(settings.WA_DIRECTORY_TTL_SECONDS)
+        self.max_instances = max(1, int(settings.WA_DIRECTORY_MAX_INSTANCES))
+        self.redis_enabled = bool(settings.WA_DIRECTORY_REDIS_ENABLED)
+        self.redis_url = settings.REDIS_URL
+        self._redis: Optional[redis_asyncio.Redis] = None
+        self._instances: Optional[_Entry] = None
+        self._contacts: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._chats: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        self._instances = None
+        self._contacts.clear()
+        self._chats.clear()
+        self._counters = {
+            "instances_hit": 0,
+            "instances_miss": 0,
+            "contacts_hit": 0,
+            "contacts_miss": 0,
+            "chats_hit": 0,
+            "chats_miss": 0,
+            "redis_hit": 0,
+            "events_applied": 0,
+            "evictions": 0,
+        }
+
+    async def _get_redis(self) -> Optional[redis_asyncio.Redis]:
+        if not self.redis_enabled:
+            return None
+        if self._redis is not None:
+            return self._redis
+        try:
+            client = redis_asyncio.from_url(self.redis_url, decode_responses=True)
+            await client.ping()
+            self._redis = client
+            return client
+        except Exception:
+            return None
+
+    async def _redis_load(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        redis_client = await self._get_redis()
+        if not redis_client:
+            return None
+        try:
+            raw = await redis_client.get(key)
+            if not raw:
+                return None
+            parsed = json.loads(raw)
+        except Exception:
+            return None
+        if not isinstance(parsed, list):
+            return None
+        self._counters["redis_hit"] += 1
+        return [item for item in parsed if isinstance(item, dict)]
+
+    async def _redis_store(self, key: str, rows: List[Dict[str, Any]], ttl: float) -> None:
+        redis_client = await self._get_redis()
+        if not redis_client:
+            return
+        try:
+            await redis_client.set(key, json.dumps(rows, ensure_ascii=False, default=str), ex=max(1, int(ttl)))
+        except Exception:
+            return
+
+    def _put(self, store: "OrderedDict[str, _Entry]", instance: str, value: Any) -> None:
+        store[instance] = _Entry(value, self.ttl)
+        store.move_to_end(instance)
+        while len(store) > self.max_instances:
+            store.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _get_fresh(self, store: "OrderedDict[str, _Entry]", instance: str) -> Any:
+        entry = store.get(instance)
+        if entry is None:
+            return None
+        if not entry.fresh:
+            store.pop(instance, None)
+            return None
+        store.move_to_end(instance)
+        return entry.value
+
+    async def get_instances(self, loader: Loader) -> List[Dict[str, Any]]:
+        entry = self._instances
+        if entry is not None and entry.fresh and entry.value:
+            self._counters["instances_hit"] += 1
+            return entry.value
+        self._counters["instances_miss"] += 1
+        rows = await loader()
+        # Lista vazia costuma ser falha transitoria do Evolution: nao cachear.
+        if rows:
+            self.store_instances(rows)
+        return rows
+
+    def store_instances(self, rows: List[Dict[str, Any]]) -> None:
+        self._instances = _Entry(list(rows), self.instances_ttl)
+
+    def invalidate_instances(self) -> None:
+        self._instances = None
+
+    async def get_contacts(self, instance: str, loader: Loader) -> ContactIndex:
+        cached = self._get_fresh(self._contacts, instance)
+        if cached is not None:
+            self._counters["contacts_hit"] += 1
+            return cached
+        self._counters["contacts_miss"] += 1
+        redis_key = f"wa:directory:{instance}:contacts"
+        rows = await self._redis_load(redis_key)
+        if rows is None:
+            rows = await loader()
+            if rows:
+                await self._redis_store(redis_key, rows, self.ttl)
+        index = ContactIndex(rows or [])
+        if rows:
+            self._put(self._contacts, instance, index)
+        return index
+
+    async def get_chats(self, instance: str, loader: Loader) -> ChatIndex:
+        cached = self._get_fresh(self._chats, instance)
+        if cached is not None:
+            self._counters["chats_hit"] += 1
+            return cached
+        self._counters["chats_miss"] += 1
+        redis_key = f"wa:directory:{instance}:chats"
+        rows = await self._redis_load(redis_key)
+        if rows is None:
+            rows = await loader()
+            if rows:
+                await self._redis_store(redis_key, rows, self.ttl)
+        index = ChatIndex(rows or [])
+        if rows:
+            self._put(self._chats, instance, index)
+        return index
+
+    @staticmethod
+    def _event_rows(payload: Any) -> List[Dict[str, Any]]:
+        if isinstance(payload, list):
+            return [item for item in payload if isinstance(item, dict)]
+        if isinstance(payload, dict):
+            for key in ("contacts", "chats", "data"):
+                nested = payload.get(key)
+                if isinstance(nested, list):
+                    return [item for item in nested if isinstance(item, dict)]
+            return [payload]
+        return []
+
+    def apply_event(self, event: str, instance: str, data: Dict[str, Any]) -> bool:
+        """Atualiza incrementalmente o diretorio ja carregado a partir de um webhook."""
+        try:
+            if event == "connection.update":
+                self.invalidate_instances()
+                return True
+            payload = data.get("data") if isinstance(data, dict) else None
+            if event in {"contacts.upsert", "contacts.update", "contacts.set"}:
+                index = self._get_fresh(self._contacts, instance)
+                if index is None:
+                    return False
+                for row in self._event_rows(payload):
+                    index.upsert(row)
+                self._counters["events_applied"] += 1
+                return True
+            if event in {"chats.upsert", "chats.update", "chats.set"}:
+                index = self._get_fresh(self._chats, instance)
+                if index is None:
+                    return False
+                for row in self._event_rows(payload):
+                    index.upsert(row)
+                self._counters["events_applied"] += 1
+                return True
+            if event == "chats.delete":
+                index = self._get_fresh(self._chats, instance)
+                if index is None:
+                    return False
+                for row in self._event_rows(payload):
+                    jid = str(row.get("remoteJid") or row.get("id") or "").strip().lower()
+                    index.by_jid.pop(jid, None)
+                    index.meta.pop(jid, None)
+                self._counters["events_applied"] += 1
+                return True
+            if event == "messages.upsert" and isinstance(payload, dict):
+                key_data = payload.get("key") if isinstance(payload.get("key"), dict) else {}
+                jid = str(key_data.get("remoteJid") or "").strip()
+                if not jid or key_data.get("fromMe"):
+                    return False
+                row: Dict[str, Any] = {"remoteJid": jid, "updatedAt": datetime.utcnow().isoformat() + "Z"}
+                push_name = str(payload.get("pushName") or "").strip()
+                if push_name:
+                    row["pushName"] = push_name
+                applied = False
+                chats = self._get_fresh(self._chats, instance)
+                if chats is not None:
+                    chats.upsert(row)
+                    applied = True
+                contacts = self._get_fresh(self._contacts, instance)
+                if contacts is not None and push_name:
+                    contacts.upsert({"remoteJid": jid, "pushName": push_name})
+                    applied = True
+                if applied:
+                    self._counters["events_applied"] += 1
+                return applied
+        except Exception:
+            logging.exception("Falha ao aplicar evento no diretorio WhatsApp: %s", event)
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        counters = dict(self._counters)
+
+        def _ratio(prefix: str) -> float:
+            hits = counters.get(f"{prefix}_hit", 0)
+            total = hits + counters.get(f"{prefix}_miss", 0)
+            return round(hits / total, 4) if total else 0.0
+
+        return {
+            **counters,
+            "instances_hit_ratio": _ratio("instances"),
+            "contacts_hit_ratio": _ratio("contacts"),
+            "chats_hit_ratio": _ratio("chats"),
+            "cached_instances": sorted(set(self._contacts) | set(self._chats)),
+            "redis_enabled": self.redis_enabled,
+            "ttl_seconds": self.ttl,
+        }
+
+
+whatsapp_directory_service = WhatsAppDirectoryService()
@@ -0,0 +1,327 @@
+"""
+Vinculos persistentes @lid -> numero real do WhatsApp.
+
+Guarda o numero validado de cada JID @lid (com confianca, origem e data de
+verificacao) em `whatsapp_lid_bindings`, para que webhook e envio consultem o
+vinculo antes de repetir match por foto/nome e probes em `/chat/whatsappNumbers`.
+Falhas de resolucao ficam em cache negativo com TTL crescente por tentativa.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+
+
+# Confianca por origem do vinculo (quanto mais direta a evidencia, maior).
+SOURCE_CONFIDENCE: Dict[str, float] = {
+    "manual_bind": 1.0,
+    "lid_meta": 0.95,
+    "contact_alt": 0.95,
+    "event_sender": 0.9,
+    "user_text": 0.8,
+    "context_preferred": 0.8,
+    "profile_pic": 0.7,
+    "chat_similarity": 0.6,
+}
+
+
+class WhatsAppLidBindingService:
+    """Cache em memoria + tabela Postgres para vinculos @lid."""
+
+    def __init__(self) -> None:
+        self.negative_ttl = max(1, int(settings.WA_LID_NEGATIVE_TTL_SECONDS))
+        self.negative_max_ttl = max(self.negative_ttl, int(settings.WA_LID_NEGATIVE_MAX_TTL_SECONDS))
+        self.number_negative_ttl = max(1, int(settings.WA_LID_NUMBER_NEGATIVE_TTL_SECONDS))
+        self.min_webhook_confidence = float(settings.WA_LID_MIN_WEBHOOK_CONFIDENCE)
+        self._table_checked = False
+        self._db_retry_at = 0.0
+        self._bindings: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._negative: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._number_negative: Dict[Tuple[str, str], float] = {}
+        self._counters: Dict[str, int] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        self._bindings.clear()
+        self._negative.clear()
+        self._number_negative.clear()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "number_negative_hits": 0,
+            "bound": 0,
+            "failures": 0,
+        }
+
+    @staticmethod
+    def _key(instance: str, lid_jid: str) -> Tuple[str, str]:
+        return (str(instance or "").strip(), str(lid_jid or "").strip().lower())
+
+    @staticmethod
+    def is_lid(value: Any) -> bool:
+        return isinstance(value, str) and value.strip().lower().endswith("@lid")
+
+    async def ensure_table(self, db: AsyncSession) -> None:
+        if self._table_checked:
+            return
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS whatsapp_lid_bindings (
+                    instance_name VARCHAR(100) NOT NULL,
+                    lid_jid VARCHAR(120) NOT NULL,
+                    numero VARCHAR(20),
+                    confidence DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    source VARCHAR(40),
+                    verified_at TIMESTAMP,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    negative_until TIMESTAMP,
+                    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (instance_name, lid_jid)
+                )
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_whatsapp_lid_bindings_numero
+                ON whatsapp_lid_bindings(numero)
+                """
+            )
+        )
+        self._table_checked = True
+
+    async def _run_db(self, action: str, fn) -> Any:
+        """Executa `fn(db)` em sessao propria; Postgres fora nao derruba o envio."""
+        if time.monotonic() < self._db_retry_at:
+            return None
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.ensure_table(db)
+                result = await fn(db)
+                await db.commit()
+                return result
+        except Exception as exc:
+            self._db_retry_at = time.monotonic() + 30.0
+            logging.warning("Vinculos @lid indisponiveis no banco (%s): %s", action, exc)
+            return None
+
+    async def get_binding(self, instance: str, lid_jid: str) -> Optional[Dict[str, Any]]:
+        """Retorna o vinculo positivo conhecido (memoria, depois banco)."""
+        if not self.is_lid(lid_jid):
+            return None
+        key = self._key(instance, lid_jid)
+        cached = self._bindings.get(key)
+        if cached:
+            self._counters["hits"] += 1
+            return dict(cached)
+
+        async def _load(db: AsyncSession) -> Optional[Dict[str, Any]]:
+            result = await db.execute(
+                text(
+                    """
+                    SELECT numero, confidence, source, verified_at, failures, negative_until
+                    FROM whatsapp_lid_bindings
+                    WHERE instance_name = :instance_name AND lid_jid = :lid_jid
+                    """
+                ),
+                {"instance_name": key[0], "lid_jid": key[1]},
+            )
+            row = result.mappings().first()
+            return dict(row) if row else None
+
+        row = await self._run_db("get", _load)
+        if row and row.get("numero"):
+            binding = {
+                "numero": str(row["numero"]),
+                "confidence": float(row.get("confidence") or 0.0),
+                "source": row.get("source"),
+                "verified_at": row.get("verified_at"),
+            }
+            self._bindings[key] = binding
+            self._negative.pop(key, None)
+            self._counters["hits"] += 1
+            return dict(binding)
+        if row and row.get("negative_until"):
+            self._negative[key] = {
+                "failures": int(row.get("failures") or 0),
+                "until": row["negative_until"],
+            }
+        self._counters["misses"] += 1
+        return None
+
+    async def bind(
+        self,
+        instance: str,
+        lid_jid: str,
+        numero: str,
+        source: str,
+        confidence: Optional[float] = None,
+        verified: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """Grava (ou promove) o vinculo; nao rebaixa vinculo de confianca maior."""
+        digits = "".join(filter(str.isdigit, str(numero or "")))
+        if not self.is_lid(lid_jid) or not (10 <= len(digits) <= 15):
+            return None
+        key = self._key(instance, lid_jid)
+        score = float(confidence if confidence is not None else SOURCE_CONFIDENCE.get(source, 0.5))
+        current = self._bindings.get(key)
+        if current and current["numero"] != digits and float(current["confidence"]) > score:
+            return dict(current)
+
+        now = datetime.utcnow()
+        binding = {
+            "numero": digits,
+            "confidence": score,
+            "source": source,
+            "verified_at": now if verified else (current or {}).get("verified_at"),
+        }
+        self._bindings[key] = binding
+        self._negative.pop(key, None)
+        self._number_negative.pop((key[0], digits), None)
+        self._counters["bound"] += 1
+
+        async def _save(db: AsyncSession) -> None:
+            await db.execute(
+                text(
+                    """
+                    INSERT INTO whatsapp_lid_bindings (
+                        instance_name, lid_jid, numero, confidence, source,
+                        verified_at, failures, negative_until, created_at, updated_at
+                    ) VALUES (
+                        :instance_name, :lid_jid, :numero, :confidence, :source,
+                        :verified_at, 0, NULL, NOW(), NOW()
+                    )
+                    ON CONFLICT (instance_name, lid_jid) DO UPDATE SET
+                        numero = EXCLUDED.numero,
+                        confidence = EXCLUDED.confidence,
+                        source = EXCLUDED.source,
+                        verified_at = COALESCE(EXCLUDED.verified_at, whatsapp_lid_bindings.verified_at),
+                        failures = 0,
+                        negative_until = NULL,
+                        updated_at = NOW()
+                    WHERE whatsapp_lid_bindings.numero IS NULL
+                       OR whatsapp_lid_bindings.numero = EXCLUDED.numero
+                       OR whatsapp_lid_bindings.confidence <= EXCLUDED.confidence
+                    """
+                ),
+                {
+                    "instance_name": key[0],
+                    "lid_jid": key[1],
+                    "numero": digits,
+                    "confidence": score,
+                    "source": source,
+                    "verified_at": binding["verified_at"],
+                },
+            )
+
+        await self._run_db("bind", _save)
+        return dict(binding)
+
+    async def invalidate(self, instance: str, lid_jid: str) -> None:
+        """Remove vinculo que deixou de entregar (ex.: exists:false no numero vinculado)."""
+        if not self.is_lid(lid_jid):
+            return
+        key = self._key(instance, lid_jid)
+        binding = self._bindings.pop(key, None)
+        if binding:
+            self._number_negative[(key[0], binding["numero"])] = time.monotonic() + self.number_negative_ttl
+
+        async def _delete(db: AsyncSession) -> None:
+            await db.execute(
+                text(
+                    """
+                    UPDATE whatsapp_lid_bindings
+                    SET numero = NULL, confidence = 0, source = NULL, updated_at = NOW()
+                    WHERE instance_name = :instance_name AND lid_jid = :lid_jid
+                    """
+                ),
+                {"instance_name": key[0], "lid_jid": key[1]},
+            )
+
+        await self._run_db("invalidate", _delete)
+
+    def is_negative(self, instance: str, lid_jid: str) -> bool:
+        entry = self._negative.get(self._key(instance, lid_jid))
+        if not entry:
+            return False
+        if entry["until"] <= datetime.utcnow():
+            return False
+        self._counters["negative_hits"] += 1
+        return True
+
+    async def mark_unresolved(self, instance: str, lid_jid: str) -> datetime:
+        """Cache negativo do @lid com TTL exponencial (base * 2^(falhas-1), com teto)."""
+        key = self._key(instance, lid_jid)
+        previous = self._negative.get(key) or {}
+        failures = int(previous.get("failures") or 0) + 1
+        ttl = min(self.negative_max_ttl, self.negative_ttl * (2 ** min(failures - 1, 16)))
+        until = datetime.utcnow() + timedelta(seconds=ttl)
+        self._negative[key] = {"failures": failures, "until": until}
+        self._counters["failures"] += 1
+
+        async def _save(db: AsyncSession) -> None:
+            await db.execute(
+                text(
+                    """
+                    INSERT INTO whatsapp_lid_bindings (
+                        instance_name, lid_jid, failures, negative_until, created_at, updated_at
+                    ) VALUES (
+                        :instance_name, :lid_jid, :failures, :negative_until, NOW(), NOW()
+                    )
+                    ON CONFLICT (instance_name, lid_jid) DO UPDATE SET
+                        failures = EXCLUDED.failures,
+                        negative_until = EXCLUDED.negative_until,
+                        updated_at = NOW()
+                    WHERE whatsapp_lid_bindings.numero IS NULL
+                    """
+                ),
+                {
+                    "instance_name": key[0],
+                    "lid_jid": key[1],
+                    "failures": failures,
+                    "negative_until": until,
+                },
+            )
+
+        await self._run_db("negative", _save)
+        return until
+
+    def is_number_negative(self, instance: str, numero: str) -> bool:
+        key = (str(instance or "").strip(), "".join(filter(str.isdigit, str(numero or ""))))
+        until = self._number_negative.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._number_negative.pop(key, None)
+            return False
+        self._counters["number_negative_hits"] += 1
+        return True
+
+    def mark_number_negative(self, instance: str, numero: str) -> None:
+        key = (str(instance or "").strip(), "".join(filter(str.isdigit, str(numero or ""))))
+        if key[1]:
+            self._number_negative[key] = time.monotonic() + self.number_negative_ttl
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "cached_bindings": len(self._bindings),
+            "negative_entries": len(self._negative),
+            "number_negative_entries": len(self._number_negative),
+            "negative_ttl_seconds": self.negative_ttl,
+        }
+
+
+whatsapp_lid_binding_service = WhatsAppLidBindingService()
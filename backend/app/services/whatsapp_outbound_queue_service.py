@@ -0,0 +1,263 @@
+"""
+Fila persistente de mensagens de saida do WhatsApp pendentes de reenvio.
+
+Substitui a lista `pending_outbound` dentro de `WhatsappConversa.contexto_ia`:
+cada item vira uma linha em `whatsapp_outbound_queue`, reservada com
+`FOR UPDATE SKIP LOCKED` (varios workers sem envio duplicado) e reagendada com
+backoff exponencial em `next_attempt_at`.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+
+class WhatsAppOutboundQueueService:
+    """Persistencia, reserva e reagendamento das mensagens de saida."""
+
+    def __init__(self) -> None:
+        self.max_attempts = max(1, int(settings.WA_OUTBOUND_MAX_ATTEMPTS))
+        self.backoff_seconds = max(1, int(settings.WA_OUTBOUND_BACKOFF_SECONDS))
+        self.backoff_max_seconds = max(self.backoff_seconds, int(settings.WA_OUTBOUND_BACKOFF_MAX_SECONDS))
+        self.concurrency = max(1, int(settings.WA_OUTBOUND_CONCURRENCY))
+        self.stale_seconds = max(30, int(settings.WA_OUTBOUND_STALE_SECONDS))
+        self._table_checked = False
+
+    async def ensure_table(self, db: AsyncSession) -> None:
+        if self._table_checked:
+            return
+        await db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS whatsapp_outbound_queue (
+                    id UUID PRIMARY KEY,
+                    conversa_id UUID NOT NULL,
+                    instance_name VARCHAR(100),
+                    remote_jid VARCHAR(120),
+                    push_name VARCHAR(200),
+                    conteudo TEXT NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    locked_at TIMESTAMP,
+                    sent_at TIMESTAMP,
+                    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_whatsapp_outbound_status_next
+                ON whatsapp_outbound_queue(status, next_attempt_at ASC)
+                """
+            )
+        )
+        await db.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_whatsapp_outbound_conversa_status
+                ON whatsapp_outbound_queue(conversa_id, status, created_at ASC)
+                """
+            )
+        )
+        self._table_checked = True
+
+    def backoff_for(self, attempts: int) -> timedelta:
+        """Atraso ate a proxima tentativa: base * 2^(tentativas-1), com teto."""
+        exponent = max(0, min(int(attempts) - 1, 16))
+        return timedelta(seconds=min(self.backoff_max_seconds, self.backoff_seconds * (2 ** exponent)))
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        conversa_id: UUID,
+        conteudo: str,
+        remote_jid: Optional[str],
+        push_name: Optional[str],
+        instance_name: Optional[str] = None,
+        erro: Optional[str] = None,
+        attempts: int = 0,
+        created_at: Optional[datetime] = None,
+    ) -> Optional[str]:
+        conteudo = str(conteudo or "").strip()
+        if not conteudo:
+            return None
+        await self.ensure_table(db)
+        item_id = uuid4()
+        await db.execute(
+            text(
+                """
+                INSERT INTO whatsapp_outbound_queue (
+                    id, conversa_id, instance_name, remote_jid, push_name, conteudo,
+                    status, attempts, last_error, next_attempt_at, created_at, updated_at
+                ) VALUES (
+                    :id, :conversa_id, :instance_name, :remote_jid, :push_name, :conteudo,
+                    'pending', :attempts, :last_error, :next_attempt_at, :created_at, NOW()
+                )
+                """
+            ),
+            {
+                "id": item_id,
+                "conversa_id": conversa_id,
+                "instance_name": instance_name,
+                "remote_jid": str(remote_jid or "").strip() or None,
+                "push_name": str(push_name or "").strip() or None,
+                "conteudo": conteudo,
+                "attempts": max(0, int(attempts)),
+                "last_error": str(erro or "").strip()[:2000] or None,
+                "next_attempt_at": datetime.utcnow() + self.backoff_for(max(1, attempts)),
+                "created_at": created_at or datetime.utcnow(),
+            },
+        )
+        return str(item_id)
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        limit: int = 50,
+        conversa_id: Optional[UUID] = None,
+        due_only: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Reserva itens pendentes (status -> sending) sem bloquear outros workers."""
+        await self.ensure_table(db)
+        filters = ["q.status = 'pending'"]
+        params: Dict[str, Any] = {"limit": max(1, min(int(limit), 500))}
+        if due_only:
+            filters.append("q.next_attempt_at <= NOW()")
+        if conversa_id is not None:
+            filters.append("q.conversa_id = :conversa_id")
+            params["conversa_id"] = conversa_id
+        else:
+            # Varredura em background: apenas conversas ativas (como antes).
+            filters.append(
+                "EXISTS (SELECT 1 FROM whatsapp_conversas c WHERE c.id = q.conversa_id AND c.status = 'ativa')"
+            )
+        result = await db.execute(
+            text(
+                f"""
+                UPDATE whatsapp_outbound_queue AS t
+                SET status = 'sending',
+                    attempts = t.attempts + 1,
+                    locked_at = NOW(),
+                    updated_at = NOW()
+                WHERE t.id IN (
+                    SELECT q.id
+                    FROM whatsapp_outbound_queue q
+                    WHERE {" AND ".join(filters)}
+                    ORDER BY q.next_attempt_at ASC, q.created_at ASC
+                    LIMIT :limit
+                    FOR UPDATE OF q SKIP LOCKED
+                )
+                RETURNING t.id, t.conversa_id, t.instance_name, t.remote_jid, t.push_name,
+                          t.conteudo, t.attempts, t.created_at
+                """
+            ),
+            params,
+        )
+        rows = [dict(row) for row in result.mappings().all()]
+        await db.commit()
+        rows.sort(key=lambda item: item.get("created_at") or datetime.min)
+        return rows
+
+    async def mark_sent(self, db: AsyncSession, item_id: Any) -> None:
+        await db.execute(
+            text(
+                """
+                UPDATE whatsapp_outbound_queue
+                SET status = 'sent', sent_at = NOW(), locked_at = NULL, last_error = NULL, updated_at = NOW()
+                WHERE id = :id
+                """
+            ),
+            {"id": item_id},
+        )
+
+    async def mark_failed(self, db: AsyncSession, item_id: Any, attempts: int, erro: Optional[str]) -> str:
+        status = "failed" if int(attempts) >= self.max_attempts else "pending"
+        await db.execute(
+            text(
+                """
+                UPDATE whatsapp_outbound_queue
+                SET status = :status,
+                    last_error = :last_error,
+                    next_attempt_at = :next_attempt_at,
+                    locked_at = NULL,
+                    updated_at = NOW()
+                WHERE id = :id
+                """
+            ),
+            {
+                "id": item_id,
+                "status": status,
+                "last_error": str(erro or "falha envio")[:2000],
+                "next_attempt_at": datetime.utcnow() + self.backoff_for(attempts),
+            },
+        )
+        return status
+
+    async def release_stale(self, db: AsyncSession) -> int:
+        """Devolve a fila itens presos em 'sending' por worker que caiu."""
+        await self.ensure_table(db)
+        result = await db.execute(
+            text(
+                """
+                UPDATE whatsapp_outbound_queue
+                SET status = 'pending', locked_at = NULL, updated_at = NOW()
+                WHERE status = 'sending'
+                  AND locked_at < NOW() - (:stale_seconds * INTERVAL '1 second')
+                """
+            ),
+            {"stale_seconds": self.stale_seconds},
+        )
+        await db.commit()
+        return int(result.rowcount or 0)
+
+    async def count_pending(self, db: AsyncSession, conversa_id: UUID) -> int:
+        await self.ensure_table(db)
+        result = await db.execute(
+            text(
+                """
+                SELECT COUNT(*) FROM whatsapp_outbound_queue
+                WHERE conversa_id = :conversa_id AND status IN ('pending', 'sending')
+                """
+            ),
+            {"conversa_id": conversa_id},
+        )
+        return int(result.scalar() or 0)
+
+    async def get_status(self, db: AsyncSession) -> Dict[str, Any]:
+        await self.ensure_table(db)
+        result = await db.execute(
+            text(
+                """
+                SELECT status, COUNT(*) AS total, MIN(next_attempt_at) AS next_attempt_at
+                FROM whatsapp_outbound_queue
+                GROUP BY status
+                """
+            )
+        )
+        by_status = {
+            str(row["status"]): {
+                "total": int(row["total"] or 0),
+                "next_attempt_at": row["next_attempt_at"].isoformat() if row["next_attempt_at"] else None,
+            }
+            for row in result.mappings().all()
+        }
+        return {
+            "by_status": by_status,
+            "max_attempts": self.max_attempts,
+            "concurrency": self.concurrency,
+            "backoff_seconds": self.backoff_seconds,
+        }
+
+
+whatsapp_outbound_queue_service = WhatsAppOutboundQueueService()
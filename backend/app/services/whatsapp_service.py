@@ -1,11 +1,15 @@
 """WhatsApp service - Integration with Evolution API."""
 from datetime import datetime
-import unicodedata
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import httpx
 
 from app.config import settings
+from app.services.whatsapp_directory_service import (
+    normalize_push_name,
+    whatsapp_directory_service,
+)
+from app.services.whatsapp_lid_binding_service import whatsapp_lid_binding_service
 
 
 DEFAULT_WEBHOOK_EVENTS: List[str] = [
@@ -38,6 +42,10 @@ DEFAULT_WEBHOOK_EVENTS: List[str] = [
 ]
 
 
+class WhatsAppNumberCheckError(RuntimeError):
+    """Consulta de numero no Evolution falhou (timeout, HTTP != 200, payload inesperado)."""
+
+
 class WhatsAppService:
     """Service for WhatsApp integration via Evolution API."""
 
@@ -128,6 +136,10 @@ class WhatsAppService:
         except Exception:
             return []
 
+    async def _get_instances(self, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+        """Instances from the cached directory (refetch only on miss/expiry)."""
+        return await whatsapp_directory_service.get_instances(lambda: self._fetch_instances(client))
+
     def _resolve_instance_name(self, instances: List[Dict[str, Any]]) -> str:
         """Resolve effective instance name from config and available instances."""
         configured = self.instance_name
@@ -270,9 +282,17 @@ class WhatsAppService:
 
     async def get_status(self) -> Dict[str, Any]:
         """Get WhatsApp connection status."""
+        status = await self._fetch_connection_status()
+        status["directory"] = whatsapp_directory_service.get_stats()
+        status["lid_bindings"] = whatsapp_lid_binding_service.get_stats()
+        return status
+
+    async def _fetch_connection_status(self) -> Dict[str, Any]:
         async with httpx.AsyncClient() as client:
             try:
                 instances = await self._fetch_instances(client)
+                if instances:
+                    whatsapp_directory_service.store_instances(instances)
                 instance = self._resolve_instance_name(instances)
                 response = await self._request(
                     client,
@@ -471,7 +491,7 @@ class WhatsAppService:
 
         async with httpx.AsyncClient() as client:
             try:
-                instances = await self._fetch_instances(client)
+                instances = await self._get_instances(client)
                 instance = self._resolve_instance_name(instances)
                 numero_resolvido = await self._resolve_lid_number(
                     client=client,
@@ -564,7 +584,7 @@ class WhatsAppService:
 
         async with httpx.AsyncClient() as client:
             try:
-                instances = await self._fetch_instances(client)
+                instances = await self._get_instances(client)
                 instance = self._resolve_instance_name(instances)
                 payload = {
                     "number": numero,
@@ -652,12 +672,10 @@ class WhatsAppService:
         """Fetch media base64 from Evolution chat endpoint for a message payload."""
         async with httpx.AsyncClient() as client:
             try:
-                instances = await self._fetch_instances(client)
-                instance = (
-                    instance_name
-                    if instance_name
-                    else self._resolve_instance_name(instances)
-                )
+                instance = instance_name
+                if not instance:
+                    instances = await self._get_instances(client)
+                    instance = self._resolve_instance_name(instances)
                 if not instance:
                     return {
                         "sucesso": False,
@@ -753,10 +771,7 @@ class WhatsAppService:
             return []
 
     def _normalizar_nome(self, nome: Optional[str]) -> str:
-        if not isinstance(nome, str):
-            return ""
-        value = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
-        return " ".join(value.lower().split())
+        return normalize_push_name(nome)
 
     def _extrair_numero_de_jid(self, jid: str) -> Optional[str]:
         if not isinstance(jid, str) or "@" not in jid:
@@ -778,7 +793,11 @@ class WhatsAppService:
         instance: str,
         numero: str,
     ) -> Optional[str]:
-        """Validate candidate number with Evolution and return deliverable digits."""
+        """Validate candidate number with Evolution and return deliverable digits.
+
+        None = resposta definitiva (numero invalido ou `exists: false`). Falha da
+        propria consulta levanta `WhatsAppNumberCheckError`, para nao virar cache negativo.
+        """
         formatted = self._format_number(numero)
         if not self._is_plausible_phone_number(formatted):
             return None
@@ -791,27 +810,29 @@ class WhatsAppService:
                 timeout=10.0,
             )
             if response.status_code != 200:
-                return None
-
+                raise WhatsAppNumberCheckError(f"HTTP {response.status_code}")
             payload = response.json()
-            if not isinstance(payload, list) or not payload:
-                return None
-            row = payload[0] if isinstance(payload[0], dict) else {}
-            if not row.get("exists"):
-                return None
-
-            numero_row = "".join(filter(str.isdigit, str(row.get("number") or "")))
-            if self._is_plausible_phone_number(numero_row):
-                return numero_row
-
-            jid_row = str(row.get("jid") or "")
-            from_jid = self._extrair_numero_de_jid(jid_row)
-            if from_jid and self._is_plausible_phone_number(from_jid):
-                return from_jid
-            return None
-        except Exception:
+        except WhatsAppNumberCheckError:
+            raise
+        except Exception as exc:
+            raise WhatsAppNumberCheckError(str(exc)[:200]) from exc
+
+        if not isinstance(payload, list) or not payload or not isinstance(payload[0], dict):
+            raise WhatsAppNumberCheckError("payload inesperado")
+        row = payload[0]
+        if not row.get("exists"):
             return None
 
+        numero_row = "".join(filter(str.isdigit, str(row.get("number") or "")))
+        if self._is_plausible_phone_number(numero_row):
+            return numero_row
+
+        jid_row = str(row.get("jid") or "")
+        from_jid = self._extrair_numero_de_jid(jid_row)
+        if from_jid and self._is_plausible_phone_number(from_jid):
+            return from_jid
+        return None
+
     async def _fetch_chats(
         self,
         client: httpx.AsyncClient,
@@ -845,8 +866,12 @@ class WhatsAppService:
             return None
 
     def _name_similarity_score(self, base_name: str, candidate_name: str) -> int:
-        base = self._normalizar_nome(base_name)
-        candidate = self._normalizar_nome(candidate_name)
+        return self._normalized_name_similarity_score(
+            self._normalizar_nome(base_name),
+            self._normalizar_nome(candidate_name),
+        )
+
+    def _normalized_name_similarity_score(self, base: str, candidate: str) -> int:
         if not base or not candidate:
             return 0
         if base == candidate:
@@ -874,25 +899,33 @@ class WhatsAppService:
         if not isinstance(numero, str) or not numero.lower().endswith("@lid"):
             return None
 
-        candidate_numbers: List[str] = []
+        # Vinculo ja validado: nenhuma chamada remota.
+        binding = await whatsapp_lid_binding_service.get_binding(instance, numero)
+        if binding:
+            return binding["numero"]
+
+        candidate_numbers: List[Tuple[str, str]] = []
         preferred = self._format_number(context_preferred_number or "")
         if self._is_plausible_phone_number(preferred):
-            candidate_numbers.append(preferred)
-
-        contacts = await self._fetch_contacts(client, instance)
-        current_contact = next(
-            (
-                item
-                for item in contacts
-                if str(item.get("remoteJid", "")).lower() == numero.lower()
-            ),
-            None,
+            candidate_numbers.append((preferred, "context_preferred"))
+
+        # Cache negativo: @lid sem resolucao recente so e retentado com numero novo do contexto.
+        if whatsapp_lid_binding_service.is_negative(instance, numero) and (
+            not candidate_numbers
+            or whatsapp_lid_binding_service.is_number_negative(instance, preferred)
+        ):
+            return None
+
+        contacts = await whatsapp_directory_service.get_contacts(
+            instance,
+            lambda: self._fetch_contacts(client, instance),
         )
+        current_contact = contacts.get(numero)
         for alt_key in ("remoteJidAlt", "remoteJidAlternative", "jidAlt"):
             if current_contact and isinstance(current_contact.get(alt_key), str):
                 numero_alt = self._extrair_numero_de_jid(current_contact.get(alt_key))
                 if numero_alt and self._is_plausible_phone_number(numero_alt):
-                    candidate_numbers.append(numero_alt)
+                    candidate_numbers.append((numero_alt, "contact_alt"))
 
         # Match por foto de perfil so quando houver correspondencia unica.
         current_pic = ""
@@ -900,51 +933,43 @@ class WhatsAppService:
             current_pic = str(current_contact.get("profilePicUrl") or "").strip()
         if current_pic:
             same_pic_candidates: List[str] = []
-            for item in contacts:
-                jid = str(item.get("remoteJid") or "")
-                if not jid or jid.lower().endswith("@lid"):
-                    continue
-                pic = str(item.get("profilePicUrl") or "").strip()
-                if not pic or pic != current_pic:
+            for jid in contacts.jids_with_pic(current_pic):
+                if jid.endswith("@lid"):
                     continue
                 numero_pic = self._extrair_numero_de_jid(jid)
                 if numero_pic and self._is_plausible_phone_number(numero_pic):
                     same_pic_candidates.append(numero_pic)
             if len(same_pic_candidates) == 1:
-                candidate_numbers.append(same_pic_candidates[0])
+                candidate_numbers.append((same_pic_candidates[0], "profile_pic"))
 
         # Match por similaridade de nome + proximidade temporal de chats.
-        chats = await self._fetch_chats(client, instance)
-        lid_chat = next(
-            (
-                row
-                for row in chats
-                if str(row.get("remoteJid") or "").lower() == numero.lower()
-            ),
-            None,
+        chats = await whatsapp_directory_service.get_chats(
+            instance,
+            lambda: self._fetch_chats(client, instance),
         )
+        lid_chat = chats.get(numero)
         base_name = str(context_push_name or "").strip()
         if not base_name:
             base_name = str((lid_chat or {}).get("pushName") or "").strip()
         if not base_name and current_contact:
             base_name = str(current_contact.get("pushName") or "").strip()
 
-        lid_updated_at = self._parse_iso_datetime((lid_chat or {}).get("updatedAt")) if lid_chat else None
+        lid_updated_at = (chats.meta.get(numero.lower()) or {}).get("updated_at") if lid_chat else None
         scored_chat_candidates: List[Dict[str, Any]] = []
         if base_name:
-            for row in chats:
-                jid = str(row.get("remoteJid") or "")
-                if not jid or jid.lower().endswith("@lid"):
+            base_normalized = self._normalizar_nome(base_name)
+            for jid, meta in chats.meta.items():
+                if meta["is_lid"]:
                     continue
                 numero_chat = self._extrair_numero_de_jid(jid)
                 if not numero_chat or not self._is_plausible_phone_number(numero_chat):
                     continue
 
-                score = self._name_similarity_score(base_name, str(row.get("pushName") or ""))
+                score = self._normalized_name_similarity_score(base_normalized, meta["name"])
                 if score < 60:
                     continue
 
-                row_updated_at = self._parse_iso_datetime(row.get("updatedAt"))
+                row_updated_at = meta["updated_at"]
                 if lid_updated_at and row_updated_at:
                     delta_seconds = abs((row_updated_at - lid_updated_at).total_seconds())
                     if delta_seconds <= 300:
@@ -956,23 +981,40 @@ class WhatsAppService:
 
         if scored_chat_candidates:
             scored_chat_candidates.sort(key=lambda item: int(item.get("score") or 0), reverse=True)
-            candidate_numbers.append(str(scored_chat_candidates[0].get("number") or ""))
+            candidate_numbers.append(
+                (str(scored_chat_candidates[0].get("number") or ""), "chat_similarity")
+            )
 
-        unique_candidates: List[str] = []
-        for candidate in candidate_numbers:
+        unique_candidates: List[Tuple[str, str]] = []
+        seen: Set[str] = set()
+        for candidate, source in candidate_numbers:
             normalized = "".join(filter(str.isdigit, str(candidate or "")))
-            if not normalized or normalized in unique_candidates:
+            if not normalized or normalized in seen:
                 continue
-            unique_candidates.append(normalized)
+            seen.add(normalized)
+            unique_candidates.append((normalized, source))
 
-        for candidate in unique_candidates:
-            checked = await self._check_whatsapp_number(client, instance, candidate)
+        check_failed = False
+        for candidate, source in unique_candidates:
+            if whatsapp_lid_binding_service.is_number_negative(instance, candidate):
+                continue
+            try:
+                checked = await self._check_whatsapp_number(client, instance, candidate)
+            except WhatsAppNumberCheckError:
+                # Falha transitoria do Evolution nao e "fora do WhatsApp": sem cache negativo.
+                check_failed = True
+                continue
             if checked:
+                await whatsapp_lid_binding_service.bind(instance, numero, checked, source=source)
                 return checked
+            whatsapp_lid_binding_service.mark_number_negative(instance, candidate)
 
+        if check_failed:
+            return None
         # Nao retornar fallback nao validado.
         # Em cenarios @lid, enviar para numero "chutado" aumenta falso negativo (exists:false)
         # e piora a taxa de entrega. Se nao validar, mantemos fluxo sem resolucao.
+        await whatsapp_lid_binding_service.mark_unresolved(instance, numero)
         return None
 
     def _format_number(self, numero: str) -> str:
@@ -0,0 +1,29 @@
+-- Migration: Jobs de manutencao de clientes (sincronizar contratos / deduplicar documentos)
+-- Data: 2026-10-18
+-- Descricao: Estado, progresso e cursor keyset dos jobs em lote; lista de documentos
+-- duplicados materializada por execucao. O backend cria as tabelas sob demanda.
+
+CREATE TABLE IF NOT EXISTS cliente_maintenance_jobs (
+    id UUID PRIMARY KEY,
+    kind VARCHAR(40) NOT NULL,
+    user_id UUID,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    total INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    counters_json JSONB,
+    cursor_json JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_cliente_maintenance_jobs_kind_status
+    ON cliente_maintenance_jobs(kind, status);
+
+CREATE TABLE IF NOT EXISTS cliente_dedup_staging (
+    run_id UUID NOT NULL,
+    documento TEXT NOT NULL,
+    PRIMARY KEY (run_id, documento)
+);
@@ -0,0 +1,10 @@
+-- Migration: Contador anual de numeracao de contratos
+-- Data: 2026-10-18
+-- Descricao: Um registro por ano com o ultimo sequencial emitido (CNT-AAAA-NNNN).
+-- O servico cria a tabela sob demanda e semeia cada ano a partir do maior numero existente.
+
+CREATE TABLE IF NOT EXISTS contrato_numero_counters (
+    ano INTEGER PRIMARY KEY,
+    ultimo INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,16 @@
+-- Migration: Indices da paginacao por cursor (keyset)
+-- Data: 2026-10-18
+-- Descricao: As listagens de contratos, clientes e agenda filtram
+-- `(coluna, id) < (:valor, :id)` e ordenam pelas mesmas colunas em ordem
+-- decrescente. Sem indice composto cada pagina ordena a tabela inteira.
+-- O startup (search_index_service) cria os mesmos indices; este arquivo serve
+-- para aplicar antes do deploy.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_created_id
+    ON contratos (created_at DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clientes_created_id
+    ON clientes (created_at DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agenda_data_inicio_id
+    ON agenda (data_inicio DESC, id DESC);
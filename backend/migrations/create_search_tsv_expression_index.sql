@@ -0,0 +1,24 @@
+-- Migration: Full-text de clientes/contratos por indice de expressao
+-- Data: 2026-10-18
+-- Descricao: Substitui a coluna gerada search_tsv (ADD COLUMN ... STORED reescreve a
+-- tabela sob ACCESS EXCLUSIVE) por indices GIN de expressao criados CONCURRENTLY.
+-- O backend consulta exatamente a mesma expressao. Requer f_unaccent (criada no
+-- startup pelo search_index_service). A remocao da coluna antiga e opcional e so
+-- atualiza o catalogo; rode fora do horario de pico.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clientes_search_tsv_expr ON clientes USING gin (
+    (to_tsvector('simple'::regconfig, f_unaccent(lower(
+        coalesce(nome, '') || ' ' || coalesce(email, '') || ' ' || coalesce(documento, '')
+    ))))
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_search_tsv_expr ON contratos USING gin (
+    (to_tsvector('simple'::regconfig, f_unaccent(lower(
+        coalesce(contratante_nome, '') || ' ' || coalesce(numero, '') || ' ' || coalesce(contratante_documento, '')
+    ))))
+);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_clientes_search_tsv;
+DROP INDEX CONCURRENTLY IF EXISTS idx_contratos_search_tsv;
+ALTER TABLE clientes DROP COLUMN IF EXISTS search_tsv;
+ALTER TABLE contratos DROP COLUMN IF EXISTS search_tsv;
@@ -0,0 +1,26 @@
+-- Migration: Metricas de contratos por cliente mantidas incrementalmente
+-- Data: 2026-10-18
+-- Descricao: Indice para MIN/MAX de created_at por cliente e recalculo unico das
+-- colunas total_contratos/primeiro_contrato_em/ultimo_contrato_em. Depois disso o
+-- backend aplica deltas a cada contrato criado, excluido ou re-vinculado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_cliente_created
+    ON contratos (cliente_id, created_at);
+
+UPDATE clientes c
+SET total_contratos = COALESCE(m.total, 0),
+    primeiro_contrato_em = m.primeiro,
+    ultimo_contrato_em = m.ultimo
+FROM clientes base
+LEFT JOIN (
+    SELECT cliente_id, COUNT(*) AS total, MIN(created_at) AS primeiro, MAX(created_at) AS ultimo
+    FROM contratos
+    WHERE cliente_id IS NOT NULL
+    GROUP BY cliente_id
+) m ON m.cliente_id = base.id
+WHERE c.id = base.id
+  AND (
+    c.total_contratos IS DISTINCT FROM COALESCE(m.total, 0)
+    OR c.primeiro_contrato_em IS DISTINCT FROM m.primeiro
+    OR c.ultimo_contrato_em IS DISTINCT FROM m.ultimo
+  );
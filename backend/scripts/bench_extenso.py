@@ -0,0 +1,88 @@
+"""Micro-benchmark of the extenso engine (cold vs memoized vs batch).
+
+Usage:
+    python backend/scripts/bench_extenso.py [--values 5000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+from decimal import Decimal
+from pathlib import Path
+import random
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import extenso_service  # noqa: E402
+from app.services.extenso_service import ExtensoService  # noqa: E402
+
+
+def _workload(size: int, seed: int = 42) -> List[Decimal]:
+    # Distribuicao realista: poucos valores "redondos" muito repetidos + cauda aleatoria.
+    rng = random.Random(seed)
+    common = [Decimal(value) for value in ("500.00", "997.00", "1500.00", "2000.00", "2997.00", "5000.00")]
+    values: List[Decimal] = []
+    for _ in range(size):
+        if rng.random() < 0.7:
+            values.append(rng.choice(common))
+        else:
+            values.append(Decimal(rng.randint(100, 50_000_00)) / 100)
+    return values
+
+
+def _best_of(repeat: int, run: Callable[[], object], before: Callable[[], None]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        before()
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    valores = _workload(args.values)
+    parcelas = [valor % 12 + 1 for valor in range(args.values)]
+    uncached_valor = extenso_service._valor_words.__wrapped__
+    uncached_numero = extenso_service.num2words
+
+    def cold() -> None:
+        for valor in valores:
+            uncached_valor(*extenso_service._split_valor(valor))
+        for qtd in parcelas:
+            uncached_numero(qtd, lang="pt_BR")
+
+    def memoized() -> None:
+        for valor in valores:
+            ExtensoService.valor_por_extenso(valor)
+        for qtd in parcelas:
+            ExtensoService.numero_por_extenso(qtd)
+
+    def batch() -> None:
+        ExtensoService.valores_por_extenso(valores)
+        ExtensoService.numeros_por_extenso(parcelas)
+
+    results = {
+        "sem cache": _best_of(args.repeat, cold, lambda: None),
+        "memoizado (cache frio)": _best_of(args.repeat, memoized, ExtensoService.cache_clear),
+        "memoizado (cache quente)": _best_of(args.repeat, memoized, lambda: None),
+        "lote (cache frio)": _best_of(args.repeat, batch, ExtensoService.cache_clear),
+        "lote (cache quente)": _best_of(args.repeat, batch, lambda: None),
+    }
+    baseline = results["sem cache"]
+    conversions = len(valores) + len(parcelas)
+    print(f"{conversions} conversoes, melhor de {args.repeat}")
+    for label, seconds in results.items():
+        print(f"{label:<26} {seconds * 1000:9.2f} ms  {seconds / conversions * 1e6:7.2f} us/op  x{baseline / seconds:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # Configuração de testes
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
@@ -7,10 +8,25 @@ from sqlalchemy.orm import sessionmaker
 from app.config import settings
 from app.db.session import get_db
 from app.main import app
+from app.services.embedding_cache_service import embedding_cache_service
+from app.services.pagination_service import count_cache
+from app.services.whatsapp_directory_service import whatsapp_directory_service
+from app.services.whatsapp_lid_binding_service import whatsapp_lid_binding_service
+
+
+# Caches de processo (diretorio WhatsApp, vinculos @lid, embeddings, totais): isolar entre testes
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    caches = (whatsapp_directory_service, whatsapp_lid_binding_service, embedding_cache_service, count_cache)
+    for cache in caches:
+        cache.clear()
+    yield
+    for cache in caches:
+        cache.clear()
 
 
 # Fixture para cliente HTTP async
-@pytest.fixture
+@pytest_asyncio.fixture
 async def client():
     """Cliente HTTP para testes"""
     async with AsyncClient(app=app, base_url="http://testserver") as client:
@@ -18,7 +34,7 @@ async def client():
 
 
 # Fixture para banco de dados de teste
-@pytest.fixture
+@pytest_asyncio.fixture
 async def db_session():
     """Sessão de banco de dados para testes"""
     # Usar banco de teste separado se disponível
@@ -29,10 +45,11 @@ async def db_session():
 
     async with async_session() as session:
         yield session
+    await engine.dispose()
 
 
 # Fixture para autenticação
-@pytest.fixture
+@pytest_asyncio.fixture
 async def auth_token(client):
     """Token de autenticação para testes"""
     response = await client.post(
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import random
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.models.agenda import Agenda
+from app.models.cliente import Cliente
+from app.models.contrato import Contrato
+from app.models.user import User
+from app.services import cliente_maintenance_service as maintenance_module
+from app.services.cliente_maintenance_service import (
+    DEDUPE_DOCUMENTOS,
+    SYNC_CONTRACTS,
+    ClienteMaintenanceService,
+)
+
+
+class _Result:
+    def __init__(self, rows=(), mapping=None, rowcount=0):
+        self._rows = list(rows)
+        self._mapping = mapping
+        self.rowcount = rowcount
+
+    def all(self):
+        return list(self._rows)
+
+    def mappings(self):
+        return SimpleNamespace(one=lambda: self._mapping)
+
+
+class _FakeDb:
+    """Responde aos statements do servico por prefixo do SQL."""
+
+    def __init__(self, orphan_pages=(), linked_pages=(), staged_pages=()):
+        self.orphan_pages = list(orphan_pages)
+        self.linked_pages = list(linked_pages)
+        self.staged_pages = list(staged_pages)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append((sql, params))
+        if sql.startswith("SELECT id FROM contratos WHERE cliente_id IS NULL"):
+            return _Result([(row_id,) for row_id in self.orphan_pages.pop(0)])
+        if sql.startswith("WITH batch AS"):
+            return _Result(self.linked_pages.pop(0))
+        if sql.startswith("SELECT documento FROM cliente_dedup_staging"):
+            return _Result([(doc,) for doc in self.staged_pages.pop(0)])
+        if sql.startswith("WITH ranked AS"):
+            docs = params["docs"]
+            return _Result(mapping={
+                "grupos_duplicados": len(docs),
+                "clientes_removidos": len(docs),
+                "contratos_relinkados": 3,
+                "agenda_relinkada": 1,
+                "contatos_mesclados": 1,
+                "canonicos": [uuid4() for _ in docs],
+            })
+        if sql.startswith("INSERT INTO cliente_dedup_staging"):
+            return _Result(rowcount=3)
+        return _Result(rowcount=1)
+
+    async def flush(self):
+        return None
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+    def count(self, prefix):
+        return sum(sql.startswith(prefix) for sql, _ in self.statements)
+
+
+def _service(batch_size):
+    service = ClienteMaintenanceService()
+    service.batch_size = batch_size
+    service._table_checked = True
+    return service
+
+
+@pytest.mark.asyncio
+async def test_sync_runs_set_based_batches_with_keyset_cursor_and_progress():
+    created_at = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    ids = [uuid4() for _ in range(3)]
+    cliente_novo, cliente_existente = uuid4(), uuid4()
+    db = _FakeDb(
+        orphan_pages=[ids[:2], ids[2:]],
+        linked_pages=[
+            [(cliente_novo, created_at, True), (cliente_existente, created_at, False)],
+            [],  # documento vazio: contrato ignorado
+        ],
+    )
+    progress = []
+
+    totals = await _service(2).run_inline(db, SYNC_CONTRACTS, progress=progress.append)
+
+    assert totals == {
+        "contratos_orfaos": 3,
+        "clientes_criados": 1,
+        "contratos_vinculados": 2,
+        "ignorados": 1,
+        "clientes_recalculados": 2,
+    }
+    assert [item["contratos_orfaos"] for item in progress] == [2, 3]
+    pages = [params for sql, params in db.statements if sql.startswith("SELECT id FROM contratos")]
+    assert pages == [{"after": None, "limit": 2}, {"after": str(ids[1]), "limit": 2}]
+    # Um statement de vinculo e um delta de metricas por lote, commit por lote.
+    assert db.count("WITH batch AS") == 2
+    assert db.count("UPDATE clientes SET total_contratos") == 1
+    assert db.commits == 2
+
+
+@pytest.mark.asyncio
+async def test_dedupe_stages_groups_once_and_cleans_up():
+    db = _FakeDb(staged_pages=[["111", "222"], ["333"]])
+
+    totals = await _service(2).run_inline(db, DEDUPE_DOCUMENTOS)
+
+    assert totals == {
+        "grupos_duplicados": 3,
+        "clientes_removidos": 3,
+        "contratos_relinkados": 6,
+        "agenda_relinkada": 2,
+    }
+    assert db.count("INSERT INTO cliente_dedup_staging") == 1
+    assert db.count("WITH ranked AS") == 2
+    assert db.count("UPDATE clientes c SET total_contratos = COALESCE(m.total, 0)") == 2
+    assert db.count("DELETE FROM cliente_dedup_staging") == 1
+    staged = [params for sql, params in db.statements if sql.startswith("SELECT documento FROM cliente_dedup_staging")]
+    assert [page["after"] for page in staged] == [None, "222"]
+
+
+def test_dedupe_statement_relinks_before_deleting_in_one_query():
+    sql = str(maintenance_module._DEDUPE_BATCH_SQL.compile(dialect=postgresql.dialect()))
+    assert "regexp_replace(documento, '[^0-9]', '', 'g') = ANY(%(docs)s::TEXT[])" in sql
+    assert sql.index("UPDATE contratos SET cliente_id = m.canonical_id") < sql.index("DELETE FROM clientes")
+    assert "telefone = COALESCE(NULLIF(c.telefone, ''), f.telefone, c.telefone)" in sql
+
+
+@pytest.mark.asyncio
+async def test_run_inline_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        await _service(10).run_inline(_FakeDb(), "outro")
+
+
+def _digits(size):
+    return "".join(random.choice("0123456789") for _ in range(size))
+
+
+def _cpf(digits):
+    return f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}"
+
+
+def _db_contrato(user_id, documento, cliente_id=None, **overrides):
+    data = {
+        "numero": f"TST-{uuid4().hex[:12]}",
+        "template_id": "bacen",
+        "template_nome": "Bacen",
+        "cliente_id": cliente_id,
+        "contratante_nome": "Fulano de Tal",
+        "contratante_documento": documento,
+        "contratante_email": "fulano@example.com",
+        "contratante_endereco": "Rua A, 1",
+        "valor_total": Decimal("1000.00"),
+        "valor_total_extenso": "mil reais",
+        "valor_entrada": Decimal("100.00"),
+        "valor_entrada_extenso": "cem reais",
+        "qtd_parcelas": 3,
+        "qtd_parcelas_extenso": "tres",
+        "valor_parcela": Decimal("300.00"),
+        "valor_parcela_extenso": "trezentos reais",
+        "prazo_1": 30,
+        "prazo_1_extenso": "trinta",
+        "prazo_2": 60,
+        "prazo_2_extenso": "sessenta",
+        "local_assinatura": "Ribeirao Preto/SP",
+        "data_assinatura": "01/10/2026",
+        "created_by": user_id,
+    }
+    data.update(overrides)
+    return Contrato(**data)
+
+
+@pytest.mark.asyncio
+async def test_dedupe_and_sync_against_database(db_session):
+    """Roda os statements reais: FKs de contratos/agenda, ON CONFLICT e existentes/novos."""
+    db = db_session
+    doc_dup, doc_novo = _digits(11), _digits(11)
+    user = User(email=f"maint-{uuid4().hex[:8]}@example.com", hashed_password="x", nome="Teste")
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Mesmo CPF com e sem mascara: o canonico e o de mais contratos.
+    canonico = Cliente(
+        nome="Fabio", documento=_cpf(doc_dup), email="fabio@example.com", telefone="",
+        total_contratos=2, created_at=base,
+    )
+    duplicado = Cliente(
+        nome="Fabio S", documento=doc_dup, email="fabio@example.com", telefone="16999990000",
+        cidade="Ribeirao Preto", total_contratos=1, created_at=base + timedelta(days=1),
+    )
+    db.add_all([user, canonico, duplicado])
+    await db.flush()
+    contratos = [
+        _db_contrato(user.id, doc_dup, canonico.id),
+        _db_contrato(user.id, doc_dup, canonico.id),
+        _db_contrato(user.id, doc_dup, duplicado.id),
+        # Orfaos: um casa com cliente existente, dois criam um unico cliente novo.
+        _db_contrato(user.id, _cpf(doc_dup)),
+        _db_contrato(user.id, doc_novo, contratante_nome="Beltrano Antigo", created_at=base),
+        _db_contrato(user.id, _cpf(doc_novo), contratante_nome="Beltrano", created_at=base + timedelta(days=2)),
+        _db_contrato(user.id, ""),
+    ]
+    db.add_all(contratos)
+    await db.flush()
+    evento = Agenda(titulo="Retorno", data_inicio=base, cliente_id=duplicado.id, created_by=user.id)
+    db.add(evento)
+    await db.commit()
+    ids = {
+        "user": user.id,
+        "canonico": canonico.id,
+        "duplicado": duplicado.id,
+        "contratos": [item.id for item in contratos],
+        "agenda": evento.id,
+    }
+
+    service = _service(2)
+    service._table_checked = False
+    try:
+        dedupe = await service.run_inline(db, DEDUPE_DOCUMENTOS)
+        sync = await service.run_inline(db, SYNC_CONTRACTS)
+
+        assert dedupe["clientes_removidos"] >= 1 and sync["clientes_criados"] >= 1
+
+        async def scalar(sql, **params):
+            return (await db.execute(text(sql), params)).scalar()
+
+        assert await scalar("SELECT COUNT(*) FROM clientes WHERE id = :id", id=ids["duplicado"]) == 0
+        row = (
+            await db.execute(
+                text("SELECT telefone, cidade, total_contratos FROM clientes WHERE id = :id"),
+                {"id": ids["canonico"]},
+            )
+        ).one()
+        # Contato vazio herdado do duplicado; metrica = 3 vinculados + 1 orfao.
+        assert tuple(row) == ("16999990000", "Ribeirao Preto", 4)
+        assert await scalar("SELECT cliente_id FROM agenda WHERE id = :id", id=ids["agenda"]) == ids["canonico"]
+        vinculos = dict(
+            (
+                await db.execute(
+                    text("SELECT id, cliente_id FROM contratos WHERE id = ANY(:ids)"),
+                    {"ids": ids["contratos"]},
+                )
+            ).all()
+        )
+        assert {vinculos[item] for item in ids["contratos"][:4]} == {ids["canonico"]}
+        assert vinculos[ids["contratos"][-1]] is None
+        novo_id = vinculos[ids["contratos"][4]]
+        assert novo_id not in (None, ids["canonico"]) and vinculos[ids["contratos"][5]] == novo_id
+        novo = (
+            await db.execute(
+                text("SELECT nome, documento, total_contratos FROM clientes WHERE id = :id"), {"id": novo_id}
+            )
+        ).one()
+        assert tuple(novo) == ("Beltrano", doc_novo, 2)
+    finally:
+        await db.rollback()
+        await db.execute(text("DELETE FROM agenda WHERE id = :id"), {"id": ids["agenda"]})
+        await db.execute(text("DELETE FROM contratos WHERE id = ANY(:ids)"), {"ids": ids["contratos"]})
+        await db.execute(
+            text("DELETE FROM clientes WHERE regexp_replace(documento, '[^0-9]', '', 'g') IN (:a, :b)"),
+            {"a": doc_dup, "b": doc_novo},
+        )
+        await db.execute(text("DELETE FROM users WHERE id = :id"), {"id": ids["user"]})
+        await db.commit()
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.services.cliente_metrics_service import ClienteMetricsService
+
+
+class _FakeDb:
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, statement, params=None):
+        self.calls.append((" ".join(str(statement).split()), params))
+        return SimpleNamespace(rowcount=len(params["ids"]) if isinstance(params, dict) and "ids" in params else 7)
+
+
+def _dt(day):
+    return datetime(2026, 1, day, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_added_contracts_become_one_delta_per_cliente():
+    db = _FakeDb()
+    a, b = uuid4(), uuid4()
+
+    touched = await ClienteMetricsService().contracts_added(
+        db, [(a, _dt(3)), (b, None), (a, _dt(1)), (None, _dt(2)), (a, _dt(5))]
+    )
+
+    assert touched == 2 and len(db.calls) == 1
+    sql, params = db.calls[0]
+    assert sql.startswith("UPDATE clientes SET total_contratos = COALESCE(total_contratos, 0) + :count")
+    by_id = {row["cliente_id"]: row for row in params}
+    assert by_id[a] == {"cliente_id": a, "count": 3, "primeiro": _dt(1), "ultimo": _dt(5)}
+    # Sem data conhecida o SQL usa NOW() (created_at do server_default).
+    assert by_id[b] == {"cliente_id": b, "count": 1, "primeiro": None, "ultimo": None}
+
+
+@pytest.mark.asyncio
+async def test_removed_contract_only_rescans_when_it_was_an_edge():
+    db = _FakeDb()
+    cliente_id = uuid4()
+
+    await ClienteMetricsService().contracts_removed(db, [(cliente_id, _dt(4))])
+    await ClienteMetricsService().contracts_removed(db, [(None, _dt(4))])
+
+    assert len(db.calls) == 1
+    sql, params = db.calls[0]
+    assert "GREATEST(COALESCE(c.total_contratos, 0) - :count, 0)" in sql
+    assert "WHEN c.primeiro_contrato_em IS NOT NULL AND c.primeiro_contrato_em <" in sql
+    assert "ELSE (SELECT MIN(ct.created_at) FROM contratos ct WHERE ct.cliente_id = c.id)" in sql
+    assert params == [{"cliente_id": cliente_id, "count": 1, "primeiro": _dt(4), "ultimo": _dt(4)}]
+
+
+@pytest.mark.asyncio
+async def test_relink_moves_contract_between_clientes():
+    db = _FakeDb()
+    old, new = uuid4(), uuid4()
+    service = ClienteMetricsService()
+
+    await service.contract_relinked(db, old, old, _dt(2))
+    assert db.calls == []
+
+    await service.contract_relinked(db, old, new, _dt(2))
+    assert [params[0]["cliente_id"] for _, params in db.calls] == [old, new]
+    assert "- :count" in db.calls[0][0] and "+ :count" in db.calls[1][0]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_is_a_single_set_based_update():
+    db = _FakeDb()
+    service = ClienteMetricsService()
+    a = uuid4()
+
+    assert await service.rebuild(db) == 7
+    assert await service.rebuild(db, [a, a]) == 1
+    assert await service.rebuild(db, []) == 0
+
+    full_sql, full_params = db.calls[0]
+    assert full_sql.startswith("UPDATE clientes c SET total_contratos = COALESCE(m.total, 0)")
+    assert "GROUP BY cliente_id" in full_sql and "ANY(" not in full_sql and full_params is None
+    scoped_sql, scoped_params = db.calls[1]
+    assert "cliente_id = ANY(:ids)" in scoped_sql and "base.id = ANY(:ids)" in scoped_sql
+    assert scoped_params == {"ids": [a]}
+    assert len(db.calls) == 2
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.services import contrato_service as contrato_service_module
+from app.services.contrato_numero_service import ContratoNumeroService
+from app.services.contrato_service import ContratoService
+
+
+def _item(**overrides):
+    item = {
+        "template_id": "rating_convencional",
+        "contratante_nome": "Maria Souza",
+        "contratante_documento": "123.456.789-01",
+        "contratante_email": "maria@example.com",
+        "contratante_endereco": "Rua A, 1",
+        "valor_total": "1500.00",
+        "valor_entrada": "300.00",
+        "qtd_parcelas": 3,
+        "valor_parcela": "0",
+        "prazo_1": 0,
+        "prazo_2": 0,
+        "data_assinatura": "10/01/2026",
+    }
+    item.update(overrides)
+    return item
+
+
+class _Result:
+    def __init__(self, rows=None, scalar=None):
+        self._rows = rows or []
+        self._scalar = scalar
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: list(self._rows))
+
+    def all(self):
+        return list(self._rows)
+
+    def scalar_one_or_none(self):
+        return self._scalar
+
+    def scalar_one(self):
+        return self._scalar
+
+
+class _FakeDb:
+    def __init__(self):
+        self.statements = []
+        self.inserted = []
+        self.added = []
+        self.commits = 0
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if sql.startswith("INSERT INTO contratos"):
+            self.inserted.extend(params)
+            return _Result()
+        if sql.startswith("UPDATE contrato_numero_counters"):
+            return _Result(scalar=10 + params["count"])
+        return _Result()
+
+    def add_all(self, items):
+        for item in items:
+            item.id = uuid4()
+        self.added.extend(items)
+
+    async def flush(self):
+        return None
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_batch_derived_fields_match_single_row():
+    rows = [SimpleNamespace(**_item(qtd_parcelas=qtd), valor_total_extenso=None, valor_entrada_extenso=None,
+                            qtd_parcelas_extenso=None, valor_parcela_extenso=None, prazo_1_extenso=None,
+                            prazo_2_extenso=None) for qtd in (1, 3)]
+    singles = [SimpleNamespace(**vars(row)) for row in rows]
+
+    schedules = ContratoService._apply_derived_fields_batch(rows, contrato_service_module.ExtensoService())
+    for single in singles:
+        ContratoService._apply_derived_fields(single, contrato_service_module.ExtensoService())
+
+    assert schedules == [[], [30, 60, 90]]
+    assert [vars(row) for row in rows] == [vars(single) for single in singles]
+    assert rows[0].prazo_1_extenso == "à vista"
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_inserts_valid_rows_once_and_reports_failures(monkeypatch):
+    monkeypatch.setattr(contrato_service_module, "contrato_numero_service", ContratoNumeroService())
+    db = _FakeDb()
+    service = ContratoService(db)
+    items = [
+        _item(),
+        _item(contratante_email="outra@example.com", valor_total="2000"),
+        _item(template_id="nao_existe"),
+        {"template_id": "rating_convencional"},
+        _item(contratante_documento="98765432100"),
+    ]
+
+    result = await service.bulk_create(items, uuid4())
+
+    assert result["criados"] == 3 and result["falhas"] == 2
+    assert [row["ok"] for row in result["resultados"]] == [True, True, False, False, True]
+    assert "nao_existe" in result["resultados"][2]["erro"]
+    assert "contratante_nome" in result["resultados"][3]["erro"]
+    assert [row["numero"] for row in db.inserted] == [f"CNT-{db.inserted[0]['numero'][4:8]}-00{n}" for n in (11, 12, 13)]
+
+    # Um cliente novo por documento distinto, mesmo repetido no lote.
+    assert len(db.added) == 2
+    assert db.inserted[0]["cliente_id"] == db.inserted[1]["cliente_id"] != db.inserted[2]["cliente_id"]
+    assert db.inserted[1]["valor_total_extenso"] == "dois mil reais"
+    assert sum(sql.startswith("INSERT INTO contratos") for sql in db.statements) == 1
+    assert sum("FROM clientes" in sql and "regexp_replace" in sql for sql in db.statements) == 1
+    # Metricas: um UPDATE por delta (executemany), sem agregar a tabela de contratos.
+    assert sum(sql.startswith("UPDATE clientes SET total_contratos") for sql in db.statements) == 1
+    assert not any("count(contratos.id)" in sql for sql in db.statements)
+    assert db.commits == 1
@@ -0,0 +1,47 @@
+import io
+from uuid import uuid4
+import zipfile
+
+import pytest
+
+from app.services.contrato_bulk_export_service import ContratoBulkExportService, ExportItem
+from app.services.contrato_pdf_cache_service import PdfArtifact
+
+
+@pytest.mark.asyncio
+async def test_stream_zip_renders_in_parallel_and_reports_failures(tmp_path, monkeypatch):
+    service = ContratoBulkExportService()
+    service.concurrency = 2
+    cached_pdf = tmp_path / "cached.pdf"
+    cached_pdf.write_bytes(b"%PDF-cached" * 10_000)
+    items = [
+        ExportItem(contrato_id=uuid4(), numero="CNT-001"),
+        ExportItem(contrato_id=uuid4(), numero="CNT-002"),
+        ExportItem(contrato_id=uuid4(), numero="CNT/003"),
+        ExportItem(contrato_id=uuid4(), numero="CNT-001"),
+    ]
+    artifacts = {
+        items[0].contrato_id: PdfArtifact(etag="a", path=str(cached_pdf)),
+        items[1].contrato_id: PdfArtifact(etag="b", content=b"%PDF-rendered"),
+        items[3].contrato_id: PdfArtifact(etag="d", content=b"%PDF-dup"),
+    }
+
+    async def _fake_render(contrato_id):
+        if contrato_id == items[2].contrato_id:
+            raise RuntimeError("falha de render")
+        return artifacts[contrato_id]
+
+    monkeypatch.setattr(service, "_render_one", _fake_render)
+
+    chunks = [chunk async for chunk in service.stream_zip(items)]
+
+    assert len(chunks) > 2
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    names = sorted(archive.namelist())
+    assert names == ["contrato-CNT-001-2.pdf", "contrato-CNT-001.pdf", "contrato-CNT-002.pdf", "erros.txt"]
+    assert b"%PDF-rendered" == archive.read("contrato-CNT-002.pdf")
+    assert {archive.read("contrato-CNT-001.pdf"), archive.read("contrato-CNT-001-2.pdf")} == {
+        cached_pdf.read_bytes(),
+        b"%PDF-dup",
+    }
+    assert "falha de render" in archive.read("erros.txt").decode()
@@ -0,0 +1,70 @@
+import pytest
+
+from app.services.contrato_numero_service import ContratoNumeroService, format_numero
+
+
+class _Result:
+    def __init__(self, value):
+        self._value = value
+
+    def scalar_one_or_none(self):
+        return self._value
+
+    def scalar_one(self):
+        assert self._value is not None
+        return self._value
+
+
+class _FakeDb:
+    """Simula contrato_numero_counters; `max_existente` = maior sequencial em contratos."""
+
+    def __init__(self, max_existente=0):
+        self.counters = {}
+        self.max_existente = max_existente
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if sql.startswith("UPDATE contrato_numero_counters"):
+            if params["ano"] not in self.counters:
+                return _Result(None)
+            self.counters[params["ano"]] += params["count"]
+            return _Result(self.counters[params["ano"]])
+        if sql.startswith("INSERT INTO contrato_numero_counters"):
+            assert "FROM contratos" in sql
+            self.counters[params["ano"]] = self.max_existente + params["count"]
+            return _Result(self.counters[params["ano"]])
+        return _Result(None)
+
+
+@pytest.mark.asyncio
+async def test_reserve_seeds_from_existing_numbers_once_then_increments():
+    service = ContratoNumeroService()
+    db = _FakeDb(max_existente=41)
+
+    assert await service.next_numero(db, ano=2026) == "CNT-2026-0042"
+    assert await service.reserve(db, 3, ano=2026) == ["CNT-2026-0043", "CNT-2026-0044", "CNT-2026-0045"]
+    assert sum("FROM contratos" in sql for sql in db.statements) == 1
+    assert sum(sql.startswith("CREATE TABLE") for sql in db.statements) == 2
+
+    # Ano novo comeca do zero (sem contratos daquele ano).
+    db.max_existente = 0
+    assert await service.next_numero(db, ano=2027) == "CNT-2027-0001"
+    assert await service.reserve(db, 0, ano=2027) == []
+
+
+@pytest.mark.asyncio
+async def test_ensure_table_reruns_after_rolled_back_transaction():
+    service = ContratoNumeroService()
+    db = _FakeDb()
+    await service.reserve(db, 1, ano=2026)
+    # Transacao desfeita (tabela criada nela some): a proxima reserva recria.
+    db.counters.clear()
+    assert await service.next_numero(db, ano=2026) == "CNT-2026-0001"
+    assert sum(sql.startswith("CREATE TABLE") for sql in db.statements) == 2
+
+
+def test_format_numero_pads_but_does_not_truncate():
+    assert format_numero(2026, 7) == "CNT-2026-0007"
+    assert format_numero(2026, 12345) == "CNT-2026-12345"
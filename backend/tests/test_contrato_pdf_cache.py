@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.models.contrato import Contrato, ContratoStatus
+from app.services import contrato_service as contrato_service_module
+from app.services.contrato_pdf_cache_service import ContratoPdfCacheService, etag_matches
+from app.services.contrato_service import ContratoService
+
+
+def _contrato(**overrides):
+    data = {
+        "id": uuid4(),
+        "numero": "CNT-2026-0001",
+        "status": ContratoStatus.RASCUNHO,
+        "template_id": "bacen",
+        "template_nome": "Bacen",
+        "contratante_nome": "Fulano de Tal",
+        "contratante_documento": "12345678901",
+        "contratante_email": "fulano@example.com",
+        "contratante_endereco": "Rua A, 1",
+        "valor_total": Decimal("1000.00"),
+        "valor_total_extenso": "mil reais",
+        "valor_entrada": Decimal("100.00"),
+        "valor_entrada_extenso": "cem reais",
+        "qtd_parcelas": 3,
+        "qtd_parcelas_extenso": "tres",
+        "valor_parcela": Decimal("300.00"),
+        "valor_parcela_extenso": "trezentos reais",
+        "prazo_1": 30,
+        "prazo_1_extenso": "trinta",
+        "prazo_2": 60,
+        "prazo_2_extenso": "sessenta",
+        "local_assinatura": "Ribeirao Preto/SP",
+        "data_assinatura": "01/10/2026",
+        "dados_extras": {},
+        "created_at": datetime(2026, 10, 1, tzinfo=timezone.utc),
+    }
+    data.update(overrides)
+    return Contrato(**data)
+
+
+def test_fingerprint_ignores_status_and_tracks_document_fields():
+    service = ContratoPdfCacheService()
+    contrato = _contrato()
+    base = service.fingerprint(contrato)
+
+    contrato.status = ContratoStatus.ENVIADO
+    contrato.pdf_url = "/storage/x.pdf"
+    assert service.fingerprint(contrato) == base
+
+    contrato.valor_total = Decimal("1500.00")
+    assert service.fingerprint(contrato) != base
+    assert service.fingerprint(contrato, "weasyprint") != service.fingerprint(contrato, "playwright")
+
+
+@pytest.mark.asyncio
+async def test_fallback_render_is_served_but_not_cached(monkeypatch, tmp_path):
+    cache = ContratoPdfCacheService()
+    cache.enabled = True
+    cache.mode = "local"
+    cache.root = tmp_path / "pdf_cache"
+    contrato = _contrato()
+    renders = [(b"%PDF-weasy", "weasyprint"), (b"%PDF-chromium", "playwright")]
+    service = ContratoService(db=None)
+
+    async def get_by_id(contrato_id):
+        return contrato
+
+    async def render(_contrato):
+        return renders.pop(0)
+
+    monkeypatch.setattr(contrato_service_module, "contrato_pdf_cache_service", cache)
+    monkeypatch.setattr(contrato_service_module, "preferred_renderer", lambda: "playwright")
+    monkeypatch.setattr(service, "get_by_id", get_by_id)
+    monkeypatch.setattr(service, "_render_contrato_pdf", render)
+    key = cache.fingerprint(contrato, "playwright")
+
+    # Playwright falhou: WeasyPrint e servido com ETag propria e nada e gravado.
+    fallback = await service.get_pdf_artifact(contrato.id)
+    assert fallback.content == b"%PDF-weasy" and fallback.etag != key
+    assert await cache.get(contrato.id, key) is None
+
+    # A ETag do fallback nao vira 304: a proxima chamada renderiza de novo.
+    stored = await service.get_pdf_artifact(contrato.id, if_none_match=f'"{fallback.etag}"')
+    assert stored.etag == key and open(stored.path, "rb").read() == b"%PDF-chromium"
+    assert (await service.get_pdf_artifact(contrato.id)).path == stored.path
+    assert renders == []
+
+
+def test_weasy_data_uses_contract_creation_date_instead_of_render_date():
+    dados = ContratoService(db=None)._build_pdf_data(_contrato(data_assinatura=None))
+    assert dados["data_assinatura"] == "01/10/2026"
+
+
+@pytest.mark.asyncio
+async def test_local_cache_roundtrip_and_invalidation(tmp_path):
+    service = ContratoPdfCacheService()
+    service.enabled = True
+    service.mode = "local"
+    service.root = tmp_path / "pdf_cache"
+    contrato_id = uuid4()
+
+    assert await service.get(contrato_id, "k1") is None
+    await service.put(contrato_id, "k1", b"%PDF-1")
+    stored = await service.put(contrato_id, "k2", b"%PDF-2")
+
+    assert await service.get(contrato_id, "k1") is None
+    cached = await service.get(contrato_id, "k2")
+    assert cached.path == stored.path
+    assert open(cached.path, "rb").read() == b"%PDF-2"
+
+    await service.invalidate(contrato_id)
+    assert await service.get(contrato_id, "k2") is None
+
+
+def test_etag_matches_if_none_match_forms():
+    assert etag_matches('"abc"', "abc")
+    assert etag_matches('W/"zzz", "abc"', "abc")
+    assert etag_matches("*", "abc")
+    assert not etag_matches('"abd"', "abc")
+    assert not etag_matches(None, "abc")
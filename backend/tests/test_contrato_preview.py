@@ -0,0 +1,49 @@
+from app.models.contrato import Contrato, ContratoStatus
+from app.services.contrato_preview_service import ContratoPreviewService
+from app.services.pdf_service_playwright import PDFService
+
+
+DADOS = {
+    "contratante_nome": "Maria Souza",
+    "contratante_documento": "12345678901",
+    "contratante_email": "maria@example.com",
+    "contratante_endereco": "Rua A, 1",
+    "valor_total": "1500.00",
+    "valor_entrada": "300",
+    "qtd_parcelas": 3,
+    "data_assinatura": "10/01/2026",
+}
+
+
+def test_preview_matches_full_render_and_fills_derived_fields():
+    service = ContratoPreviewService()
+    result = service.render("rating_convencional", DADOS)
+
+    completos = result["dados_completos"]
+    assert completos["prazo_1"] == 30 and completos["prazo_2"] == 60
+    assert completos["valor_parcela_extenso"]
+    assert completos["dados_extras"]["parcelamento"] == "3x"
+
+    contrato = Contrato(**completos, status=ContratoStatus.RASCUNHO, template_nome="x")
+    expected = PDFService()._generate_html(contrato, inline_assets=True)
+    assert result["html"] == expected
+    assert "Maria Souza" in result["html"]
+    assert "<style>" in result["html"]
+
+
+def test_preview_only_rerenders_blocks_whose_tokens_changed():
+    service = ContratoPreviewService()
+    service.render("rating_convencional", DADOS)
+    cache = service._block_cache("rating_convencional")
+    assert len(cache) > 0
+
+    misses = cache.misses
+    service.render("rating_convencional", DADOS)
+    assert cache.misses == misses
+
+    # Email so aparece em parte dos blocos: os demais vem do cache.
+    hits = cache.hits
+    result = service.render("rating_convencional", {**DADOS, "contratante_email": "outra@example.com"})
+    assert "outra@example.com" in result["html"]
+    assert cache.hits > hits
+    assert cache.misses - misses < len(cache)
@@ -0,0 +1,79 @@
+import json
+import os
+from types import SimpleNamespace
+
+from app.services.contrato_template_loader import ContractTemplateRegistry
+from app.services.pdf_service_playwright import PDFService
+
+
+def _write_template(path, titulo, ativo=True):
+    payload = {
+        "id": "zz_registro_teste",
+        "nome": "Registro Teste",
+        "ativo": ativo,
+        "clausulas": [
+            {"numero": "1", "titulo": titulo, "paragrafos": ["Texto fixo.", "- item"]},
+            {"numero": "2", "titulo": "Valor", "conteudo": "Valor de [VALOR] pago por [NOME COMPLETO DO CLIENTE]."},
+        ],
+    }
+    path.write_text(json.dumps(payload), encoding="utf-8")
+
+
+def test_registry_compiles_once_and_reloads_on_mtime_change(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONTRATOS_TEMPLATES_DIR", str(tmp_path))
+    template_path = tmp_path / "zz_registro_teste.json"
+    _write_template(template_path, "Objeto")
+
+    registry = ContractTemplateRegistry()
+    registry.reload_seconds = 0.0
+    first = registry.get("ZZ_REGISTRO_TESTE")
+    assert first.payload["clausulas"][0]["conteudo"] == "Texto fixo.\n\n- item"
+    assert registry.get("zz_registro_teste") is first
+    loads = registry.loads
+
+    _write_template(template_path, "Objeto alterado")
+    stat = template_path.stat()
+    os.utime(template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = registry.get("zz_registro_teste")
+    assert registry.loads == loads + 1
+    assert second is not first
+    assert second.payload["clausulas"][0]["titulo"] == "Objeto alterado"
+
+
+def test_static_clause_html_is_cached_on_compiled_template():
+    service = PDFService(db=None)
+    contrato = SimpleNamespace(
+        dados_extras={},
+        contratante_nome="Fulano",
+        contratante_documento="12345678901",
+        numero="CNT-1",
+        data_assinatura="01/10/2026",
+        created_at=None,
+        contratante_email="",
+        contratante_telefone=None,
+        contratante_endereco="",
+        valor_total=1000,
+        valor_total_extenso="mil reais",
+        valor_entrada=0,
+        valor_entrada_extenso="",
+        qtd_parcelas=1,
+        qtd_parcelas_extenso="uma",
+        valor_parcela=1000,
+        valor_parcela_extenso="mil reais",
+        prazo_1=0,
+        prazo_1_extenso="",
+        prazo_2=0,
+        prazo_2_extenso="",
+    )
+    clauses = [
+        {"numero": "1", "titulo": "Objeto", "conteudo": "Texto fixo."},
+        {"numero": "2", "titulo": "Valor", "conteudo": "Valor de [VALOR]."},
+    ]
+    fragments = {}
+
+    first = service._render_clauses_html(contrato, clauses, fragments=fragments)
+    assert list(fragments) == [("clause", 0)]
+    assert service._render_clauses_html(contrato, clauses, fragments=fragments) == first
+    assert first == service._render_clauses_html(contrato, clauses)
+    assert "R$ 1.000,00" in first
@@ -0,0 +1,84 @@
+import pytest
+
+from app.services.embedding_cache_service import (
+    EmbeddingCacheService,
+    embedding_cache_key,
+    embedding_cache_service,
+)
+from app.services.openai_service import OpenAIService
+
+
+def test_cache_key_normalizes_whitespace_and_separates_models():
+    assert embedding_cache_key("m1", "bom  dia\n") == embedding_cache_key("m1", "bom dia")
+    assert embedding_cache_key("m1", "bom dia") != embedding_cache_key("m2", "bom dia")
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used(monkeypatch):
+    cache = EmbeddingCacheService()
+    monkeypatch.setattr(cache, "max_items", 2)
+
+    await cache.put_many("m", [("a", [1.0]), ("b", [2.0])])
+    assert await cache.get_many("m", ["a"]) == {"a": [1.0]}
+    await cache.put_many("m", [("c", [3.0])])
+
+    assert await cache.get_many("m", ["a", "b", "c"]) == {"a": [1.0], "c": [3.0]}
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, inputs):
+        self._inputs = inputs
+
+    def json(self):
+        return {"data": [{"index": idx, "embedding": [0.5, float(idx)]} for idx in range(len(self._inputs))]}
+
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    async def post(self, url, headers=None, json=None, timeout=None):
+        self.calls.append(list(json["input"]))
+        return _FakeResponse(json["input"])
+
+
+@pytest.mark.asyncio
+async def test_embed_text_reuses_cached_vectors(monkeypatch):
+    service = OpenAIService()
+    service.api_key = "test-key"
+    client = _FakeClient()
+    monkeypatch.setattr(
+        "app.services.openai_service.http_client_service.get_client",
+        lambda name: client,
+    )
+
+    first = await service.embed_text("qual o status do contrato?")
+    second = await service.embed_text("qual o status  do contrato?")
+    batch = await service.embed_texts(["qual o status do contrato?", "novo texto"])
+
+    assert first == second == batch[0]
+    assert client.calls == [["qual o status do contrato?"], ["novo texto"]]
+    cache_stats = service.get_embedding_runtime_status()["cache"]
+    assert cache_stats["hits"] == 2
+    assert cache_stats["hit_ratio"] == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_local_fallback_vectors_are_cached_under_their_own_key():
+    service = OpenAIService()
+    service.api_key = None
+    service.embedding_fallback_local = True
+
+    first = await service.embed_text("bom dia fabio")
+    second = await service.embed_text("bom dia fabio")
+
+    assert first == pytest.approx(second)
+    assert embedding_cache_service.get_stats()["hits"] == 1
+    cached = await embedding_cache_service.get_many("text-embedding-3-small", ["bom dia fabio"])
+    assert cached == {}
@@ -1,6 +1,17 @@
+from datetime import timedelta
+from uuid import uuid4
+
 import pytest
+from sqlalchemy import Column, MetaData, Table, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
 
-from app.services.evolution_webhook_service import EvolutionWebhookService
+from app.services import evolution_webhook_service as webhook_module
+from app.services.evolution_webhook_service import LEGACY_PENDING_OUTBOUND_FILTER, EvolutionWebhookService
+from app.services.whatsapp_outbound_queue_service import (
+    WhatsAppOutboundQueueService,
+    whatsapp_outbound_queue_service,
+)
 
 
 class _DummyDb:
@@ -10,17 +21,79 @@ class _DummyDb:
 
 class _DummyConversa:
     def __init__(self, contexto):
+        self.id = uuid4()
         self.contexto_ia = contexto
         self.nome_contato = "Lucas"
         self.numero_telefone = "223927414591688"
+        self.instance_name = "fc-solucoes"
+
+
+class _FakeQueue:
+    """Fila em memoria com a mesma interface usada pelo webhook."""
+
+    def __init__(self):
+        self.rows = {}
+        self.sent = []
+        self.failed = []
+
+    async def enqueue(self, db, conversa_id, conteudo, remote_jid, push_name, **kwargs):
+        item_id = str(len(self.rows) + 1)
+        self.rows[item_id] = {
+            "id": item_id,
+            "conversa_id": conversa_id,
+            "conteudo": conteudo,
+            "remote_jid": remote_jid,
+            "push_name": push_name,
+            "attempts": int(kwargs.get("attempts") or 0),
+            "status": "pending",
+        }
+        return item_id
+
+    async def claim(self, db, limit=50, conversa_id=None, due_only=True):
+        claimed = []
+        for row in self.rows.values():
+            if row["status"] != "pending" or (conversa_id and row["conversa_id"] != conversa_id):
+                continue
+            row["status"] = "sending"
+            row["attempts"] += 1
+            claimed.append(dict(row))
+        return claimed[:limit]
+
+    async def mark_sent(self, db, item_id):
+        self.rows[item_id]["status"] = "sent"
+        self.sent.append(item_id)
+
+    async def mark_failed(self, db, item_id, attempts, erro):
+        self.rows[item_id]["status"] = "pending"
+        self.failed.append((item_id, attempts, erro))
+        return "pending"
+
+    async def count_pending(self, db, conversa_id):
+        return sum(
+            1
+            for row in self.rows.values()
+            if row["conversa_id"] == conversa_id and row["status"] in {"pending", "sending"}
+        )
+
+
+@pytest.fixture
+def fake_queue(monkeypatch):
+    queue = _FakeQueue()
+    monkeypatch.setattr(whatsapp_outbound_queue_service, "enqueue", queue.enqueue)
+    monkeypatch.setattr(whatsapp_outbound_queue_service, "claim", queue.claim)
+    monkeypatch.setattr(whatsapp_outbound_queue_service, "mark_sent", queue.mark_sent)
+    monkeypatch.setattr(whatsapp_outbound_queue_service, "mark_failed", queue.mark_failed)
+    monkeypatch.setattr(whatsapp_outbound_queue_service, "count_pending", queue.count_pending)
+    return queue
 
 
 @pytest.mark.asyncio
-async def test_flush_pending_outbound_delivers_and_clears_queue(monkeypatch):
+async def test_flush_pending_outbound_delivers_and_clears_queue(monkeypatch, fake_queue):
     service = EvolutionWebhookService()
     conversa = _DummyConversa(
         {
             "lead": {"telefone": "5516981903443"},
+            "needs_manual_bind": True,
             "pending_outbound": [
                 {
                     "id": "1",
@@ -32,8 +105,10 @@ async def test_flush_pending_outbound_delivers_and_clears_queue(monkeypatch):
             ],
         }
     )
+    destinos = []
 
     async def _fake_send_text(self, numero, mensagem, context_push_name=None, context_preferred_number=None):
+        destinos.append(numero)
         return {"sucesso": True, "destino": "5516981903443"}
 
     monkeypatch.setattr("app.services.whatsapp_service.WhatsAppService.send_text", _fake_send_text)
@@ -46,5 +121,95 @@ async def test_flush_pending_outbound_delivers_and_clears_queue(monkeypatch):
     )
 
     assert sent == 1
-    assert conversa.contexto_ia.get("pending_outbound") == []
+    assert destinos == ["5516981903443"]
+    assert "pending_outbound" not in conversa.contexto_ia
+    assert conversa.contexto_ia["needs_manual_bind"] is False
+    assert [row["status"] for row in fake_queue.rows.values()] == ["sent"]
+
+
+@pytest.mark.asyncio
+async def test_flush_pending_outbound_keeps_order_and_reschedules_failures(monkeypatch, fake_queue):
+    service = EvolutionWebhookService()
+    conversa = _DummyConversa({})
+    for conteudo in ("primeira", "segunda"):
+        await service._queue_pending_outbound(
+            db=_DummyDb(),
+            conversa=conversa,
+            conteudo=conteudo,
+            remote_jid="223927414591688@lid",
+            push_name="Lucas",
+            erro="exists:false",
+        )
+    enviados = []
+
+    async def _fake_send_text(self, numero, mensagem, context_push_name=None, context_preferred_number=None):
+        enviados.append(mensagem)
+        if mensagem == "segunda":
+            return {"sucesso": False, "erro": "exists:false"}
+        return {"sucesso": True}
+
+    monkeypatch.setattr("app.services.whatsapp_service.WhatsAppService.send_text", _fake_send_text)
+
+    sent = await service._flush_pending_outbound_for_conversation(
+        db=_DummyDb(),
+        conversa=conversa,
+        push_name="Lucas",
+        remote_jid="223927414591688@lid",
+    )
+
+    assert sent == 1
+    assert enviados == ["primeira", "segunda"]
+    assert fake_queue.failed == [("2", 1, "exists:false")]
+
+
+def test_outbound_backoff_is_exponential_and_capped():
+    queue = WhatsAppOutboundQueueService()
+    queue.backoff_seconds = 60
+    queue.backoff_max_seconds = 600
+
+    assert queue.backoff_for(1) == timedelta(seconds=60)
+    assert queue.backoff_for(2) == timedelta(seconds=120)
+    assert queue.backoff_for(4) == timedelta(seconds=480)
+    assert queue.backoff_for(10) == timedelta(seconds=600)
+
+
+def test_legacy_outbound_filter_casts_jsonb_column_to_json():
+    # Tabela como na migration (JSONB): json_typeof(jsonb) nao existe no Postgres.
+    conversas = Table("whatsapp_conversas", MetaData(), Column("contexto_ia", JSONB))
+    sql = str(select(conversas.c.contexto_ia).where(text(LEGACY_PENDING_OUTBOUND_FILTER)).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "json_typeof(CAST(whatsapp_conversas.contexto_ia AS json) -> 'pending_outbound') = 'array'" in sql
+    assert "json_typeof(whatsapp_conversas.contexto_ia" not in sql
+
+
+@pytest.mark.asyncio
+async def test_failed_legacy_migration_does_not_block_claim(monkeypatch):
+    service = EvolutionWebhookService()
+    calls = []
+
+    class _Db:
+        async def rollback(self):
+            calls.append("rollback")
+
+    async def _broken_migration(db, batch_size=200):
+        calls.append("migrate")
+        raise RuntimeError("function json_typeof(jsonb) does not exist")
+
+    async def _release_stale(db):
+        calls.append("release")
+
+    async def _claim(db, limit=50):
+        calls.append("claim")
+        return []
+
+    monkeypatch.setattr(service, "migrate_legacy_pending_outbound", _broken_migration)
+    monkeypatch.setattr(webhook_module.whatsapp_outbound_queue_service, "release_stale", _release_stale)
+    monkeypatch.setattr(webhook_module.whatsapp_outbound_queue_service, "claim", _claim)
+
+    assert await service.process_pending_outbound(_Db()) == {"processed": 0, "sent": 0}
+    assert await service.process_pending_outbound(_Db()) == {"processed": 0, "sent": 0}
 
+    # Uma tentativa (retry so apos o intervalo) e a fila segue nas duas chamadas.
+    assert calls == ["migrate", "rollback", "release", "claim", "release", "claim"]
+    assert service._legacy_outbound_migrated is False
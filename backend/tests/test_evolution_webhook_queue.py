@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.models.whatsapp_conversa import TipoOrigem
+from app.services import evolution_webhook_service as webhook_module
+from app.services.evolution_webhook_queue_service import EvolutionWebhookQueueService
+from app.services.evolution_webhook_service import (
+    EvolutionWebhookService,
+    collect_webhook_stages,
+    track_webhook_stage,
+)
+
+
+def test_extract_intake_keys_for_inbound_message():
+    service = EvolutionWebhookService()
+    data = {
+        "event": "MESSAGES_UPSERT",
+        "instance": "fc-solucoes",
+        "data": {
+            "key": {"id": "MSG001", "remoteJid": "5516999999999@s.whatsapp.net", "fromMe": False},
+            "message": {"conversation": "oi"},
+        },
+    }
+    keys = service.extract_intake_keys(data)
+    assert keys["event"] == "messages.upsert"
+    assert keys["instance_name"] == "fc-solucoes"
+    assert keys["remote_jid"] == "5516999999999@s.whatsapp.net"
+    assert keys["message_id"] == "MSG001"
+    assert keys["from_me"] is False
+
+
+def test_should_enqueue_only_inbound_messages():
+    queue = EvolutionWebhookQueueService()
+    assert queue.should_enqueue({"event": "messages.upsert", "from_me": False}) is True
+    assert queue.should_enqueue({"event": "messages.upsert", "from_me": True}) is False
+    assert queue.should_enqueue({"event": "connection.update", "from_me": False}) is False
+
+
+def test_conversation_key_groups_by_instance_and_jid():
+    queue = EvolutionWebhookQueueService()
+    first = queue._conversation_key({"instance_name": "fc", "remote_jid": "123@LID"})
+    second = queue._conversation_key({"instance_name": "fc", "remote_jid": "123@lid"})
+    assert first == second == "fc:123@lid"
+    orphan_a = queue._conversation_key({"instance_name": "fc", "remote_jid": None})
+    orphan_b = queue._conversation_key({"instance_name": "fc", "remote_jid": None})
+    assert orphan_a != orphan_b
+
+
+def test_stage_tracking_only_records_inside_collection():
+    with track_webhook_stage("llm"):
+        pass
+    with collect_webhook_stages() as timings:
+        with track_webhook_stage("llm"):
+            pass
+        with track_webhook_stage("llm"):
+            pass
+    assert set(timings) == {"llm"}
+    assert timings["llm"] >= 0.0
+
+
+def test_stage_stats_percentiles():
+    queue = EvolutionWebhookQueueService()
+    for value in range(1, 101):
+        queue._record_stage("send", float(value))
+    stats = queue.stage_stats()["send"]
+    assert stats["count"] == 100
+    assert stats["p50_ms"] in (50.0, 51.0)
+    assert stats["p95_ms"] in (95.0, 96.0)
+    assert stats["max_ms"] == 100.0
+
+
+class _CommitFailingDb:
+    """Sessao falsa que guarda mensagens; o commit de numero `fail_on` levanta erro.
+
+    `execute` so atende a consulta de duplicata (origens gravadas por message_id).
+    """
+
+    def __init__(self, fail_on=0):
+        self.fail_on = fail_on
+        self.commits = 0
+        self.rollbacks = 0
+        self.pending = []
+        self.stored = []
+
+    async def execute(self, statement, params=None):
+        origens = [msg.tipo_origem for msg in self.stored if msg.message_id == "MSG9"]
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: origens))
+
+    def add(self, obj):
+        self.pending.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+        if self.commits == self.fail_on:
+            raise RuntimeError("commit falhou")
+        self.stored.extend(self.pending)
+        self.pending = []
+
+    async def rollback(self):
+        self.rollbacks += 1
+        self.pending = []
+
+
+def _inbound_service(monkeypatch, sent, llm_errors=()):
+    service = EvolutionWebhookService()
+    conversa = SimpleNamespace(id=uuid4(), contexto_ia={}, instance_name="fc", ultima_mensagem_em=None)
+
+    async def get_conversa(**kwargs):
+        return conversa
+
+    async def refresh(**kwargs):
+        return {}
+
+    async def flush(**kwargs):
+        return None
+
+    errors = list(llm_errors)
+
+    async def llm(**kwargs):
+        if errors:
+            raise errors.pop(0)
+        return "Ola!"
+
+    class _WhatsApp:
+        async def send_text(self, **kwargs):
+            sent.append(kwargs["mensagem"])
+            return {"sucesso": True}
+
+    monkeypatch.setattr(service, "_get_ou_criar_conversa", get_conversa)
+    monkeypatch.setattr(service, "_refresh_lid_resolution_context", refresh)
+    monkeypatch.setattr(service, "_flush_pending_outbound_for_conversation", flush)
+    monkeypatch.setattr(webhook_module.viva_service, "processar_mensagem", llm)
+    monkeypatch.setattr(webhook_module, "WhatsAppService", _WhatsApp)
+    return service
+
+
+_INBOUND = {
+    "event": "messages.upsert",
+    "instance": "fc",
+    "data": {
+        "key": {"id": "MSG9", "remoteJid": "5516999999999@s.whatsapp.net", "fromMe": False},
+        "message": {"conversation": "oi"},
+    },
+}
+
+
+@pytest.mark.asyncio
+async def test_failure_after_send_is_terminal_to_avoid_duplicate_reply(monkeypatch):
+    sent = []
+    service = _inbound_service(monkeypatch, sent)
+    db = _CommitFailingDb(fail_on=2)  # 1 = mensagem do usuario, 2 = resposta da IA
+
+    assert await service.processar_webhook(_INBOUND, db) is True
+    assert sent == ["Ola!"]
+    assert db.rollbacks == 1
+
+
+@pytest.mark.asyncio
+async def test_failure_before_send_is_retried_and_then_replies(monkeypatch):
+    sent = []
+    service = _inbound_service(monkeypatch, sent, llm_errors=[RuntimeError("llm fora")])
+    db = _CommitFailingDb()
+
+    # 1a tentativa: mensagem do usuario gravada, LLM falha, nada enviado.
+    assert await service.processar_webhook(_INBOUND, db) is False
+    assert sent == []
+    assert [msg.tipo_origem for msg in db.stored] == [TipoOrigem.USUARIO]
+
+    # Retry: nao e duplicata (sem resposta), nao regrava o inbound e responde.
+    assert await service.processar_webhook(_INBOUND, db) is True
+    assert sent == ["Ola!"]
+    assert [(msg.tipo_origem, msg.message_id) for msg in db.stored] == [
+        (TipoOrigem.USUARIO, "MSG9"),
+        (TipoOrigem.IA, "MSG9"),
+    ]
+
+    # Reentrega depois da resposta: duplicata, sem novo envio.
+    assert await service.processar_webhook(_INBOUND, db) is True
+    assert sent == ["Ola!"]
@@ -0,0 +1,33 @@
+from decimal import Decimal
+
+from app.services import extenso_service
+from app.services.extenso_service import ExtensoService
+
+
+def test_memoized_conversion_matches_uncached_and_hits_cache():
+    ExtensoService.cache_clear()
+    uncached = extenso_service._valor_words.__wrapped__
+
+    for raw in ("1500.50", "1.00", "0.50", "0.01", "1000000", "0"):
+        reais, centavos = extenso_service._split_valor(raw)
+        assert ExtensoService.valor_por_extenso(raw) == uncached(reais, centavos)
+    assert ExtensoService.valor_por_extenso(Decimal("1500.50")) == "mil quinhentos reais e cinquenta centavos"
+    assert ExtensoService.valor_por_extenso("1,00") == "um real"
+
+    ExtensoService.valor_por_extenso(1500.5)
+    assert ExtensoService.cache_info()["valor"]["hits"] >= 2
+    assert ExtensoService.numero_por_extenso(45) == "quarenta e cinco"
+    assert ExtensoService.numero_por_extenso(2.5) == extenso_service.num2words(2.5, lang="pt_BR")
+
+
+def test_batch_api_preserves_order_and_converts_each_value_once():
+    ExtensoService.cache_clear()
+    valores = [Decimal("997.00"), "997", 1500, Decimal("997.00"), "0.5"]
+    assert ExtensoService.valores_por_extenso(valores) == [ExtensoService.valor_por_extenso(v) for v in valores]
+
+    ExtensoService.cache_clear()
+    ExtensoService.valores_por_extenso(valores)
+    assert ExtensoService.cache_info()["valor"]["misses"] == 3
+
+    assert ExtensoService.numeros_por_extenso([3, 1, 3]) == ["três", "um", "três"]
+    assert ExtensoService.valores_por_extenso([]) == []
@@ -0,0 +1,56 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+import pytest
+
+from app.services.http_client_service import HttpClientService
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        return None
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reuses_keepalive_connection():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    service = HttpClientService()
+    try:
+        client = service.get_client("test")
+        assert service.get_client("test") is client
+        for _ in range(4):
+            response = await client.get(f"http://127.0.0.1:{server.server_port}/", timeout=5.0)
+            assert response.status_code == 200
+
+        stats = service.get_stats("test")
+        assert stats["requests"] == 4
+        assert stats["connections_opened"] == 1
+        assert stats["reused_requests"] == 3
+        assert stats["open"] is True
+    finally:
+        await service.shutdown()
+        server.shutdown()
+
+    assert service.get_stats("test")["open"] is False
+
+
+@pytest.mark.asyncio
+async def test_get_client_recreates_after_shutdown():
+    service = HttpClientService()
+    first = service.get_client("openai")
+    await service.shutdown()
+    assert first.is_closed
+    second = service.get_client("openai")
+    assert second is not first
+    await service.shutdown()
@@ -0,0 +1,80 @@
+import hashlib
+import math
+import re
+
+import pytest
+
+from app.services.local_embedding_service import LocalEmbeddingService, _sparse_slots, to_float_list
+from app.services.viva_memory_service import VivaMemoryService
+
+
+def _reference_embed(text, dim):
+    """Implementacao original (laco denso) usada como referencia."""
+    clean = str(text or "").strip().lower()
+    if not clean:
+        return None
+    vector = [0.0] * dim
+    tokens = re.findall(r"[a-z0-9]+", clean) or [clean]
+    for token in tokens:
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        idx = int.from_bytes(digest[:4], "big") % dim
+        sign = -1.0 if (digest[4] & 1) else 1.0
+        weight = 1.0 + (float(digest[5]) / 255.0) * 0.5
+        vector[idx] += sign * weight
+    full_digest = hashlib.sha256(clean.encode("utf-8")).digest()
+    for offset in range(0, 16, 4):
+        idx = int.from_bytes(full_digest[offset:offset + 4], "big") % dim
+        sign = -1.0 if (full_digest[(offset + 4) % len(full_digest)] & 1) else 1.0
+        vector[idx] += sign * 0.35
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm <= 1e-12:
+        return None
+    return [value / norm for value in vector]
+
+
+@pytest.mark.parametrize("text", ["Contrato de credito 2026", "bom dia", "???", "a a a b"])
+def test_local_embedding_matches_reference_algorithm(text):
+    embedder = LocalEmbeddingService(dim=64)
+    vector = to_float_list(embedder.embed(text))
+    assert vector == pytest.approx(_reference_embed(text, 64), abs=1e-6)
+    assert math.sqrt(sum(value * value for value in vector)) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_local_embedding_batch_matches_single_calls():
+    embedder = LocalEmbeddingService(dim=128)
+    texts = ["cliente fabio", "", "renovacao de contrato", "   "]
+    batch = embedder.embed_batch(texts)
+    assert batch[1] is None and batch[3] is None
+    for text, vector in zip(texts, batch):
+        if vector is None:
+            continue
+        assert to_float_list(vector) == pytest.approx(to_float_list(embedder.embed(text)))
+
+
+def test_numpy_backend_matches_python_path():
+    np = pytest.importorskip("numpy")
+    embedder = LocalEmbeddingService(dim=256)
+    texts = ["Contrato de credito 2026", "", "a a a b", "cliente fabio unisete"]
+    sparse = [_sparse_slots(text, embedder.dim) for text in texts]
+    dense = embedder._dense_numpy(sparse)
+    assert embedder.backend == "numpy"
+    for slots, vector in zip(sparse, dense):
+        expected = embedder._dense_python(slots)
+        if expected is None:
+            assert vector is None
+            continue
+        assert vector.dtype == np.float32
+        assert to_float_list(vector) == pytest.approx(to_float_list(expected), abs=1e-6)
+
+
+def test_vector_transfer_modes():
+    service = VivaMemoryService()
+    embedding = [0.5, 0.0, -0.1234567891]
+
+    service.vector_transfer = "array"
+    assert service._vector_param(embedding) is embedding
+    assert service._vector_sql("embedding") == "CAST(CAST(:embedding AS REAL[]) AS vector)"
+
+    service.vector_transfer = "text"
+    assert service._vector_param(embedding) == "[0.5,0,-0.1234568]"
+    assert service._vector_sql("embedding") == "CAST(:embedding AS vector)"
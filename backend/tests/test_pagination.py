@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.cliente import Cliente
+from app.services import pagination_service
+from app.services.pagination_service import (
+    CountCache,
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    next_cursor,
+    page_request,
+)
+from app.services.search_index_service import _BTREE_INDEXES
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    created = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+    row_id = uuid4()
+    cursor = encode_cursor(created, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created, row_id)
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("nao-e-um-cursor")
+    with pytest.raises(InvalidCursorError):
+        page_request(cursor="e30")  # base64 de "{}"
+
+
+def test_page_request_defaults_total_mode_by_pagination_style():
+    assert page_request(page=3, page_size=10).offset == 20
+    assert page_request().total_mode == "exact"
+
+    req = page_request(page=3, page_size=10, cursor=encode_cursor(datetime(2026, 1, 1), uuid4()))
+    assert req.offset == 0
+    assert req.total_mode == "cached"
+    assert page_request(total_mode="none").total_mode == "none"
+
+
+def test_next_cursor_only_when_extra_row_was_fetched():
+    rows = [SimpleNamespace(created_at=datetime(2026, 1, day), id=uuid4()) for day in (5, 4, 3)]
+    key = lambda row: (row.created_at, row.id)  # noqa: E731
+    assert next_cursor(rows, 3, key) is None
+    assert decode_cursor(next_cursor(rows, 2, key)) == (rows[1].created_at, rows[1].id)
+
+
+def test_keyset_condition_compiles_to_row_comparison():
+    cursor = (datetime(2026, 1, 1), uuid4())
+    sql = str(
+        select(Cliente.id)
+        .where(keyset_condition(Cliente.created_at, Cliente.id, cursor))
+        .compile(dialect=postgresql.dialect())
+    )
+    assert "(clientes.created_at, clientes.id) < (" in sql
+
+
+@pytest.mark.asyncio
+async def test_count_cache_reuses_total_until_ttl(monkeypatch):
+    cache = CountCache()
+    cache.ttl = 30.0
+    now = [100.0]
+    monkeypatch.setattr(pagination_service.time, "monotonic", lambda: now[0])
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return 42 + len(calls)
+
+    assert await cache.get(("clientes", None), compute) == 43
+    assert await cache.get(("clientes", None), compute) == 43
+    now[0] += 31
+    assert await cache.get(("clientes", None), compute) == 44
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_total_none_skips_count():
+    async def compute():
+        raise AssertionError("nao deveria contar")
+
+    assert await pagination_service.resolve_total(page_request(total_mode="none"), "k", compute) is None
+
+
+def test_keyset_orderings_have_matching_indexes():
+    indexed = {(table, expression) for _, table, expression in _BTREE_INDEXES}
+    assert ("contratos", "created_at DESC, id DESC") in indexed
+    assert ("clientes", "created_at DESC, id DESC") in indexed
+    assert ("agenda", "data_inicio DESC, id DESC") in indexed
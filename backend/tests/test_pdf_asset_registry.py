@@ -0,0 +1,36 @@
+import os
+
+from app.services.contrato_annex_loader import list_fixed_annexes_for_template
+from app.services.pdf_asset_registry_service import PdfAssetRegistry, pdf_asset_registry
+
+
+def test_file_asset_is_read_once_and_reloaded_on_change(tmp_path):
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(b"\x89PNG-v1")
+    registry = PdfAssetRegistry()
+    registry.reload_seconds = 0.0
+
+    first = registry.get_file("logo", [tmp_path / "missing.png", logo])
+    assert first.mime == "image/png"
+    assert first.data_uri.startswith("data:image/png;base64,")
+    assert registry.get("logo") is first
+    assert registry.disk_reads == 1
+
+    logo.write_bytes(b"\x89PNG-v2-maior")
+    stat = logo.stat()
+    os.utime(logo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = registry.get("logo")
+    assert second.content == b"\x89PNG-v2-maior"
+    assert second.digest != first.digest
+    assert registry.disk_reads == 2
+
+    assert registry.resolve_url(registry.url("logo")) is second
+    assert registry.resolve_url("https://example.com/logo") is None
+
+
+def test_annexes_are_served_from_registry_without_rereading():
+    list_fixed_annexes_for_template("rating_convencional")
+    reads = pdf_asset_registry.disk_reads
+    annexes = list_fixed_annexes_for_template("rating_convencional")
+    assert [item["id"] for item in annexes] == ["termo_ciencia_geral", "termo_ciencia_rating"]
+    assert pdf_asset_registry.disk_reads == reads
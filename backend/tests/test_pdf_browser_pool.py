@@ -0,0 +1,144 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+from app.services.pdf_browser_pool_service import PdfBrowserPoolService, PdfPoolBusyError
+
+
+class _FakePage:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def route(self, pattern, handler):
+        self.route_pattern = pattern
+
+    async def set_content(self, html_content, wait_until=None):
+        self.html = html_content
+
+    async def pdf(self, **options):
+        await asyncio.sleep(self.delay)
+        return b"%PDF-" + self.html.encode()
+
+
+class _FakeContext:
+    def __init__(self, stats, delay):
+        self.stats = stats
+        self.delay = delay
+
+    async def new_page(self):
+        return _FakePage(self.delay)
+
+    async def close(self):
+        self.stats["contexts_closed"] += 1
+
+
+class _FakeBrowser:
+    def __init__(self, stats, delay):
+        self.stats = stats
+        self.delay = delay
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        self.stats["contexts"] += 1
+        return _FakeContext(self.stats, self.delay)
+
+    async def close(self):
+        return None
+
+
+def _install_fake_playwright(monkeypatch, delay=0.0):
+    stats = {"launches": 0, "contexts": 0, "contexts_closed": 0}
+
+    class _Chromium:
+        async def launch(self, **kwargs):
+            stats["launches"] += 1
+            return _FakeBrowser(stats, delay)
+
+    class _Playwright:
+        chromium = _Chromium()
+
+        async def stop(self):
+            return None
+
+    class _Starter:
+        async def start(self):
+            return _Playwright()
+
+    module = types.ModuleType("playwright.async_api")
+    module.async_playwright = lambda: _Starter()
+    monkeypatch.setitem(sys.modules, "playwright", types.ModuleType("playwright"))
+    monkeypatch.setitem(sys.modules, "playwright.async_api", module)
+    return stats
+
+
+def _pool(**overrides):
+    pool = PdfBrowserPoolService()
+    pool.browsers = 1
+    pool.contexts_per_browser = 2
+    pool.max_queue = 4
+    pool.acquire_timeout = 1.0
+    pool.render_timeout = 5.0
+    pool.page_max_uses = 50
+    for key, value in overrides.items():
+        setattr(pool, key, value)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_warm_browser_and_recycles_pages(monkeypatch):
+    stats = _install_fake_playwright(monkeypatch)
+    pool = _pool(page_max_uses=2)
+
+    results = [await pool.render_pdf(f"<p>{idx}</p>", format="A4") for idx in range(5)]
+
+    assert results[0] == b"%PDF-<p>0</p>"
+    assert stats["launches"] == 1
+    assert pool.get_stats()["renders"] == 5
+    assert pool.get_stats()["page_recycles"] >= 1
+    assert pool.get_stats()["render_p95_ms"] is not None
+    await pool.stop()
+    assert pool.started is False
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_when_queue_is_full(monkeypatch):
+    _install_fake_playwright(monkeypatch, delay=0.05)
+    pool = _pool(contexts_per_browser=1, max_queue=1)
+
+    results = await asyncio.gather(
+        *(pool.render_pdf("<p>x</p>") for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(item, bytes) for item in results) == 2
+    assert sum(isinstance(item, PdfPoolBusyError) for item in results) == 1
+    assert pool.get_stats()["rejected"] == 1
+    assert pool.get_stats()["in_use"] == 0
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_render_recycles_slot_before_release(monkeypatch):
+    stats = _install_fake_playwright(monkeypatch, delay=0.2)
+    pool = _pool(contexts_per_browser=1)
+
+    task = asyncio.create_task(pool.render_pdf("<p>x</p>"))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert stats["contexts_closed"] == 1
+    assert pool.get_stats()["in_use"] == 0
+    assert pool._slots[0].page is None
+    assert await pool.render_pdf("<p>y</p>") == b"%PDF-<p>y</p>"
+    assert stats["contexts"] == 2
+    await pool.stop()
@@ -0,0 +1,153 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.cliente import Cliente
+from app.services import search_index_service as search_module
+from app.services.cliente_service import ClienteService
+from app.services.search_index_service import _TSV_INDEXES, SearchIndexService, normalize_term
+
+
+def _sql(expression):
+    return str(select(Cliente.id).where(expression).compile(dialect=postgresql.dialect()))
+
+
+def test_falls_back_to_ilike_until_indexes_are_ready():
+    service = SearchIndexService()
+    condition, rank = service.build_search("clientes", "Maria", "contains")
+    assert rank is None
+    assert "ILIKE" in _sql(condition).upper()
+    assert service.build_search("contratos", "   ", "prefix") == (None, None)
+
+
+def test_contains_mode_uses_trigram_expressions_and_rank():
+    service = SearchIndexService()
+    service.trgm_ready = True
+    condition, rank = service.build_search("clientes", "  JOSÉ  da Silva 123.456", "contains")
+    sql = _sql(condition)
+    assert "f_unaccent(lower(clientes.nome)) LIKE" in sql
+    assert "f_unaccent(lower(clientes.nome)) %" in sql
+    assert "regexp_replace(clientes.documento, '[^0-9]', '', 'g') LIKE" in sql
+    assert "similarity" in str(rank.compile(dialect=postgresql.dialect()))
+
+
+def test_prefix_mode_builds_tsquery_with_prefix_tokens():
+    service = SearchIndexService()
+    service.tsv_ready = True
+    condition, rank = service.build_search("contratos", "joão sil", "prefix")
+    compiled = select(Cliente.id).where(condition).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "search_tsv" not in sql
+    # Mesma expressao do indice GIN, qualificada pela tabela.
+    expr = _TSV_INDEXES[1][2][1:-1].replace("coalesce(", "coalesce(contratos.")
+    assert f"{expr} @@ to_tsquery('simple'" in sql
+    assert "joao:* & sil:*" in compiled.params.values()
+    assert "ts_rank_cd" in str(rank.compile(dialect=postgresql.dialect()))
+
+
+def test_document_expression_matches_functional_index():
+    sql = str(ClienteService._document_expression().compile(dialect=postgresql.dialect()))
+    assert sql == "regexp_replace(clientes.documento, '[^0-9]', '', 'g')"
+    assert normalize_term("  Ação  Çedilha ") == "acao cedilha"
+
+
+def test_name_match_scores_words_with_trigram_when_ready():
+    service = SearchIndexService()
+    service.trgm_ready = True
+    condition, score = service.build_name_match("clientes", "Fábio da Unisete", tokens=["Fabio", "x"])
+    compiled = select(Cliente.id).where(condition).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "f_unaccent(lower(clientes.nome)) LIKE" in sql
+    assert "<%% f_unaccent(lower(clientes.nome))" in sql
+    assert {"fabio", "da", "unisete"} <= set(compiled.params.values())
+    assert "x" not in compiled.params.values()
+    assert "word_similarity" in str(score.compile(dialect=postgresql.dialect()))
+
+
+def test_name_match_fallback_and_empty_input():
+    service = SearchIndexService()
+    condition, score = service.build_name_match("clientes", None, tokens=["Lucas"])
+    sql = str(select(Cliente.id).where(condition).compile(dialect=postgresql.dialect()))
+    assert "lower(clientes.nome) LIKE" in sql and "f_unaccent" not in sql
+    assert "CASE WHEN" in str(score.compile(dialect=postgresql.dialect()))
+    assert service.build_name_match("clientes", "  ", tokens=["a"]) == (None, None)
+
+
+def test_name_match_without_trgm_still_folds_accents_when_unaccent_exists():
+    service = SearchIndexService()
+    service.unaccent_ready = True
+    condition, score = service.build_name_match("clientes", "Fábio")
+    compiled = select(Cliente.id).where(condition).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "f_unaccent(lower(clientes.nome)) LIKE" in sql and "<%%" not in sql
+    assert "%fabio%" in compiled.params.values()
+    assert "word_similarity" not in str(score.compile(dialect=postgresql.dialect()))
+
+
+class _CatalogConn:
+    """Conexao falsa: advisory lock + estado de indices por nome (valid, building)."""
+
+    def __init__(self, lock_free=True, indexes=None):
+        self.lock_free = lock_free
+        self.indexes = indexes or {}
+        self.statements = []
+
+    async def execution_options(self, **kwargs):
+        return self
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if "pg_try_advisory_lock" in sql:
+            return SimpleNamespace(scalar=lambda: self.lock_free)
+        if "FROM pg_proc" in sql:
+            return SimpleNamespace(scalar_one_or_none=lambda: 1)
+        if "FROM pg_index" in sql:
+            state = self.indexes.get(params["name"])
+            return SimpleNamespace(first=lambda: state)
+        return SimpleNamespace()
+
+    def ddl(self, prefix):
+        return [sql for sql in self.statements if sql.startswith(prefix)]
+
+
+def _patch_engine(monkeypatch, conn):
+    @asynccontextmanager
+    async def connect():
+        yield conn
+
+    monkeypatch.setattr(search_module, "engine", SimpleNamespace(connect=connect))
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_skips_ddl_when_another_worker_holds_the_lock(monkeypatch):
+    tsv_names = [name for name, _, _ in _TSV_INDEXES]
+    conn = _CatalogConn(lock_free=False, indexes={name: (True, False) for name in tsv_names})
+    _patch_engine(monkeypatch, conn)
+    service = SearchIndexService()
+
+    result = await service.ensure_indexes()
+
+    assert result["skipped"] is True
+    assert service.tsv_ready and service.unaccent_ready and not service.trgm_ready
+    assert not conn.ddl("CREATE") and not conn.ddl("DROP") and not conn.ddl("SELECT pg_advisory_unlock")
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_keeps_invalid_index_that_is_still_being_built(monkeypatch):
+    building, failed = _TSV_INDEXES[0][0], _TSV_INDEXES[1][0]
+    conn = _CatalogConn(indexes={building: (False, True), failed: (False, False)})
+    _patch_engine(monkeypatch, conn)
+    service = SearchIndexService()
+
+    result = await service.ensure_indexes()
+
+    assert result["skipped"] is False and service.tsv_ready is False
+    assert conn.ddl("DROP INDEX") == [f"DROP INDEX CONCURRENTLY IF EXISTS {failed}"]
+    created = conn.ddl("CREATE INDEX")
+    assert not any(f" {building} " in sql for sql in created)
+    assert any(f" {failed} " in sql for sql in created)
+    assert conn.statements[-1].startswith("SELECT pg_advisory_unlock")
@@ -111,7 +111,7 @@ async def test_viva_chat_stream_delegates_to_canonical_flow(monkeypatch):
             self.resposta = "Ola Fabio! Fluxo canonico."
             self.session_id = "sessao-123"
 
-    async def fake_handle_chat_with_viva(self, request, current_user, db):
+    async def fake_handle_chat_with_viva(self, request, current_user, db, stream_llm=False):
         return FakeResponse()
 
     monkeypatch.setattr(
@@ -132,3 +132,96 @@ async def test_viva_chat_stream_delegates_to_canonical_flow(monkeypatch):
     assert chunks[0]["content"] == "Ola Fabio! Fluxo canonico."
     assert chunks[1]["done"] is True
     assert chunks[1]["session_id"] == "sessao-123"
+    assert chunks[1]["resposta"] == "Ola Fabio! Fluxo canonico."
+
+
+@pytest.mark.asyncio
+async def test_viva_chat_stream_streams_llm_tokens_then_finalizes(monkeypatch):
+    """Fallback LLM chega token a token e a finalizacao ocorre uma vez, no fim."""
+    from app.services.viva_chat_orchestrator_service import _StreamingLLMReply
+    from app.services.viva_model_service import viva_model_service
+
+    completed = []
+
+    class FakeResponse:
+        def __init__(self, resposta):
+            self.resposta = resposta
+            self.session_id = "sessao-456"
+
+    async def complete(texto):
+        completed.append(texto)
+        return FakeResponse(f"Ola Fabio! {texto}")
+
+    async def local_fallback():
+        return "fallback local"
+
+    async def fake_handle_chat_with_viva(self, request, current_user, db, stream_llm=False):
+        assert stream_llm is True
+        return _StreamingLLMReply(
+            messages=[{"role": "user", "content": "oi"}],
+            complete=complete,
+            local_fallback=local_fallback,
+        )
+
+    async def fake_chat_stream(messages, temperature, max_tokens):
+        for token in ("Tudo ", "certo", "."):
+            yield token
+
+    monkeypatch.setattr(VivaChatOrchestratorService, "handle_chat_with_viva", fake_handle_chat_with_viva)
+    monkeypatch.setattr(viva_model_service, "chat_stream", fake_chat_stream)
+
+    service = VivaChatOrchestratorService()
+    chunks = [
+        chunk
+        async for chunk in service.handle_chat_with_viva_stream(
+            request=object(),
+            current_user=object(),
+            db=object(),
+        )
+    ]
+
+    assert [chunk["content"] for chunk in chunks[:-1]] == ["Tudo ", "certo", "."]
+    assert completed == ["Tudo certo."]
+    assert chunks[-1] == {"done": True, "session_id": "sessao-456", "resposta": "Ola Fabio! Tudo certo."}
+
+
+@pytest.mark.asyncio
+async def test_viva_chat_stream_uses_local_fallback_on_provider_error(monkeypatch):
+    from app.services.viva_chat_orchestrator_service import _StreamingLLMReply
+    from app.services.viva_model_service import viva_model_service
+
+    completed = []
+
+    class FakeResponse:
+        resposta = "fallback local"
+        session_id = "sessao-789"
+
+    async def complete(texto):
+        completed.append(texto)
+        return FakeResponse()
+
+    async def local_fallback():
+        return "fallback local"
+
+    async def fake_handle_chat_with_viva(self, request, current_user, db, stream_llm=False):
+        return _StreamingLLMReply(messages=[], complete=complete, local_fallback=local_fallback)
+
+    async def fake_chat_stream(messages, temperature, max_tokens):
+        yield "Erro OpenAI stream: 500"
+
+    monkeypatch.setattr(VivaChatOrchestratorService, "handle_chat_with_viva", fake_handle_chat_with_viva)
+    monkeypatch.setattr(viva_model_service, "chat_stream", fake_chat_stream)
+
+    service = VivaChatOrchestratorService()
+    chunks = [
+        chunk
+        async for chunk in service.handle_chat_with_viva_stream(
+            request=object(),
+            current_user=object(),
+            db=object(),
+        )
+    ]
+
+    assert chunks[0] == {"content": "fallback local"}
+    assert completed == ["fallback local"]
+    assert chunks[-1]["done"] is True
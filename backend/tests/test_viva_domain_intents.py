@@ -124,24 +124,22 @@ async def test_domain_router_returns_client_detail_with_real_fields(monkeypatch)
         def __init__(self, db):
             self.db = db
 
-        async def list(self, search=None, page=1, page_size=20):
-            assert "lucas" in str(search or "").lower()
-            return {
-                "items": [
-                    {
-                        "nome": "Lucas Ricardo Lebre",
-                        "documento": "33429258847",
-                        "telefone": "11999998888",
-                        "email": "lucas@example.com",
-                        "cidade": "Sao Paulo",
-                        "estado": "SP",
-                        "endereco": "Rua A, 100",
-                        "observacoes": "Cliente premium",
-                        "total_contratos": 21,
-                    }
-                ],
-                "total": 1,
-            }
+        async def resolve(self, name=None, tokens=(), limit=5):
+            assert "lucas" in str(name or "").lower()
+            return [
+                {
+                    "score": 100.0,
+                    "nome": "Lucas Ricardo Lebre",
+                    "documento": "33429258847",
+                    "telefone": "11999998888",
+                    "email": "lucas@example.com",
+                    "cidade": "Sao Paulo",
+                    "estado": "SP",
+                    "endereco": "Rua A, 100",
+                    "observacoes": "Cliente premium",
+                    "total_contratos": 21,
+                }
+            ]
 
     monkeypatch.setattr(
         "app.services.viva_domain_query_router_service.ClienteService",
@@ -167,26 +165,24 @@ async def test_domain_router_client_detail_uses_fuzzy_match(monkeypatch):
         def __init__(self, db):
             self.db = db
 
-        async def list(self, search=None, page=1, page_size=20):
-            if search:
-                return {"items": [], "total": 0}
-            return {
-                "items": [
-                    {
-                        "id": "11111111-1111-1111-1111-111111111111",
-                        "nome": "Fabio D C da Silva",
-                        "documento": "32521118885",
-                        "telefone": "11988887777",
-                        "email": "fabio@fcsolucoes.com",
-                        "cidade": "Sao Paulo",
-                        "estado": "SP",
-                        "endereco": "Rua B, 200",
-                        "observacoes": "",
-                        "total_contratos": 5,
-                    }
-                ],
-                "total": 1,
-            }
+        async def resolve(self, name=None, tokens=(), limit=5):
+            # Nome pedido nao bate inteiro; a palavra "fabio" da mensagem pontua no banco.
+            assert "fabio" in tokens
+            return [
+                {
+                    "score": 20.0,
+                    "id": "11111111-1111-1111-1111-111111111111",
+                    "nome": "Fabio D C da Silva",
+                    "documento": "32521118885",
+                    "telefone": "11988887777",
+                    "email": "fabio@fcsolucoes.com",
+                    "cidade": "Sao Paulo",
+                    "estado": "SP",
+                    "endereco": "Rua B, 200",
+                    "observacoes": "",
+                    "total_contratos": 5,
+                }
+            ]
 
     monkeypatch.setattr(
         "app.services.viva_domain_query_router_service.ClienteService",
@@ -226,24 +222,22 @@ async def test_domain_router_returns_combined_client_and_contracts_summary(monke
         def __init__(self, db):
             self.db = db
 
-        async def list(self, search=None, page=1, page_size=20):
-            return {
-                "items": [
-                    {
-                        "id": client_id,
-                        "nome": "Lucas Ricardo Lebre",
-                        "documento": "33429258847",
-                        "telefone": "11999998888",
-                        "email": "lucas@example.com",
-                        "cidade": "Sao Paulo",
-                        "estado": "SP",
-                        "endereco": "Rua A, 100",
-                        "observacoes": "Cliente premium",
-                        "total_contratos": 2,
-                    }
-                ],
-                "total": 1,
-            }
+        async def resolve(self, name=None, tokens=(), limit=5):
+            return [
+                {
+                    "score": 80.0,
+                    "id": client_id,
+                    "nome": "Lucas Ricardo Lebre",
+                    "documento": "33429258847",
+                    "telefone": "11999998888",
+                    "email": "lucas@example.com",
+                    "cidade": "Sao Paulo",
+                    "estado": "SP",
+                    "endereco": "Rua A, 100",
+                    "observacoes": "Cliente premium",
+                    "total_contratos": 2,
+                }
+            ]
 
         async def get_contratos(self, cliente_id):
             assert cliente_id == client_id
@@ -291,16 +285,8 @@ async def test_domain_router_returns_contract_count_by_client(monkeypatch):
         def __init__(self, db):
             self.db = db
 
-        async def list(self, search=None, page=1, page_size=20):
-            return {
-                "items": [
-                    {
-                        "id": client_id,
-                        "nome": "Fabio D C da Silva",
-                    }
-                ],
-                "total": 1,
-            }
+        async def resolve(self, name=None, tokens=(), limit=5):
+            return [{"id": client_id, "nome": "Fabio D C da Silva", "score": 80.0}]
 
         async def get_contratos(self, cliente_id):
             class _Status:
@@ -350,10 +336,9 @@ async def test_domain_router_contracts_by_client_accepts_pending_name_followup(m
         def __init__(self, db):
             self.db = db
 
-        async def list(self, search=None, page=1, page_size=20):
-            if search:
-                assert "lucas" in str(search).lower()
-            return {"items": [{"id": client_id, "nome": "Lucas Lebre"}], "total": 1}
+        async def resolve(self, name=None, tokens=(), limit=5):
+            assert "lucas" in str(name).lower()
+            return [{"id": client_id, "nome": "Lucas Lebre", "score": 80.0}]
 
         async def get_contratos(self, cliente_id):
             assert cliente_id == client_id
@@ -401,10 +386,9 @@ async def test_domain_router_contracts_by_client_uses_context_on_short_confirmat
         def __init__(self, db):
             self.db = db
 
-        async def list(self, search=None, page=1, page_size=20):
-            if search:
-                assert "lucas" in str(search).lower()
-            return {"items": [{"id": client_id, "nome": "Lucas Lebre"}], "total": 1}
+        async def resolve(self, name=None, tokens=(), limit=5):
+            assert "lucas" in str(name).lower()
+            return [{"id": client_id, "nome": "Lucas Lebre", "score": 80.0}]
 
         async def get_contratos(self, cliente_id):
             assert cliente_id == client_id
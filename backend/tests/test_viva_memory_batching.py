@@ -0,0 +1,113 @@
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+
+from app.services.openai_service import OpenAIService
+from app.services.viva_memory_service import VivaMemoryService
+
+
+class _FakeEmbeddingResponse:
+    status_code = 200
+
+    def __init__(self, inputs):
+        self._inputs = inputs
+
+    def json(self):
+        # API pode devolver fora de ordem: o servico reordena por `index`.
+        data = [
+            {"index": idx, "embedding": [float(len(text)), float(idx)]}
+            for idx, text in enumerate(self._inputs)
+        ]
+        return {"data": list(reversed(data))}
+
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    async def post(self, url, headers=None, json=None, timeout=None):
+        self.calls.append(list(json["input"]))
+        return _FakeEmbeddingResponse(json["input"])
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_batches_inputs_and_keeps_order(monkeypatch):
+    service = OpenAIService()
+    service.api_key = "test-key"
+    client = _FakeClient()
+    monkeypatch.setattr(
+        "app.services.openai_service.http_client_service.get_client",
+        lambda name: client,
+    )
+
+    texts = ["a", "", "ccc", "dd", "eeeee"]
+    vectors = await service.embed_texts(texts, batch_size=2, concurrency=2)
+
+    assert sorted(client.calls) == [["a", "ccc"], ["dd", "eeeee"]]
+    assert vectors[1] is None
+    assert [vector[0] for vector in (vectors[0], vectors[2], vectors[3], vectors[4])] == [1.0, 3.0, 2.0, 5.0]
+    assert service.get_embedding_runtime_status()["provider_last"] == "openai"
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_uses_local_fallback_without_api_key():
+    service = OpenAIService()
+    service.api_key = None
+    service.embedding_fallback_local = True
+
+    vectors = await service.embed_texts(["contrato de credito", "  "])
+
+    assert len(vectors[0]) == service.embedding_fallback_dim
+    assert vectors[1] is None
+
+
+class _FakeDb:
+    def __init__(self):
+        self.executions = []
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        yield
+
+    async def execute(self, statement, params=None):
+        self.executions.append(params)
+
+
+@pytest.mark.asyncio
+async def test_append_long_memory_batch_uses_single_executemany(monkeypatch):
+    service = VivaMemoryService()
+    service.vector_enabled = True
+    service.file_log_enabled = False
+    embed_calls = []
+
+    async def _fake_ensure_storage(db):
+        return {"vector": True, "redis": False}
+
+    async def _fake_embed_texts(texts):
+        embed_calls.append(list(texts))
+        return [[1.0, 0.0] if "falha" not in text else None for text in texts]
+
+    monkeypatch.setattr(service, "ensure_storage", _fake_ensure_storage)
+    monkeypatch.setattr("app.services.viva_memory_service.openai_service.embed_texts", _fake_embed_texts)
+
+    db = _FakeDb()
+    session_id = uuid4()
+    items = [
+        {"session_id": session_id, "tipo": "usuario", "conteudo": "mensagem longa numero um", "modo": "fc"},
+        {"session_id": session_id, "tipo": "ia", "conteudo": "curta", "modo": None},
+        {"session_id": session_id, "tipo": "ia", "conteudo": "esta aqui vai falhar no embedding", "modo": None},
+        {"session_id": session_id, "tipo": "ia", "conteudo": "mensagem longa numero dois", "modo": None},
+    ]
+
+    indexed = await service.append_long_memory_batch(db=db, user_id=uuid4(), items=items)
+
+    assert indexed == 2
+    assert len(embed_calls) == 1 and len(embed_calls[0]) == 3
+    assert len(db.executions) == 1
+    rows = db.executions[0]
+    assert [row["conteudo"] for row in rows] == ["mensagem longa numero um", "mensagem longa numero dois"]
+    assert rows[0]["modo"] == "FC"
+    # Modo padrao "array": lista de floats enviada como real[] binario.
+    assert rows[0]["embedding"][:2] == [1.0, 0.0]
+    assert len(rows[0]["embedding"]) == service.embedding_dim
@@ -0,0 +1,123 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.viva_memory_index_service import (
+    INDEX_NAME,
+    VivaMemoryIndexService,
+    parse_index_options,
+    recommended_lists,
+    recommended_probes,
+)
+
+
+def _index(method="ivfflat", lists=None, valid=True, name=INDEX_NAME, m=None):
+    item = {"name": name, "method": method, "valid": valid}
+    if lists is not None:
+        item["lists"] = lists
+    if m is not None:
+        item["m"] = m
+    return item
+
+
+def test_recommended_lists_and_probes_follow_row_count():
+    assert recommended_lists(0) == 1
+    assert recommended_lists(250_000) == 250
+    assert recommended_lists(4_000_000) == 2000
+    assert recommended_probes(100) == 10
+
+
+def test_parse_index_options_reads_lists_and_m():
+    ivf = "CREATE INDEX x ON public.viva_memory_vectors USING ivfflat (embedding vector_cosine_ops) WITH (lists='100')"
+    hnsw = "CREATE INDEX x ON public.viva_memory_vectors USING hnsw (embedding vector_cosine_ops) WITH (m='16', ef_construction='64')"
+    assert parse_index_options(ivf) == {"lists": 100}
+    assert parse_index_options(hnsw) == {"m": 16}
+
+
+def test_plan_waits_for_data_before_building_ivfflat():
+    service = VivaMemoryIndexService()
+    service.method = "ivfflat"
+    service.ivfflat_min_rows = 1000
+
+    initial = service.plan({"rows": 10, "indexes": []})
+    assert (initial["action"], initial["method"], initial["lists"]) == ("create", "hnsw", None)
+    assert service.plan({"rows": 10, "indexes": [_index(method="hnsw")]})["action"] == "none"
+    assert service.plan({"rows": 10, "indexes": [_index(method="hnsw", valid=False)]})["method"] == "hnsw"
+    plan = service.plan({"rows": 50_000, "indexes": []})
+    assert plan["action"] == "create" and plan["lists"] == 50
+    # Com volume, o HNSW inicial da lugar ao ivfflat configurado.
+    swap = service.plan({"rows": 50_000, "indexes": [_index(method="hnsw")]})
+    assert (swap["action"], swap["method"]) == ("rebuild", "ivfflat")
+
+
+def test_plan_rebuilds_on_lists_drift_method_change_and_invalid_index():
+    service = VivaMemoryIndexService()
+    service.method = "ivfflat"
+    service.ivfflat_min_rows = 1000
+    service.lists_drift = 2.0
+
+    assert service.plan({"rows": 120_000, "indexes": [_index(lists=100)]})["action"] == "none"
+    assert service.plan({"rows": 500_000, "indexes": [_index(lists=100)]})["action"] == "rebuild"
+    assert service.plan({"rows": 120_000, "indexes": [_index(lists=100, valid=False)]})["action"] == "rebuild"
+    assert service.plan({"rows": 120_000, "indexes": [_index(lists=100)]}, method="hnsw")["action"] == "rebuild"
+
+
+def test_search_settings_follow_active_index():
+    service = VivaMemoryIndexService()
+    service.ivfflat_probes = 0
+    service._active_method = "ivfflat"
+    service._active_lists = 400
+    assert service.search_settings_sql() == ["SET LOCAL ivfflat.probes = 20"]
+
+    service._active_method = "hnsw"
+    service.hnsw_ef_search = 80
+    assert service.search_settings_sql() == ["SET LOCAL hnsw.ef_search = 80"]
+
+
+class _RecallDb:
+    """Registra statements; ANN devolve ids diferentes da busca exata."""
+
+    def __init__(self):
+        self.statements = []
+        self.index_scan = True
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        self.statements.append("SAVEPOINT")
+        yield
+        self.statements.append("RELEASE")
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if sql.startswith("SET LOCAL enable_indexscan"):
+            self.index_scan = sql.endswith("= on")
+        if sql.startswith("SELECT id FROM viva_memory_vectors ORDER BY random()"):
+            rows = [SimpleNamespace(id="p1"), SimpleNamespace(id="p2")]
+        elif sql.startswith("SELECT id FROM viva_memory_vectors ORDER BY embedding"):
+            ids = ["a", "b"] if self.index_scan else ["a", "c"]
+            rows = [SimpleNamespace(id=row_id) for row_id in ids]
+        else:
+            rows = []
+        return SimpleNamespace(fetchall=lambda: rows)
+
+
+@pytest.mark.asyncio
+async def test_measure_recall_reenables_index_scan_for_each_ann_query():
+    service = VivaMemoryIndexService()
+    service._active_method = "hnsw"
+    db = _RecallDb()
+
+    result = await service.measure_recall(db, sample_size=2, k=2)
+
+    # Com o indice religado o ANN do 2o probe continua diferente da busca exata.
+    assert result["sample_size"] == 2 and result["recall"] == 0.5
+    knn = [idx for idx, sql in enumerate(db.statements) if "ORDER BY embedding" in sql]
+    for position, idx in enumerate(knn):
+        toggles = [sql for sql in db.statements[:idx] if sql.startswith("SET LOCAL enable_indexscan")]
+        expected = "SET LOCAL enable_indexscan = on" if position % 2 == 0 else "SET LOCAL enable_indexscan = off"
+        assert toggles[-1] == expected
+        if position % 2 == 0:
+            assert db.statements[idx - 1].startswith("SET LOCAL hnsw.ef_search")
+    assert db.statements[-1] == "SET LOCAL enable_indexscan = on"
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import weasy_render_pool_service as pool_module
+from app.services.weasy_render_pool_service import WeasyRenderPoolService
+
+
+@pytest.mark.asyncio
+async def test_thread_mode_renders_off_loop_and_times_out(monkeypatch):
+    monkeypatch.setattr(pool_module, "weasyprint_available", lambda: True)
+
+    def _fake_render(dados):
+        time.sleep(dados["delay"])
+        return b"%PDF-" + dados["numero"].encode()
+
+    monkeypatch.setattr(pool_module, "_worker_render", _fake_render)
+    service = WeasyRenderPoolService()
+    service.workers = 0
+
+    ticks = 0
+
+    async def _ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(_ticker())
+    try:
+        assert await service.render({"numero": "CNT-1", "delay": 0.1}) == b"%PDF-CNT-1"
+    finally:
+        ticker.cancel()
+    # Event loop seguiu livre durante o render.
+    assert ticks >= 3
+
+    with pytest.raises(asyncio.TimeoutError):
+        await service.render({"numero": "CNT-2", "delay": 0.2}, timeout=0.05)
+    assert service.get_stats()["timeouts"] == 1
+    assert service.get_stats()["renders"] == 1
+
+
+@pytest.mark.asyncio
+async def test_render_requires_weasyprint(monkeypatch):
+    monkeypatch.setattr(pool_module, "weasyprint_available", lambda: False)
+    with pytest.raises(ModuleNotFoundError):
+        await WeasyRenderPoolService().render({"numero": "x"})
@@ -0,0 +1,133 @@
+import pytest
+
+from app.services.whatsapp_directory_service import WhatsAppDirectoryService
+from app.services.whatsapp_service import WhatsAppService
+
+
+def _loader(rows, calls):
+    async def _load():
+        calls.append(1)
+        return rows
+
+    return _load
+
+
+@pytest.mark.asyncio
+async def test_directory_caches_contacts_and_indexes_by_picture():
+    directory = WhatsAppDirectoryService()
+    calls = []
+    rows = [
+        {"remoteJid": "260129056403704@lid", "pushName": "Contato", "profilePicUrl": "pic-a"},
+        {"remoteJid": "5516982223333@s.whatsapp.net", "pushName": "Outro", "profilePicUrl": "pic-a"},
+    ]
+
+    first = await directory.get_contacts("fc-solucoes", _loader(rows, calls))
+    second = await directory.get_contacts("fc-solucoes", _loader(rows, calls))
+
+    assert first is second
+    assert len(calls) == 1
+    assert first.get("260129056403704@LID")["pushName"] == "Contato"
+    assert first.jids_with_pic("pic-a") == ["260129056403704@lid", "5516982223333@s.whatsapp.net"]
+    stats = directory.get_stats()
+    assert stats["contacts_miss"] == 1
+    assert stats["contacts_hit"] == 1
+
+
+@pytest.mark.asyncio
+async def test_directory_does_not_cache_empty_instances():
+    directory = WhatsAppDirectoryService()
+    calls = []
+
+    assert await directory.get_instances(_loader([], calls)) == []
+    await directory.get_instances(_loader([{"name": "fc-solucoes"}], calls))
+    await directory.get_instances(_loader([{"name": "outra"}], calls))
+
+    assert len(calls) == 2
+    assert directory.get_stats()["instances_hit"] == 1
+
+    directory.apply_event("connection.update", "fc-solucoes", {})
+    await directory.get_instances(_loader([{"name": "fc-solucoes"}], calls))
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_directory_applies_webhook_events_incrementally():
+    directory = WhatsAppDirectoryService()
+    chats = await directory.get_chats(
+        "fc-solucoes",
+        _loader([{"remoteJid": "5516997030530@s.whatsapp.net", "pushName": "Lucas"}], []),
+    )
+
+    assert directory.apply_event(
+        "chats.upsert",
+        "fc-solucoes",
+        {"data": [{"remoteJid": "5511999998888@s.whatsapp.net", "pushName": "Tuane"}]},
+    )
+    assert directory.apply_event(
+        "messages.upsert",
+        "fc-solucoes",
+        {"data": {"key": {"remoteJid": "5516997030530@s.whatsapp.net"}, "pushName": "Lucas Lebre"}},
+    )
+    assert directory.apply_event(
+        "chats.delete",
+        "fc-solucoes",
+        {"data": {"remoteJid": "5511999998888@s.whatsapp.net"}},
+    )
+    # Instancia ainda nao carregada: nada a atualizar
+    assert not directory.apply_event("chats.upsert", "outra", {"data": [{"remoteJid": "1@s.whatsapp.net"}]})
+
+    row = chats.get("5516997030530@s.whatsapp.net")
+    assert row["pushName"] == "Lucas Lebre"
+    assert chats.meta["5516997030530@s.whatsapp.net"]["name"] == "lucas lebre"
+    assert chats.meta["5516997030530@s.whatsapp.net"]["updated_at"] is not None
+    assert chats.get("5511999998888@s.whatsapp.net") is None
+
+
+@pytest.mark.asyncio
+async def test_directory_evicts_least_recently_used_instance(monkeypatch):
+    directory = WhatsAppDirectoryService()
+    monkeypatch.setattr(directory, "max_instances", 2)
+    rows = [{"remoteJid": "5516997030530@s.whatsapp.net"}]
+
+    for instance in ("a", "b", "c"):
+        await directory.get_chats(instance, _loader(rows, []))
+
+    stats = directory.get_stats()
+    assert stats["cached_instances"] == ["b", "c"]
+    assert stats["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resolve_lid_reuses_cached_directory(monkeypatch):
+    service = WhatsAppService()
+    calls = {"contacts": 0, "chats": 0}
+
+    async def _fake_fetch_contacts(client, instance):
+        calls["contacts"] += 1
+        return [{"remoteJid": "223927414591688@lid", "pushName": "Lucas"}]
+
+    async def _fake_fetch_chats(client, instance):
+        calls["chats"] += 1
+        return [
+            {"remoteJid": "223927414591688@lid", "pushName": "Lucas"},
+            {"remoteJid": "5516997030530@s.whatsapp.net", "pushName": "Lucas Lebre"},
+        ]
+
+    async def _fake_check_whatsapp_number(client, instance, number):
+        return number if number == "5516997030530" else None
+
+    monkeypatch.setattr(service, "_fetch_contacts", _fake_fetch_contacts)
+    monkeypatch.setattr(service, "_fetch_chats", _fake_fetch_chats)
+    monkeypatch.setattr(service, "_check_whatsapp_number", _fake_check_whatsapp_number)
+
+    for _ in range(3):
+        resolved = await service._resolve_lid_number(
+            client=None,
+            instance="fc-solucoes",
+            numero="223927414591688@lid",
+            context_push_name=None,
+            context_preferred_number=None,
+        )
+        assert resolved == "5516997030530"
+
+    assert calls == {"contacts": 1, "chats": 1}
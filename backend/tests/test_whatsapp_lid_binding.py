@@ -0,0 +1,158 @@
+import math
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services.whatsapp_lid_binding_service import whatsapp_lid_binding_service
+from app.services.whatsapp_service import WhatsAppNumberCheckError, WhatsAppService
+
+
+@pytest.fixture
+def memory_only_bindings(monkeypatch):
+    # Sem Postgres nos testes: apenas a camada em memoria.
+    monkeypatch.setattr(whatsapp_lid_binding_service, "_db_retry_at", math.inf)
+    return whatsapp_lid_binding_service
+
+
+@pytest.mark.asyncio
+async def test_bind_keeps_higher_confidence_binding(memory_only_bindings):
+    store = memory_only_bindings
+
+    await store.bind("fc-solucoes", "123@LID", "5516997030530", source="manual_bind")
+    await store.bind("fc-solucoes", "123@lid", "5511999998888", source="chat_similarity")
+
+    binding = await store.get_binding("fc-solucoes", "123@lid")
+    assert binding["numero"] == "5516997030530"
+    assert binding["source"] == "manual_bind"
+    assert binding["confidence"] == 1.0
+
+    await store.invalidate("fc-solucoes", "123@lid")
+    assert await store.get_binding("fc-solucoes", "123@lid") is None
+    assert store.is_number_negative("fc-solucoes", "5516997030530")
+
+
+@pytest.mark.asyncio
+async def test_negative_ttl_grows_per_failure(memory_only_bindings):
+    store = memory_only_bindings
+    first = await store.mark_unresolved("fc-solucoes", "999@lid")
+    second = await store.mark_unresolved("fc-solucoes", "999@lid")
+
+    delta = (second - first).total_seconds()
+    assert delta == pytest.approx(store.negative_ttl, abs=2)
+    assert store.is_negative("fc-solucoes", "999@lid")
+    assert not store.is_negative("fc-solucoes", "888@lid")
+
+
+@pytest.mark.asyncio
+async def test_resolve_lid_uses_binding_and_negative_cache(monkeypatch, memory_only_bindings):
+    service = WhatsAppService()
+    probes = []
+
+    async def _fake_fetch(client, instance):
+        return []
+
+    async def _fake_check_whatsapp_number(client, instance, number):
+        probes.append(number)
+        return number if number == "5511999998888" else None
+
+    monkeypatch.setattr(service, "_fetch_contacts", _fake_fetch)
+    monkeypatch.setattr(service, "_fetch_chats", _fake_fetch)
+    monkeypatch.setattr(service, "_check_whatsapp_number", _fake_check_whatsapp_number)
+
+    async def _resolve(preferred):
+        return await service._resolve_lid_number(
+            client=None,
+            instance="fc-solucoes",
+            numero="123456789@lid",
+            context_push_name=None,
+            context_preferred_number=preferred,
+        )
+
+    # Sem candidatos: falha entra no cache negativo e nao reconsulta o Evolution.
+    assert await _resolve(None) is None
+    assert await _resolve("5516981234567") is None
+    assert await _resolve("5516981234567") is None
+    assert probes == ["5516981234567"]
+
+    # Numero novo no contexto ainda e validado; depois o vinculo dispensa probes.
+    assert await _resolve("5511999998888") == "5511999998888"
+    assert await _resolve(None) == "5511999998888"
+    assert probes == ["5516981234567", "5511999998888"]
+
+    binding = await memory_only_bindings.get_binding("fc-solucoes", "123456789@lid")
+    assert binding["source"] == "context_preferred"
+    assert binding["verified_at"] is not None
+
+
+def test_number_negative_expires(monkeypatch, memory_only_bindings):
+    store = memory_only_bindings
+    store.mark_number_negative("fc-solucoes", "5516981234567")
+    assert store.is_number_negative("fc-solucoes", "5516981234567")
+
+    monkeypatch.setattr(time, "monotonic", lambda: math.inf)
+    assert not store.is_number_negative("fc-solucoes", "5516981234567")
+
+
+@pytest.mark.asyncio
+async def test_check_number_separates_not_on_whatsapp_from_failed_check(monkeypatch):
+    service = WhatsAppService()
+    responses = []
+
+    async def _fake_request(client, method, path, json=None, timeout=10.0):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(service, "_request", _fake_request)
+
+    responses.append(SimpleNamespace(status_code=200, json=lambda: [{"exists": False}]))
+    assert await service._check_whatsapp_number(None, "fc", "5516981234567") is None
+    responses.append(SimpleNamespace(status_code=200, json=lambda: [{"exists": True, "number": "5516981234567"}]))
+    assert await service._check_whatsapp_number(None, "fc", "5516981234567") == "5516981234567"
+
+    for failure in (
+        httpx.ReadTimeout("timeout"),
+        SimpleNamespace(status_code=502, json=lambda: {}),
+        SimpleNamespace(status_code=200, json=lambda: {"error": "x"}),
+    ):
+        responses.append(failure)
+        with pytest.raises(WhatsAppNumberCheckError):
+            await service._check_whatsapp_number(None, "fc", "5516981234567")
+
+
+@pytest.mark.asyncio
+async def test_failed_check_is_not_cached_as_negative(monkeypatch, memory_only_bindings):
+    service = WhatsAppService()
+    outcomes = [WhatsAppNumberCheckError("HTTP 502"), "5521988887777"]
+
+    async def _fake_fetch(client, instance):
+        return []
+
+    async def _fake_check_whatsapp_number(client, instance, number):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(service, "_fetch_contacts", _fake_fetch)
+    monkeypatch.setattr(service, "_fetch_chats", _fake_fetch)
+    monkeypatch.setattr(service, "_check_whatsapp_number", _fake_check_whatsapp_number)
+
+    async def _resolve():
+        return await service._resolve_lid_number(
+            client=None,
+            instance="fc-solucoes",
+            numero="555000111@lid",
+            context_push_name=None,
+            context_preferred_number="5521988887777",
+        )
+
+    assert await _resolve() is None
+    assert not memory_only_bindings.is_number_negative("fc-solucoes", "5521988887777")
+    assert not memory_only_bindings.is_negative("fc-solucoes", "555000111@lid")
+    # Proxima mensagem tenta de novo e resolve.
+    assert await _resolve() == "5521988887777"
+    assert outcomes == []
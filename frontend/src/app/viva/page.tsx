@@ -1094,6 +1094,10 @@ export default function VivaChatPage() {
 
           if (data?.done) {
             streamFinished = true
+            // Texto final do backend pode ajustar o que foi transmitido (ex.: saudacao).
+            if (typeof data.resposta === 'string' && data.resposta.length > 0) {
+              fullResponse = data.resposta
+            }
             setMensagens(prev => prev.map(msg =>
               msg.id === streamMsgId
                 ? { ...msg, streaming: false, conteudo: fullResponse }